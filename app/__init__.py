@@ -14,6 +14,7 @@ from app.models_tasks import Project, ProjectMember, Task, Sprint, TaskComment,
 
 # Import new user system models (RBAC) - will create tables alongside old ones
 from app.models_users import User, TeacherProfile, StudentProfile, ParentProfile
+from app.models_rbac import Role, Permission, RbacVersion  # RBAC động + bộ đếm phiên bản cache quyền
 
 # Initialize Flask-Mail and CSRF
 mail = Mail()
@@ -111,24 +112,16 @@ def create_app():
     @app.template_filter('assess_bmi')
     def assess_bmi_filter(student, bmi_value):
         """Đánh giá BMI theo tuổi của trẻ (dùng trong template) - WHO standards"""
-        from app.routes import assess_child_growth_who
-        from datetime import datetime
+        from app.growth_standards import assess_child_growth_who, age_in_months
         
         if not student or not hasattr(student, 'birth_date') or not student.birth_date or not bmi_value:
             return 'Chưa có đủ thông tin'
         
         try:
-            # Convert birth_date từ string hoặc date object sang datetime
-            if isinstance(student.birth_date, str):
-                birth_date_obj = datetime.strptime(student.birth_date, '%Y-%m-%d')
-            else:
-                birth_date_obj = student.birth_date
-            
-            # Tính age_months
-            age_months = (datetime.now() - birth_date_obj).days // 30
+            age_months = age_in_months(student.birth_date)
             gender = getattr(student, 'gender', 'unknown')
             
-            # Sử dụng WHO standards
+            # Sử dụng WHO standards (bảng LMS, nội suy theo tháng)
             growth_data = assess_child_growth_who(age_months, gender, bmi=bmi_value)
             return growth_data['bmi']['assessment'] or 'Chưa có đủ thông tin'
         except Exception as e:
@@ -139,8 +132,7 @@ def create_app():
     @app.template_filter('assess_growth')
     def assess_growth_filter(student, weight=None, height=None, bmi=None):
         """Đánh giá tăng trưởng đầy đủ theo WHO standards - trả về dict với 3 chỉ số"""
-        from app.routes import assess_child_growth_who
-        from datetime import datetime
+        from app.growth_standards import assess_child_growth_who, age_in_months
         
         result = {
             'bmi': {'assessment': 'Chưa có đủ thông tin', 'badge': 'secondary'},
@@ -152,13 +144,7 @@ def create_app():
             return result
         
         try:
-            # Convert birth_date
-            if isinstance(student.birth_date, str):
-                birth_date_obj = datetime.strptime(student.birth_date, '%Y-%m-%d')
-            else:
-                birth_date_obj = student.birth_date
-            
-            age_months = (datetime.now() - birth_date_obj).days // 30
+            age_months = age_in_months(student.birth_date)
             gender = getattr(student, 'gender', 'unknown')
             
             # Đánh giá theo WHO
@@ -188,6 +174,10 @@ def create_app():
     app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
     app.config['SESSION_COOKIE_SECURE'] = False  # Set True in production with HTTPS
     
+    # Session phía server: cookie chỉ giữ session id, dữ liệu nằm ở SESSION_BACKEND
+    from app.session_store import init_session_store
+    init_session_store(app)
+    
     # Security Headers  
     @app.after_request
     def add_security_headers(response):
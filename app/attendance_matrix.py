@@ -0,0 +1,103 @@
+"""
+Attendance Matrix - Bảng điểm danh học sinh x ngày của một tháng, dạng gọn
+
+month_matrix() trả về mỗi học sinh một chuỗi trạng thái, mỗi ngày trong tháng một ký tự
+(STATUS_CODES; NO_RECORD nếu ngày đó chưa điểm danh), được ghép ngay trong SQL:
+GROUP BY child_id với mỗi ngày một cột MAX(CASE ...) nối lại bằng ||.
+Nếu một ngày có nhiều bản ghi, chỉ lấy bản ghi mới nhất (id lớn nhất) - subquery MAX(id)
+theo (child_id, date).
+Không nạp object AttendanceRecord nào - 300 học sinh x 31 ngày chỉ còn 300 chuỗi 31 ký tự.
+
+Trạng thái khác bốn trạng thái chuẩn (dữ liệu cũ, nhập tay) được cấp mã riêng trong tháng
+(EXTRA_CODES) nên bảng vẫn hiện đúng chữ đã lưu - MonthMatrix.labels là bảng mã → chữ.
+
+Template dựng bảng từ chuỗi này; matrix_payload() là dạng JSON cho mobile/render phía client.
+"""
+from calendar import monthrange
+from collections import namedtuple
+from functools import reduce
+
+from sqlalchemy import String, case, func, select
+
+from app.models import db, AttendanceRecord
+
+STATUS_CODES = {
+    'Có mặt': 'P',
+    'Vắng mặt có phép': 'E',
+    'Vắng mặt không phép': 'U',
+    'Vắng': 'A',
+}
+STATUS_LABELS = {code: status for status, code in STATUS_CODES.items()}
+NO_RECORD = '-'
+# Mã cho trạng thái không có trong STATUS_CODES, cấp theo thứ tự chữ cái của trạng thái trong tháng
+# (hết EXTRA_CODES thì dùng ký tự vùng Private Use U+E000...)
+EXTRA_CODES = 'abcdefghijklmnopqrstuvwxyz0123456789'
+UNKNOWN_STATUS = '?'  # bản ghi không có trạng thái (NULL/rỗng) - hiển thị ô trống
+
+# rows: {child_id: chuỗi trạng thái}; labels: {mã: trạng thái đã lưu}
+MonthMatrix = namedtuple('MonthMatrix', ['rows', 'labels'])
+
+
+def month_days(month):
+    """['YYYY-MM-01', ..., 'YYYY-MM-<ngày cuối>'] của tháng 'YYYY-MM'"""
+    year, m = map(int, month.split('-'))
+    return [f"{year:04d}-{m:02d}-{day:02d}" for day in range(1, monthrange(year, m)[1] + 1)]
+
+
+def _extra_code(index):
+    return EXTRA_CODES[index] if index < len(EXTRA_CODES) else chr(0xE000 + index - len(EXTRA_CODES))
+
+
+def _status_codes(filters):
+    """{trạng thái: mã} gồm STATUS_CODES và mã riêng cho trạng thái lạ có trong phạm vi filters"""
+    codes = dict(STATUS_CODES)
+    extra = sorted(status for (status,) in
+                   db.session.query(AttendanceRecord.status).filter(*filters).distinct()
+                   if status and status not in codes)
+    codes.update((status, _extra_code(index)) for index, status in enumerate(extra))
+    return codes
+
+
+def _labels(codes):
+    return dict({code: status for status, code in codes.items()}, **{UNKNOWN_STATUS: ''})
+
+
+def month_matrix(month, child_ids=None):
+    """
+    MonthMatrix của tháng 'YYYY-MM': rows {child_id: chuỗi trạng thái} (độ dài = số ngày trong tháng)
+    và labels {mã: trạng thái}. child_ids: chỉ lấy các học sinh này (None = tất cả). Học sinh
+    không có bản ghi nào không có trong rows - dùng empty_row(month).
+    """
+    filters = [AttendanceRecord.date.like(f"{month}-%")]
+    if child_ids is not None:
+        if not child_ids:
+            return MonthMatrix({}, _labels(STATUS_CODES))
+        filters.append(AttendanceRecord.child_id.in_(child_ids))
+
+    codes = _status_codes(filters)
+    code = case(codes, value=AttendanceRecord.status, else_=UNKNOWN_STATUS)
+    cells = [func.coalesce(func.max(case((AttendanceRecord.date == day, code))), NO_RECORD, type_=String)
+             for day in month_days(month)]
+    statuses = reduce(lambda row, cell: row + cell, cells).label('statuses')
+
+    latest = select(func.max(AttendanceRecord.id)).where(*filters)\
+        .group_by(AttendanceRecord.child_id, AttendanceRecord.date)
+    query = db.session.query(AttendanceRecord.child_id, statuses).filter(AttendanceRecord.id.in_(latest))
+    return MonthMatrix(dict(query.group_by(AttendanceRecord.child_id).all()), _labels(codes))
+
+
+def empty_row(month):
+    return NO_RECORD * len(month_days(month))
+
+
+def matrix_payload(month, students, matrix):
+    """Dạng JSON: mã trạng thái (kể cả mã riêng của trạng thái lạ) + mỗi học sinh một chuỗi (thứ tự như students)"""
+    empty = empty_row(month)
+    return {
+        'month': month,
+        'days': len(empty),
+        'codes': matrix.labels,
+        'no_record': NO_RECORD,
+        'students': [{'id': student.id, 'name': student.name, 'statuses': matrix.rows.get(student.id, empty)}
+                     for student in students],
+    }
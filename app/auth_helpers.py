@@ -4,7 +4,8 @@ Decorators và functions để xác thực và phân quyền
 """
 from functools import wraps
 from flask import session, redirect, url_for, flash, abort
-from app.models_users import User, ROLE_PERMISSIONS
+from app.models_users import User
+from app.models_rbac import role_has_permission
 
 
 def login_required(f):
@@ -55,10 +56,7 @@ def permission_required(permission):
                 flash('Vui lòng đăng nhập để tiếp tục!', 'warning')
                 return redirect(url_for('main.login'))
             
-            user_role = session.get('role')
-            permissions = ROLE_PERMISSIONS.get(user_role, [])
-            
-            if permission not in permissions:
+            if not role_has_permission(session.get('role'), permission):
                 flash('Bạn không có quyền thực hiện hành động này!', 'danger')
                 abort(403)
             
@@ -122,7 +120,7 @@ def has_permission(permission):
     user_role = session.get('role')
     if not user_role:
         return False
-    return permission in ROLE_PERMISSIONS.get(user_role, [])
+    return role_has_permission(user_role, permission)
 
 
 def is_admin():
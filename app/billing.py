@@ -0,0 +1,183 @@
+"""
+Billing - Tính hóa đơn học phí cho cả danh sách học sinh trong một lượt
+
+Biểu phí lấy từ bảng fee_schedule (FeeSchedule, có version) thay vì hằng số rải trong
+routes/template; chưa có bảng hoặc chưa có dòng nào thì dùng DEFAULT_FEES (giá cũ).
+
+compute_invoices() nhận danh sách học sinh (RosterEntry), số ngày điểm danh, dịch vụ
+đã chọn và biểu phí, trả về list InvoiceRow: tuổi, học phí, tiền ăn, dịch vụ, tổng tiền.
+Ngày sinh được đọc một lần cho mỗi học sinh, phần tính tiền chạy theo cột (numpy nếu có).
+Trang hóa đơn, file Word và các bản xuất khác đều dùng chung các dòng này.
+"""
+from collections import namedtuple
+from datetime import date, datetime
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.models import db, AttendanceRecord, FeeSchedule
+from app.service_enrollment import DEFAULT_SERVICES
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+PRESENT = 'Có mặt'
+ABSENT_UNEXCUSED = 'Vắng mặt không phép'
+ABSENT_EXCUSED = 'Vắng mặt có phép'
+
+# Giá trước khi có bảng fee_schedule (version 0) - migrate_fee_schedule.py ghi thành version 1
+DEFAULT_FEES = {
+    'meal_fee': 38000,
+    'meal_days': 26,
+    'english_fee': 250000,
+    'steamax_fee': 200000,
+    'tuition_by_age': {1: 1850000, 2: 1750000, 3: 1650000, 4: 1550000},
+    'default_tuition': 1500000,
+}
+
+FeeRates = namedtuple('FeeRates', ['version', 'effective_from', 'meal_fee', 'meal_days', 'english_fee',
+                                   'steamax_fee', 'tuition_by_age', 'default_tuition'])
+
+DEFAULT_RATES = FeeRates(version=0, effective_from=None, **DEFAULT_FEES)
+
+AttendanceSummary = namedtuple('AttendanceSummary', ['present', 'absent_unexcused', 'absent_excused'])
+NO_ATTENDANCE = AttendanceSummary(0, 0, 0)
+
+# student: RosterEntry; age: tuổi tròn (0 nếu thiếu/sai ngày sinh)
+InvoiceRow = namedtuple('InvoiceRow', ['student', 'age', 'present', 'absent_unexcused', 'absent_excused',
+                                       'tuition', 'meal_cost', 'has_english', 'english_cost',
+                                       'has_steamax', 'steamax_cost', 'total'])
+
+
+# ================== BIỂU PHÍ ==================
+
+def _rates(row):
+    return FeeRates(row.version, row.effective_from, row.meal_fee, row.meal_days, row.english_fee,
+                    row.steamax_fee, {int(age): fee for age, fee in row.tuition_by_age.items()},
+                    row.default_tuition)
+
+
+def fee_rates(month):
+    """FeeRates áp dụng cho tháng học phí 'YYYY-MM' (DEFAULT_RATES nếu chưa có biểu phí)"""
+    query = select(FeeSchedule).where(FeeSchedule.effective_from <= month)\
+        .order_by(FeeSchedule.effective_from.desc(), FeeSchedule.version.desc()).limit(1)
+    try:
+        with db.engine.connect() as conn:
+            row = conn.execute(query).first()
+    except SQLAlchemyError:
+        # Chưa có bảng fee_schedule (chưa chạy migrate_fee_schedule.py)
+        return DEFAULT_RATES
+    return _rates(row) if row else DEFAULT_RATES
+
+
+def add_fee_schedule(effective_from, note=None, **fees):
+    """Thêm biểu phí version mới (phí không truyền vào giữ như biểu phí đang áp dụng), chưa commit"""
+    current = fee_rates(effective_from)
+    values = {field: fees.get(field, getattr(current, field)) for field in DEFAULT_FEES}
+    values['tuition_by_age'] = {str(age): fee for age, fee in values['tuition_by_age'].items()}
+    version = (db.session.query(func.max(FeeSchedule.version)).scalar() or 0) + 1
+    schedule = FeeSchedule(version=version, effective_from=effective_from, note=note, **values)
+    db.session.add(schedule)
+    return schedule
+
+
+# ================== ĐẦU VÀO ==================
+
+def attendance_summaries(month):
+    """{child_id: AttendanceSummary} của tháng 'YYYY-MM' - một query GROUP BY"""
+    rows = db.session.query(AttendanceRecord.child_id, AttendanceRecord.status, func.count(AttendanceRecord.id))\
+        .filter(AttendanceRecord.date.like(f"{month}-%"))\
+        .filter(AttendanceRecord.status.in_((PRESENT, ABSENT_UNEXCUSED, ABSENT_EXCUSED)))\
+        .group_by(AttendanceRecord.child_id, AttendanceRecord.status).all()
+    counts = {}
+    for child_id, status, count in rows:
+        counts.setdefault(child_id, {})[status] = count
+    return {child_id: AttendanceSummary(c.get(PRESENT, 0), c.get(ABSENT_UNEXCUSED, 0), c.get(ABSENT_EXCUSED, 0))
+            for child_id, c in counts.items()}
+
+
+def _birth_parts(birth_date):
+    try:
+        born = datetime.strptime(birth_date, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        return None
+    return born.year, born.month, born.day
+
+
+# ================== TÍNH TIỀN ==================
+
+def _compute_python(births, excused, english, steamax, rates, on_date):
+    columns = []
+    for born, absent, has_english, has_steamax in zip(births, excused, english, steamax):
+        age = 0
+        if born:
+            age = on_date.year - born[0] - ((on_date.month, on_date.day) < (born[1], born[2]))
+        tuition = rates.tuition_by_age.get(age, rates.default_tuition)
+        meal_cost = (rates.meal_days - absent) * rates.meal_fee
+        english_cost = rates.english_fee if has_english else 0
+        steamax_cost = rates.steamax_fee if has_steamax else 0
+        columns.append((age, tuition, meal_cost, english_cost, steamax_cost,
+                        tuition + meal_cost + english_cost + steamax_cost))
+    return [list(col) for col in zip(*columns)] or [[]] * 6
+
+
+def _compute_numpy(births, excused, english, steamax, rates, on_date):
+    n = len(births)
+    parts = np.array([born or (on_date.year, 1, 1) for born in births], dtype=np.int64).reshape(n, 3)
+    known = np.array([born is not None for born in births], dtype=bool)
+    before_birthday = (parts[:, 1] > on_date.month) | ((parts[:, 1] == on_date.month) & (parts[:, 2] > on_date.day))
+    ages = np.where(known, on_date.year - parts[:, 0] - before_birthday, 0)
+
+    # Bảng tra học phí theo tuổi: ô cuối là default_tuition cho tuổi ngoài bảng (kể cả âm)
+    max_age = max(rates.tuition_by_age, default=0)
+    table = np.full(max_age + 2, rates.default_tuition, dtype=np.int64)
+    for age, fee in rates.tuition_by_age.items():
+        if age >= 0:
+            table[age] = fee
+    index = np.where((ages >= 0) & (ages <= max_age), ages, max_age + 1)
+    tuition = table[index]
+
+    meal_cost = (rates.meal_days - np.asarray(excused, dtype=np.int64)) * rates.meal_fee
+    english_cost = np.asarray(english, dtype=bool) * rates.english_fee
+    steamax_cost = np.asarray(steamax, dtype=bool) * rates.steamax_fee
+    total = tuition + meal_cost + english_cost + steamax_cost
+    return [col.tolist() for col in (ages, tuition, meal_cost, english_cost, steamax_cost, total)]
+
+
+def compute_invoices(students, attendance, services, rates, on_date=None):
+    """
+    list InvoiceRow theo thứ tự students.
+    attendance: {child_id: AttendanceSummary}, services: {child_id: (has_english, has_steamax)}
+    (thiếu thì dùng DEFAULT_SERVICES), on_date: ngày tính tuổi (mặc định hôm nay).
+    """
+    on_date = on_date or date.today()
+    summaries = [attendance.get(student.id, NO_ATTENDANCE) for student in students]
+    births = [_birth_parts(student.birth_date) for student in students]
+    chosen = [services.get(student.id, DEFAULT_SERVICES) for student in students]
+    excused = [summary.absent_excused for summary in summaries]
+    english = [has_english for has_english, _ in chosen]
+    steamax = [has_steamax for _, has_steamax in chosen]
+
+    compute = _compute_numpy if NUMPY_AVAILABLE and students else _compute_python
+    ages, tuition, meal_cost, english_cost, steamax_cost, total = \
+        compute(births, excused, english, steamax, rates, on_date)
+
+    return [InvoiceRow(student, ages[i], summary.present, summary.absent_unexcused, summary.absent_excused,
+                       tuition[i], meal_cost[i], english[i], english_cost[i], steamax[i], steamax_cost[i], total[i])
+            for i, (student, summary) in enumerate(zip(students, summaries))]
+
+
+def invoice_summary(row):
+    """Một dòng mô tả hóa đơn (hiển thị dưới bảng sau khi bấm xuất)"""
+    extras = []
+    if row.has_english:
+        extras.append(f"Anh văn: {row.english_cost:,}đ")
+    if row.has_steamax:
+        extras.append(f"STEAMAX: {row.steamax_cost:,}đ")
+    extra_text = " + " + " + ".join(extras) if extras else ""
+    return (f"Học sinh {row.student.name}: Có mặt {row.present} ngày, vắng không phép {row.absent_unexcused} ngày, "
+            f"vắng có phép {row.absent_excused} ngày. Tiền ăn: {row.meal_cost:,}đ + Học phí: {row.tuition:,}đ"
+            f"{extra_text} = Tổng: {row.total:,}đ")
@@ -0,0 +1,61 @@
+"""
+BMI History Service
+Lấy chỉ số BMI mới nhất / lịch sử BMI của nhiều học sinh trong MỘT query
+bằng window function ROW_NUMBER() OVER (PARTITION BY student_id ...),
+thay vì 1 query cho mỗi học sinh. Dùng index ix_bmi_record_student_date.
+
+Child.current_bmi/current_weight/current_height/current_bmi_date là bản chiếu
+của lần đo mới nhất, cập nhật bằng refresh_current_bmi() mỗi khi ghi bmi_record.
+"""
+from sqlalchemy.orm import aliased
+
+from app.models import db, BmiRecord, Child
+
+
+def _ranked_records(student_ids, partition_by):
+    """BmiRecord được đánh số trong từng partition, mới nhất (date, id lớn nhất) = 1"""
+    row_number = db.func.row_number().over(
+        partition_by=partition_by,
+        order_by=(BmiRecord.date.desc(), BmiRecord.id.desc())
+    ).label('rn')
+    ranked = db.session.query(BmiRecord, row_number)\
+        .filter(BmiRecord.student_id.in_(student_ids))\
+        .subquery()
+    record = aliased(BmiRecord, ranked)
+    return db.session.query(record).filter(ranked.c.rn == 1), record
+
+
+def latest_bmi_records(student_ids):
+    """{student_id: BmiRecord mới nhất} cho danh sách học sinh - 1 query"""
+    student_ids = list(student_ids)
+    if not student_ids:
+        return {}
+    query, _ = _ranked_records(student_ids, BmiRecord.student_id)
+    return {record.student_id: record for record in query}
+
+
+def bmi_history(student_ids):
+    """
+    {student_id: [BmiRecord]} - mỗi ngày đo chỉ giữ bản ghi nhập sau cùng,
+    sắp xếp mới nhất trước. Học sinh chưa có dữ liệu trả về list rỗng - 1 query.
+    """
+    student_ids = list(student_ids)
+    history = {student_id: [] for student_id in student_ids}
+    if not student_ids:
+        return history
+    query, record = _ranked_records(student_ids, (BmiRecord.student_id, BmiRecord.date))
+    for row in query.order_by(record.student_id, record.date.desc(), record.id.desc()):
+        history[row.student_id].append(row)
+    return history
+
+
+def refresh_current_bmi(student_ids):
+    """Cập nhật lại bản chiếu BMI hiện tại trên Child từ bmi_record. Không commit."""
+    student_ids = list(student_ids)
+    latest = latest_bmi_records(student_ids)
+    for child in Child.query.filter(Child.id.in_(student_ids)):
+        record = latest.get(child.id)
+        child.current_bmi = record.bmi if record else None
+        child.current_weight = record.weight if record else None
+        child.current_height = record.height if record else None
+        child.current_bmi_date = record.date if record else None
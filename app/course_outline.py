@@ -0,0 +1,194 @@
+"""
+Course Outline Loader
+Nạp cấu trúc khóa học (sections → lessons → chapters) và tiến độ của học viên
+với số lượng query cố định, thay vì 1 query LessonProgress cho mỗi bài học.
+
+Outline (phần không phụ thuộc học viên) được cache trong process theo
+"phiên bản" của khóa học = Course.updated_at. Các endpoint chỉnh sửa nội dung
+gọi touch_course_outline() để tăng phiên bản, nên mọi worker đều thấy thay đổi.
+"""
+import threading
+from collections import namedtuple
+from datetime import datetime
+
+from app.models import db
+from app.models_courses import Course, CourseSection, Lesson, LessonProgress, VideoChapter
+
+
+# Snapshot bất biến - an toàn để dùng lại giữa các request (không gắn với session)
+SectionOutline = namedtuple('SectionOutline', ['id', 'title', 'description', 'order', 'lessons'])
+LessonOutline = namedtuple('LessonOutline', [
+    'id', 'section_id', 'title', 'description', 'order', 'lesson_type',
+    'video_url', 'video_id', 'video_start_time', 'video_end_time',
+    'content', 'duration', 'is_preview', 'chapters'
+])
+ChapterOutline = namedtuple('ChapterOutline', ['id', 'title', 'timestamp', 'order', 'description', 'formatted_time'])
+
+EMPTY_PROGRESS = {
+    'is_completed': False,
+    'completion_percentage': 0,
+    'current_position': 0,
+    'watched_duration': 0
+}
+
+_outline_cache = {}  # course_id -> (version, tuple[SectionOutline])
+_outline_lock = threading.Lock()
+
+
+def _format_timestamp(seconds):
+    """Giống VideoChapter.formatted_time() nhưng không cần ORM object"""
+    hours = seconds // 3600
+    minutes = (seconds % 3600) // 60
+    secs = seconds % 60
+    if hours > 0:
+        return f"{hours:02d}:{minutes:02d}:{secs:02d}"
+    return f"{minutes:02d}:{secs:02d}"
+
+
+def _build_outline(course_id):
+    """Nạp sections, lessons, chapters của khóa học - đúng 3 query"""
+    sections = CourseSection.query.filter_by(course_id=course_id)\
+        .order_by(CourseSection.order, CourseSection.id).all()
+    section_ids = [s.id for s in sections]
+
+    lessons = []
+    if section_ids:
+        lessons = Lesson.query.filter(Lesson.section_id.in_(section_ids))\
+            .order_by(Lesson.order, Lesson.id).all()
+    lesson_ids = [l.id for l in lessons]
+
+    chapters_by_lesson = {}
+    if lesson_ids:
+        chapters = VideoChapter.query.filter(VideoChapter.lesson_id.in_(lesson_ids))\
+            .order_by(VideoChapter.order, VideoChapter.timestamp).all()
+        for ch in chapters:
+            chapters_by_lesson.setdefault(ch.lesson_id, []).append(ChapterOutline(
+                id=ch.id,
+                title=ch.title,
+                timestamp=ch.timestamp,
+                order=ch.order,
+                description=ch.description,
+                formatted_time=_format_timestamp(ch.timestamp or 0)
+            ))
+
+    lessons_by_section = {}
+    for l in lessons:
+        lessons_by_section.setdefault(l.section_id, []).append(LessonOutline(
+            id=l.id,
+            section_id=l.section_id,
+            title=l.title,
+            description=l.description,
+            order=l.order,
+            lesson_type=l.lesson_type,
+            video_url=l.video_url,
+            video_id=l.video_id,
+            video_start_time=l.video_start_time or 0,
+            video_end_time=l.video_end_time,
+            content=l.content,
+            duration=l.duration or 0,
+            is_preview=l.is_preview,
+            chapters=tuple(chapters_by_lesson.get(l.id, ()))
+        ))
+
+    return tuple(
+        SectionOutline(
+            id=s.id,
+            title=s.title,
+            description=s.description,
+            order=s.order,
+            lessons=tuple(lessons_by_section.get(s.id, ()))
+        )
+        for s in sections
+    )
+
+
+def get_course_outline(course):
+    """
+    Trả về outline (tuple SectionOutline) của khóa học.
+    Cache theo (course.id, course.updated_at) - chỉ query lại khi khóa học thay đổi.
+    """
+    version = course.updated_at
+    with _outline_lock:
+        cached = _outline_cache.get(course.id)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    outline = _build_outline(course.id)
+    with _outline_lock:
+        _outline_cache[course.id] = (version, outline)
+    return outline
+
+
+def get_progress_map(enrollment_id, lesson_ids):
+    """Tiến độ của học viên cho các bài học - 1 query duy nhất"""
+    progress_map = {lesson_id: dict(EMPTY_PROGRESS) for lesson_id in lesson_ids}
+    if not enrollment_id or not lesson_ids:
+        return progress_map
+
+    rows = db.session.query(
+        LessonProgress.lesson_id,
+        LessonProgress.is_completed,
+        LessonProgress.completion_percentage,
+        LessonProgress.current_position,
+        LessonProgress.watched_duration
+    ).filter(
+        LessonProgress.enrollment_id == enrollment_id,
+        LessonProgress.lesson_id.in_(lesson_ids)
+    ).all()
+
+    for row in rows:
+        progress_map[row.lesson_id] = {
+            'is_completed': bool(row.is_completed),
+            'completion_percentage': row.completion_percentage or 0,
+            'current_position': row.current_position or 0,
+            'watched_duration': row.watched_duration or 0
+        }
+    return progress_map
+
+
+def load_course_player(course, enrollment=None):
+    """
+    Dữ liệu cho trang course_learn: outline + tiến độ + bài học hiện tại.
+    Tổng cộng tối đa 4 query (3 khi outline chưa cache, +1 cho tiến độ).
+    """
+    sections = get_course_outline(course)
+    lessons = [lesson for section in sections for lesson in section.lessons]
+
+    progress_map = {}
+    completed_lessons = 0
+    if enrollment:
+        progress_map = get_progress_map(enrollment.id, [l.id for l in lessons])
+        completed_lessons = sum(1 for p in progress_map.values() if p['is_completed'])
+
+    total_lessons = len(lessons) if enrollment else 0
+    overall_progress = 0
+    if total_lessons > 0:
+        overall_progress = round((completed_lessons / total_lessons) * 100, 1)
+
+    # Bài học hiện tại: bài đầu tiên chưa hoàn thành, nếu không có thì bài đầu tiên
+    current_lesson = None
+    if enrollment:
+        current_lesson = next((l for l in lessons if not progress_map[l.id]['is_completed']), None)
+    if not current_lesson and sections and sections[0].lessons:
+        current_lesson = sections[0].lessons[0]
+
+    return {
+        'sections': sections,
+        'lesson_progress_map': progress_map,
+        'current_lesson': current_lesson,
+        'total_lessons': total_lessons,
+        'completed_lessons': completed_lessons,
+        'overall_progress': overall_progress
+    }
+
+
+def touch_course_outline(course_id):
+    """
+    Đánh dấu outline của khóa học đã thay đổi (gọi trước db.session.commit()).
+    Tăng Course.updated_at để worker khác cũng bỏ cache cũ, và xoá cache local.
+    """
+    course = Course.query.get(course_id)
+    if course:
+        course.updated_at = datetime.utcnow()
+    with _outline_lock:
+        _outline_cache.pop(course_id, None)
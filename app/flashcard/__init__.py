@@ -2,7 +2,10 @@
 Flashcard Blueprint - Hệ thống học flashcard cho trẻ mầm non
 """
 from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash, session
-from app.models import db, Deck, Card, CardProgress, DeckProgress, Child
+from app.models import db, Deck, Card, DeckProgress, Child
+from app.flashcard.review_queue import get_review_queue
+from app.flashcard.progress import (apply_review_events, apply_deck_summary, parse_review_events, parse_deck_summary,
+                                    existing_deck_id, known_card_ids, MAX_EVENTS_PER_BATCH)
 from datetime import datetime, timedelta
 from werkzeug.utils import secure_filename
 import os
@@ -36,6 +39,25 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def session_child_id(requested_child_id=None):
+    """
+    Bé mà tài khoản đang đăng nhập được phép xem/ghi tiến độ, None nếu không được phép:
+    phụ huynh (tài khoản gắn với hồ sơ bé) chỉ dùng chính bé của mình, admin/giáo viên chọn bé bất kỳ
+    """
+    role = session.get('role')
+    try:
+        requested = int(requested_child_id) if requested_child_id else None
+    except (TypeError, ValueError):
+        return None
+    if role == 'parent':
+        own = session.get('user_id')
+        if requested is not None and requested != own:
+            return None
+        return own
+    if role in ('admin', 'teacher'):
+        return requested
+    return None
+
 # ================== SPACED REPETITION ALGORITHM (Anki-style) ==================
 def calculate_next_review(ease_level, current_interval=1):
     """Tính khoảng cách ôn tập tiếp theo"""
@@ -74,7 +96,7 @@ def deck_list(age_group):
 def deck_detail(deck_id):
     """Chi tiết bộ thẻ - Chọn chế độ học"""
     deck = Deck.query.get_or_404(deck_id)
-    cards_count = Card.query.filter_by(deck_id=deck_id).count()
+    cards_count = deck.card_count
     
     # Lấy tiến độ nếu đã đăng nhập
     child_id = request.args.get('child_id', type=int)
@@ -139,77 +161,132 @@ def rewards():
     return render_template('flashcard/rewards.html', stars=stars, deck=deck, progress=progress, child_id=child_id)
 
 # ================== API CHO JAVASCRIPT ==================
+def _progress_child(requested_child_id):
+    """(child_id, None) của bé được phép ghi/xem tiến độ, hoặc (None, response lỗi 401/400/403)"""
+    if session.get('role') not in ('admin', 'teacher', 'parent'):
+        return None, (jsonify({'success': False, 'message': 'Login required'}), 401)
+    child_id = session_child_id(requested_child_id)
+    if not child_id:
+        if session.get('role') != 'parent' and not requested_child_id:
+            return None, (jsonify({'success': False, 'message': 'Missing data'}), 400)
+        return None, (jsonify({'success': False, 'message': 'Forbidden'}), 403)
+    return child_id, None
+
+def _save_progress(child_id, events, deck_id=None, summary=None):
+    """
+    Ghi sự kiện ôn tập (đã kiểm tra) và tiến độ bộ thẻ trong 1 transaction.
+    Returns: (next_reviews, deck_progress), None nếu database lỗi (đã rollback, chỉ ghi log)
+    """
+    try:
+        next_reviews = apply_review_events(child_id, events, calculate_next_review)
+        deck_progress = None
+        if deck_id:
+            learned_cards, score, stars = summary
+            deck_progress = apply_deck_summary(child_id, deck_id, learned_cards=learned_cards,
+                                               score=score, stars=stars)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"[ERROR] Lỗi lưu tiến độ flashcard (child {child_id}): {e}")
+        return None
+    return next_reviews, deck_progress
+
+def _unknown_cards(events, deck_id=None):
+    card_ids = {event['card_id'] for event in events}
+    return bool(card_ids - known_card_ids(card_ids, deck_id))
+
 @flashcard_bp.route('/api/update-progress', methods=['POST'])
 def update_progress():
-    """Cập nhật tiến độ học của học sinh"""
-    data = request.json
-    child_id = data.get('child_id')
-    card_id = data.get('card_id')
-    ease_level = data.get('ease_level', 2)
-    
-    if not child_id or not card_id:
+    """Cập nhật tiến độ một thẻ (API cũ - client hiện dùng /api/submit-session)"""
+    data = request.get_json(silent=True) or {}
+    child_id, error = _progress_child(data.get('child_id'))
+    if error:
+        return error
+    if not data.get('card_id'):
         return jsonify({'success': False, 'message': 'Missing data'}), 400
-    
-    # Tìm hoặc tạo progress
-    progress = CardProgress.query.filter_by(child_id=child_id, card_id=card_id).first()
-    
-    if not progress:
-        progress = CardProgress(child_id=child_id, card_id=card_id)
-        db.session.add(progress)
-    
-    # Tính toán khoảng cách ôn tập
-    new_interval, next_review = calculate_next_review(ease_level, progress.interval_days)
-    
-    progress.ease_level = ease_level
-    progress.repetitions += 1
-    progress.interval_days = new_interval
-    progress.next_review = next_review
-    progress.last_reviewed = datetime.now()
-    
-    db.session.commit()
-    
+    events = parse_review_events([{'card_id': data.get('card_id'), 'ease_level': data.get('ease_level', 2)}])
+    if events is None:
+        return jsonify({'success': False, 'message': 'Invalid data'}), 400
+    if _unknown_cards(events):
+        return jsonify({'success': False, 'message': 'Unknown card'}), 400
+    
+    saved = _save_progress(child_id, events)
+    if saved is None:
+        return jsonify({'success': False, 'message': 'Không lưu được tiến độ'}), 500
+    next_review = saved[0][events[0]['card_id']]
     return jsonify({'success': True, 'next_review': next_review.isoformat()})
 
+@flashcard_bp.route('/api/review-queue')
+def review_queue():
+    """Thẻ cần ôn tiếp theo của bé trên tất cả bộ thẻ (thẻ đến hạn + thẻ mới)"""
+    child_id, error = _progress_child(request.args.get('child_id'))
+    if error:
+        return error
+    limit = min(request.args.get('limit', 20, type=int), 100)
+    deck_ids = request.args.getlist('deck_id', type=int)
+    
+    queue = get_review_queue(child_id, limit=limit, deck_ids=deck_ids or None)
+    return jsonify(dict(queue, success=True))
+
+@flashcard_bp.route('/api/submit-session', methods=['POST'])
+def submit_session():
+    """
+    Lưu cả phiên học trong 1 transaction:
+    {child_id, events: [{card_id, ease_level}], deck_id?, learned_cards?, score?, stars?}
+    child_id lấy theo tài khoản đang đăng nhập (session_child_id), phụ huynh không ghi được cho bé khác.
+    Cả lô bị từ chối (400) nếu có sự kiện sai định dạng hoặc thẻ không thuộc bộ thẻ deck_id.
+    """
+    data = request.get_json(silent=True) or {}
+    child_id, error = _progress_child(data.get('child_id'))
+    if error:
+        return error
+    raw_events = data.get('events') or []
+    
+    if not (raw_events or data.get('deck_id')):
+        return jsonify({'success': False, 'message': 'Missing data'}), 400
+    if isinstance(raw_events, list) and len(raw_events) > MAX_EVENTS_PER_BATCH:
+        return jsonify({'success': False, 'message': f'Tối đa {MAX_EVENTS_PER_BATCH} sự kiện mỗi lần'}), 400
+    events = parse_review_events(raw_events)
+    summary = parse_deck_summary(data)
+    deck_id = existing_deck_id(data['deck_id']) if data.get('deck_id') else None
+    if events is None or summary is None or (data.get('deck_id') and not deck_id):
+        return jsonify({'success': False, 'message': 'Invalid data'}), 400
+    if _unknown_cards(events, deck_id):
+        return jsonify({'success': False, 'message': 'Unknown card'}), 400
+    
+    saved = _save_progress(child_id, events, deck_id, summary)
+    if saved is None:
+        return jsonify({'success': False, 'message': 'Không lưu được tiến độ'}), 500
+    next_reviews, deck_progress = saved
+    
+    response = {
+        'success': True,
+        'updated_cards': len(next_reviews),
+        'next_review': {str(card_id): dt.isoformat() for card_id, dt in next_reviews.items()}
+    }
+    if deck_progress:
+        response['total_stars'] = deck_progress.stars
+        response['streak'] = deck_progress.streak_days
+    return jsonify(response)
+
 @flashcard_bp.route('/api/update-deck-progress', methods=['POST'])
 def update_deck_progress():
-    """Cập nhật tiến độ tổng thể của bộ thẻ"""
-    data = request.json
-    child_id = data.get('child_id')
-    deck_id = data.get('deck_id')
-    learned_cards = data.get('learned_cards', 0)
-    score = data.get('score', 0)
-    stars = data.get('stars', 0)
-    
-    if not child_id or not deck_id:
+    """Cập nhật tiến độ tổng thể của bộ thẻ (API cũ - client hiện dùng /api/submit-session)"""
+    data = request.get_json(silent=True) or {}
+    child_id, error = _progress_child(data.get('child_id'))
+    if error:
+        return error
+    if not data.get('deck_id'):
         return jsonify({'success': False, 'message': 'Missing data'}), 400
+    deck_id = existing_deck_id(data['deck_id'])
+    summary = parse_deck_summary(data)
+    if not deck_id or summary is None:
+        return jsonify({'success': False, 'message': 'Invalid data'}), 400
     
-    progress = DeckProgress.query.filter_by(child_id=child_id, deck_id=deck_id).first()
-    
-    if not progress:
-        progress = DeckProgress(child_id=child_id, deck_id=deck_id)
-        db.session.add(progress)
-    
-    progress.learned_cards = learned_cards
-    progress.total_score += score
-    progress.stars += stars
-    progress.last_studied = datetime.now()
-    
-    # Kiểm tra hoàn thành
-    total_cards = Card.query.filter_by(deck_id=deck_id).count()
-    if learned_cards >= total_cards and not progress.completion_date:
-        progress.completion_date = datetime.now()
-    
-    # Cập nhật streak
-    if progress.last_studied:
-        days_diff = (datetime.now().date() - progress.last_studied.date()).days
-        if days_diff == 1:
-            progress.streak_days += 1
-        elif days_diff > 1:
-            progress.streak_days = 1
-    else:
-        progress.streak_days = 1
-    
-    db.session.commit()
+    saved = _save_progress(child_id, [], deck_id, summary)
+    if saved is None:
+        return jsonify({'success': False, 'message': 'Không lưu được tiến độ'}), 500
+    progress = saved[1]
     
     return jsonify({
         'success': True, 
@@ -395,6 +472,7 @@ def create_card(deck_id):
         )
         
         db.session.add(card)
+        deck.card_count = (deck.card_count or 0) + 1
         db.session.commit()
         
         flash(f'Đã thêm thẻ "{front_text}"', 'success')
@@ -481,6 +559,10 @@ def delete_card(card_id):
     deck_id = card.deck_id
     
     db.session.delete(card)
+    Deck.query.filter_by(id=deck_id).update(
+        {Deck.card_count: db.case((Deck.card_count > 0, Deck.card_count - 1), else_=0)},
+        synchronize_session=False
+    )
     db.session.commit()
     
     flash(f'Đã xóa thẻ "{card.front_text}"', 'success')
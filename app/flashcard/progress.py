@@ -0,0 +1,196 @@
+"""
+Flashcard Progress - Ghi tiến độ học theo lô (cả một phiên học trong 1 transaction)
+
+Thay vì mỗi lần lật thẻ gọi /api/update-progress (1 lookup + 1 commit),
+client gửi toàn bộ sự kiện ôn tập của phiên học một lần. Server đọc trạng thái
+hiện tại của các thẻ bằng 1 query, tính lịch ôn mới rồi upsert hàng loạt theo
+ràng buộc unique_child_card.
+
+Dữ liệu client gửi lên được kiểm tra trước khi ghi (parse_review_events, known_card_ids):
+sự kiện sai định dạng hoặc thẻ không tồn tại bị từ chối cả lô, không tạo CardProgress mồ côi.
+"""
+from datetime import datetime
+
+from app.models import db, Card, Deck, CardProgress, DeckProgress
+
+MAX_EVENTS_PER_BATCH = 500
+EASE_LEVELS = (0, 1, 2, 3)  # calculate_next_review: mới / khó / tốt / dễ
+DEFAULT_EASE_LEVEL = 2
+
+
+def _as_int(value):
+    """int từ số nguyên hoặc chuỗi số, None nếu không hợp lệ (bool không được coi là số)"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value)
+    return None
+
+
+def parse_review_events(events):
+    """
+    [{'card_id': int, 'ease_level': int}] từ danh sách sự kiện client gửi lên,
+    None nếu có sự kiện sai định dạng (card_id không phải số nguyên dương, ease_level ngoài EASE_LEVELS)
+    """
+    if not isinstance(events, list):
+        return None
+    parsed = []
+    for event in events:
+        if not isinstance(event, dict):
+            return None
+        card_id = _as_int(event.get('card_id'))
+        ease_level = _as_int(event.get('ease_level', DEFAULT_EASE_LEVEL))
+        if card_id is None or card_id <= 0 or ease_level not in EASE_LEVELS:
+            return None
+        parsed.append({'card_id': card_id, 'ease_level': ease_level})
+    return parsed
+
+
+def parse_deck_summary(data):
+    """(learned_cards, score, stars) - số nguyên không âm, mặc định 0; None nếu không hợp lệ"""
+    values = tuple(_as_int(data.get(key, 0)) for key in ('learned_cards', 'score', 'stars'))
+    if any(value is None or value < 0 for value in values):
+        return None
+    return values
+
+
+def existing_deck_id(value):
+    """id bộ thẻ nếu value là id của một Deck đang có, None nếu không"""
+    deck_id = _as_int(value)
+    if not deck_id or deck_id <= 0:
+        return None
+    return db.session.query(Deck.id).filter(Deck.id == deck_id).scalar()
+
+
+def known_card_ids(card_ids, deck_id=None):
+    """Các card_id có trong bảng card (thuộc deck_id nếu có) - 1 query"""
+    if not card_ids:
+        return set()
+    query = db.session.query(Card.id).filter(Card.id.in_(list(card_ids)))
+    if deck_id is not None:
+        query = query.filter(Card.deck_id == deck_id)
+    return {card_id for (card_id,) in query.all()}
+
+
+def _upsert_statement():
+    """INSERT ... ON CONFLICT (child_id, card_id) DO UPDATE cho SQLite/PostgreSQL, None nếu không hỗ trợ"""
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        return None
+
+    stmt = insert(CardProgress.__table__)
+    return stmt.on_conflict_do_update(
+        index_elements=['child_id', 'card_id'],
+        set_={
+            'ease_level': stmt.excluded.ease_level,
+            'repetitions': stmt.excluded.repetitions,
+            'interval_days': stmt.excluded.interval_days,
+            'next_review': stmt.excluded.next_review,
+            'last_reviewed': stmt.excluded.last_reviewed
+        }
+    )
+
+
+def apply_review_events(child_id, events, calculate_next_review):
+    """
+    Áp dụng danh sách sự kiện ôn tập [{'card_id', 'ease_level'}] (đã qua parse_review_events) cho một bé.
+    Nhiều sự kiện cho cùng một thẻ được cộng dồn theo thứ tự gửi lên.
+    Không commit - caller commit một lần cho cả phiên.
+
+    Returns: {card_id: next_review (datetime)}
+    """
+    card_ids = {int(e['card_id']) for e in events}
+    if not card_ids:
+        return {}
+
+    # Trạng thái hiện tại - 1 query cho cả phiên (index unique_child_card)
+    state = {
+        row.card_id: {'repetitions': row.repetitions or 0, 'interval_days': row.interval_days or 1,
+                      'first_reviewed': row.first_reviewed}
+        for row in db.session.query(
+            CardProgress.card_id, CardProgress.repetitions, CardProgress.interval_days, CardProgress.first_reviewed
+        ).filter(
+            CardProgress.child_id == child_id,
+            CardProgress.card_id.in_(card_ids)
+        )
+    }
+
+    now = datetime.now()
+    rows = {}
+    for event in events:
+        card_id = int(event['card_id'])
+        ease_level = int(event.get('ease_level', 2))
+        current = rows.get(card_id) or state.get(card_id) or {'repetitions': 0, 'interval_days': 1,
+                                                               'first_reviewed': now}
+        new_interval, next_review = calculate_next_review(ease_level, current['interval_days'])
+        rows[card_id] = {
+            'child_id': child_id,
+            'card_id': card_id,
+            'ease_level': ease_level,
+            'repetitions': current['repetitions'] + 1,
+            'interval_days': new_interval,
+            'next_review': next_review,
+            'last_reviewed': now,
+            # Chỉ ghi khi tạo dòng mới (ON CONFLICT không cập nhật cột này)
+            'first_reviewed': current['first_reviewed']
+        }
+
+    stmt = _upsert_statement()
+    if stmt is not None:
+        db.session.execute(stmt, list(rows.values()))
+    else:
+        # Database khác: fallback sang bulk insert/update bằng ORM
+        existing_ids = dict(db.session.query(CardProgress.card_id, CardProgress.id).filter(
+            CardProgress.child_id == child_id, CardProgress.card_id.in_(card_ids)
+        ).all())
+        inserts = [r for cid, r in rows.items() if cid not in existing_ids]
+        updates = [{key: value for key, value in dict(r, id=existing_ids[cid]).items() if key != 'first_reviewed'}
+                   for cid, r in rows.items() if cid in existing_ids]
+        if inserts:
+            db.session.bulk_insert_mappings(CardProgress, inserts)
+        if updates:
+            db.session.bulk_update_mappings(CardProgress, updates)
+
+    return {card_id: row['next_review'] for card_id, row in rows.items()}
+
+
+def apply_deck_summary(child_id, deck_id, learned_cards=0, score=0, stars=0):
+    """
+    Cập nhật DeckProgress sau một phiên học. Dùng Deck.card_count (đã denormalize)
+    thay vì COUNT(*) trên bảng card. Không commit.
+    """
+    progress = DeckProgress.query.filter_by(child_id=child_id, deck_id=deck_id).first()
+
+    if not progress:
+        progress = DeckProgress(child_id=child_id, deck_id=deck_id, total_score=0, stars=0, streak_days=0)
+        db.session.add(progress)
+
+    now = datetime.now()
+
+    # Cập nhật streak (so với lần học trước, trước khi ghi đè last_studied)
+    if progress.last_studied:
+        days_diff = (now.date() - progress.last_studied.date()).days
+        if days_diff == 1:
+            progress.streak_days = (progress.streak_days or 0) + 1
+        elif days_diff > 1:
+            progress.streak_days = 1
+    else:
+        progress.streak_days = 1
+
+    progress.learned_cards = learned_cards
+    progress.total_score = (progress.total_score or 0) + score
+    progress.stars = (progress.stars or 0) + stars
+    progress.last_studied = now
+
+    # Kiểm tra hoàn thành
+    total_cards = db.session.query(Deck.card_count).filter_by(id=deck_id).scalar() or 0
+    if learned_cards >= total_cards and not progress.completion_date:
+        progress.completion_date = now
+
+    return progress
@@ -0,0 +1,148 @@
+"""
+Review Queue - Chọn thẻ cần ôn (spaced repetition) cho một bé trên tất cả các bộ thẻ
+
+- Thẻ đến hạn: CardProgress.next_review <= now, dùng index (child_id, next_review)
+- Thẻ mới: thẻ trong bộ đang hoạt động mà bé chưa có CardProgress
+- Giới hạn theo ngày cho thẻ mới / thẻ ôn, trộn xen kẽ thẻ mới vào giữa thẻ ôn
+- Trả kèm URL ảnh/âm thanh của lượt tiếp theo để client tải trước
+"""
+from datetime import datetime, time
+
+from flask import url_for
+
+from app.models import db, Deck, Card, CardProgress
+
+NEW_CARDS_PER_DAY = 10
+REVIEWS_PER_DAY = 100
+
+
+def _media_url(path, folder):
+    """URL đầy đủ cho ảnh/âm thanh (R2 giữ nguyên, local thì trỏ vào /static)"""
+    if not path:
+        return None
+    if path.startswith('http://') or path.startswith('https://'):
+        return path
+    if '/' not in path:
+        path = f'flashcard/{folder}/{path}'
+    return url_for('static', filename=path)
+
+
+def _card_dict(card, deck_title, is_new, next_review=None):
+    return {
+        'id': card.id,
+        'deck_id': card.deck_id,
+        'deck_title': deck_title,
+        'front_text': card.front_text,
+        'back_text': card.back_text,
+        'image_url': _media_url(card.image_url, 'images'),
+        'audio_url': _media_url(card.audio_url, 'audio'),
+        'is_new': is_new,
+        'next_review': next_review.isoformat() if next_review else None
+    }
+
+
+def studied_today(child_id, now=None):
+    """
+    Số thẻ mới đã học và số thẻ đã ôn trong ngày:
+    thẻ mới = first_reviewed trong ngày, thẻ ôn = last_reviewed trong ngày nhưng học lần đầu từ trước
+    """
+    now = now or datetime.now()
+    day_start = datetime.combine(now.date(), time.min)
+    first_today = CardProgress.first_reviewed >= day_start
+    new, total = db.session.query(
+        db.func.sum(db.case((first_today, 1), else_=0)),
+        db.func.count(CardProgress.id)
+    ).filter(
+        CardProgress.child_id == child_id,
+        CardProgress.last_reviewed >= day_start
+    ).one()
+    new = new or 0
+    return {'new': new, 'review': total - new}
+
+
+def _due_cards(child_id, now, limit, deck_ids=None):
+    """Thẻ đến hạn, sớm nhất trước - range scan trên ix_card_progress_child_next_review"""
+    if limit <= 0:
+        return []
+    query = db.session.query(Card, Deck.title, CardProgress.next_review)\
+        .join(CardProgress, CardProgress.card_id == Card.id)\
+        .join(Deck, Deck.id == Card.deck_id)\
+        .filter(
+            CardProgress.child_id == child_id,
+            CardProgress.next_review <= now,
+            Deck.is_active == True
+        )
+    if deck_ids:
+        query = query.filter(Card.deck_id.in_(deck_ids))
+    return query.order_by(CardProgress.next_review).limit(limit).all()
+
+
+def _new_cards(child_id, limit, deck_ids=None):
+    """Thẻ bé chưa học lần nào, theo thứ tự bộ thẻ rồi thứ tự thẻ"""
+    if limit <= 0:
+        return []
+    query = db.session.query(Card, Deck.title)\
+        .join(Deck, Deck.id == Card.deck_id)\
+        .outerjoin(CardProgress, db.and_(
+            CardProgress.card_id == Card.id,
+            CardProgress.child_id == child_id
+        ))\
+        .filter(CardProgress.id.is_(None), Deck.is_active == True)
+    if deck_ids:
+        query = query.filter(Card.deck_id.in_(deck_ids))
+    return query.order_by(Deck.order, Deck.id, Card.order, Card.id).limit(limit).all()
+
+
+def _interleave(due, new):
+    """Chèn đều thẻ mới vào giữa thẻ ôn: cứ mỗi `step` thẻ ôn thì có 1 thẻ mới"""
+    if not new:
+        return list(due)
+    if not due:
+        return list(new)
+    step = max(1, len(due) // len(new))
+    merged = []
+    new_iter = iter(new)
+    for index, item in enumerate(due, start=1):
+        merged.append(item)
+        if index % step == 0:
+            next_new = next(new_iter, None)
+            if next_new is not None:
+                merged.append(next_new)
+    merged.extend(new_iter)
+    return merged
+
+
+def get_review_queue(child_id, limit=20, now=None, deck_ids=None,
+                     new_per_day=NEW_CARDS_PER_DAY, reviews_per_day=REVIEWS_PER_DAY):
+    """
+    N thẻ tiếp theo bé cần học (thẻ ôn đến hạn + thẻ mới, trong giới hạn của ngày).
+    Lấy trước gấp đôi để trả về danh sách media cần prefetch cho lượt sau.
+
+    Returns: {'cards': [...], 'prefetch': {'images': [...], 'audio': [...]},
+              'remaining_today': {'new': int, 'review': int}}
+    """
+    now = now or datetime.now()
+    done = studied_today(child_id, now)
+    new_left = max(0, new_per_day - done['new'])
+    review_left = max(0, reviews_per_day - done['review'])
+
+    window = limit * 2  # lượt hiện tại + lượt kế tiếp (prefetch)
+    due_rows = _due_cards(child_id, now, min(window, review_left), deck_ids)
+    new_rows = _new_cards(child_id, min(window, new_left), deck_ids)
+
+    due = [_card_dict(card, deck_title, False, next_review) for card, deck_title, next_review in due_rows]
+    new = [_card_dict(card, deck_title, True) for card, deck_title in new_rows]
+    queue = _interleave(due, new)
+
+    batch, upcoming = queue[:limit], queue[limit:window]
+    return {
+        'cards': batch,
+        'prefetch': {
+            'images': [c['image_url'] for c in upcoming if c['image_url']],
+            'audio': [c['audio_url'] for c in upcoming if c['audio_url']]
+        },
+        'remaining_today': {
+            'new': max(0, new_left - sum(1 for c in batch if c['is_new'])),
+            'review': max(0, review_left - sum(1 for c in batch if not c['is_new']))
+        }
+    }
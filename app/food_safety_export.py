@@ -0,0 +1,704 @@
+"""
+Food Safety Export - Bộ biểu mẫu quy trình an toàn thực phẩm theo tuần (QĐ 1246/BYT)
+
+Mỗi biểu mẫu (Bước 1.1, 1.2, 2, 3, 4, 6) được khai báo một lần bằng layout spec
+(ô tiêu đề, bảng, khối thống kê/ghi chú/chữ ký). build_workbook() dựng 6 sheet
+theo ngày từ cùng một spec, style dùng NamedStyle đăng ký một lần cho mỗi workbook.
+
+Dữ liệu tuần là list DaySheet lấy từ kế hoạch mua hàng (app/procurement.py, đã cache);
+phần dựng workbook không đụng tới database nên có thể kiểm tra riêng với DaySheet tự tạo.
+"""
+import zipfile
+from copy import copy
+from datetime import timedelta
+from io import BytesIO
+
+from openpyxl import Workbook
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+from openpyxl.styles.fonts import DEFAULT_FONT
+
+
+MEAL_TIMES = {
+    'morning': 'Bữa sáng',
+    'snack': 'Ăn phụ sáng',
+    'dessert': 'Tráng miệng',
+    'lunch': 'Bữa trưa',
+    'afternoon': 'Ăn phụ chiều',
+    'lateafternoon': 'Bữa xế',
+}
+# Giờ chuẩn cho từng ca (giờ_sơ_chế, giờ_chế_biến)
+MEAL_TIME_HOURS = {
+    'morning': ('07:00', '07:25'),
+    'snack': ('09:00', '10:00'),
+    'dessert': ('09:00', '10:00'),
+    'lunch': ('09:00', '10:00'),
+    'afternoon': ('09:00', '10:00'),
+    'lateafternoon': ('14:00', '14:25')
+}
+MAX_INGREDIENT_ROWS = 25
+SIGN_HINT = '(Ký, ghi rõ họ tên)'
+
+# ================== DỮ LIỆU ==================
+
+def is_fresh(category):
+    cat = (category or '').lower()
+    return 'tươi' in cat or 'rau' in cat or 'thịt' in cat or 'cá' in cat or 'trứng' in cat or cat == 'fresh'
+
+
+def is_dry(category):
+    cat = (category or '').lower()
+    return cat == 'dry' or 'khô' in cat or 'gia vị' in cat or 'bột' in cat or 'gạo' in cat or 'đường' in cat
+
+
+def supplier_info(supplier):
+    if not supplier:
+        return {}
+    return {
+        'address': supplier.address or 'Chưa cập nhật địa chỉ',
+        'phone': supplier.phone or 'Chưa cập nhật SĐT',
+        'contact_person': supplier.contact_person or 'Chưa cập nhật người liên hệ',
+        'food_safety_cert': supplier.food_safety_cert or '',
+    }
+
+
+def _weights(ingredients):
+    return [i.quantity for i in ingredients]
+
+
+# ================== DÒNG DỮ LIỆU TỪNG BIỂU MẪU ==================
+
+def _fresh_rows(day):
+    rows = []
+    fresh = [i for i in day.ingredients if is_fresh(i.category)][:MAX_INGREDIENT_ROWS]
+    for stt, (ing, weight) in enumerate(zip(fresh, _weights(fresh)), 1):
+        info = supplier_info(ing.supplier)
+        address = info.get('address', 'Đà Lạt')
+        rows.append([
+            stt,
+            ing.name.upper(),
+            f"{day.date.strftime('%d/%m/%Y')}\n6:00-7:00",
+            f"{weight} kg",
+            (ing.supplier.name if ing.supplier else '') or 'CTY TNHH Thực phẩm An toàn',
+            f"{info.get('phone', '0902.xxx.xxx')}\n{address[:30]}...",
+            info.get('contact_person', 'Chưa cập nhật'),
+            '',  # SỐ CHỨNG TỪ/SỐ HOÁ ĐƠN
+            info.get('food_safety_cert', ''),
+            '',
+            '✓', '',
+            '✓', '',
+            ''
+        ])
+    return rows
+
+
+def _dry_rows(day):
+    rows = []
+    dry = [i for i in day.ingredients if is_dry(i.category)][:MAX_INGREDIENT_ROWS]
+    for stt, (ing, weight) in enumerate(zip(dry, _weights(dry)), 1):
+        info = supplier_info(ing.supplier)
+        supplier_name = (ing.supplier.name if ing.supplier else '') or 'Siêu thị Co.opmart'
+        rows.append([
+            stt,
+            ing.name.upper(),
+            supplier_name,  # TÊN CƠ SỞ SẢN XUẤT
+            info.get('address', 'Đà Lạt'),  # ĐỊA CHỈ SẢN XUẤT
+            f"{day.date.strftime('%d/%m/%Y')}\n8:00-9:00",
+            f"{weight} kg",
+            supplier_name,  # NƠI CUNG CẤP
+            '', '',
+            'còn HDS',
+            'Khô ráo, thoáng mát\n<25°C',
+            '',  # CHỨNG TỪ, HOÁ ĐƠN
+            '✓', '',
+            ''
+        ])
+    return rows
+
+
+def _dish_names(day, meal_key):
+    return ', '.join(dish.title() for dish in day.meals[meal_key])
+
+
+def _cooking_rows(day):
+    date_str = day.date.strftime('%d/%m/%Y')
+    rows = []
+    for stt, (meal_key, meal_name) in enumerate(MEAL_TIMES.items(), 1):
+        products = set()
+        for dish in day.meals[meal_key]:
+            products.update(day.dish_products.get(dish, []))
+        so_che, che_bien = MEAL_TIME_HOURS[meal_key]
+        rows.append([
+            stt, meal_name, _dish_names(day, meal_key), ', '.join(sorted(products)), day.students,
+            f"{date_str} {so_che}", f"{date_str} {che_bien}",
+            'Trang phục gọn gàng, vệ sinh cá nhân sạch sẽ', 'Đảm bảo vệ sinh', 'Đảm bảo vệ sinh',
+            '', '', ''
+        ])
+    return rows
+
+
+def _serving_rows(day):
+    date_str = day.date.strftime('%d/%m/%Y')
+    return [
+        [stt, meal_name, _dish_names(day, meal_key), day.students,
+         f"{date_str} 10:15", f"{date_str} 10:30", 'Đảm bảo vệ sinh', '', '', '']
+        for stt, (meal_key, meal_name) in enumerate(MEAL_TIMES.items(), 1)
+    ]
+
+
+def _sample_rows(day):
+    date_str = day.date.strftime('%d/%m/%Y')
+    destroy = (day.date + timedelta(days=1)).strftime('%d/%m/%Y')
+    return [
+        [stt, meal_name, _dish_names(day, meal_key), day.students, 150, 'Hộp Inox chuyên dụng', '2-4°C',
+         f"{date_str} 10:30", f"15:00, {destroy}", 'Ngon', 'Hoàng Thanh Tuấn', 'Hoàng Thanh Tuấn']
+        for stt, (meal_key, meal_name) in enumerate(MEAL_TIMES.items(), 1)
+    ]
+
+
+def _receiving_rows(day):
+    rows = []
+    for stt, ing in enumerate(day.ingredients, 1):
+        rows.append([stt, ing.name, ing.unit, ing.quantity, '',
+                     f"{ing.cost:,.0f} đ" if ing.cost is not None else 'Chưa có giá', ''])
+    return rows
+
+
+def _receiving_total(ws, styles, day, row):
+    """Dòng tổng chi phí dự kiến dưới bảng phiếu tiếp nhận; trả về dòng kế tiếp"""
+    total = sum(ing.cost or 0 for ing in day.ingredients)
+    if total <= 0:
+        return row
+    ws.merge_cells(f'A{row}:E{row}')
+    styles.write(ws, f'A{row}', 'TỔNG CHI PHÍ DỰ KIẾN', 'total_label')
+    styles.write(ws, f'F{row}', f"{total:,.0f} đ", 'total_value')
+    styles.write(ws, f'G{row}', '', 'total_fill')
+    for col in 'BCDE':
+        styles.apply(ws[f'{col}{row}'], 'total_border')
+    return row + 1
+
+
+def _price_style(value):
+    return 'price' if value != 'Chưa có giá' and value != '0 đ' else 'no_price'
+
+
+def _check_style(value):
+    return 'check' if value == '✓' else 'td'
+
+
+# ================== STYLE ==================
+
+_SIDES = {'thin': Side(style='thin'), 'medium': Side(style='medium')}
+
+
+def _named_style(name, spec):
+    style = NamedStyle(name=name)
+    font = {key: spec[key] for key in ('bold', 'italic', 'size', 'color') if key in spec}
+    # Không khai báo font → giữ font mặc định của workbook (Calibri 11)
+    style.font = Font(**font) if font else copy(DEFAULT_FONT)
+    if 'fill' in spec:
+        style.fill = PatternFill(start_color=spec['fill'], end_color=spec['fill'], fill_type='solid')
+    if 'align' in spec:
+        style.alignment = Alignment(horizontal=spec['align'], vertical='center', wrap_text=spec.get('wrap'))
+    if 'border' in spec:
+        side = _SIDES[spec['border']]
+        style.border = Border(left=side, right=side, top=side, bottom=side)
+    return style
+
+
+class StyleBook:
+    """NamedStyle theo tên trong spec - mỗi style chỉ tạo và đăng ký một lần cho workbook"""
+
+    def __init__(self, wb, specs):
+        self.wb = wb
+        self.specs = specs
+        self.arrays = {}
+
+    def apply(self, cell, name):
+        array = self.arrays.get(name)
+        if array is None:
+            self.wb.add_named_style(_named_style(name, self.specs[name]))
+            cell.style = name
+            # Lần sau chỉ chép StyleArray đã resolve, không tra cứu/so sánh style lại
+            self.arrays[name] = copy(cell._style)
+        else:
+            cell._style = copy(array)
+
+    def write(self, ws, ref, value, name):
+        cell = ws[ref]
+        cell.value = value
+        self.apply(cell, name)
+
+
+TD = {'align': 'center', 'wrap': True, 'border': 'thin'}
+
+BASE_STYLES = {
+    'info': {'bold': True, 'size': 10},
+    'doc_no': {'bold': True, 'size': 10},
+    'step': {'bold': True, 'size': 12, 'color': 'FF0000', 'fill': 'FFEEEE'},
+    'th': {'bold': True, 'size': 9, 'color': 'FFFFFF', 'align': 'center', 'wrap': True, 'border': 'medium'},
+    'th_sub': {'bold': True, 'size': 8, 'align': 'center', 'border': 'thin'},
+    'th_num': {'bold': True, 'size': 8, 'align': 'center', 'border': 'thin'},
+    'td': dict(TD),
+    'line': {'size': 10},
+    'sign_title': {'bold': True, 'size': 12, 'align': 'center'},
+    'sign_hint': {'italic': True, 'size': 9, 'align': 'center'},
+    'sign_name': {'bold': True, 'size': 11, 'align': 'center'},
+    'sign_date': {'size': 9, 'align': 'center'},
+}
+
+
+def _styles(base=None, **overrides):
+    """BASE_STYLES + override: giá trị dict được trộn vào style cùng tên"""
+    styles = {name: dict(spec) for name, spec in BASE_STYLES.items()}
+    for source in (base or {}, overrides):
+        for name, spec in source.items():
+            styles[name] = dict(styles.get(name, {}), **spec)
+    return styles
+
+
+# ================== LAYOUT SPEC ==================
+# cells: (ô, nội dung - format với {date} {weekday} {students}, style, vùng merge)
+# table: header_row + 2 dòng (tiêu đề phụ, số thứ tự cột), dữ liệu bắt đầu ngay sau
+# footer: các khối, gap = số dòng tính từ khối trước (khối đầu: từ dòng sau bảng)
+
+_GREEN_STYLES = dict(
+    org={'bold': True, 'size': 12, 'fill': 'E6FFE6'},
+    title={'bold': True, 'size': 14, 'color': '006600', 'align': 'center'},
+    doc_no={'fill': 'CCFFCC'},
+    info_box={'bold': True, 'size': 10, 'fill': 'F0F8FF'},
+    th={'fill': '8B0000'},
+    th_sub={'fill': 'CD5C5C'},
+    th_num={'fill': 'F0F8FF'},
+    stt=dict(TD, bold=True, color='006600', fill='F0FFF0'),
+    dish=dict(TD, bold=True, size=10, fill='F0FFF0'),
+    stats_title={'bold': True, 'size': 11, 'color': '006600', 'fill': 'E6FFE6'},
+    notes_title={'bold': True, 'size': 11, 'color': '004000'},
+    note={'size': 9, 'color': '004000'},
+    sign_title={'color': '006600', 'fill': 'F0FFF0'},
+)
+
+
+def _serving_stats(extra):
+    def lines(day, rows):
+        servings = len(rows)
+        portions = servings * day.students
+        return [
+            f"• Tổng số lần phục vụ: {servings} lần",
+            f"• Tổng số suất ăn phục vụ: {portions} suất",
+            f"• Trung bình suất/lần: {(portions / servings):.1f} suất/lần" if servings else "• Trung bình suất/lần: N/A",
+            extra
+        ]
+    return lines
+
+
+def _ingredient_stats(label, predicate):
+    def lines(day, rows):
+        items = [i for i in day.ingredients if predicate(i.category)]
+        total_weight = sum(_weights(items))
+        return [
+            f"• Tổng số loại {label}: {len(items)} loại",
+            f"• Tổng khối lượng ước tính: {total_weight:.1f} kg",
+            f"• Số học sinh phục vụ: {day.students} em",
+            f"• Khối lượng trung bình/học sinh: {(total_weight / day.students):.2f} kg/em/ngày"
+            if day.students else "• Khối lượng trung bình/học sinh: N/A"
+        ]
+    return lines
+
+
+SERVING_PRINCIPLES = [
+    "• Đảm bảo vệ sinh dụng cụ, khu vực ăn trước khi phục vụ",
+    "• Kiểm tra nhiệt độ thức ăn trước khi cho trẻ ăn",
+    "• Đảm bảo trẻ rửa tay sạch sẽ trước khi ăn",
+    "• Báo cáo ngay nếu phát hiện bất thường về thức ăn hoặc sức khỏe trẻ"
+]
+
+STEP_1_1 = {
+    'filename': 'Bước 1.1 - Tiếp nhận thực phẩm tươi - Tuần {week}.xlsx',
+    'styles': _styles(
+        org={'bold': True, 'size': 12, 'fill': 'FFE6CC'},
+        title={'bold': True, 'size': 14, 'color': 'FF0000', 'align': 'center'},
+        doc_no={'fill': 'FFCCCC'},
+        info_box={'bold': True, 'size': 10, 'fill': 'E6F3FF'},
+        section={'bold': True, 'size': 12, 'color': '0066CC', 'fill': 'E6F3FF'},
+        th={'fill': '4472C4'},
+        th_sub={'fill': 'B4C6E7'},
+        th_num={'fill': 'B4C6E7'},
+        stt=dict(TD, bold=True, color='0066CC', fill='F2F2F2'),
+        food=dict(TD, bold=True, size=10, fill='FFF2CC'),
+        supplier=dict(TD, bold=True, color='CC6600'),
+        check=dict(TD, bold=True, size=12, color='00AA00', fill='E2EFDA'),
+        stats_title={'bold': True, 'size': 11, 'color': '0066CC', 'fill': 'E6F3FF'},
+        notes_title={'bold': True, 'size': 11, 'color': 'FF0000'},
+        note={'size': 9, 'color': 'CC0000'},
+        sign_title={'color': '0066CC', 'fill': 'F2F2F2'},
+    ),
+    'cells': [
+        ('A1', 'TÊN CƠ SỞ: MNĐL Cây Nhỏ', 'org', 'A1:P1'),
+        ('D2', 'BIỂU MẪU KIỂM TRA TRƯỚC KHI CHẾ BIẾN THỨC ĂN', 'title', 'D2:M2'),
+        ('O2', 'Số: 1246/QĐ - Bộ Y Tế', 'doc_no', None),
+        ('A3', 'Người kiểm tra: Nguyễn Thị Vân', 'info', None),
+        ('O3', 'Mẫu số 1.1', 'info_box', None),
+        ('A4', 'Ngày kiểm tra: {date} - {weekday}', 'info', None),
+        ('O4', 'Số học sinh: {students}', 'info_box', None),
+        ('A5', 'Địa điểm: Bếp ăn Trường MNĐL Cây Nhỏ', 'info', None),
+        ('O5', 'Phiên bản: v2.0', 'info_box', None),
+        ('A7', 'PHẦN I: THỰC PHẨM TƯƠI SỐNG, ĐÔNG LẠNH (Thịt, cá, rau, củ, quả...)', 'section', 'A7:M7'),
+        ('O7', 'BƯỚC 1.1', 'step', None),
+    ],
+    'table': {
+        'header_row': 8,
+        'headers': [
+            'STT', 'TÊN THỰC PHẨM', 'THỜI GIAN NHẬP\n(Ngày/Giờ)',
+            'KHỐI LƯỢNG\n(kg/lít)', 'NƠI CUNG CẤP', '', '', 'SỐ CHỨNG TỪ/SỐ HOÁ ĐƠN',
+            'GIẤY ĐĂNG KÝ VỚI THÚ Y', 'GIẤY KIỂM DỊCH',
+            'KIỂM TRA CẢM QUAN', '',
+            'XÉT NGHIỆM NHANH', '',
+            'BIỆN PHÁP XỬ LÝ/ GHI CHÚ'
+        ],
+        'sub_headers': ['', '', '', '', 'Tên cơ sở', 'SĐT/Địa chỉ', 'Người Giao Hàng', '', '', '',
+                        'Đạt', 'Không đạt', 'Đạt', 'Không đạt', ''],
+        'merges': ['E8:G8', 'K8:L8', 'M8:N8'],
+        'rows': _fresh_rows,
+        'column_styles': {1: 'stt', 2: 'food', 5: 'supplier', 11: _check_style, 13: _check_style},
+    },
+    'footer': [
+        {'gap': 1, 'title': 'THỐNG KÊ TỔNG QUAN:', 'title_style': 'stats_title',
+         'lines': _ingredient_stats('thực phẩm tươi', is_fresh), 'line_style': 'line'},
+        {'gap': 6, 'title': 'GHI CHÚ QUAN TRỌNG:', 'title_style': 'notes_title', 'line_style': 'note', 'lines': [
+            "• Kiểm tra nhiệt độ bảo quản: Thực phẩm tươi <4°C, đông lạnh <-18°C",
+            "• Thời gian sử dụng: Thực phẩm tươi trong ngày, đông lạnh theo hạn sử dụng",
+            "• Xét nghiệm nhanh: Ưu tiên thực phẩm có nguồn gốc không rõ ràng",
+            "• Báo cáo ngay nếu phát hiện bất thường về màu sắc, mùi vị, bao bì"
+        ]},
+        {'gap': 7, 'signature': [('D', 'BẾP TRƯỞNG', 'Hoàng Thanh Tuấn'), ('K', 'HIỆU TRƯỞNG', 'Nguyễn Thị Vân')],
+         'with_date': True},
+    ],
+}
+
+STEP_1_2 = {
+    'filename': 'Bước 1.2 - Tiếp nhận thực phẩm khô - Tuần {week}.xlsx',
+    'styles': _styles(
+        org={'bold': True, 'size': 12, 'fill': 'FFE6CC'},
+        title={'bold': True, 'size': 14, 'color': 'FF0000', 'align': 'center'},
+        doc_no={'fill': 'FFCCCC'},
+        info_box={'bold': True, 'size': 10, 'fill': 'F0F8FF'},
+        section={'bold': True, 'size': 12, 'color': 'FF6600', 'fill': 'FFF2E6'},
+        th={'fill': 'E67E22'},
+        th_sub={'fill': 'F8C471'},
+        th_num={'fill': 'FADBD8'},
+        stt=dict(TD, bold=True, color='E67E22', fill='F2F2F2'),
+        food=dict(TD, bold=True, size=10, fill='FEF9E7'),
+        address=dict(TD, bold=True, color='D35400'),
+        storage=dict(TD, bold=True, color='8E44AD'),
+        check=dict(TD, bold=True, size=12, color='27AE60', fill='E8F5E8'),
+        stats_title={'bold': True, 'size': 11, 'color': 'E67E22', 'fill': 'FFF2E6'},
+        notes_title={'bold': True, 'size': 11, 'color': 'FF0000'},
+        note={'size': 9, 'color': 'CC0000'},
+        sign_title={'color': 'E67E22', 'fill': 'F2F2F2'},
+    ),
+    'cells': [
+        ('A1', 'TÊN CƠ SỞ: MNĐL Cây Nhỏ', 'org', 'A1:P1'),
+        ('D2', 'BIỂU MẪU KIỂM TRA THỰC PHẨM KHÔ VÀ BAO GÓI', 'title', 'D2:L2'),
+        ('N2', 'Số: 1246/QĐ - Bộ Y Tế', 'doc_no', None),
+        ('A3', 'Người kiểm tra: Nguyễn Thị Vân', 'info', None),
+        ('N3', 'Mẫu số 1.2', 'info_box', None),
+        ('A4', 'Ngày kiểm tra: {date} - {weekday}', 'info', None),
+        ('N4', 'Số học sinh: {students}', 'info_box', None),
+        ('A5', 'Địa điểm: Kho thực phẩm khô - MNĐL Cây Nhỏ', 'info', None),
+        ('N5', '', 'info_box', None),
+        ('A7', 'PHẦN II: THỰC PHẨM KHÔ, BAO GÓI SẴN VÀ PHỤ GIA THỰC PHẨM', 'section', 'A7:M7'),
+        ('N7', 'BƯỚC 1.2', 'step', None),
+    ],
+    'table': {
+        'header_row': 8,
+        'headers': [
+            'STT', 'TÊN THỰC PHẨM', 'TÊN CƠ SỞ SẢN XUẤT',
+            'ĐỊA CHỈ SẢN XUẤT', 'THỜI GIAN NHẬP\n(Ngày/Giờ)', 'KHỐI LƯỢNG (KG/LÍT)', 'NƠI CUNG CẤP', '', '',
+            'HẠN SỬ DỤNG', 'ĐIỀU KIỆN BẢO QUẢN', 'CHỨNG TỪ, HOÁ ĐƠN', 'KIỂM TRA CẢM QUAN', '', 'BIỆN PHÁP XỬ LÝ / GHI CHÚ'
+        ],
+        'sub_headers': ['', '', '', '', '', '', '', 'Tên cơ sở', '', '', '', '', 'Đạt', 'Không đạt', ''],
+        'merges': ['G8:I8', 'M8:N8'],
+        'rows': _dry_rows,
+        'column_styles': {1: 'stt', 2: 'food', 4: 'address', 11: 'storage', 13: _check_style},
+    },
+    'footer': [
+        {'gap': 1, 'title': 'THỐNG KÊ THỰC PHẨM KHÔ:', 'title_style': 'stats_title',
+         'lines': _ingredient_stats('thực phẩm khô', is_dry), 'line_style': 'line'},
+        {'gap': 6, 'title': 'GHI CHÚ QUAN TRỌNG:', 'title_style': 'notes_title', 'line_style': 'note', 'lines': [
+            "• Bảo quản nơi khô ráo, thoáng mát, tránh ánh nắng trực tiếp",
+            "• Kiểm tra hạn sử dụng, bao bì nguyên vẹn trước khi nhập kho",
+            "• Sử dụng theo nguyên tắc FIFO (nhập trước xuất trước)",
+            "• Báo cáo ngay nếu phát hiện bất thường về màu sắc, mùi vị, bao bì"
+        ]},
+        {'gap': 7, 'signature': [('D', 'THỦ KHO', 'Hoàng Thanh Tuấn'), ('K', 'HIỆU TRƯỞNG', 'Nguyễn Thị Vân')],
+         'with_date': True},
+    ],
+}
+
+STEP_2 = {
+    'filename': 'Bước 2 - Kiểm tra khi chế biến thức ăn - Tuần {week}.xlsx',
+    'styles': _styles(
+        _GREEN_STYLES,
+        section={'bold': True, 'size': 12, 'color': '8B0000', 'fill': 'FFE6E6'},
+        th_sub={'wrap': True},
+    ),
+    'cells': [
+        ('A1', 'TÊN CƠ SỞ: MNĐL Cây Nhỏ', 'org', 'A1:O1'),
+        ('D2', 'BIỂU MẪU KIỂM TRA KHI CHẾ BIẾN THỨC ĂN', 'title', 'D2:K2'),
+        ('M2', 'Số: 1246/QĐ - Bộ Y Tế', 'doc_no', None),
+        ('A3', 'Người kiểm tra: Nguyễn Thị Vân', 'info', None),
+        ('M3', 'Mẫu số 2.0', 'info_box', None),
+        ('A4', 'Ngày kiểm tra: {date} - {weekday}', 'info', None),
+        ('M4', 'Số học sinh: {students}', 'info_box', None),
+        ('A5', 'Địa điểm: Bếp chế biến - MNĐL Cây Nhỏ', 'info', None),
+        ('M5', '', 'info_box', None),
+        ('A7', 'PHẦN II: KIỂM TRA QUY TRÌNH CHẾ BIẾN THỨC ĂN', 'section', 'A7:L7'),
+        ('M7', 'BƯỚC 2', 'step', None),
+    ],
+    'table': {
+        'header_row': 8,
+        'headers': [
+            'STT', 'CA/BỮA ĂN', 'TÊN MÓN ĂN', 'NGUYÊN LIỆU CHÍNH', 'SỐ SUẤT\n(phần)',
+            'THỜI GIAN SƠ CHẾ XONG\n(ngày, giờ)', 'THỜI GIAN CHẾ BIẾN XONG\n(ngày, giờ)', 'KIỂM TRA VỆ SINH', '', '',
+            'KIỂM TRA CẢM QUAN THỨC ĂN', '', 'BIỆN PHÁP XỬ LÝ\nGHI CHÚ'
+        ],
+        'sub_headers': ['', '', '', '', '', '', '', 'Người tham gia\n chế biến', 'Trang thiết bị\n dụng cụ',
+                        'Khu vực chế biến\n và phụ trợ', 'Đạt', 'Không đạt', ''],
+        'merges': ['H8:J8', 'K8:L8'],
+        'widths': {'H': 18, 'I': 18, 'J': 18},
+        'rows': _cooking_rows,
+        'column_styles': {1: 'stt', 3: 'dish'},
+    },
+    'footer': [
+        {'gap': 2, 'title': 'THỐNG KÊ PHỤC VỤ THỨC ĂN:', 'title_style': 'stats_title', 'line_style': 'line',
+         'lines': _serving_stats("• Thời gian trung bình từ chế biến xong đến phục vụ: <30 phút")},
+        {'gap': 6, 'title': 'NGUYÊN TẮC BẢO QUẢN VÀ PHỤC VỤ AN TOÀN:', 'title_style': 'notes_title',
+         'line_style': 'note', 'lines': [
+             "• Thời gian: Từ chế biến xong đến phục vụ không quá 2 giờ",
+             "• Nhiệt độ: Món nóng >60°C, món lạnh <10°C khi phục vụ",
+             "• Thiết bị: Sử dụng tủ giữ nhiệt, nồi cơm điện, bình giữ nhiệt",
+             "• Vệ sinh: Khử trùng dụng cụ trước mỗi bữa ăn",
+             "• Kiểm tra: Nhiệt độ thức ăn trước khi phục vụ cho trẻ"
+         ]},
+        {'gap': 8, 'signature': [('D', 'BẾP TRƯỞNG', 'Hoàng Thanh Tuấn'), ('H', 'NV. Y TẾ', SIGN_HINT),
+                                 ('K', 'HIỆU TRƯỞNG', 'Nguyễn Thị Vân')]},
+    ],
+}
+
+STEP_3 = {
+    'filename': 'Bước 3 - Kiểm tra trước khi ăn - Tuần {week}.xlsx',
+    'styles': _styles(_GREEN_STYLES),
+    'cells': [
+        ('A1', 'TÊN CƠ SỞ: MNĐL Cây Nhỏ', 'org', 'A1:O1'),
+        ('D2', 'BIỂU MẪU KIỂM TRA TRƯỚC KHI ĂN', 'title', 'D2:I2'),
+        ('J2', 'Số: 1246/QĐ - Bộ Y Tế', 'doc_no', None),
+        ('A3', 'Người kiểm tra: Nguyễn Thị Vân', 'info', None),
+        ('J3', 'Mẫu số 3.0', 'info_box', None),
+        ('A4', 'Ngày kiểm tra: {date} - {weekday}', 'info', None),
+        ('J4', 'Số học sinh: {students}', 'info_box', None),
+        ('A5', 'Địa điểm: Phòng ăn - MNĐL Cây Nhỏ', 'info', None),
+        ('J5', '', 'info_box', None),
+        ('J7', 'BƯỚC 3', 'step', None),
+    ],
+    'table': {
+        'header_row': 8,
+        'headers': [
+            'STT', 'CA/BỮA ĂN', 'TÊN MÓN ĂN', 'SỐ SUẤT\n(phần)',
+            'THỜI GIAN CHIA MÓN ĂN XONG\n(ngày, giờ)', 'THỜI GIAN BẮT ĐẦU ĂN\n(ngày, giờ)',
+            'DỤNG CỤ CHIA, CHỨA ĐỰNG\n, CHE ĐẬY, BẢO QUẢN THỨC ĂN',
+            'KIỂM TRA CẢM QUAN THỨC ĂN', '', 'BIỆN PHÁP XỬ LÝ\nGHI CHÚ'
+        ],
+        'sub_headers': ['', '', '', '', '', '', '', 'Đạt', 'Không đạt', ''],
+        'merges': ['H8:I8'],
+        'widths': {'G': 25, 'H': 18, 'I': 18},
+        'rows': _serving_rows,
+        'column_styles': {1: 'stt', 3: 'dish'},
+    },
+    'footer': [
+        {'gap': 2, 'title': 'THỐNG KÊ PHỤC VỤ THỨC ĂN:', 'title_style': 'stats_title', 'line_style': 'line',
+         'lines': _serving_stats("• Thời gian trung bình từ phục vụ đến ăn: <15 phút")},
+        {'gap': 6, 'title': 'NGUYÊN TẮC PHỤC VỤ AN TOÀN:', 'title_style': 'notes_title',
+         'line_style': 'note', 'lines': SERVING_PRINCIPLES},
+        {'gap': 8, 'signature': [('D', 'BẾP TRƯỞNG', 'Hoàng Thanh Tuấn'), ('H', 'NV. Y TẾ', ''),
+                                 ('K', 'HIỆU TRƯỞNG', 'Nguyễn Thị Vân')]},
+    ],
+}
+
+STEP_4 = {
+    'filename': 'Bước 4 - Theo dõi lưu và huỷ mẫu thức ăn lưu - Tuần {week}.xlsx',
+    'styles': _styles(_GREEN_STYLES),
+    'cells': [
+        ('A1', 'TÊN CƠ SỞ: MNĐL Cây Nhỏ', 'org', 'A1:O1'),
+        ('D2', 'BIỂU MẪU THEO DÕI LƯU VÀ HUỶ LƯU MẪU THỨC ĂN LƯU', 'title', 'D2:I2'),
+        ('J2', 'Số: 1246/QĐ - Bộ Y Tế', 'doc_no', None),
+        ('A3', 'Người kiểm tra: Nguyễn Thị Vân', 'info', None),
+        ('J3', 'Mẫu số 5', 'info_box', None),
+        ('A4', 'Ngày kiểm tra: {date} - {weekday}', 'info', None),
+        ('J4', 'Số học sinh: {students}', 'info_box', None),
+        ('A5', 'Địa điểm: Phòng ăn - MNĐL Cây Nhỏ', 'info', None),
+        ('F5', 'Ngày tiếp phẩm: {date} - {weekday}', 'info_box', None),
+    ],
+    'table': {
+        'header_row': 8,
+        'headers': [
+            'STT', 'CA/BỮA ĂN', 'TÊN MẪU THỨC ĂN', 'SỐ SUẤT ĂN\n(phần)',
+            'KHỐI LƯỢNG\n/ THỂ TÍCH MẪU(GRAM/ML)', 'DỤNG CỤ CHỨA\n MẪU THỨC ĂN LƯU',
+            'NHIỆT ĐỘ BẢO QUẢN MẪU',
+            'THỜI GIAN LẤY MẪU\n (giờ, ngày, tháng, năm)', 'THỜI GIAN HUỶ MẪU\n (giờ, ngày, tháng, năm)',
+            'GHI CHÚ', 'NGƯỜI LƯU MẪU', 'NGƯỜI HUỶ MẪU'
+        ],
+        'sub_headers': [''] * 12,
+        'merges': [],
+        'widths': {'E': 18, 'F': 18, 'G': 18, 'H': 18, 'I': 18},
+        'rows': _sample_rows,
+        'column_styles': {1: 'stt', 3: 'dish'},
+    },
+    'footer': [
+        {'gap': 2, 'title': 'THỐNG KÊ PHỤC VỤ THỨC ĂN:', 'title_style': 'stats_title', 'line_style': 'line',
+         'lines': _serving_stats("• Thời gian trung bình từ phục vụ đến ăn: <15 phút")},
+        {'gap': 6, 'title': 'NGUYÊN TẮC PHỤC VỤ AN TOÀN:', 'title_style': 'notes_title',
+         'line_style': 'note', 'lines': SERVING_PRINCIPLES},
+        {'gap': 8, 'signature': [('D', 'NGƯỜI THỰC HIỆN LƯU MẪU', 'Hoàng Thanh Tuấn'),
+                                 ('H', 'NGƯỜI THỰC HIỆN HUỶ MẪU', 'Hoàng Thanh Tuấn'),
+                                 ('K', 'HIỆU TRƯỞNG', 'Nguyễn Thị Vân')]},
+    ],
+}
+
+STEP_6 = {
+    'filename': 'Bước 6 - PHIẾU TIẾP NHẬN VÀ KIỂM TRA CHẤT LƯỢNG THỰC PHẨM - Tuần {week}.xlsx',
+    'portrait': True,
+    'styles': _styles(
+        _GREEN_STYLES,
+        section={'bold': True, 'size': 12, 'color': '8B0000', 'fill': 'FFF2E6'},
+        food=dict(TD, bold=True, size=10, fill='F0FFF0'),
+        price=dict(TD, bold=True, color='FF6600', fill='FFF8E1'),
+        no_price=dict(TD, italic=True, color='999999'),
+        total_label={'bold': True, 'size': 11, 'color': '8B0000', 'fill': 'FFE6E6', 'align': 'right',
+                     'border': 'medium'},
+        total_value={'bold': True, 'size': 12, 'color': '8B0000', 'fill': 'FFE6E6', 'align': 'center',
+                     'border': 'medium'},
+        total_fill={'fill': 'FFE6E6', 'border': 'medium'},
+        total_border={'border': 'medium'},
+    ),
+    'cells': [
+        ('D2', 'PHIẾU TIẾP NHẬN VÀ KIỂM TRA CHẤT LƯỢNG THỰC PHẨM', 'title', 'D2:I2'),
+        ('A1', 'Phòng GD&ĐT: XÃ ĐỨC TRỌNG', 'info', None),
+        ('J1', 'Ngày: {date}', 'info_box', None),
+        ('A2', 'Đơn vị: MẦM NON CÂY NHỎ', 'info', None),
+        ('J2', 'Thứ: {weekday}', 'info_box', None),
+        ('A3', 'Số suất: {students}', 'info', None),
+        ('F3', '', 'info_box', None),
+        ('A5', 'I. Tiếp nhận, kiểm tra chất lượng thực phẩm và chế biến', 'section', 'A5:G5'),
+    ],
+    'table': {
+        'header_row': 6,
+        'headers': ['STT', 'TÊN THỰC PHẨM', 'ĐƠN VỊ TÍNH', 'SỐ LƯỢNG DỰ KIẾN MUA',
+                    'THỰC TẾ TIẾP NHẬN', 'GIÁ TIỀN (VNĐ)', 'NHẬN XÉT'],
+        'sub_headers': [''] * 7,
+        'merges': [],
+        'widths': {'B': 18, 'C': 18, 'D': 18, 'E': 18, 'F': 15, 'G': 20},
+        'rows': _receiving_rows,
+        'column_styles': {1: 'stt', 2: 'food', 6: _price_style},
+        'after_rows': _receiving_total,
+    },
+    'footer': [
+        {'gap': 2, 'title': 'II. Nội Dung Khác', 'title_style': 'section', 'lines': []},
+        {'gap': 8, 'signature': [('A', 'NGƯỜI GIAO HÀNG', ''), ('C', 'NGƯỜI TIẾP NHẬN', ''),
+                                 ('E', 'NV. Y TẾ', ''), ('H', 'HIỆU TRƯỞNG', 'Nguyễn Thị Vân')]},
+    ],
+}
+
+WEEKLY_TEMPLATES = (STEP_1_1, STEP_1_2, STEP_2, STEP_3, STEP_4, STEP_6)
+
+
+# ================== DỰNG WORKBOOK ==================
+
+def _render_table(ws, styles, table, day):
+    header_row = table['header_row']
+    headers = table['headers']
+    for i, header in enumerate(headers, 1):
+        styles.apply(ws.cell(row=header_row, column=i, value=header), 'th')
+    for i, header in enumerate(table['sub_headers'], 1):
+        styles.apply(ws.cell(row=header_row + 1, column=i, value=header), 'th_sub')
+    for cell_range in table['merges']:
+        ws.merge_cells(cell_range)
+    for col, width in table.get('widths', {}).items():
+        ws.column_dimensions[col].width = width
+    for i in range(1, len(headers) + 1):
+        styles.apply(ws.cell(row=header_row + 2, column=i, value=i), 'th_num')
+
+    column_styles = table['column_styles']
+    row = header_row + 3
+    rows = table['rows'](day)
+    for values in rows:
+        for col, value in enumerate(values, 1):
+            style = column_styles.get(col, 'td')
+            styles.apply(ws.cell(row=row, column=col, value=value), style(value) if callable(style) else style)
+        row += 1
+    if 'after_rows' in table:
+        row = table['after_rows'](ws, styles, day, row)
+    return row, rows
+
+
+def _render_footer(ws, styles, footer, day, rows, row):
+    sign_date = f"Ngày {day.date.day}/{day.date.month}/{day.date.year}"
+    for block in footer:
+        row += block['gap']
+        if 'signature' in block:
+            for col, title, name in block['signature']:
+                styles.write(ws, f'{col}{row}', title, 'sign_title')
+                styles.write(ws, f'{col}{row + 1}', SIGN_HINT, 'sign_hint')
+                styles.write(ws, f'{col}{row + 5}', name, 'sign_name')
+                if block.get('with_date'):
+                    styles.write(ws, f'{col}{row + 6}', sign_date, 'sign_date')
+            continue
+        styles.write(ws, f'A{row}', block['title'], block['title_style'])
+        lines = block['lines'](day, rows) if callable(block['lines']) else block['lines']
+        for i, line in enumerate(lines, 1):
+            styles.write(ws, f'A{row + i}', line, block['line_style'])
+
+
+def render_day_sheet(ws, styles, template, day):
+    context = {'date': day.date.strftime('%d/%m/%Y'), 'weekday': day.name, 'students': day.students}
+    for ref, text, style, merge in template['cells']:
+        styles.write(ws, ref, text.format(**context), style)
+        if merge:
+            ws.merge_cells(merge)
+
+    row, rows = _render_table(ws, styles, template['table'], day)
+    _render_footer(ws, styles, template['footer'], day, rows, row)
+
+    # Page setup cho in A4
+    ws.page_setup.orientation = ws.ORIENTATION_PORTRAIT if template.get('portrait') else ws.ORIENTATION_LANDSCAPE
+    ws.page_setup.paperSize = ws.PAPERSIZE_A4
+    ws.page_setup.fitToPage = True
+    ws.page_setup.fitToWidth = 1
+    ws.page_setup.fitToHeight = 0
+    ws.print_options.horizontalCentered = True
+    ws.page_margins.left = 0.5
+    ws.page_margins.right = 0.5
+    ws.page_margins.top = 0.75
+    ws.page_margins.bottom = 0.75
+
+
+def build_workbook(template, days):
+    """Workbook một biểu mẫu: mỗi ngày một sheet '<Thứ> (dd-mm)'"""
+    wb = Workbook()
+    wb.remove(wb.active)
+    styles = StyleBook(wb, template['styles'])
+    for day in days:
+        ws = wb.create_sheet(title=f"{day.name} ({day.date.strftime('%d-%m')})")
+        render_day_sheet(ws, styles, template, day)
+    return wb
+
+
+def build_week_zip(days, week_number, templates=WEEKLY_TEMPLATES):
+    """File zip chứa toàn bộ biểu mẫu của tuần, trả về BytesIO đã seek(0)"""
+    zip_buffer = BytesIO()
+    with zipfile.ZipFile(zip_buffer, 'w') as zipf:
+        for template in templates:
+            buffer = BytesIO()
+            build_workbook(template, days).save(buffer)
+            zipf.writestr(template['filename'].format(week=week_number), buffer.getvalue())
+    zip_buffer.seek(0)
+    return zip_buffer
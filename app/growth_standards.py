@@ -0,0 +1,278 @@
+"""
+WHO Growth Standards - Tính z-score tăng trưởng theo phương pháp LMS của WHO
+
+Bảng LMS (L, M, S theo từng tháng tuổi 0-120) được nạp một lần khi import module
+từ growth_standards_lms.json (WHO 2006 cho 0-60 tháng, WHO 2007 cho 61-120 tháng).
+Tuổi lẻ tháng được nội suy tuyến tính giữa hai tháng liền kề.
+
+- zscore(): một học sinh
+- zscores(): cả lớp trong một lần (dùng numpy nếu có)
+"""
+import json
+import math
+import os
+from datetime import date, datetime
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+DAYS_PER_MONTH = 30.4375  # 365.25 / 12 - quy ước của WHO Anthro
+INDICATORS = ('bmi', 'weight', 'height')
+# Chỉ số dùng điều chỉnh của WHO cho |z| > 3 (phân phối lệch)
+RESTRICTED_INDICATORS = ('bmi', 'weight')
+
+_LMS_PATH = os.path.join(os.path.dirname(__file__), 'growth_standards_lms.json')
+
+
+def _load_tables():
+    with open(_LMS_PATH, encoding='utf-8') as f:
+        raw = json.load(f)
+    tables = {}
+    for indicator in INDICATORS:
+        for sex in ('male', 'female'):
+            rows = raw[indicator][sex]
+            tables[(indicator, sex)] = (
+                [r[0] for r in rows],  # L
+                [r[1] for r in rows],  # M
+                [r[2] for r in rows],  # S
+            )
+    return tables
+
+
+_TABLES = _load_tables()
+_NP_TABLES = {key: tuple(np.asarray(col, dtype=float) for col in cols)
+              for key, cols in _TABLES.items()} if NUMPY_AVAILABLE else {}
+MAX_AGE_MONTHS = len(next(iter(_TABLES.values()))[0]) - 1
+
+
+def normalize_sex(gender):
+    """'male' cho bé trai, còn lại 'female' (giống quy ước cũ trong routes)"""
+    if gender and str(gender).lower() in ['male', 'nam', 'boy', 'm']:
+        return 'male'
+    return 'female'
+
+
+def age_in_months(birth_date, on_date=None):
+    """Tuổi theo tháng (số thực). birth_date có thể là 'YYYY-MM-DD', date hoặc datetime; None nếu không đọc được."""
+    if not birth_date:
+        return None
+    if isinstance(birth_date, str):
+        try:
+            birth_date = datetime.strptime(birth_date, '%Y-%m-%d').date()
+        except ValueError:
+            return None
+    elif isinstance(birth_date, datetime):
+        birth_date = birth_date.date()
+    on_date = on_date or date.today()
+    if isinstance(on_date, datetime):
+        on_date = on_date.date()
+    return (on_date - birth_date).days / DAYS_PER_MONTH
+
+
+def lms_at(indicator, gender, age_months):
+    """(L, M, S) nội suy tuyến tính tại tuổi age_months, None nếu ngoài bảng"""
+    if age_months is None or age_months < 0 or age_months > MAX_AGE_MONTHS:
+        return None
+    L, M, S = _TABLES[(indicator, normalize_sex(gender))]
+    lo = int(age_months)
+    hi = min(lo + 1, MAX_AGE_MONTHS)
+    t = age_months - lo
+    return (
+        L[lo] + (L[hi] - L[lo]) * t,
+        M[lo] + (M[hi] - M[lo]) * t,
+        S[lo] + (S[hi] - S[lo]) * t,
+    )
+
+
+def _value_at_z(l, m, s, z):
+    """Giá trị đo tương ứng với z-score z theo phân phối LMS"""
+    if l == 0:
+        return m * math.exp(s * z)
+    return m * (1 + l * s * z) ** (1 / l)
+
+
+def lms_zscore(value, l, m, s, restricted=False):
+    """
+    z = ((value/M)^L - 1) / (L*S)   (L != 0)
+    z = ln(value/M) / S             (L == 0)
+    restricted=True: áp dụng điều chỉnh của WHO ngoài khoảng ±3 SD (cân nặng, BMI).
+    """
+    if value is None or value <= 0:
+        return None
+    if l == 0:
+        z = math.log(value / m) / s
+    else:
+        z = ((value / m) ** l - 1) / (l * s)
+
+    if restricted and z > 3:
+        sd3 = _value_at_z(l, m, s, 3)
+        sd23 = sd3 - _value_at_z(l, m, s, 2)
+        z = 3 + (value - sd3) / sd23
+    elif restricted and z < -3:
+        sd3 = _value_at_z(l, m, s, -3)
+        sd23 = _value_at_z(l, m, s, -2) - sd3
+        z = -3 + (value - sd3) / sd23
+    return z
+
+
+def zscore(indicator, gender, age_months, value):
+    """z-score của một chỉ số ('bmi', 'weight', 'height') cho một trẻ"""
+    lms = lms_at(indicator, gender, age_months)
+    if lms is None or value is None:
+        return None
+    return lms_zscore(float(value), *lms, restricted=indicator in RESTRICTED_INDICATORS)
+
+
+def zscores(indicator, genders, ages_months, values):
+    """
+    z-score cho cả lớp trong một lần: genders, ages_months, values là các list cùng độ dài.
+    Phần tử không tính được (thiếu số đo, ngoài độ tuổi) trả về None.
+    """
+    if not NUMPY_AVAILABLE:
+        return [zscore(indicator, g, a, v) for g, a, v in zip(genders, ages_months, values)]
+
+    n = len(values)
+    ages = np.array([np.nan if a is None else a for a in ages_months], dtype=float)
+    vals = np.array([np.nan if v is None else v for v in values], dtype=float)
+    is_male = np.array([normalize_sex(g) == 'male' for g in genders], dtype=bool)
+    valid = (ages >= 0) & (ages <= MAX_AGE_MONTHS) & (vals > 0)
+
+    safe_ages = np.where(valid, ages, 0.0)
+    lo = np.floor(safe_ages).astype(int)
+    hi = np.minimum(lo + 1, MAX_AGE_MONTHS)
+    t = safe_ages - lo
+
+    l = np.empty(n)
+    m = np.empty(n)
+    s = np.empty(n)
+    for sex, mask in (('male', is_male), ('female', ~is_male)):
+        L, M, S = _NP_TABLES[(indicator, sex)]
+        l[mask] = L[lo[mask]] + (L[hi[mask]] - L[lo[mask]]) * t[mask]
+        m[mask] = M[lo[mask]] + (M[hi[mask]] - M[lo[mask]]) * t[mask]
+        s[mask] = S[lo[mask]] + (S[hi[mask]] - S[lo[mask]]) * t[mask]
+
+    safe_vals = np.where(valid, vals, m)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        l_zero = np.abs(l) < 1e-12
+        safe_l = np.where(l_zero, 1.0, l)
+        z = np.where(l_zero,
+                     np.log(safe_vals / m) / s,
+                     ((safe_vals / m) ** safe_l - 1) / (safe_l * s))
+
+        if indicator in RESTRICTED_INDICATORS:
+            def at(zv):
+                return np.where(l_zero, m * np.exp(s * zv), m * (1 + safe_l * s * zv) ** (1 / safe_l))
+            sd3p, sd2p, sd3n, sd2n = at(3), at(2), at(-3), at(-2)
+            z = np.where(z > 3, 3 + (safe_vals - sd3p) / (sd3p - sd2p), z)
+            z = np.where(z < -3, -3 + (safe_vals - sd3n) / (sd2n - sd3n), z)
+
+    return [float(zv) if ok else None for zv, ok in zip(z, valid)]
+
+
+def assess_who_indicator(z_score, indicator_type='bmi'):
+    """
+    Đánh giá z-score theo WHO standards
+    
+    indicator_type:
+    - 'bmi': BMI-for-age
+    - 'weight': Weight-for-age  
+    - 'height': Height-for-age
+    """
+    if z_score is None:
+        return 'Chưa có đủ thông tin', 'secondary'
+    
+    if indicator_type == 'bmi':
+        if z_score < -3:
+            return 'Suy dinh dưỡng nặng (< -3 SD)', 'danger'
+        elif z_score < -2:
+            return 'Gầy còm (< -2 SD)', 'warning'
+        elif z_score <= 1:
+            return 'Bình thường (-2 đến +1 SD)', 'success'
+        elif z_score <= 2:
+            return 'Nguy cơ thừa cân (+1 đến +2 SD)', 'info'
+        elif z_score <= 3:
+            return 'Thừa cân (+2 đến +3 SD)', 'warning'
+        else:
+            return 'Béo phì (> +3 SD)', 'danger'
+    
+    elif indicator_type == 'weight':
+        if z_score < -3:
+            return 'Nhẹ cân nghiêm trọng (< -3 SD)', 'danger'
+        elif z_score < -2:
+            return 'Nhẹ cân (< -2 SD)', 'warning'
+        elif z_score <= 2:
+            return 'Cân nặng bình thường (-2 đến +2 SD)', 'success'
+        else:
+            return 'Thừa cân (> +2 SD)', 'warning'
+    
+    elif indicator_type == 'height':
+        if z_score < -3:
+            return 'Thấp còi nghiêm trọng (< -3 SD)', 'danger'
+        elif z_score < -2:
+            return 'Thấp còi (< -2 SD)', 'warning'
+        elif z_score <= 3:
+            return 'Chiều cao bình thường (-2 đến +3 SD)', 'success'
+        else:
+            return 'Cao bất thường (> +3 SD)', 'info'
+    
+    return 'Chưa xác định', 'secondary'
+
+
+def _indicator_result(indicator, value, z):
+    if value is None:
+        return {'assessment': None, 'badge': 'secondary', 'z_score': None}
+    assessment, badge = assess_who_indicator(z, indicator)
+    return {'assessment': assessment, 'badge': badge, 'z_score': round(z, 2) if z is not None else None}
+
+
+def _growth_result(age_months, bmi, weight_kg, height_cm, bmi_z, weight_z, height_z):
+    if bmi is not None and age_months is not None and age_months < 24:
+        # BMI chỉ đánh giá cho trẻ >= 2 tuổi
+        bmi_result = {'assessment': 'Trẻ < 2 tuổi không đánh giá BMI', 'badge': 'secondary', 'z_score': None}
+    else:
+        bmi_result = _indicator_result('bmi', bmi, bmi_z)
+    return {
+        'bmi': bmi_result,
+        'weight': _indicator_result('weight', weight_kg, weight_z),
+        'height': _indicator_result('height', height_cm, height_z)
+    }
+
+
+def assess_child_growth_who(age_months, gender, bmi=None, weight_kg=None, height_cm=None):
+    """
+    Đánh giá tăng trưởng trẻ em theo WHO Child Growth Standards
+    Trả về dict với đánh giá BMI, cân nặng, chiều cao
+    """
+    return _growth_result(
+        age_months, bmi, weight_kg, height_cm,
+        zscore('bmi', gender, age_months, bmi),
+        zscore('weight', gender, age_months, weight_kg),
+        zscore('height', gender, age_months, height_cm)
+    )
+
+
+def assess_growth_batch(rows):
+    """
+    Đánh giá tăng trưởng cho nhiều lần đo cùng lúc (cả lớp).
+    rows: list (gender, age_months, bmi, weight_kg, height_cm) → list dict giống assess_child_growth_who
+    """
+    if not rows:
+        return []
+    genders = [r[0] for r in rows]
+    ages = [r[1] for r in rows]
+    z_by_indicator = {}
+    for index, indicator in enumerate(INDICATORS, start=2):
+        values = [r[index] for r in rows]
+        if any(v is not None for v in values):
+            z_by_indicator[indicator] = zscores(indicator, genders, ages, values)
+        else:
+            z_by_indicator[indicator] = [None] * len(rows)
+
+    return [
+        _growth_result(r[1], r[2], r[3], r[4],
+                       z_by_indicator['bmi'][i], z_by_indicator['weight'][i], z_by_indicator['height'][i])
+        for i, r in enumerate(rows)
+    ]
@@ -0,0 +1,105 @@
+"""
+Identity - Tài khoản đang đăng nhập, nạp tối đa một lần mỗi request (g.identity, g.scope)
+
+session chỉ lưu user_id/role; current_identity() trả về object tương ứng:
+- 'admin', 'teacher' → Staff
+- 'parent'           → Child (tài khoản phụ huynh gắn với hồ sơ học sinh)
+- role RBAC khác     → User (app/models_users.py)
+Lần gọi đầu trong request query một lần, các lần sau (view, helper, template) dùng lại.
+
+current_scope() gom ngữ cảnh phân quyền của request: con (phụ huynh), id lớp của con và
+tập quyền của role. Id lớp (Child.class_id) được cache trong process CLASS_SCOPE_TTL giây
+theo tài khoản phụ huynh (1 query khi hết hạn), nên trang hoạt động/thư viện ảnh/chương
+trình học của phụ huynh không phải query Child rồi Class ở mỗi request. Sửa/xoá lớp hoặc
+đổi lớp học sinh gọi invalidate_class_scope(); worker khác thấy thay đổi sau tối đa TTL.
+"""
+import threading
+import time
+from functools import cached_property
+
+from flask import g, session
+
+from app.models import db, Child, Staff
+from app.models_rbac import cached_role_permissions
+from app.models_users import User
+
+IDENTITY_MODELS = {'admin': Staff, 'teacher': Staff, 'parent': Child}
+
+CLASS_SCOPE_TTL = 60  # giây
+
+_class_scope = {}  # id tài khoản phụ huynh (Child.id) -> (class_id, expires_at)
+_class_scope_lock = threading.Lock()
+
+
+def _load_identity():
+    user_id = session.get('user_id')
+    role = session.get('role')
+    if not user_id or not role:
+        return None
+    return db.session.get(IDENTITY_MODELS.get(role, User), user_id)
+
+
+def current_identity():
+    """Staff/Child/User của tài khoản đang đăng nhập, None nếu chưa đăng nhập hoặc không tìm thấy"""
+    if 'identity' not in g:
+        g.identity = _load_identity()
+    return g.identity
+
+
+def forget_identity():
+    """Bỏ identity/scope đã nạp (gọi khi session đổi tài khoản trong cùng request)"""
+    g.pop('identity', None)
+    g.pop('scope', None)
+
+
+def parent_class_id(child_id):
+    """Child.class_id của học sinh, None nếu chưa xếp lớp"""
+    now = time.monotonic()
+    with _class_scope_lock:
+        cached = _class_scope.get(child_id)
+    if cached and cached[1] > now:
+        return cached[0]
+    class_id = db.session.query(Child.class_id).filter(Child.id == child_id).scalar()
+    with _class_scope_lock:
+        _class_scope[child_id] = (class_id, now + CLASS_SCOPE_TTL)
+    return class_id
+
+
+def invalidate_class_scope(child_id=None):
+    """Bỏ cache id lớp của một học sinh, hoặc của tất cả (đổi tên/xoá lớp)"""
+    with _class_scope_lock:
+        if child_id is None:
+            _class_scope.clear()
+        else:
+            _class_scope.pop(child_id, None)
+
+
+class RequestScope:
+    """Ngữ cảnh phân quyền của request hiện tại - mỗi thuộc tính tính tối đa một lần"""
+    def __init__(self):
+        self.role = session.get('role')
+        self.user_id = session.get('user_id')
+
+    @property
+    def is_parent(self):
+        return self.role == 'parent' and self.user_id is not None
+
+    @cached_property
+    def child(self):
+        """Child của tài khoản phụ huynh (None với role khác)"""
+        return current_identity() if self.is_parent else None
+
+    @cached_property
+    def class_id(self):
+        """Id lớp của con (chỉ với phụ huynh)"""
+        return parent_class_id(self.user_id) if self.is_parent else None
+
+    @cached_property
+    def permissions(self):
+        return cached_role_permissions().get(self.role, frozenset())
+
+
+def current_scope():
+    if 'scope' not in g:
+        g.scope = RequestScope()
+    return g.scope
@@ -0,0 +1,142 @@
+"""
+Invoice Ledger - Sổ hóa đơn (Invoice/InvoiceLine) theo học sinh và tháng
+
+Mỗi InvoiceRow (app/billing.py) được lưu thành một Invoice kèm các dòng InvoiceLine, cùng
+input_hash của các đầu vào: số ngày điểm danh, dịch vụ đã chọn, version biểu phí, tuổi,
+họ tên/ngày sinh. Lần xuất sau chỉ lập lại hóa đơn có hash đổi (hóa đơn khác giữ nguyên).
+
+File Word của hóa đơn lưu trong Invoice.docx (cột deferred); docx_hash == input_hash nghĩa là
+file còn đúng và được dùng lại, không dựng lại bằng python-docx. File ZIP được stream từ sổ,
+mỗi lần chỉ nạp một file Word.
+Đổi cách lập dòng hóa đơn hoặc bố cục file Word: tăng LEDGER_FORMAT để mọi hóa đơn lập lại.
+"""
+import hashlib
+import io
+import json
+import zipfile
+
+from sqlalchemy.orm import selectinload
+
+from app.models import db, Invoice, InvoiceLine
+
+LEDGER_FORMAT = 1
+
+
+def input_hash(row, rates):
+    """sha256 các đầu vào của một InvoiceRow với biểu phí rates"""
+    student = row.student
+    payload = [LEDGER_FORMAT, rates.version, student.name, student.birth_date, row.age,
+               row.present, row.absent_unexcused, row.absent_excused, row.has_english, row.has_steamax]
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def invoice_lines(row, rates):
+    """Các InvoiceLine (chưa gắn hóa đơn) của một InvoiceRow"""
+    lines = [
+        InvoiceLine(kind='tuition', label='Tiền học phí', quantity=1, unit_price=row.tuition, amount=row.tuition),
+        InvoiceLine(kind='meal', label='Tiền ăn', quantity=rates.meal_days - row.absent_excused,
+                    unit_price=rates.meal_fee, amount=row.meal_cost),
+    ]
+    if row.has_english:
+        lines.append(InvoiceLine(kind='english', label='Tiền học anh văn', quantity=1,
+                                 unit_price=row.english_cost, amount=row.english_cost))
+    if row.has_steamax:
+        lines.append(InvoiceLine(kind='steamax', label='Tiền học STEAMAX', quantity=1,
+                                 unit_price=row.steamax_cost, amount=row.steamax_cost))
+    for position, line in enumerate(lines):
+        line.position = position
+    return lines
+
+
+def _fill(invoice, row, rates, digest):
+    student = row.student
+    invoice.fee_version = rates.version
+    invoice.input_hash = digest
+    invoice.student_name = student.name
+    invoice.birth_date = student.birth_date
+    invoice.age = row.age
+    invoice.present_days = row.present
+    invoice.absent_unexcused_days = row.absent_unexcused
+    invoice.absent_excused_days = row.absent_excused
+    invoice.total = row.total
+    invoice.lines = invoice_lines(row, rates)
+    invoice.docx = None
+    invoice.docx_hash = None
+
+
+def sync_invoices(month, rows, rates):
+    """
+    Lập/cập nhật Invoice của tháng cho các InvoiceRow (chưa commit).
+    Trả về (list Invoice theo thứ tự rows, số hóa đơn được lập lại).
+    """
+    child_ids = [row.student.id for row in rows]
+    existing = {}
+    if child_ids:
+        existing = {invoice.child_id: invoice for invoice in
+                    Invoice.query.options(selectinload(Invoice.lines))
+                    .filter(Invoice.month == month, Invoice.child_id.in_(child_ids)).all()}
+    invoices = []
+    regenerated = 0
+    for row in rows:
+        digest = input_hash(row, rates)
+        invoice = existing.get(row.student.id)
+        if invoice is None:
+            invoice = Invoice(child_id=row.student.id, month=month)
+            db.session.add(invoice)
+        if invoice.input_hash != digest:
+            _fill(invoice, row, rates, digest)
+            regenerated += 1
+        invoices.append(invoice)
+    return invoices, regenerated
+
+
+def cache_docx(invoices, build):
+    """
+    Dựng file Word cho hóa đơn chưa có file hoặc file đã cũ (build(invoice) → bytes), chưa commit.
+    Trả về số file được dựng.
+    """
+    built = 0
+    for invoice in invoices:
+        if invoice.docx_hash != invoice.input_hash:
+            invoice.docx = build(invoice)
+            invoice.docx_hash = invoice.input_hash
+            built += 1
+    return built
+
+
+def invoice_files(invoice_ids):
+    """(tên file, nội dung Word) của từng hóa đơn đã có docx, nạp lần lượt từng file"""
+    for invoice_id in invoice_ids:
+        row = db.session.query(Invoice.student_name, Invoice.month, Invoice.docx)\
+            .filter(Invoice.id == invoice_id).first()
+        if row and row.docx:
+            yield f"invoice_{row.student_name}_{row.month}.docx", row.docx
+
+
+class _ZipSink(io.RawIOBase):
+    """Đích ghi không seek được cho ZipFile - gom byte để stream ra response"""
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def zip_stream(files):
+    """Stream file ZIP từ các cặp (tên file, bytes) - mỗi lần yield phần đã ghi của một file"""
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, 'w') as zipf:
+        for filename, data in files:
+            zipf.writestr(filename, data)
+            yield sink.drain()
+    yield sink.drain()
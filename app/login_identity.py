@@ -0,0 +1,84 @@
+"""
+Login Identity - Xác định tài khoản đăng nhập từ email/số điện thoại
+
+Một query UNION ALL trên staff và child (index email/phone ở cả hai bảng) trả về các
+tài khoản khớp với định danh, theo đúng thứ tự của trang đăng nhập cũ:
+admin (nhân viên admin đầu tiên) → phụ huynh (child) → giáo viên (staff còn lại).
+
+Tài khoản đầu tiên theo thứ tự đó đúng mật khẩu được đăng nhập (như trang cũ: email dùng
+chung cho hồ sơ bé và giáo viên vẫn đăng nhập được bằng mật khẩu giáo viên).
+check_password_hash (PBKDF2, tốn CPU) luôn chạy đúng MAX_LOGIN_CANDIDATES lần - thử hết các
+tài khoản khớp, không dừng sớm, phần còn thiếu chạy trên hash giả - nên thời gian phản hồi
+không để lộ email/số điện thoại nào đã đăng ký hay có bao nhiêu tài khoản dùng chung.
+Chỉ khi có hơn MAX_LOGIN_CANDIDATES tài khoản khớp (hiếm) thì mỗi tài khoản thêm một lần hash.
+
+Bảng users (models_users, hệ thống RBAC mới) không đăng nhập qua /login nên không nằm ở đây.
+"""
+import threading
+from collections import namedtuple
+
+from sqlalchemy import bindparam, case, func, literal, or_, select, union_all
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from app.models import db, Child, Staff
+
+# role: 'admin', 'parent' hoặc 'teacher' (giá trị session['role'])
+LoginAccount = namedtuple('LoginAccount', ['role', 'id', 'name'])
+
+_ROLE_PRIORITY = {'admin': 0, 'parent': 1, 'teacher': 2}
+
+# Số lần check_password_hash cố định mỗi lượt đăng nhập (một cho mỗi loại tài khoản)
+MAX_LOGIN_CANDIDATES = len(_ROLE_PRIORITY)
+
+_dummy_hash = None
+_dummy_lock = threading.Lock()
+_query = None
+
+
+def _dummy_password_hash():
+    global _dummy_hash
+    with _dummy_lock:
+        if _dummy_hash is None:
+            _dummy_hash = generate_password_hash('smalltree-no-account')
+        return _dummy_hash
+
+
+def _candidates_query():
+    """SELECT dựng một lần (tham số :identifier) - tránh chi phí dựng câu lệnh mỗi lượt đăng nhập"""
+    identifier = bindparam('identifier')
+    first_admin = select(func.min(Staff.id)).where(Staff.position == 'admin').scalar_subquery()
+    staff_role = case((Staff.id == first_admin, 'admin'), else_='teacher')
+    staff = select(
+        staff_role.label('role'),
+        case((Staff.id == first_admin, _ROLE_PRIORITY['admin']), else_=_ROLE_PRIORITY['teacher']).label('priority'),
+        Staff.id.label('id'), Staff.name.label('name'), Staff.password.label('password'),
+    ).where(or_(Staff.email == identifier, Staff.phone == identifier))
+    child = select(
+        literal('parent').label('role'), literal(_ROLE_PRIORITY['parent']).label('priority'),
+        Child.id.label('id'), Child.name.label('name'), Child.password.label('password'),
+    ).where(or_(Child.email == identifier, Child.phone == identifier))
+    candidates = union_all(staff, child).subquery()
+    return select(candidates).order_by(candidates.c.priority, candidates.c.id)
+
+
+def resolve_login(identifier):
+    """[(LoginAccount, password hash)] của các tài khoản khớp email/số điện thoại, theo thứ tự ưu tiên"""
+    global _query
+    identifier = (identifier or '').strip()
+    if not identifier:
+        return []
+    if _query is None:
+        _query = _candidates_query()
+    rows = db.session.execute(_query, {'identifier': identifier}).all()
+    return [(LoginAccount(row.role, row.id, row.name), row.password) for row in rows if row.password]
+
+
+def authenticate(identifier, password):
+    """LoginAccount đầu tiên (theo thứ tự ưu tiên) đúng mật khẩu, None nếu sai hoặc không có tài khoản"""
+    candidates = resolve_login(identifier)
+    padding = [(None, _dummy_password_hash())] * (MAX_LOGIN_CANDIDATES - len(candidates))
+    matched = None
+    for account, password_hash in candidates + padding:
+        if check_password_hash(password_hash, password or '') and matched is None:
+            matched = account
+    return matched
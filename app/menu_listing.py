@@ -0,0 +1,95 @@
+"""
+Menu Listing - Trang danh sách thực đơn phân trang theo năm/tuần
+
+- Mỗi trang chỉ nạp MENU_WEEKS_PER_PAGE tuần của một năm (index ix_menu_year_week).
+- Bảng 6×6 của từng tuần được render một lần và cache trong process theo
+  "phiên bản" của thực đơn = Menu.updated_date (hoặc created_date). Các endpoint
+  ghi thực đơn gọi touch_menu() để tăng phiên bản, nên mọi worker đều thấy thay đổi.
+- ETag/Last-Modified của trang tính từ phiên bản các tuần trên trang, trình duyệt
+  xem lại trang không đổi sẽ nhận 304.
+"""
+import hashlib
+import threading
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from flask import render_template
+from markupsafe import Markup
+
+from app.models import db, Menu
+from app.menu_slots import slots_by_menu, week_texts
+
+MENU_WEEKS_PER_PAGE = 8
+
+MenuWeek = namedtuple('MenuWeek', ['id', 'week_number', 'year', 'table'])
+
+_table_cache = {}  # (menu_id, mobile) -> (version, Markup)
+_table_lock = threading.Lock()
+
+
+def menu_version(menu):
+    return menu.updated_date or menu.created_date
+
+
+def menu_years():
+    """Các năm có thực đơn, mới nhất trước"""
+    return [row.year for row in db.session.query(Menu.year).distinct().order_by(Menu.year.desc())]
+
+
+def menu_page(year, page):
+    """Pagination các tuần của năm, tuần mới nhất trước"""
+    return Menu.query.filter_by(year=year).order_by(Menu.week_number.desc())\
+        .paginate(page=page, per_page=MENU_WEEKS_PER_PAGE, error_out=False)
+
+
+def menu_weeks(menus, mobile):
+    """
+    list MenuWeek cho template. Bảng của các tuần chưa có trong cache (hoặc đã đổi
+    phiên bản) được dựng từ menu_slot trong 1 query chung.
+    """
+    tables = {}
+    stale = []
+    with _table_lock:
+        for menu in menus:
+            cached = _table_cache.get((menu.id, mobile))
+            if cached and cached[0] == menu_version(menu):
+                tables[menu.id] = cached[1]
+            else:
+                stale.append(menu)
+
+    if stale:
+        week_slots = slots_by_menu([menu.id for menu in stale])
+        for menu in stale:
+            table = Markup(render_template('menu_week_table.html',
+                                           data=week_texts(week_slots[menu.id]), mobile=mobile))
+            tables[menu.id] = table
+            with _table_lock:
+                _table_cache[(menu.id, mobile)] = (menu_version(menu), table)
+
+    return [MenuWeek(menu.id, menu.week_number, menu.year, tables[menu.id]) for menu in menus]
+
+
+def listing_etag(menus, *context):
+    """ETag của trang: phiên bản từng tuần trên trang + các tham số khác ảnh hưởng tới HTML"""
+    versions = [(menu.id, menu.week_number, menu_version(menu)) for menu in menus]
+    return hashlib.sha1(repr((versions, context)).encode('utf-8')).hexdigest()
+
+
+def listing_last_modified(menus):
+    """Phiên bản mới nhất trong trang (timestamp lưu theo UTC), None nếu trang rỗng"""
+    versions = [menu_version(menu) for menu in menus if menu_version(menu)]
+    if not versions:
+        return None
+    return max(versions).replace(tzinfo=timezone.utc)
+
+
+def touch_menu(menu):
+    """
+    Đánh dấu thực đơn đã thay đổi (gọi trước db.session.commit()).
+    Tăng Menu.updated_date để worker khác cũng bỏ cache cũ, và xoá cache local.
+    """
+    menu.updated_date = datetime.utcnow()
+    if menu.id is not None:
+        with _table_lock:
+            for mobile in (False, True):
+                _table_cache.pop((menu.id, mobile), None)
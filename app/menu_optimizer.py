@@ -0,0 +1,341 @@
+"""
+Menu Optimizer - Gợi ý thực đơn tuần theo chi phí nguyên liệu
+
+Thay cho việc random.sample theo Dish.meal_times:
+- Danh mục món (chi phí/trẻ, nguyên liệu, bữa phù hợp) được dựng một lần từ
+  DishIngredient × Product.price và cache trong process (CATALOG_TTL giây,
+  các endpoint sửa món/sản phẩm gọi invalidate_catalog()).
+- Món có nguyên liệu thuộc sản phẩm/nhà cung cấp đã ngừng hoạt động bị loại.
+- Nguyên liệu chưa có giá được ước theo trung vị giá/đơn vị chuẩn (g, ml, đơn vị đếm) của
+  các sản phẩm đã có giá, để món thiếu giá không thành "món rẻ nhất".
+- Ràng buộc cứng: một món không lặp trong cùng ngày, mỗi món dùng tối đa
+  max_repeats lần/tuần (tự nới nếu bữa đó không đủ món).
+- Mục tiêu: tổng chi phí/trẻ + phạt khi cùng một sản phẩm xuất hiện quá
+  max_product_days ngày trong tuần (đa dạng nguyên liệu giữa các ngày).
+- Lời giải: tham lam theo bữa ít lựa chọn nhất, sau đó local search (thay món /
+  đổi chỗ hai ngày) tới khi không cải thiện hoặc hết time_budget.
+"""
+import math
+import random
+import statistics
+import threading
+import time
+from collections import namedtuple
+
+from sqlalchemy.orm import selectinload
+
+from app.models import Dish, DishIngredient, Product
+from app.menu_slots import DAY_KEYS, MEAL_KEYS
+from app.units import purchase_cost
+
+CATALOG_TTL = 300  # giây
+DISHES_PER_MEAL = {'lunch': 2}  # Bữa trưa 2 món, các bữa khác 1 món
+EMPTY_DISH = '[Không có]'
+
+# product_costs: tuple (product_id, chi phí/trẻ) - chi phí ước tính (imputed_cost) nếu chưa có giá
+# hoặc đơn vị không quy đổi được; unpriced: món có ít nhất một nguyên liệu như vậy
+DishFeatures = namedtuple('DishFeatures', ['id', 'name', 'meals', 'cost', 'product_costs', 'products', 'unpriced'])
+# dishes: tuple DishFeatures; by_meal: {meal: tuple index vào dishes, sắp theo chi phí tăng dần}
+Catalog = namedtuple('Catalog', ['dishes', 'by_meal', 'excluded', 'product_ids'])
+MenuPlan = namedtuple('MenuPlan', ['menu', 'cost_per_child', 'daily_cost', 'unpriced_dishes', 'excluded_dishes'])
+
+_catalog = None  # (built_at, Catalog)
+_catalog_lock = threading.Lock()
+
+
+def ingredient_cost(di):
+    """
+    Chi phí nguyên liệu/trẻ của một DishIngredient theo các cột đơn vị chuẩn (app.units);
+    None nếu sản phẩm chưa có giá hoặc đơn vị không quy đổi được sang đơn vị tính giá.
+    """
+    product = di.product
+    if product is None:
+        return None
+    return purchase_cost(di.base_quantity, di.base_unit, product.base_unit, product.unit_price)
+
+
+def imputed_cost(di, unit_prices, fallback):
+    """
+    Chi phí ước tính của nguyên liệu chưa có giá: trung vị giá/đơn vị chuẩn (unit_prices theo
+    base_unit) × lượng dùng; fallback (trung vị chi phí một nguyên liệu) nếu không có giá cùng đơn vị.
+    """
+    price = unit_prices.get(di.base_unit)
+    if price is None or not di.base_quantity:
+        return fallback
+    return di.base_quantity * price
+
+
+def _is_available(product):
+    return product is not None and product.is_active is not False and \
+        (product.supplier is None or product.supplier.is_active is not False)
+
+
+def build_catalog():
+    """Dựng danh mục món đang hoạt động - 3 query (món, nguyên liệu, sản phẩm + nhà cung cấp)"""
+    dishes = Dish.query.filter_by(is_active=True).options(
+        selectinload(Dish.ingredients)
+        .joinedload(DishIngredient.product)
+        .joinedload(Product.supplier)
+    ).order_by(Dish.id).all()
+
+    features = []
+    excluded = []
+    for dish in dishes:
+        meals = tuple(meal for meal in MEAL_KEYS if meal in (dish.meal_times or []))
+        if not meals:
+            continue
+        ingredients = [di for di in dish.ingredients if di.is_active is not False]
+        if not all(_is_available(di.product) for di in ingredients):
+            excluded.append(dish.name)
+            continue
+        features.append((dish, meals, [(di, ingredient_cost(di)) for di in ingredients]))
+
+    # Giá tham chiếu cho nguyên liệu chưa có giá
+    prices_by_unit = {}
+    priced_costs = []
+    for _, _, ingredients in features:
+        for di, cost in ingredients:
+            if cost is not None:
+                prices_by_unit.setdefault(di.product.base_unit, {})[di.product_id] = di.product.unit_price
+                priced_costs.append(cost)
+    unit_prices = {unit: statistics.median(prices.values()) for unit, prices in prices_by_unit.items()}
+    fallback = statistics.median(priced_costs) if priced_costs else 0
+
+    for i, (dish, meals, ingredients) in enumerate(features):
+        costs = {}
+        unpriced = False
+        for di, cost in ingredients:
+            if cost is None:
+                unpriced = True
+                cost = imputed_cost(di, unit_prices, fallback)
+            costs[di.product_id] = costs.get(di.product_id, 0) + cost
+        features[i] = DishFeatures(
+            dish.id, dish.name, meals, sum(costs.values()), tuple(costs.items()), frozenset(costs), unpriced
+        )
+
+    by_meal = {
+        meal: tuple(sorted((i for i, f in enumerate(features) if meal in f.meals),
+                           key=lambda i: (features[i].cost, features[i].id)))
+        for meal in MEAL_KEYS
+    }
+    product_ids = {}
+    for dish in dishes:
+        for di in dish.ingredients:
+            if di.product:
+                product_ids[di.product.name.lower()] = di.product_id
+    return Catalog(tuple(features), by_meal, tuple(excluded), product_ids)
+
+
+def get_catalog():
+    """Danh mục món dùng chung trong process, dựng lại sau CATALOG_TTL giây hoặc khi bị invalidate"""
+    global _catalog
+    with _catalog_lock:
+        cached = _catalog
+    if cached and time.monotonic() - cached[0] < CATALOG_TTL:
+        return cached[1]
+    catalog = build_catalog()
+    with _catalog_lock:
+        _catalog = (time.monotonic(), catalog)
+    return catalog
+
+
+def invalidate_catalog():
+    """Gọi sau khi thêm/sửa/xoá món ăn hoặc sản phẩm"""
+    global _catalog
+    with _catalog_lock:
+        _catalog = None
+
+
+def in_stock_products(catalog, text):
+    """Sản phẩm đã có sẵn (tên cách nhau bởi dấu phẩy/xuống dòng) → set product_id, không tính chi phí"""
+    names = [name.strip().lower() for name in (text or '').replace('\n', ',').split(',') if name.strip()]
+    return {catalog.product_ids[name] for name in names if name in catalog.product_ids}
+
+
+class _WeekPlan:
+    """Trạng thái lời giải: món cho từng slot + đếm sản phẩm theo ngày để tính delta nhanh"""
+
+    def __init__(self, catalog, costs, max_product_days, overlap_penalty):
+        self.dishes = catalog.dishes
+        self.costs = costs
+        self.max_product_days = max_product_days
+        self.overlap_penalty = overlap_penalty
+        self.slots = [(d, meal) for d in range(len(DAY_KEYS)) for meal in MEAL_KEYS
+                      for _ in range(DISHES_PER_MEAL.get(meal, 1))]
+        self.choice = [None] * len(self.slots)
+        self.uses = {}  # dish index -> số lần dùng trong tuần
+        self.day_dishes = [{} for _ in DAY_KEYS]  # ngày -> {dish index: số lần}
+        self.product_day = {}  # product_id -> [số món chứa sản phẩm trong từng ngày]
+        self.product_days = {}  # product_id -> số ngày có sản phẩm
+
+    def _excess(self, days):
+        return max(0, days - self.max_product_days)
+
+    def _products_delta(self, day, removed, added):
+        """Thay đổi phần phạt trùng nguyên liệu khi bỏ món removed / thêm món added ở ngày day"""
+        if removed == added:
+            return 0
+        change = {}
+        if removed is not None:
+            for pid in self.dishes[removed].products:
+                change[pid] = change.get(pid, 0) - 1
+        if added is not None:
+            for pid in self.dishes[added].products:
+                change[pid] = change.get(pid, 0) + 1
+        delta = 0
+        for pid, diff in change.items():
+            if diff == 0:
+                continue
+            per_day = self.product_day.get(pid)
+            before_count = per_day[day] if per_day else 0
+            days = self.product_days.get(pid, 0)
+            after_count = before_count + diff
+            new_days = days + (after_count > 0) - (before_count > 0)
+            delta += self._excess(new_days) - self._excess(days)
+        return delta * self.overlap_penalty
+
+    def _apply_products(self, day, dish, sign):
+        for pid in self.dishes[dish].products:
+            per_day = self.product_day.setdefault(pid, [0] * len(DAY_KEYS))
+            before = per_day[day]
+            per_day[day] += sign
+            if before == 0 and per_day[day] > 0:
+                self.product_days[pid] = self.product_days.get(pid, 0) + 1
+            elif before > 0 and per_day[day] == 0:
+                self.product_days[pid] -= 1
+
+    def delta(self, slot, dish):
+        day = self.slots[slot][0]
+        old = self.choice[slot]
+        cost = self.costs[dish] - (self.costs[old] if old is not None else 0)
+        return cost + self._products_delta(day, old, dish)
+
+    def assign(self, slot, dish):
+        day = self.slots[slot][0]
+        old = self.choice[slot]
+        if old is not None:
+            self.uses[old] -= 1
+            self.day_dishes[day][old] -= 1
+            self._apply_products(day, old, -1)
+        self.choice[slot] = dish
+        self.uses[dish] = self.uses.get(dish, 0) + 1
+        self.day_dishes[day][dish] = self.day_dishes[day].get(dish, 0) + 1
+        self._apply_products(day, dish, +1)
+
+    def feasible(self, slot, dish, limit):
+        """Món chưa có trong ngày và chưa vượt số lần lặp (không tính chính slot đang thay)"""
+        day = self.slots[slot][0]
+        if self.choice[slot] == dish:
+            return True
+        return not self.day_dishes[day].get(dish) and self.uses.get(dish, 0) < limit
+
+    def try_swap(self, slot, other):
+        """Đổi món giữa hai slot khác ngày nếu giảm được phạt trùng nguyên liệu (chi phí không đổi)"""
+        a, b = self.choice[slot], self.choice[other]
+        if a == b or self.day_dishes[self.slots[slot][0]].get(b) or self.day_dishes[self.slots[other][0]].get(a):
+            return False
+        delta = self.delta(slot, b)
+        self.assign(slot, b)
+        delta += self.delta(other, a)
+        if delta < -1e-9:
+            self.assign(other, a)
+            return True
+        self.assign(slot, a)
+        return False
+
+    def removal_gain(self, slot):
+        """Mức giảm phạt tối đa có thể đạt được khi thay món ở slot"""
+        old = self.choice[slot]
+        return -self._products_delta(self.slots[slot][0], old, None) if old is not None else 0
+
+
+def optimize_week_menu(available_ingredients='', max_repeats=1, max_product_days=3,
+                       time_budget=0.3, seed=None, catalog=None):
+    """
+    Lập thực đơn tuần tối thiểu chi phí/trẻ.
+    Returns: MenuPlan(menu={day: {meal: 'Món 1, Món 2'}}, cost_per_child, daily_cost, ...)
+    """
+    catalog = catalog or get_catalog()
+    rng = random.Random(seed)
+    in_stock = in_stock_products(catalog, available_ingredients)
+    costs = [
+        sum(cost for pid, cost in f.product_costs if pid not in in_stock) if in_stock else f.cost
+        for f in catalog.dishes
+    ]
+    # Ứng viên từng bữa sắp theo chi phí thực tế (đã trừ nguyên liệu có sẵn) để cắt nhánh khi local search
+    by_meal = {meal: sorted(candidates, key=costs.__getitem__) for meal, candidates in catalog.by_meal.items()} \
+        if in_stock else catalog.by_meal
+    priced = [c for c in costs if c > 0]
+    # Phạt cho mỗi ngày vượt max_product_days ~ chi phí trung bình của một món
+    overlap_penalty = (sum(priced) / len(priced)) if priced else 1.0
+
+    plan = _WeekPlan(catalog, costs, max_product_days, overlap_penalty)
+    slots_per_meal = {meal: len(DAY_KEYS) * DISHES_PER_MEAL.get(meal, 1) for meal in MEAL_KEYS}
+    limits = {
+        meal: max(max_repeats, math.ceil(slots_per_meal[meal] / len(by_meal[meal])))
+        for meal in MEAL_KEYS if by_meal[meal]
+    }
+
+    # Tham lam: bữa ít lựa chọn nhất trước, mỗi slot chọn món có delta nhỏ nhất
+    order = sorted(range(len(plan.slots)),
+                   key=lambda s: (len(by_meal[plan.slots[s][1]]), plan.slots[s]))
+    for slot in order:
+        meal = plan.slots[slot][1]
+        candidates = by_meal[meal]
+        if not candidates:
+            continue
+        feasible = [c for c in candidates if plan.feasible(slot, c, limits[meal])]
+        if not feasible:
+            # Không còn món thoả ràng buộc: chọn món dùng ít nhất chưa có trong ngày
+            day = plan.slots[slot][0]
+            feasible = [min(candidates, key=lambda c: (plan.day_dishes[day].get(c, 0), plan.uses.get(c, 0)))]
+        plan.assign(slot, min(feasible, key=lambda c: plan.delta(slot, c)))
+
+    # Local search: thay món / đổi chỗ hai slot cùng bữa khác ngày
+    deadline = time.monotonic() + time_budget
+    filled = [s for s in range(len(plan.slots)) if plan.choice[s] is not None]
+    improved = True
+    while improved and time.monotonic() < deadline:
+        improved = False
+        rng.shuffle(filled)
+        for slot in filled:
+            meal = plan.slots[slot][1]
+            old = plan.choice[slot]
+            gain = plan.removal_gain(slot)
+            moved = False
+            for dish in by_meal[meal]:
+                # Danh sách đã sắp theo chi phí: từ đây trở đi không thể tốt hơn
+                if costs[dish] - costs[old] - gain >= 0:
+                    break
+                if dish != old and plan.feasible(slot, dish, limits[meal]) and plan.delta(slot, dish) < -1e-9:
+                    plan.assign(slot, dish)
+                    moved = True
+                    break
+            if not moved and gain > 0:
+                # Đổi chỗ chỉ giảm được phạt trùng nguyên liệu, bỏ qua nếu món hiện tại không bị phạt
+                moved = any(plan.try_swap(slot, other) for other in filled
+                            if plan.slots[other][1] == meal and plan.slots[other][0] != plan.slots[slot][0])
+            improved = improved or moved
+            if time.monotonic() >= deadline:
+                break
+
+    return _menu_plan(plan, catalog)
+
+
+def _menu_plan(plan, catalog):
+    names = {day: {meal: [] for meal in MEAL_KEYS} for day in DAY_KEYS}
+    daily_cost = {day: 0 for day in DAY_KEYS}
+    unpriced = set()
+    for (d, meal), dish in zip(plan.slots, plan.choice):
+        day = DAY_KEYS[d]
+        if dish is None:
+            names[day][meal].append(EMPTY_DISH)
+            continue
+        features = catalog.dishes[dish]
+        names[day][meal].append(features.name)
+        daily_cost[day] += plan.costs[dish]
+        if features.unpriced:
+            unpriced.add(features.name)
+    menu = {day: {meal: ', '.join(dishes) for meal, dishes in meals.items()} for day, meals in names.items()}
+    daily_cost = {day: round(cost) for day, cost in daily_cost.items()}
+    return MenuPlan(menu, sum(daily_cost.values()), daily_cost, sorted(unpriced), list(catalog.excluded))
@@ -0,0 +1,102 @@
+"""
+Menu Slots - Thực đơn tuần dạng bảng chuẩn hoá (menu_slot)
+
+Các cột <thứ>_<bữa> trên Menu vẫn là dữ liệu gốc của form nhập/sửa. Mỗi lần ghi
+thực đơn, set_menu_data()/sync_menu_slots() tách tên món MỘT lần và lưu thành
+MenuSlot(menu_id, day, meal, position, dish_id), tên món khớp với Dish ngay lúc ghi.
+
+Hiển thị thực đơn, tổng hợp nguyên liệu (food_safety_export) và thống kê món ăn
+đọc menu_slot qua index (menu_id, day, meal) / (dish_id) thay vì tách chuỗi
+theo dấu phẩy rồi tìm món theo tên mỗi lần.
+"""
+from app.models import db, Dish, MenuSlot
+
+DAY_KEYS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat')
+DAY_FIELDS = dict(zip(DAY_KEYS, ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday')))
+MEAL_KEYS = ('morning', 'snack', 'dessert', 'lunch', 'afternoon', 'lateafternoon')
+
+
+def split_dishes(meal_text):
+    """'Cơm, Canh chua' → ['Cơm', 'Canh chua']"""
+    return [d.strip() for d in str(meal_text or '').split(',') if d.strip()]
+
+
+def menu_field(day, meal):
+    """Tên cột trên Menu: ('mon', 'lunch') → 'monday_lunch'"""
+    return f'{DAY_FIELDS[day]}_{meal}'
+
+
+def empty_week():
+    return {day: {meal: [] for meal in MEAL_KEYS} for day in DAY_KEYS}
+
+
+def menu_data_from_form(form):
+    """{day: {meal: text}} từ các field content_<day>_<meal> của form thực đơn"""
+    return {day: {meal: form.get(f'content_{day}_{meal}', '') for meal in MEAL_KEYS} for day in DAY_KEYS}
+
+
+def set_menu_data(menu, menu_data):
+    """
+    Gán các cột thực đơn từ {day: {meal: text}} (thiếu → '') rồi đồng bộ menu_slot.
+    Không commit.
+    """
+    for day in DAY_KEYS:
+        day_data = menu_data.get(day) or {}
+        for meal in MEAL_KEYS:
+            value = day_data.get(meal)
+            setattr(menu, menu_field(day, meal), value if value is not None else '')
+    sync_menu_slots(menu)
+
+
+def sync_menu_slots(menu):
+    """Tạo lại menu.slots từ các cột text, tên món khớp Dish.name trong 1 query. Không commit."""
+    entries = [
+        (day, meal, position, name)
+        for day in DAY_KEYS for meal in MEAL_KEYS
+        for position, name in enumerate(split_dishes(getattr(menu, menu_field(day, meal))))
+    ]
+    names = {entry[3] for entry in entries}
+    dish_ids = dict(db.session.query(Dish.name, Dish.id).filter(Dish.name.in_(names))) if names else {}
+    menu.slots = [
+        MenuSlot(day=day, meal=meal, position=position, dish_name=name, dish_id=dish_ids.get(name))
+        for day, meal, position, name in entries
+    ]
+
+
+def link_dish_slots(dish):
+    """Gắn dish cho các slot chưa khớp món nào nhưng trùng tên (sau khi tạo/đổi tên món). Không commit."""
+    MenuSlot.query.filter(MenuSlot.dish_id.is_(None), MenuSlot.dish_name == dish.name)\
+        .update({'dish_id': dish.id}, synchronize_session=False)
+
+
+def slots_by_menu(menu_ids, *options):
+    """
+    {menu_id: {day: {meal: [MenuSlot theo position]}}} cho nhiều thực đơn - 1 query.
+    options: loader options bổ sung (vd. nạp sẵn dish và nguyên liệu).
+    """
+    grouped = {menu_id: empty_week() for menu_id in menu_ids}
+    if not grouped:
+        return grouped
+    query = MenuSlot.query.filter(MenuSlot.menu_id.in_(list(grouped)))\
+        .order_by(MenuSlot.menu_id, MenuSlot.day, MenuSlot.meal, MenuSlot.position)
+    for slot in query.options(*options):
+        grouped[slot.menu_id][slot.day][slot.meal].append(slot)
+    return grouped
+
+
+def week_texts(week_slots):
+    """{day: {meal: [MenuSlot]}} → {day: {meal: 'Món 1, Món 2'}} (định dạng template thực đơn)"""
+    return {
+        day: {meal: ', '.join(slot.dish_name for slot in slots) for meal, slots in meals.items()}
+        for day, meals in week_slots.items()
+    }
+
+
+def dish_usage_counts():
+    """{dish_id: số lần món xuất hiện trong các thực đơn} - 1 query GROUP BY trên ix_menu_slot_dish"""
+    return dict(
+        db.session.query(MenuSlot.dish_id, db.func.count(MenuSlot.id))
+        .filter(MenuSlot.dish_id.isnot(None))
+        .group_by(MenuSlot.dish_id)
+        .all()
+    )
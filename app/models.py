@@ -1,12 +1,20 @@
 
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.orm import deferred, validates
+
+from app.units import canonical_quantity, unit_price
 
 db = SQLAlchemy()
 # ================== LỚP HỌC ==================
+DEFAULT_CLASS_SORT_ORDER = 999  # lớp chưa đặt thứ tự xếp cuối
+
 class Class(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), unique=True, nullable=False)
     description = db.Column(db.String(255))
+    # Thứ tự hiển thị (Mầm → Chồi → Lá → Kay...), sắp xếp trong SQL: ORDER BY sort_order, name
+    sort_order = db.Column(db.Integer, nullable=False, default=DEFAULT_CLASS_SORT_ORDER,
+                           server_default=str(DEFAULT_CLASS_SORT_ORDER))
 
     # Có thể mở rộng thêm các trường khác nếu cần
 class Child(db.Model):
@@ -23,25 +31,51 @@ class Child(db.Model):
     # Deprecated: Giữ lại tạm để không mất data cũ trên server, sẽ xóa sau
     parent_contact = db.Column(db.String(100), nullable=True)
     
+    # Lớp: class_id (FK, có index) dùng để lọc/join; class_name là tên hiển thị, gán cùng nhau qua assign_class()
+    class_id = db.Column(db.Integer, db.ForeignKey('class.id'), index=True)
     class_name = db.Column(db.String(100))
     birth_date = db.Column(db.String(20))
     status = db.Column(db.String(20), default='Chưa điểm danh')
-    email = db.Column(db.String(100))
-    phone = db.Column(db.String(20))
+    email = db.Column(db.String(100), index=True)  # Đăng nhập (app/login_identity.py)
+    phone = db.Column(db.String(20), index=True)
     password = db.Column(db.String(100))
     student_code = db.Column(db.String(20), unique=True, nullable=True)
     avatar = db.Column(db.String(300))  # Đường dẫn ảnh đại diện học sinh
     is_active = db.Column(db.Boolean, default=True)  # Ẩn học sinh khi nghỉ học
 
+    # Chỉ số BMI mới nhất (denormalized từ bmi_record, cập nhật qua bmi_history.refresh_current_bmi)
+    current_bmi = db.Column(db.Float)
+    current_weight = db.Column(db.Float)
+    current_height = db.Column(db.Float)
+    current_bmi_date = db.Column(db.Date)
+
+    class_obj = db.relationship('Class', backref=db.backref('children', lazy=True))
+
+    def assign_class(self, class_obj):
+        """Gán lớp (Class hoặc None) - giữ class_id và class_name luôn khớp nhau"""
+        self.class_obj = class_obj
+        self.class_id = class_obj.id if class_obj else None
+        self.class_name = class_obj.name if class_obj else None
+
 class Staff(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     position = db.Column(db.String(100), nullable=False)
     contact_info = db.Column(db.String(100), nullable=False)
-    email = db.Column(db.String(100))
-    phone = db.Column(db.String(20))
+    email = db.Column(db.String(100), index=True)  # Đăng nhập (app/login_identity.py)
+    phone = db.Column(db.String(20), index=True)
     password = db.Column(db.String(100))
 
+class CacheVersion(db.Model):
+    """
+    Bộ đếm phiên bản của cache trong process (vd: 'roster' - app/roster.py)
+    Tăng khi dữ liệu nguồn thay đổi để mọi worker nạp lại cache
+    """
+    __tablename__ = 'cache_version'
+
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
 class Activity(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
@@ -91,6 +125,7 @@ class BmiRecord(db.Model):
     weight = db.Column(db.Float, nullable=False)
     height = db.Column(db.Float, nullable=False)
     bmi = db.Column(db.Float, nullable=False)
+    __table_args__ = (db.Index('ix_bmi_record_student_date', 'student_id', 'date'),)
 
 class Supplier(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -115,6 +150,17 @@ class Product(db.Model):
     price = db.Column(db.Float, nullable=True)  # Giá cả (VNĐ) theo đơn vị
     # usual_quantity = db.Column(db.Float)  # Đã bỏ trường số lượng thường dùng
     is_active = db.Column(db.Boolean, default=True)
+    # Tự tính khi ghi unit/price (app.units): đơn vị chuẩn và giá trên 1 đơn vị chuẩn
+    base_unit = db.Column(db.String(20))
+    unit_price = db.Column(db.Float)
+
+    @validates('unit', 'price')
+    def _canonicalize(self, key, value):
+        unit = value if key == 'unit' else self.unit
+        price = value if key == 'price' else self.price
+        if unit is not None:
+            self.base_unit, self.unit_price = unit_price(price, unit)
+        return value
 
 # ================== MÓN ĂN VÀ NGUYÊN LIỆU ==================
 class Dish(db.Model):
@@ -137,7 +183,17 @@ class DishIngredient(db.Model):
     notes = db.Column(db.Text)  # Ghi chú
     created_date = db.Column(db.DateTime, nullable=False)
     is_active = db.Column(db.Boolean, default=True)
-    
+    # Tự tính khi ghi quantity/unit (app.units): lượng theo đơn vị chuẩn (g, ml hoặc đơn vị đếm)
+    base_quantity = db.Column(db.Float)
+    base_unit = db.Column(db.String(20))
+
+    @validates('quantity', 'unit')
+    def _canonicalize(self, key, value):
+        quantity = value if key == 'quantity' else self.quantity
+        unit = value if key == 'unit' else self.unit
+        if quantity is not None and unit is not None:
+            self.base_quantity, self.base_unit = canonical_quantity(quantity, unit)
+        return value
 
 class StudentAlbum(db.Model):
     """Album cá nhân của học sinh để theo dõi quá trình phát triển"""
@@ -243,7 +299,10 @@ class Menu(db.Model):
     updated_date = db.Column(db.DateTime, onupdate=db.func.current_timestamp())
     
     # Unique constraint để tránh trùng lặp tuần
-    __table_args__ = (db.UniqueConstraint('week_number', 'year', name='unique_week_year'),)
+    __table_args__ = (
+        db.UniqueConstraint('week_number', 'year', name='unique_week_year'),
+        db.Index('ix_menu_year_week', 'year', 'week_number'),
+    )
     
     def to_dict(self):
         """Convert Menu object to dictionary for JSON serialization"""
@@ -305,6 +364,26 @@ class Menu(db.Model):
             'updated_date': self.updated_date.isoformat() if self.updated_date else None
         }
 
+class MenuSlot(db.Model):
+    """Một món trong thực đơn tuần (bản chuẩn hoá của các cột <thứ>_<bữa> trên Menu)"""
+    id = db.Column(db.Integer, primary_key=True)
+    menu_id = db.Column(db.Integer, db.ForeignKey('menu.id'), nullable=False)
+    day = db.Column(db.String(3), nullable=False)  # 'mon' ... 'sat'
+    meal = db.Column(db.String(20), nullable=False)  # 'morning', 'snack', 'dessert', 'lunch', 'afternoon', 'lateafternoon'
+    position = db.Column(db.Integer, nullable=False, default=0)  # Thứ tự món trong bữa
+    dish_id = db.Column(db.Integer, db.ForeignKey('dish.id'))  # None nếu tên món chưa có trong danh sách món ăn
+    dish_name = db.Column(db.String(200), nullable=False)  # Tên món như đã nhập trong thực đơn
+
+    # Relationship
+    menu = db.relationship('Menu', backref=db.backref('slots', lazy=True, cascade='all, delete-orphan',
+                                                      order_by='MenuSlot.position'))
+    dish = db.relationship('Dish', backref=db.backref('menu_slots', lazy=True))
+
+    __table_args__ = (
+        db.Index('ix_menu_slot_menu_day_meal', 'menu_id', 'day', 'meal', 'position'),
+        db.Index('ix_menu_slot_dish', 'dish_id'),
+    )
+
 # ================== DỊCH VỤ THEO THÁNG ==================
 class MonthlyService(db.Model):
     """Lưu trữ thông tin dịch vụ (tiếng anh, steamax) của học sinh theo tháng"""
@@ -322,6 +401,83 @@ class MonthlyService(db.Model):
     # Unique constraint: một học sinh chỉ có một record cho mỗi tháng
     __table_args__ = (db.UniqueConstraint('child_id', 'month', name='unique_child_month'),)
 
+
+class FeeSchedule(db.Model):
+    """
+    Biểu phí (tiền ăn, học phí theo tuổi, dịch vụ) - mỗi lần đổi giá thêm một dòng version mới,
+    không sửa dòng cũ. Tháng học phí dùng dòng có effective_from <= tháng đó, version lớn nhất.
+    """
+    __tablename__ = 'fee_schedule'
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, unique=True, nullable=False)
+    effective_from = db.Column(db.String(7), nullable=False, index=True)  # Format: "2025-11"
+    meal_fee = db.Column(db.Integer, nullable=False)       # tiền ăn một ngày
+    meal_days = db.Column(db.Integer, nullable=False)      # số ngày ăn mặc định của tháng
+    english_fee = db.Column(db.Integer, nullable=False)
+    steamax_fee = db.Column(db.Integer, nullable=False)
+    tuition_by_age = db.Column(db.JSON, nullable=False)    # {"1": 1850000, "2": 1750000, ...}
+    default_tuition = db.Column(db.Integer, nullable=False)  # tuổi không có trong tuition_by_age
+    note = db.Column(db.String(255))
+    created_date = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp())
+
+    def __repr__(self):
+        return f'<FeeSchedule v{self.version} from {self.effective_from}>'
+
+
+class Invoice(db.Model):
+    """
+    Hóa đơn đã lập của một học sinh cho một tháng điểm danh (sổ hóa đơn - app/invoice_ledger.py)
+    input_hash: băm các đầu vào (điểm danh, dịch vụ, version biểu phí, tuổi, họ tên/ngày sinh) -
+    chỉ lập lại khi hash đổi. docx: file Word đã tạo, dùng lại khi docx_hash == input_hash.
+    """
+    __tablename__ = 'invoice'
+
+    id = db.Column(db.Integer, primary_key=True)
+    child_id = db.Column(db.Integer, db.ForeignKey('child.id'), nullable=False, index=True)
+    month = db.Column(db.String(7), nullable=False)  # Format: "2025-11" (tháng điểm danh, như MonthlyService)
+    fee_version = db.Column(db.Integer, nullable=False)  # FeeSchedule.version (0 = giá mặc định)
+    input_hash = db.Column(db.String(64), nullable=False)
+    # Bản chụp thông tin học sinh lúc lập hóa đơn
+    student_name = db.Column(db.String(100), nullable=False)
+    birth_date = db.Column(db.String(20))
+    age = db.Column(db.Integer, nullable=False, default=0)
+    present_days = db.Column(db.Integer, nullable=False, default=0)
+    absent_unexcused_days = db.Column(db.Integer, nullable=False, default=0)
+    absent_excused_days = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    docx = deferred(db.Column(db.LargeBinary))  # chỉ nạp khi xuất file
+    docx_hash = db.Column(db.String(64))
+    created_date = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp())
+    updated_date = db.Column(db.DateTime, onupdate=db.func.current_timestamp())
+
+    child = db.relationship('Child', backref=db.backref('invoices', lazy=True, cascade='all, delete-orphan'))
+    lines = db.relationship('InvoiceLine', backref='invoice', cascade='all, delete-orphan',
+                            order_by='InvoiceLine.position')
+
+    __table_args__ = (db.UniqueConstraint('child_id', 'month', name='unique_invoice_child_month'),)
+
+    def line(self, kind):
+        """InvoiceLine theo loại ('tuition', 'meal', 'english', 'steamax'), None nếu không có"""
+        return next((line for line in self.lines if line.kind == kind), None)
+
+    def __repr__(self):
+        return f'<Invoice {self.child_id} {self.month}: {self.total}>'
+
+
+class InvoiceLine(db.Model):
+    """Một khoản trong hóa đơn: quantity x unit_price = amount"""
+    __tablename__ = 'invoice_line'
+
+    id = db.Column(db.Integer, primary_key=True)
+    invoice_id = db.Column(db.Integer, db.ForeignKey('invoice.id'), nullable=False, index=True)
+    position = db.Column(db.Integer, nullable=False, default=0)
+    kind = db.Column(db.String(20), nullable=False)
+    label = db.Column(db.String(100), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False, default=1)
+    unit_price = db.Column(db.Integer, nullable=False, default=0)
+    amount = db.Column(db.Integer, nullable=False, default=0)
+
 # ================== USER ACTIVITY TRACKING ==================
 class UserActivity(db.Model):
     """Ghi nhận hoạt động của người dùng để phân tích và theo dõi"""
@@ -352,6 +508,7 @@ class Deck(db.Model):
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
     is_active = db.Column(db.Boolean, default=True)  # Hiển thị hay ẩn
     order = db.Column(db.Integer, default=0)  # Thứ tự hiển thị
+    card_count = db.Column(db.Integer, default=0, nullable=False, server_default='0')  # Số thẻ (denormalized, cập nhật khi thêm/xóa thẻ)
     
     cards = db.relationship('Card', backref='deck', lazy=True, cascade='all, delete-orphan')
     
@@ -383,11 +540,15 @@ class CardProgress(db.Model):
     repetitions = db.Column(db.Integer, default=0)  # Số lần ôn
     next_review = db.Column(db.DateTime)  # Thời điểm ôn lại
     last_reviewed = db.Column(db.DateTime)  # Lần ôn gần nhất
+    first_reviewed = db.Column(db.DateTime)  # Lần học đầu tiên (đếm thẻ mới trong ngày)
     interval_days = db.Column(db.Integer, default=1)  # Khoảng cách ôn (ngày)
     
     child = db.relationship('Child', backref=db.backref('card_progress', lazy=True))
     
-    __table_args__ = (db.UniqueConstraint('child_id', 'card_id', name='unique_child_card'),)
+    __table_args__ = (
+        db.UniqueConstraint('child_id', 'card_id', name='unique_child_card'),
+        db.Index('ix_card_progress_child_next_review', 'child_id', 'next_review'),  # Chọn thẻ đến hạn ôn
+    )
     
     def __repr__(self):
         return f'<CardProgress child={self.child_id} card={self.card_id} ease={self.ease_level}>'
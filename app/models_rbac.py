@@ -1,10 +1,21 @@
 """
 Dynamic Role & Permission Models
 Cho phép admin tạo và quản lý roles & permissions động
+
+Kiểm tra quyền dùng bản "biên dịch" role → frozenset(permission) nạp một lần mỗi process
+(cached_role_permissions()). Các endpoint sửa role/permission gọi bump_permissions_version()
+để tăng bộ đếm trong bảng rbac_version; process khác thấy phiên bản mới sau tối đa
+PERMISSION_VERSION_CHECK_SECONDS giây và nạp lại.
 """
-from app.models import db
+import threading
+import time
+from collections import namedtuple
 from datetime import datetime
 
+from app.models import db
+
+PERMISSION_VERSION_CHECK_SECONDS = 5
+
 
 class Role(db.Model):
     """
@@ -99,8 +110,30 @@ role_permissions = db.Table('role_permissions',
 )
 
 
+class RbacVersion(db.Model):
+    """
+    Bộ đếm phiên bản của roles/permissions (1 dòng, id=1)
+    Tăng mỗi khi role/permission thay đổi để mọi process nạp lại cache quyền
+    """
+    __tablename__ = 'rbac_version'
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
 # ==================== HELPER FUNCTIONS ====================
 
+def permission_category(perm_name):
+    """Nhóm hiển thị của permission theo tên"""
+    if 'manage' in perm_name or 'delete' in perm_name or 'admin' in perm_name:
+        return 'Admin'
+    if 'create' in perm_name or 'edit' in perm_name:
+        return 'Content Management'
+    if 'view' in perm_name or 'access' in perm_name:
+        return 'View Access'
+    return 'Actions'
+
+
 def init_system_roles():
     """
     Khởi tạo 5 roles hệ thống mặc định
@@ -115,22 +148,12 @@ def init_system_roles():
     
     permission_objs = {}
     for perm_name in all_perms:
-        # Categorize permission
-        if 'manage' in perm_name or 'delete' in perm_name or 'admin' in perm_name:
-            category = 'Admin'
-        elif 'create' in perm_name or 'edit' in perm_name:
-            category = 'Content Management'
-        elif 'view' in perm_name or 'access' in perm_name:
-            category = 'View Access'
-        else:
-            category = 'Actions'
-        
         perm = Permission.query.filter_by(name=perm_name).first()
         if not perm:
             perm = Permission(
                 name=perm_name,
                 display_name=perm_name.replace('_', ' ').title(),
-                category=category,
+                category=permission_category(perm_name),
                 is_system_permission=True
             )
             db.session.add(perm)
@@ -172,21 +195,114 @@ def init_system_roles():
 
 def get_role_permissions_dict():
     """
-    Lấy ROLE_PERMISSIONS từ database thay vì hard-coded
+    Lấy ROLE_PERMISSIONS từ database thay vì hard-coded (1 query roles ⟕ permissions)
     Fallback về hard-coded nếu database chưa có data
     """
     try:
-        roles = Role.query.filter_by(is_active=True).all()
-        if not roles:
+        rows = db.session.query(Role.name, Permission.name)\
+            .outerjoin(role_permissions, role_permissions.c.role_id == Role.id)\
+            .outerjoin(Permission, Permission.id == role_permissions.c.permission_id)\
+            .filter(Role.is_active.is_(True))\
+            .order_by(Role.id, Permission.name).all()
+        if not rows:
             # Fallback to hard-coded
             from app.models_users import ROLE_PERMISSIONS
             return ROLE_PERMISSIONS
         
         result = {}
-        for role in roles:
-            result[role.name] = role.get_permissions()
+        for role_name, perm_name in rows:
+            perms = result.setdefault(role_name, [])
+            if perm_name:
+                perms.append(perm_name)
         return result
     except Exception as e:
         print(f"⚠️ Error loading roles from DB: {e}")
         from app.models_users import ROLE_PERMISSIONS
         return ROLE_PERMISSIONS
+
+
+# ==================== CACHE QUYỀN ====================
+
+# permissions: {role: frozenset(permission)}; version: RbacVersion.version lúc nạp
+_CompiledPermissions = namedtuple('_CompiledPermissions', ['version', 'checked_at', 'permissions'])
+
+_compiled = None
+_compiled_lock = threading.Lock()
+
+
+def permissions_version():
+    """Phiên bản hiện tại trong database (0 nếu chưa có dòng), None nếu chưa có bảng"""
+    try:
+        row = db.session.get(RbacVersion, 1)
+    except Exception:
+        return None
+    return row.version if row else 0
+
+
+def bump_permissions_version():
+    """
+    Gọi khi role/permission thay đổi, trước db.session.commit() (cùng transaction với thay đổi).
+    Process hiện tại nạp lại ngay ở lần kiểm tra quyền kế tiếp.
+    """
+    global _compiled
+    updated = RbacVersion.query.filter_by(id=1).update({RbacVersion.version: RbacVersion.version + 1})
+    if not updated:
+        db.session.add(RbacVersion(id=1, version=1))
+    with _compiled_lock:
+        _compiled = None
+
+
+def cached_role_permissions():
+    """{role: frozenset(permission)} dùng chung trong process - kiểm tra quyền O(1)"""
+    global _compiled
+    now = time.monotonic()
+    with _compiled_lock:
+        cached = _compiled
+    if cached and now - cached.checked_at < PERMISSION_VERSION_CHECK_SECONDS:
+        return cached.permissions
+
+    version = permissions_version()
+    if cached and (version is None or version == cached.version):
+        compiled = cached._replace(checked_at=now)
+    else:
+        compiled = _CompiledPermissions(version, now, {
+            role: frozenset(perms) for role, perms in get_role_permissions_dict().items()
+        })
+    with _compiled_lock:
+        _compiled = compiled
+    return compiled.permissions
+
+
+def role_has_permission(role, permission):
+    return permission in cached_role_permissions().get(role, ())
+
+
+def save_role_permissions(role_name, permission_names):
+    """
+    Ghi danh sách permission của role vào database (tạo Permission còn thiếu) và tăng phiên bản.
+    Lần đầu (chưa có role nào) khởi tạo roles hệ thống từ ROLE_PERMISSIONS trước.
+    Caller commit.
+    """
+    if not Role.query.first():
+        init_system_roles()
+    role = Role.query.filter_by(name=role_name).first()
+    if role is None:
+        role = Role(name=role_name, display_name=role_name.replace('_', ' ').title())
+        db.session.add(role)
+    names = sorted(set(permission_names))
+    perms = {p.name: p for p in Permission.query.filter(Permission.name.in_(names))} if names else {}
+    for name in names:
+        if name not in perms:
+            perms[name] = Permission(name=name, display_name=name.replace('_', ' ').title(),
+                                     category=permission_category(name))
+            db.session.add(perms[name])
+    role.permissions = [perms[name] for name in names]
+    role.updated_at = datetime.utcnow()
+    bump_permissions_version()
+
+
+def add_permission(name, category=None):
+    """Thêm permission mới (chưa gán cho role nào) và tăng phiên bản. Caller commit."""
+    db.session.add(Permission(name=name, display_name=name.replace('_', ' ').title(),
+                              category=category or permission_category(name)))
+    bump_permissions_version()
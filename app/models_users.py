@@ -53,7 +53,8 @@ class User(db.Model):
     
     def has_permission(self, permission):
         """Check if user has specific permission"""
-        return permission in ROLE_PERMISSIONS.get(self.role, [])
+        from app.models_rbac import role_has_permission
+        return role_has_permission(self.role, permission)
     
     def __repr__(self):
         return f'<User {self.username} - {self.role}>'
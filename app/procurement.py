@@ -0,0 +1,296 @@
+"""
+Procurement Planner - Kế hoạch mua hàng theo tuần, nhóm theo nhà cung cấp
+
+collect_week() nạp dữ liệu tuần (món ăn từ menu_slot, nguyên liệu, sĩ số) với số query
+cố định thành list DaySheet - bản chụp không chứa ORM object.
+
+get_procurement_plan() dựng ProcurementPlan từ thực đơn tuần và sĩ số dự kiến:
+danh sách mua từng ngày cho từng nhà cung cấp, số lượng đã quy đổi đơn vị
+(gram → kg, ml → lít) và thành tiền theo Product.price. Số lượng và giá lấy từ các
+cột đơn vị chuẩn (app.units) đã tính khi ghi, không phân tích lại chuỗi đơn vị.
+
+Plan được cache trong process theo (menu.id, phiên bản thực đơn, sĩ số từng ngày)
+và dùng chung cho file Excel quy trình ATTP, trang mua hàng và báo cáo chi phí tháng.
+Khi món ăn/sản phẩm thay đổi, gọi invalidate_procurement(); worker khác tự dựng lại
+sau PLAN_TTL giây.
+"""
+import threading
+import time
+from collections import namedtuple
+from datetime import date, timedelta
+
+from sqlalchemy.orm import joinedload
+
+from app.models import db, AttendanceRecord, Dish, DishIngredient, Menu, MenuSlot, Product
+from app.menu_listing import menu_version
+from app.menu_slots import DAY_KEYS, MEAL_KEYS, slots_by_menu
+from app.roster import active_roster
+from app.units import display_amounts, display_unit, purchase_cost
+
+DAY_NAMES = ('Thứ 2', 'Thứ 3', 'Thứ 4', 'Thứ 5', 'Thứ 6', 'Thứ 7')
+PLAN_TTL = 300  # giây
+MAX_CACHED_PLANS = 64
+NO_SUPPLIER = 'Chưa có nhà cung cấp'
+
+# meals: {meal_key: [tên món]}, ingredients: [Ingredient] theo thứ tự xuất hiện trong ngày.
+# Không chứa ORM object (sản phẩm/nhà cung cấp là bản chụp) nên dùng lại được giữa các request.
+DaySheet = namedtuple('DaySheet', ['key', 'name', 'date', 'students', 'meals', 'dish_products', 'ingredients'])
+# total_qty: tổng theo đơn vị chuẩn; unit/quantity: đơn vị hiển thị (kg, lít, gói...) và số lượng
+# đã làm tròn; cost: thành tiền hoặc None nếu chưa có giá/đơn vị không quy đổi được
+Ingredient = namedtuple('Ingredient', ['name', 'unit', 'category', 'supplier', 'product', 'total_qty', 'quantity', 'cost'])
+ProductInfo = namedtuple('ProductInfo', ['id', 'name', 'unit', 'price', 'category', 'base_unit', 'unit_price'])
+SupplierInfo = namedtuple('SupplierInfo', ['id', 'name', 'address', 'phone', 'contact_person', 'food_safety_cert'])
+PurchaseLine = namedtuple('PurchaseLine', ['product_id', 'name', 'category', 'unit', 'quantity', 'unit_price', 'cost'])
+# supplier: SupplierInfo hoặc None; cost không tính các dòng chưa có giá
+SupplierOrder = namedtuple('SupplierOrder', ['supplier', 'day', 'date', 'lines', 'cost'])
+ProcurementPlan = namedtuple('ProcurementPlan', [
+    'menu_id', 'week_number', 'year', 'days', 'orders', 'supplier_totals', 'daily_cost', 'total_cost', 'unpriced'
+])
+MonthCostReport = namedtuple('MonthCostReport', [
+    'year', 'month', 'weeks', 'supplier_totals', 'daily_cost', 'total_cost', 'unpriced'
+])
+
+_plans = {}  # (menu_id, version, headcounts) -> (built_at, ProcurementPlan)
+_plans_lock = threading.Lock()
+
+
+# ================== DỮ LIỆU TUẦN ==================
+
+def week_headcounts(dates):
+    """
+    Sĩ số dự kiến từng ngày: số học sinh có mặt theo điểm danh, ngày chưa điểm danh
+    dùng tổng số học sinh active - 1 query điểm danh, tối đa 1 query sĩ số.
+    """
+    present = dict(db.session.query(AttendanceRecord.date, db.func.count(AttendanceRecord.id)).filter(
+        AttendanceRecord.date.in_([d.strftime('%Y-%m-%d') for d in dates]),
+        AttendanceRecord.status == 'Có mặt'
+    ).group_by(AttendanceRecord.date).all())
+    active_count = None
+    headcounts = []
+    for day_date in dates:
+        students = present.get(day_date.strftime('%Y-%m-%d'), 0)
+        if students == 0:
+            # Nếu không có dữ liệu điểm danh, dùng tổng số học sinh active
+            if active_count is None:
+                active_count = len(active_roster())
+            students = active_count
+        headcounts.append(students)
+    return headcounts
+
+
+def week_dates(week_start):
+    return [week_start + timedelta(days=i) for i in range(len(DAY_KEYS))]
+
+
+def _product_info(product):
+    return ProductInfo(product.id, product.name, product.unit, product.price, product.category,
+                       product.base_unit, product.unit_price)
+
+
+def _supplier_info(supplier):
+    if supplier is None:
+        return None
+    return SupplierInfo(supplier.id, supplier.name, supplier.address, supplier.phone,
+                        supplier.contact_person, supplier.food_safety_cert)
+
+
+def collect_week(menu_item, week_start, headcounts=None):
+    """
+    Nạp toàn bộ dữ liệu cần cho bộ biểu mẫu của một tuần: 1 query menu_slot (kèm món ăn,
+    nguyên liệu, sản phẩm, nhà cung cấp) và sĩ số từng ngày (week_headcounts() nếu không truyền vào).
+    Returns: list DaySheet (Thứ 2 → Thứ 7)
+    """
+    week_slots = slots_by_menu(
+        [menu_item.id],
+        joinedload(MenuSlot.dish)
+        .selectinload(Dish.ingredients)
+        .joinedload(DishIngredient.product)
+        .joinedload(Product.supplier)
+    )[menu_item.id]
+    week_meals = [
+        {meal_key: [slot.dish_name for slot in week_slots[key][meal_key]] for meal_key in MEAL_KEYS}
+        for key in DAY_KEYS
+    ]
+    dishes = {
+        slot.dish_name: slot.dish
+        for meals in week_slots.values() for slots in meals.values() for slot in slots if slot.dish
+    }
+
+    dates = week_dates(week_start)
+    if headcounts is None:
+        headcounts = week_headcounts(dates)
+
+    days = []
+    for key, name, day_date, meals, students in zip(DAY_KEYS, DAY_NAMES, dates, week_meals, headcounts):
+        ingredients = {}
+        for names in meals.values():
+            for dish_name in names:
+                dish = dishes.get(dish_name)
+                if not dish:
+                    continue
+                for di in dish.ingredients:
+                    product = di.product
+                    supplier = _supplier_info(product.supplier)
+                    key_ = (product.name, di.base_unit, product.category, supplier)
+                    if key_ not in ingredients:
+                        ingredients[key_] = [_product_info(product), 0]
+                    ingredients[key_][1] += di.base_quantity * students
+
+        dish_products = {
+            dish_name: [di.product.name for di in dishes[dish_name].ingredients]
+            for names in meals.values() for dish_name in names if dish_name in dishes
+        }
+        days.append(DaySheet(key, name, day_date, students, meals, dish_products, _ingredients(ingredients)))
+    return days
+
+
+def _ingredients(totals):
+    """list Ingredient từ {(tên, đơn vị chuẩn, loại, nhà cung cấp): [ProductInfo, tổng lượng chuẩn]}"""
+    keys = list(totals)
+    quantities = [totals[key][1] for key in keys]
+    amounts = display_amounts(quantities, [key[1] for key in keys])
+    rows = []
+    for (name, base_unit, category, supplier), qty, amount in zip(keys, quantities, amounts):
+        product = totals[(name, base_unit, category, supplier)][0]
+        price = purchase_cost(qty, base_unit, product.base_unit, product.unit_price)
+        rows.append(Ingredient(name, display_unit(base_unit), category, supplier, product, qty,
+                               round(amount, 2), round(price, 0) if price is not None else None))
+    return rows
+
+
+# ================== KẾ HOẠCH MUA HÀNG ==================
+
+def week_start_of(menu):
+    return date.fromisocalendar(menu.year, menu.week_number, 1)
+
+
+def supplier_name(supplier):
+    return supplier.name if supplier else NO_SUPPLIER
+
+
+def build_plan(menu, days):
+    """ProcurementPlan từ list DaySheet của collect_week() - không query thêm"""
+    orders = []
+    supplier_totals = {}
+    daily_cost = {}
+    unpriced = set()
+    for day in days:
+        by_supplier = {}
+        for ing in day.ingredients:
+            if ing.cost is None:
+                unpriced.add(ing.name)
+            by_supplier.setdefault(ing.supplier, []).append(PurchaseLine(
+                ing.product.id, ing.name, ing.category, ing.unit, ing.quantity, ing.product.price, ing.cost
+            ))
+        day_total = 0
+        for supplier, lines in sorted(by_supplier.items(), key=lambda item: supplier_name(item[0])):
+            cost = sum(line.cost or 0 for line in lines)
+            orders.append(SupplierOrder(supplier, day.key, day.date, tuple(lines), cost))
+            supplier_totals[supplier] = supplier_totals.get(supplier, 0) + cost
+            day_total += cost
+        daily_cost[day.key] = day_total
+    return ProcurementPlan(
+        menu.id, menu.week_number, menu.year, tuple(days), tuple(orders), supplier_totals,
+        daily_cost, sum(daily_cost.values()), tuple(sorted(unpriced))
+    )
+
+
+def get_procurement_plan(menu, headcount=None):
+    """
+    Kế hoạch mua hàng của thực đơn tuần (dùng lại từ cache nếu thực đơn và sĩ số không đổi).
+    headcount: sĩ số dự kiến áp dụng cho mọi ngày; None → theo điểm danh/số học sinh active.
+    """
+    dates = week_dates(week_start_of(menu))
+    headcounts = [headcount] * len(dates) if headcount is not None else week_headcounts(dates)
+    key = (menu.id, menu_version(menu), tuple(headcounts))
+    now = time.monotonic()
+    with _plans_lock:
+        cached = _plans.get(key)
+    if cached and now - cached[0] < PLAN_TTL:
+        return cached[1]
+
+    plan = build_plan(menu, collect_week(menu, dates[0], headcounts))
+    with _plans_lock:
+        if len(_plans) >= MAX_CACHED_PLANS:
+            _plans.pop(min(_plans, key=lambda k: _plans[k][0]))
+        _plans[key] = (now, plan)
+    return plan
+
+
+def invalidate_procurement():
+    """Gọi sau khi thêm/sửa/xoá món ăn hoặc sản phẩm (định lượng, giá thay đổi)"""
+    with _plans_lock:
+        _plans.clear()
+
+
+def month_cost_report(year, month):
+    """Tổng chi phí nguyên liệu của tháng từ kế hoạch mua hàng các tuần có ngày thuộc tháng"""
+    first = date(year, month, 1)
+    last = (first.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    weeks = sorted({(d.isocalendar()[0], d.isocalendar()[1])
+                    for d in (first + timedelta(days=i) for i in range((last - first).days + 1))})
+    menus = Menu.query.filter(
+        Menu.year.in_({y for y, _ in weeks}), Menu.week_number.in_({w for _, w in weeks})
+    ).all()
+    menus = sorted((m for m in menus if (m.year, m.week_number) in weeks), key=lambda m: (m.year, m.week_number))
+
+    week_costs = []
+    supplier_totals = {}
+    daily_cost = {}
+    unpriced = set()
+    for menu in menus:
+        plan = get_procurement_plan(menu)
+        week_cost = 0
+        for order in plan.orders:
+            if order.date.month != month or order.date.year != year:
+                continue
+            supplier_totals[order.supplier] = supplier_totals.get(order.supplier, 0) + order.cost
+            daily_cost[order.date] = daily_cost.get(order.date, 0) + order.cost
+            week_cost += order.cost
+            unpriced.update(line.name for line in order.lines if line.cost is None)
+        week_costs.append((menu.week_number, week_cost))
+    return MonthCostReport(year, month, week_costs, supplier_totals, dict(sorted(daily_cost.items())),
+                           sum(daily_cost.values()), tuple(sorted(unpriced)))
+
+
+def _supplier_dict(supplier):
+    if supplier is None:
+        return None
+    return {'id': supplier.id, 'name': supplier.name, 'phone': supplier.phone,
+            'contact_person': supplier.contact_person}
+
+
+def plan_to_dict(plan):
+    """Dạng JSON của ProcurementPlan (API)"""
+    return {
+        'menu_id': plan.menu_id,
+        'week_number': plan.week_number,
+        'year': plan.year,
+        'headcounts': {day.key: day.students for day in plan.days},
+        'orders': [{
+            'supplier': _supplier_dict(order.supplier),
+            'day': order.day,
+            'date': order.date.isoformat(),
+            'cost': order.cost,
+            'lines': [line._asdict() for line in order.lines],
+        } for order in plan.orders],
+        'supplier_totals': [{'supplier': _supplier_dict(supplier), 'cost': cost}
+                            for supplier, cost in plan.supplier_totals.items()],
+        'daily_cost': plan.daily_cost,
+        'total_cost': plan.total_cost,
+        'unpriced': list(plan.unpriced),
+    }
+
+
+def report_to_dict(report):
+    """Dạng JSON của MonthCostReport (API)"""
+    return {
+        'year': report.year,
+        'month': report.month,
+        'weeks': [{'week_number': week, 'cost': cost} for week, cost in report.weeks],
+        'supplier_totals': [{'supplier': _supplier_dict(supplier), 'cost': cost}
+                            for supplier, cost in report.supplier_totals.items()],
+        'daily_cost': {d.isoformat(): cost for d, cost in report.daily_cost.items()},
+        'total_cost': report.total_cost,
+        'unpriced': list(report.unpriced),
+    }
@@ -0,0 +1,358 @@
+"""
+Rate Limit - Giới hạn tần suất request và khoá tạm thời (đăng nhập, API nhạy cảm)
+
+Thuật toán sliding window counter: mỗi khoá chỉ giữ bộ đếm của cửa sổ hiện tại và
+cửa sổ trước, số lần ước tính = hiện tại + trước × phần cửa sổ trước còn nằm trong
+window. Mọi bộ đếm/khoá đều có TTL nên tự bị xoá khi hết hạn.
+
+Backend (RATE_LIMIT_BACKEND trong config) dùng chung giao diện incr/get/set/delete có TTL:
+- 'memory': dict LRU trong process (chỉ đúng khi chạy 1 worker)
+- 'sqlite': file SQLite cục bộ (RATE_LIMIT_DB), dùng chung giữa các worker gunicorn
+- 'redis':  Redis hoặc server tương thích giao thức Redis (Valkey, KeyDB...) qua redis-py
+- 'redis-local': RedisBackend trên LocalRedis - stand-in tương thích Redis trong process
+  (không cần cài redis/server; chỉ đúng khi chạy 1 worker, dùng cho dev/test đường Redis)
+
+rate_limit() dùng làm decorator cho endpoint; RateLimit dùng trực tiếp khi cần xử lý
+riêng (đăng nhập: chỉ đếm lần sai, đúng thì reset).
+"""
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from contextlib import closing
+from functools import wraps
+
+from flask import abort, current_app, jsonify, request
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+DEFAULT_MAX_KEYS = 10000
+PURGE_EVERY = 200  # SQLite: xoá bản ghi hết hạn sau mỗi PURGE_EVERY lần ghi
+
+# allowed: request được phép; remaining: số lần còn lại trong window; retry_after: giây (0 nếu được phép)
+Decision = namedtuple('Decision', ['allowed', 'remaining', 'retry_after'])
+
+
+# ================== BACKEND ==================
+
+class MemoryBackend:
+    """Dict LRU trong process, tối đa max_keys khoá (khoá ít dùng nhất bị xoá trước)"""
+    def __init__(self, max_keys=DEFAULT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._data = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+
+    def _live(self, key, now):
+        item = self._data.get(key)
+        if item is None:
+            return None
+        if item[1] <= now:
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return item
+
+    def _store(self, key, value, expires_at):
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_keys:
+            self._data.popitem(last=False)
+
+    def incr(self, key, ttl):
+        now = time.time()
+        with self._lock:
+            item = self._live(key, now)
+            value = item[0] + 1 if item else 1
+            self._store(key, value, item[1] if item else now + ttl)
+            return value
+
+    def get(self, key):
+        with self._lock:
+            item = self._live(key, time.time())
+            return item[0] if item else None
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._store(key, value, time.time() + ttl)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+
+class SQLiteBackend:
+    """Bảng rate_limit trong file SQLite cục bộ - các worker trên cùng máy thấy chung trạng thái"""
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._writes = 0
+        self._init_db()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+
+    def _init_db(self):
+        with closing(self._connect()) as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS rate_limit ('
+                ' key TEXT PRIMARY KEY,'
+                ' value REAL NOT NULL,'
+                ' expires_at REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_rate_limit_expires_at ON rate_limit (expires_at)')
+
+    def _maybe_purge(self, conn, now):
+        self._writes += 1
+        if self._writes % PURGE_EVERY == 0:
+            conn.execute('DELETE FROM rate_limit WHERE expires_at <= ?', (now,))
+
+    def incr(self, key, ttl):
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute(
+                    'INSERT INTO rate_limit (key, value, expires_at) VALUES (?, 1, ?) '
+                    'ON CONFLICT(key) DO UPDATE SET'
+                    ' value = CASE WHEN expires_at <= ? THEN 1 ELSE value + 1 END,'
+                    ' expires_at = CASE WHEN expires_at <= ? THEN excluded.expires_at ELSE expires_at END',
+                    (key, now + ttl, now, now)
+                )
+                value = conn.execute('SELECT value FROM rate_limit WHERE key = ?', (key,)).fetchone()[0]
+                self._maybe_purge(conn, now)
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        return int(value)
+
+    def get(self, key):
+        with closing(self._connect()) as conn:
+            row = conn.execute('SELECT value FROM rate_limit WHERE key = ? AND expires_at > ?',
+                               (key, time.time())).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute('INSERT OR REPLACE INTO rate_limit (key, value, expires_at) VALUES (?, ?, ?)',
+                         (key, value, now + ttl))
+            self._maybe_purge(conn, now)
+
+    def delete(self, *keys):
+        if not keys:
+            return
+        with closing(self._connect()) as conn:
+            conn.execute(f'DELETE FROM rate_limit WHERE key IN ({",".join("?" * len(keys))})', keys)
+
+
+class RedisBackend:
+    """Redis/Valkey/KeyDB... - client là redis.Redis hoặc object có cùng các lệnh INCR/EXPIRE/GET/SET/DEL"""
+    def __init__(self, client):
+        self.client = client
+
+    def incr(self, key, ttl):
+        value = int(self.client.incr(key))
+        if value == 1:
+            self.client.expire(key, math.ceil(ttl))
+        return value
+
+    def get(self, key):
+        value = self.client.get(key)
+        return float(value) if value is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(key, value, ex=math.ceil(ttl))
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*keys)
+
+
+class LocalRedis:
+    """
+    Stand-in tương thích Redis trong process: dict + TTL, đủ các lệnh RedisBackend dùng
+    (INCR, EXPIRE, GET, SET ex=, DEL, TTL). Giá trị trả về là bytes như redis-py.
+    """
+    def __init__(self):
+        self._data = {}  # key -> (bytes, expires_at hoặc None)
+        self._lock = threading.Lock()
+
+    def _live(self, key, now):
+        item = self._data.get(key)
+        if item is not None and item[1] is not None and item[1] <= now:
+            del self._data[key]
+            return None
+        return item
+
+    def incr(self, key):
+        with self._lock:
+            item = self._live(key, time.time())
+            value = int(item[0]) + 1 if item else 1
+            self._data[key] = (str(value).encode(), item[1] if item else None)
+            return value
+
+    def expire(self, key, seconds):
+        with self._lock:
+            item = self._live(key, time.time())
+            if item is None:
+                return False
+            self._data[key] = (item[0], time.time() + seconds)
+            return True
+
+    def get(self, key):
+        with self._lock:
+            item = self._live(key, time.time())
+            return item[0] if item else None
+
+    def set(self, key, value, ex=None):
+        value = value if isinstance(value, bytes) else str(value).encode()
+        with self._lock:
+            self._data[key] = (value, time.time() + ex if ex else None)
+        return True
+
+    def delete(self, *keys):
+        with self._lock:
+            return sum(self._data.pop(key, None) is not None for key in keys)
+
+    def ttl(self, key):
+        """Số giây còn lại; -1 nếu không có hạn, -2 nếu không có khoá (như Redis)"""
+        with self._lock:
+            now = time.time()
+            item = self._live(key, now)
+            if item is None:
+                return -2
+            return -1 if item[1] is None else math.ceil(item[1] - now)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend(config):
+    """Backend dùng chung trong process, tạo từ app.config (RATE_LIMIT_*)"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            kind = config.get('RATE_LIMIT_BACKEND', 'sqlite')
+            if kind == 'redis':
+                if not REDIS_AVAILABLE:
+                    raise RuntimeError('RATE_LIMIT_BACKEND=redis cần cài đặt redis (pip install redis)')
+                _backend = RedisBackend(redis.Redis.from_url(config['RATE_LIMIT_REDIS_URL']))
+            elif kind == 'redis-local':
+                _backend = RedisBackend(LocalRedis())
+            elif kind == 'sqlite':
+                _backend = SQLiteBackend(config['RATE_LIMIT_DB'])
+            else:
+                _backend = MemoryBackend(config.get('RATE_LIMIT_MAX_KEYS', DEFAULT_MAX_KEYS))
+        return _backend
+
+
+# ================== GIỚI HẠN ==================
+
+class RateLimit:
+    """
+    Tối đa limit lần trong window giây cho mỗi ident (IP, user id...).
+    lockout: khi đạt limit thì khoá ident thêm lockout giây (mọi lần hit trong thời gian đó bị từ chối).
+    backend: None → get_backend(current_app.config) lúc dùng.
+    """
+    def __init__(self, name, limit, window, lockout=None, backend=None):
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self.lockout = lockout
+        self._backend = backend
+
+    @property
+    def backend(self):
+        return self._backend or get_backend(current_app.config)
+
+    def _window_keys(self, ident, now):
+        index = int(now // self.window)
+        return f'rl:{self.name}:{ident}:{index}', f'rl:{self.name}:{ident}:{index - 1}'
+
+    def _lock_key(self, ident):
+        return f'rl:{self.name}:{ident}:lock'
+
+    def _estimate(self, current, previous, now):
+        elapsed = (now % self.window) / self.window
+        return current + (previous or 0) * (1 - elapsed)
+
+    def locked_for(self, ident):
+        """Số giây còn bị khoá (0 nếu không bị khoá)"""
+        until = self.backend.get(self._lock_key(ident))
+        return max(0, math.ceil(until - time.time())) if until else 0
+
+    def lock(self, ident, seconds):
+        self.backend.set(self._lock_key(ident), time.time() + seconds, seconds)
+
+    def count(self, ident):
+        """Số lần ước tính trong window hiện tại (không tăng bộ đếm)"""
+        now = time.time()
+        current_key, previous_key = self._window_keys(ident, now)
+        return self._estimate(self.backend.get(current_key) or 0, self.backend.get(previous_key), now)
+
+    def hit(self, ident):
+        """Ghi nhận một lần và trả về Decision"""
+        locked = self.locked_for(ident)
+        if locked:
+            return Decision(False, 0, locked)
+        now = time.time()
+        current_key, previous_key = self._window_keys(ident, now)
+        current = self.backend.incr(current_key, 2 * self.window)
+        used = self._estimate(current, self.backend.get(previous_key), now)
+        remaining = max(0, math.ceil(self.limit - used))
+        if self.lockout and used >= self.limit:
+            self.lock(ident, self.lockout)
+            return Decision(True, 0, 0)
+        if used > self.limit:
+            return Decision(False, 0, math.ceil(self.window - now % self.window))
+        return Decision(True, remaining, 0)
+
+    def reset(self, ident):
+        """Xoá bộ đếm và khoá của ident (vd: đăng nhập đúng)"""
+        now = time.time()
+        self.backend.delete(*self._window_keys(ident, now), self._lock_key(ident))
+
+
+def client_ip():
+    return request.remote_addr or 'unknown'
+
+
+def too_many_requests(retry_after, message):
+    """429: JSON cho API, trang lỗi 429 cho request thường (kèm header Retry-After)"""
+    if request.path.startswith('/api/') or request.is_json:
+        response = jsonify({'success': False, 'message': message, 'retry_after': retry_after})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(retry_after)
+        return response
+    abort(429, description=message)
+
+
+def rate_limit(name, limit, window, lockout=None, key=client_ip,
+               message='Bạn thao tác quá nhanh. Vui lòng thử lại sau!'):
+    """
+    Decorator giới hạn tần suất gọi endpoint theo key() (mặc định IP).
+    key() trả về None: request không được đếm (vd: chưa đăng nhập - để view tự từ chối,
+    không làm hết lượt của mọi người dùng chung IP/NAT).
+    Vd: @rate_limit('enrollment', limit=5, window=3600)
+    """
+    limiter = RateLimit(name, limit, window, lockout)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            ident = key()
+            if ident is not None:
+                decision = limiter.hit(ident)
+                if not decision.allowed:
+                    return too_many_requests(decision.retry_after, message)
+            return view(*args, **kwargs)
+        wrapped.limiter = limiter
+        return wrapped
+    return decorator
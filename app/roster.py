@@ -0,0 +1,154 @@
+"""
+Roster - Danh sách học sinh theo lớp
+
+Lọc theo lớp là join có index Child.class_id → Class (không so khớp chuỗi Child.class_name),
+thứ tự lớp lấy từ Class.sort_order và sắp xếp ngay trong SQL.
+
+active_roster() là bản chụp (tuple RosterEntry, bất biến) của học sinh đang học, giữ trong
+process cho các trang chỉ đọc (lịch sử điểm danh, hóa đơn, lưu điểm danh, sĩ số dự kiến...):
+- Thêm/xoá Child, hoặc sửa các cột có trong bản chụp → sau commit tăng
+  CacheVersion('roster') và bỏ bản chụp local (listener SQLAlchemy bên dưới).
+  Cập nhật hàng loạt (Query.update) không qua listener: gọi touch_roster() trước commit.
+- Worker khác so phiên bản tối đa mỗi ROSTER_VERSION_CHECK_SECONDS giây; bản chụp cũ
+  hơn ROSTER_MAX_AGE giây luôn được nạp lại (thay đổi ngoài app: script, SQL tay).
+"""
+import threading
+import time
+from collections import namedtuple
+
+from sqlalchemy import event, func, insert, inspect, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, object_session
+
+from app.models import db, CacheVersion, Child, Class, DEFAULT_CLASS_SORT_ORDER
+
+ROSTER_CACHE = 'roster'
+ROSTER_VERSION_CHECK_SECONDS = 2
+ROSTER_MAX_AGE = 300
+
+# Cột của Child có trong bản chụp (sửa cột khác - BMI, ảnh, mật khẩu... - không làm mất cache)
+ROSTER_FIELDS = ('student_code', 'name', 'class_id', 'class_name', 'birth_date', 'is_active')
+
+# class_name: tên lớp theo Class (None nếu chưa xếp lớp)
+RosterEntry = namedtuple('RosterEntry', ['id', 'student_code', 'name', 'class_id', 'class_name', 'birth_date'])
+
+_Snapshot = namedtuple('_Snapshot', ['version', 'loaded_at', 'checked_at', 'students'])
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+_CHANGED = 'roster_changed'  # cờ trong Session.info: có thay đổi chờ commit
+
+
+def ordered_classes():
+    """Các lớp theo thứ tự hiển thị (sort_order, rồi tên)"""
+    return Class.query.order_by(Class.sort_order, Class.name).all()
+
+
+def roster_order():
+    """ORDER BY theo thứ tự lớp rồi tên học sinh (học sinh chưa xếp lớp ở cuối)"""
+    return func.coalesce(Class.sort_order, DEFAULT_CLASS_SORT_ORDER), Class.name, Child.name
+
+
+def class_students(class_name=None, active_only=True):
+    """Query học sinh (join lớp), lọc theo tên lớp nếu có"""
+    query = Child.query.outerjoin(Class, Child.class_id == Class.id)
+    if active_only:
+        query = query.filter(Child.is_active.is_(True))
+    if class_name:
+        query = query.filter(Class.name == class_name)
+    return query
+
+
+# ================== BẢN CHỤP ==================
+
+def roster_version():
+    """CacheVersion('roster') hiện tại (0 nếu chưa có dòng), None nếu chưa có bảng cache_version"""
+    try:
+        with db.engine.connect() as conn:
+            version = conn.execute(select(CacheVersion.version).where(CacheVersion.name == ROSTER_CACHE)).scalar()
+    except SQLAlchemyError:
+        return None
+    return version or 0
+
+
+def _load_students():
+    rows = db.session.query(Child.id, Child.student_code, Child.name, Child.class_id,
+                            Class.name, Child.birth_date)\
+        .outerjoin(Class, Child.class_id == Class.id)\
+        .filter(Child.is_active.is_(True))\
+        .order_by(*roster_order()).all()
+    return tuple(RosterEntry(*row) for row in rows)
+
+
+def active_roster():
+    """tuple RosterEntry của học sinh đang học, theo thứ tự lớp rồi tên"""
+    global _snapshot
+    now = time.monotonic()
+    with _snapshot_lock:
+        cached = _snapshot
+    fresh = cached is not None and now - cached.loaded_at < ROSTER_MAX_AGE
+    if fresh and now - cached.checked_at < ROSTER_VERSION_CHECK_SECONDS:
+        return cached.students
+
+    version = roster_version()
+    if fresh and version == cached.version:
+        snapshot = cached._replace(checked_at=now)
+    else:
+        snapshot = _Snapshot(version, now, now, _load_students())
+    with _snapshot_lock:
+        _snapshot = snapshot
+    return snapshot.students
+
+
+def roster_for_class(class_name=None):
+    """list RosterEntry của một lớp (theo tên), hoặc cả trường nếu không chọn lớp"""
+    students = active_roster()
+    if not class_name:
+        return list(students)
+    return [student for student in students if student.class_name == class_name]
+
+
+# ================== INVALIDATION ==================
+
+def touch_roster():
+    """Đánh dấu danh sách học sinh đã đổi (gọi trước db.session.commit() khi dùng Query.update)"""
+    db.session.info[_CHANGED] = True
+
+
+def _bump_version():
+    global _snapshot
+    with _snapshot_lock:
+        _snapshot = None
+    try:
+        with db.engine.begin() as conn:
+            updated = conn.execute(update(CacheVersion).where(CacheVersion.name == ROSTER_CACHE)
+                                   .values(version=CacheVersion.version + 1)).rowcount
+            if not updated:
+                conn.execute(insert(CacheVersion).values(name=ROSTER_CACHE, version=1))
+    except SQLAlchemyError as e:
+        # Chưa có bảng cache_version (chưa chạy migrate_cache_version.py): worker khác nạp lại sau ROSTER_MAX_AGE
+        print(f"[WARN] Không tăng được phiên bản roster: {e}")
+
+
+@event.listens_for(Child, 'after_insert')
+@event.listens_for(Child, 'after_delete')
+def _child_added_or_removed(mapper, connection, target):
+    object_session(target).info[_CHANGED] = True
+
+
+@event.listens_for(Child, 'after_update')
+def _child_updated(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[field].history.has_changes() for field in ROSTER_FIELDS):
+        object_session(target).info[_CHANGED] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _roster_committed(session):
+    if session.info.pop(_CHANGED, False):
+        _bump_version()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _roster_rolled_back(session):
+    session.info.pop(_CHANGED, None)
@@ -1,10 +1,10 @@
 from werkzeug.security import generate_password_hash
 from PIL import Image
-from flask import Blueprint, render_template, request, redirect, url_for, flash, send_file, session, jsonify, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, flash, send_file, session, jsonify, current_app, make_response, stream_with_context
+from werkzeug.http import is_resource_modified
 from app.models import db, Activity, Curriculum, Child, AttendanceRecord, Staff, BmiRecord, ActivityImage, Supplier, Product, StudentAlbum, StudentPhoto, StudentProgress, Dish, Menu, Class, MonthlyService, UserActivity
 from app.models_tasks import Project, ProjectMember, Task, TaskComment, TaskAttachment, TaskHistory
 from app.forms import EditProfileForm, ActivityCreateForm, ActivityEditForm, SupplierForm, ProductForm
-from calendar import monthrange
 from datetime import datetime, date, timedelta
 import io, zipfile, os, json, re, secrets, tempfile
 
@@ -38,198 +38,30 @@ main = Blueprint('main', __name__)
 # Import CSRF for exempting API endpoints
 from app import csrf
 
-def get_who_bmi_median_sd(age_months, gender):
-    """
-    Lấy giá trị median (M) và SD (S) của BMI theo tuổi và giới tính
-    Dữ liệu từ WHO Child Growth Standards (BMI-for-age)
-    """
-    # Dữ liệu WHO BMI-for-age (simplified) - giá trị xấp xỉ cho trẻ 2-6 tuổi
-    # Format: age_months: (median, sd)
-    
-    if gender.lower() in ['male', 'nam', 'boy', 'm']:
-        # Boys BMI-for-age WHO standards
-        who_data = {
-            24: (16.0, 1.3), 30: (15.8, 1.3), 36: (15.7, 1.3), 42: (15.6, 1.3),
-            48: (15.5, 1.4), 54: (15.4, 1.4), 60: (15.3, 1.4), 66: (15.3, 1.5),
-            72: (15.3, 1.5)
-        }
-    else:
-        # Girls BMI-for-age WHO standards
-        who_data = {
-            24: (16.0, 1.3), 30: (15.8, 1.3), 36: (15.7, 1.3), 42: (15.5, 1.3),
-            48: (15.4, 1.4), 54: (15.3, 1.4), 60: (15.2, 1.4), 66: (15.2, 1.5),
-            72: (15.2, 1.5)
-        }
-    
-    # Tìm age_months gần nhất trong data
-    if age_months < 24:
-        return None, None  # Không đánh giá BMI cho trẻ < 2 tuổi
-    
-    # Làm tròn xuống bội số của 6 tháng
-    age_key = (age_months // 6) * 6
-    if age_key > 72:
-        age_key = 72
-    
-    return who_data.get(age_key, (15.5, 1.4))
-
-def get_who_weight_median_sd(age_months, gender):
-    """
-    Lấy giá trị median và SD của cân nặng (kg) theo tuổi và giới tính
-    Dữ liệu từ WHO Child Growth Standards (Weight-for-age)
-    """
-    if gender.lower() in ['male', 'nam', 'boy', 'm']:
-        # Boys Weight-for-age WHO standards (kg)
-        who_data = {
-            0: (3.3, 0.4), 6: (7.9, 0.9), 12: (9.6, 1.1), 18: (10.9, 1.2),
-            24: (12.2, 1.3), 30: (13.3, 1.4), 36: (14.3, 1.5), 42: (15.2, 1.6),
-            48: (16.2, 1.8), 54: (17.2, 1.9), 60: (18.3, 2.1), 66: (19.4, 2.3),
-            72: (20.5, 2.5)
-        }
-    else:
-        # Girls Weight-for-age WHO standards (kg)
-        who_data = {
-            0: (3.2, 0.4), 6: (7.3, 0.9), 12: (9.0, 1.0), 18: (10.2, 1.2),
-            24: (11.5, 1.3), 30: (12.5, 1.4), 36: (13.5, 1.5), 42: (14.4, 1.6),
-            48: (15.4, 1.8), 54: (16.4, 2.0), 60: (17.5, 2.2), 66: (18.6, 2.4),
-            72: (19.8, 2.6)
-        }
-    
-    # Làm tròn xuống bội số của 6 tháng
-    age_key = (age_months // 6) * 6
-    if age_key > 72:
-        age_key = 72
-    
-    return who_data.get(age_key, (18.0, 2.0))
-
-def get_who_height_median_sd(age_months, gender):
-    """
-    Lấy giá trị median và SD của chiều cao (cm) theo tuổi và giới tính
-    Dữ liệu từ WHO Child Growth Standards (Height-for-age)
-    """
-    if gender.lower() in ['male', 'nam', 'boy', 'm']:
-        # Boys Height-for-age WHO standards (cm)
-        who_data = {
-            0: (49.9, 1.9), 6: (67.6, 2.5), 12: (75.7, 2.8), 18: (82.3, 3.0),
-            24: (87.8, 3.3), 30: (92.3, 3.5), 36: (96.1, 3.7), 42: (99.6, 3.9),
-            48: (102.9, 4.1), 54: (106.0, 4.3), 60: (109.0, 4.5), 66: (111.8, 4.6),
-            72: (114.6, 4.8)
-        }
-    else:
-        # Girls Height-for-age WHO standards (cm)
-        who_data = {
-            0: (49.1, 1.9), 6: (65.7, 2.4), 12: (74.0, 2.8), 18: (80.7, 3.0),
-            24: (86.4, 3.3), 30: (91.1, 3.6), 36: (95.1, 3.8), 42: (98.7, 4.0),
-            48: (101.9, 4.2), 54: (105.0, 4.4), 60: (108.0, 4.5), 66: (110.8, 4.7),
-            72: (113.5, 4.9)
-        }
-    
-    # Làm tròn xuống bội số của 6 tháng
-    age_key = (age_months // 6) * 6
-    if age_key > 72:
-        age_key = 72
-    
-    return who_data.get(age_key, (105.0, 4.5))
-
-def calculate_z_score(value, median, sd):
-    """Tính z-score cho giá trị đo được"""
-    if median is None or sd is None or sd == 0:
-        return None
-    return (value - median) / sd
-
-def assess_who_indicator(z_score, indicator_type='bmi'):
-    """
-    Đánh giá z-score theo WHO standards
-    
-    indicator_type:
-    - 'bmi': BMI-for-age
-    - 'weight': Weight-for-age  
-    - 'height': Height-for-age
-    """
-    if z_score is None:
-        return 'Chưa có đủ thông tin', 'secondary'
-    
-    if indicator_type == 'bmi':
-        if z_score < -3:
-            return 'Suy dinh dưỡng nặng (< -3 SD)', 'danger'
-        elif z_score < -2:
-            return 'Gầy còm (< -2 SD)', 'warning'
-        elif z_score <= 1:
-            return 'Bình thường (-2 đến +1 SD)', 'success'
-        elif z_score <= 2:
-            return 'Nguy cơ thừa cân (+1 đến +2 SD)', 'info'
-        elif z_score <= 3:
-            return 'Thừa cân (+2 đến +3 SD)', 'warning'
-        else:
-            return 'Béo phì (> +3 SD)', 'danger'
-    
-    elif indicator_type == 'weight':
-        if z_score < -3:
-            return 'Nhẹ cân nghiêm trọng (< -3 SD)', 'danger'
-        elif z_score < -2:
-            return 'Nhẹ cân (< -2 SD)', 'warning'
-        elif z_score <= 2:
-            return 'Cân nặng bình thường (-2 đến +2 SD)', 'success'
-        else:
-            return 'Thừa cân (> +2 SD)', 'warning'
-    
-    elif indicator_type == 'height':
-        if z_score < -3:
-            return 'Thấp còi nghiêm trọng (< -3 SD)', 'danger'
-        elif z_score < -2:
-            return 'Thấp còi (< -2 SD)', 'warning'
-        elif z_score <= 3:
-            return 'Chiều cao bình thường (-2 đến +3 SD)', 'success'
-        else:
-            return 'Cao bất thường (> +3 SD)', 'info'
-    
-    return 'Chưa xác định', 'secondary'
-
-def assess_child_growth_who(age_months, gender, bmi=None, weight_kg=None, height_cm=None):
-    """
-    Đánh giá tăng trưởng trẻ em theo WHO Child Growth Standards
-    Trả về dict với đánh giá BMI, cân nặng, chiều cao
-    """
-    result = {
-        'bmi': {'assessment': None, 'badge': 'secondary', 'z_score': None},
-        'weight': {'assessment': None, 'badge': 'secondary', 'z_score': None},
-        'height': {'assessment': None, 'badge': 'secondary', 'z_score': None}
-    }
-    
-    # BMI assessment (chỉ cho trẻ >= 2 tuổi)
-    if bmi is not None:
-        if age_months < 24:
-            result['bmi']['assessment'] = 'Trẻ < 2 tuổi không đánh giá BMI'
-            result['bmi']['badge'] = 'secondary'
-        else:
-            median, sd = get_who_bmi_median_sd(age_months, gender)
-            if median and sd:
-                z_score = calculate_z_score(bmi, median, sd)
-                result['bmi']['z_score'] = round(z_score, 2) if z_score else None
-                assessment, badge = assess_who_indicator(z_score, 'bmi')
-                result['bmi']['assessment'] = assessment
-                result['bmi']['badge'] = badge
-    
-    # Weight-for-age assessment
-    if weight_kg is not None:
-        median, sd = get_who_weight_median_sd(age_months, gender)
-        if median and sd:
-            z_score = calculate_z_score(weight_kg, median, sd)
-            result['weight']['z_score'] = round(z_score, 2) if z_score else None
-            assessment, badge = assess_who_indicator(z_score, 'weight')
-            result['weight']['assessment'] = assessment
-            result['weight']['badge'] = badge
-    
-    # Height-for-age assessment
-    if height_cm is not None:
-        median, sd = get_who_height_median_sd(age_months, gender)
-        if median and sd:
-            z_score = calculate_z_score(height_cm, median, sd)
-            result['height']['z_score'] = round(z_score, 2) if z_score else None
-            assessment, badge = assess_who_indicator(z_score, 'height')
-            result['height']['assessment'] = assessment
-            result['height']['badge'] = badge
-    
-    return result
+# Đánh giá tăng trưởng WHO (bảng LMS nạp một lần khi import)
+from app.growth_standards import assess_growth_batch, age_in_months
+from app.bmi_history import bmi_history as load_bmi_history, refresh_current_bmi
+from app.menu_slots import (DAY_KEYS, MEAL_KEYS, menu_field, menu_data_from_form, set_menu_data,
+                            link_dish_slots, dish_usage_counts)
+from app.menu_optimizer import optimize_week_menu, invalidate_catalog
+from app.rate_limit import RateLimit, client_ip, rate_limit
+from app.login_identity import authenticate
+from app.identity import current_identity, current_scope, forget_identity, invalidate_class_scope
+from app.roster import ordered_classes, roster_order, class_students, active_roster, roster_for_class, touch_roster
+from app.billing import attendance_summaries, compute_invoices, fee_rates, invoice_summary
+from app.service_enrollment import service_choices, apply_service_changes
+from app.attendance_matrix import month_days, month_matrix, empty_row, matrix_payload
+from app.invoice_ledger import sync_invoices, cache_docx, invoice_files, zip_stream
+from app.session_store import regenerate_session
+from app.procurement import (get_procurement_plan, invalidate_procurement, month_cost_report, plan_to_dict,
+                             report_to_dict, supplier_name)
+from app.menu_listing import (menu_years, menu_page, menu_weeks, listing_etag, listing_last_modified,
+                              touch_menu)
+
+def food_catalog_changed():
+    """Món ăn/sản phẩm thay đổi: bỏ cache danh mục món (gợi ý thực đơn) và kế hoạch mua hàng"""
+    invalidate_catalog()
+    invalidate_procurement()
 
 def log_activity(action, resource_type=None, resource_id=None, description=None):
     """Helper function để ghi nhận hoạt động người dùng"""
@@ -271,21 +103,6 @@ def redirect_no_permission():
     flash('Bạn không có quyền truy cập chức năng này!', 'danger')
     return redirect(url_for('main.login'))
 
-def get_class_order(class_name):
-    """Định nghĩa thứ tự sắp xếp lớp học"""
-    class_order = {
-        'Lớp Mầm': 1,
-        'Lớp Chồi': 2, 
-        'Lớp Lá': 3,
-        'Kay 01': 4,
-        'Kay01': 4,
-        'Kay 02': 5,
-        'Kay02': 5,
-        'Kay 03': 6,
-        'Kay03': 6,
-    }
-    return class_order.get(class_name, 999)  # 999 cho lớp không xác định
-
 def optimize_image(file_stream, max_size=(1200, 900), quality=85):
     """
     Tối ưu hóa ảnh: resize và compress - LUÔN THÀNH CÔNG
@@ -445,6 +262,7 @@ def new_class():
     if request.method == 'POST':
         class_name = request.form.get('class_name')
         description = request.form.get('description')
+        sort_order = request.form.get('sort_order', type=int)
         if not class_name or len(class_name) < 3:
             flash('Tên lớp phải có ít nhất 3 ký tự!', 'danger')
             return redirect(url_for('main.new_class'))
@@ -452,14 +270,14 @@ def new_class():
         if existing:
             flash('Lớp này đã tồn tại!', 'warning')
             return redirect(url_for('main.new_class'))
-        new_class = Class(name=class_name, description=description)
+        new_class = Class(name=class_name, description=description, sort_order=sort_order)
         db.session.add(new_class)
         db.session.commit()
         log_activity('create', 'class', new_class.id, f'Tạo lớp: {class_name}')
         flash(f'Đã tạo lớp mới: {class_name}', 'success')
         return redirect(url_for('main.new_class'))
     # Hiển thị danh sách lớp
-    classes = Class.query.order_by(Class.name).all()
+    classes = ordered_classes()
     mobile = is_mobile()
     return render_template('new_class.html', title='Tạo Lớp mới', mobile=mobile, classes=classes)
 
@@ -472,7 +290,14 @@ def edit_class(class_id):
     if request.method == 'POST':
         class_obj.name = request.form.get('class_name')
         class_obj.description = request.form.get('description')
+        sort_order = request.form.get('sort_order', type=int)
+        if sort_order is not None:
+            class_obj.sort_order = sort_order
+        # Đồng bộ tên lớp hiển thị trên hồ sơ học sinh
+        Child.query.filter_by(class_id=class_id).update({Child.class_name: class_obj.name})
+        touch_roster()
         db.session.commit()
+        invalidate_class_scope()
         log_activity('edit', 'class', class_id, f'Sửa lớp: {class_obj.name}')
         flash('Đã cập nhật lớp!', 'success')
         return redirect(url_for('main.new_class'))
@@ -485,8 +310,11 @@ def delete_class(class_id):
         return redirect(url_for('main.new_class'))
     class_obj = Class.query.get_or_404(class_id)
     class_name = class_obj.name
+    Child.query.filter_by(class_id=class_id).update({Child.class_id: None})
+    touch_roster()
     db.session.delete(class_obj)
     db.session.commit()
+    invalidate_class_scope()
     log_activity('delete', 'class', class_id, f'Xóa lớp: {class_name}')
     flash('Đã xóa lớp!', 'success')
     return redirect(url_for('main.new_class'))
@@ -502,11 +330,8 @@ def save_attendance():
     from datetime import date
     attendance_date = request.form.get('attendance_date') or date.today().strftime('%Y-%m-%d')
     selected_class = request.form.get('class_name')
-    # Lưu hàng loạt (không có student_id riêng lẻ)
-    if selected_class and selected_class != 'None':
-        students = Child.query.filter_by(class_name=selected_class, is_active=True).all()
-    else:
-        students = Child.query.filter_by(is_active=True).all()
+    # Lưu hàng loạt (không có student_id riêng lẻ) - chỉ cần id học sinh, lấy từ bản chụp roster
+    students = roster_for_class(selected_class if selected_class != 'None' else None)
     for student in students:
         present_value = request.form.get(f'present_{student.id}')
         if present_value == 'yes':
@@ -546,21 +371,15 @@ def is_mobile():
     ua = request.user_agent.string.lower()
     return 'mobile' in ua or 'android' in ua or 'iphone' in ua
 
-def calculate_age(birth_date):
-    today = datetime.today()
-    try:
-        birthday = datetime.strptime(birth_date, '%Y-%m-%d')
-    except Exception:
-        return 0
-    age = today.year - birthday.year - ((today.month, today.day) < (birthday.month, birthday.day))
-    return age
-
 MAX_LOGIN_ATTEMPTS = 5
 LOCKOUT_TIME_MINUTES = 10
 LOGIN_COOLDOWN_SECONDS = 30
-login_attempts = {}
-lockout_until = {}
-last_login_time = {}
+LOGIN_ATTEMPT_WINDOW_MINUTES = 15
+# Trạng thái lưu ở backend RATE_LIMIT_BACKEND (dùng chung giữa các worker, có TTL)
+login_failures = RateLimit('login', MAX_LOGIN_ATTEMPTS, LOGIN_ATTEMPT_WINDOW_MINUTES * 60,
+                           lockout=LOCKOUT_TIME_MINUTES * 60)
+login_cooldown = RateLimit('login_cooldown', 1, LOGIN_COOLDOWN_SECONDS)
+LOGIN_ROLE_LABELS = {'admin': 'Admin', 'parent': 'Phụ huynh', 'teacher': 'Giáo viên'}
 
 # --- GLOBAL ERROR HANDLER FOR API JSON RESPONSE ---
 from werkzeug.exceptions import HTTPException
@@ -603,8 +422,9 @@ def dish_list():
         return redirect_no_permission()
     try:
         dishes = Dish.query.all()
+        usage_counts = dish_usage_counts()
         mobile = is_mobile()
-        return render_template('dish_list.html', dishes=dishes, mobile=mobile)
+        return render_template('dish_list.html', dishes=dishes, usage_counts=usage_counts, mobile=mobile)
     except Exception as e:
         flash(f'Lỗi khi tải danh sách món ăn: {str(e)}', 'danger')
         return redirect(url_for('main.menu'))
@@ -618,6 +438,7 @@ def toggle_dish_active(dish_id):
     dish = Dish.query.get_or_404(dish_id)
     dish.is_active = not dish.is_active
     db.session.commit()
+    food_catalog_changed()
     flash(f"Đã {'bật' if dish.is_active else 'ẩn'} món ăn!", 'success')
     return redirect(url_for('main.dish_list'))
 
@@ -652,7 +473,9 @@ def edit_dish(dish_id):
                 is_active=True
             )
             db.session.add(di)
+        link_dish_slots(dish)
         db.session.commit()
+        food_catalog_changed()
         log_activity('edit', 'dish', dish.id, f'Cập nhật món ăn: {dish.name}')
         flash('Đã cập nhật món ăn!', 'success')
         return redirect(url_for('main.dish_list'))
@@ -672,6 +495,7 @@ def delete_dish(dish_id):
         # Xóa món ăn (cascade sẽ tự động xóa DishIngredient)
         db.session.delete(dish)
         db.session.commit()
+        food_catalog_changed()
         log_activity('delete', 'dish', dish_id, f'Xóa món ăn: {dish_name}')
         flash(f'Đã xóa món ăn "{dish_name}"! Lưu ý: Món này có thể vẫn còn trong thực đơn cũ, vui lòng kiểm tra và cập nhật lại thực đơn.', 'success')
     except Exception as e:
@@ -716,7 +540,9 @@ def create_dish():
                 is_active=True
             )
             db.session.add(di)
+        link_dish_slots(dish)
         db.session.commit()
+        food_catalog_changed()
         log_activity('create', 'dish', dish.id, f'Tạo món ăn: {name}')
         flash('Đã tạo món ăn thành công!', 'success')
         return redirect(url_for('main.dish_list'))
@@ -738,20 +564,14 @@ def about():
 @main.route('/gallery')
 def gallery():
     mobile = is_mobile()
-    from app.models import ActivityImage, Activity, Child, Class
+    from app.models import ActivityImage, Activity
     role = session.get('role')
-    user_id = session.get('user_id')
     images = []
     if role in ['admin', 'teacher']:
         images = ActivityImage.query.order_by(ActivityImage.upload_date.desc()).all()
     elif role == 'parent':
         # Lấy class_id của con
-        child = Child.query.filter_by(id=user_id).first()
-        class_id = None
-        if child and child.class_name:
-            class_obj = Class.query.filter_by(name=child.class_name).first()
-            if class_obj:
-                class_id = class_obj.id
+        class_id = current_scope().class_id
         # Chỉ lấy ảnh của hoạt động thuộc lớp con hoặc cho khách vãng lai
         if class_id:
             images = ActivityImage.query.join(Activity).filter(
@@ -774,7 +594,7 @@ def contact():
 def new_activity():
     if session.get('role') not in ['admin', 'teacher']:
         return redirect_no_permission()
-    classes = Class.query.order_by(Class.name).all()
+    classes = ordered_classes()
     class_choices = [(0, 'Tất cả khách vãng lai')] + [(c.id, c.name) for c in classes]
     form = ActivityCreateForm()
     form.class_id.choices = class_choices
@@ -1202,12 +1022,8 @@ def activity_detail(id):
         flash('Không tìm thấy bài viết!', 'danger')
         return redirect(url_for('main.activities'))
     user_role = session.get('role')
-    user_id = session.get('user_id')
     if user_role == 'parent':
-        child = Child.query.filter_by(id=user_id).first()
-        class_name = child.class_name if child else None
-        class_obj = Class.query.filter_by(name=class_name).first() if class_name else None
-        class_id = class_obj.id if class_obj else None
+        class_id = current_scope().class_id
         # Nếu bài viết không phải của lớp con mình và không phải khách vãng lai thì không cho xem
         if post.class_id is not None and post.class_id != class_id:
             flash('Bạn không có quyền xem bài viết này!', 'danger')
@@ -1234,12 +1050,8 @@ def download_activity_images(id):
     
     # Kiểm tra quyền truy cập
     user_role = session.get('role')
-    user_id = session.get('user_id')
     if user_role == 'parent':
-        child = Child.query.filter_by(id=user_id).first()
-        class_name = child.class_name if child else None
-        class_obj = Class.query.filter_by(name=class_name).first() if class_name else None
-        class_id = class_obj.id if class_obj else None
+        class_id = current_scope().class_id
         if post.class_id is not None and post.class_id != class_id:
             flash('Bạn không có quyền tải bài viết này!', 'danger')
             return redirect(url_for('main.activities'))
@@ -1313,7 +1125,7 @@ def download_activity_images(id):
 def new_curriculum():
     if session.get('role') not in ['admin', 'teacher']:
         return redirect_no_permission()
-    classes = Class.query.order_by(Class.name).all()
+    classes = ordered_classes()
     if request.method == 'POST':
         week_number = request.form.get('week_number')
         class_id = request.form.get('class_id')
@@ -1323,7 +1135,7 @@ def new_curriculum():
         if existing:
             class_name = Class.query.get(class_id).name if class_id else "Chưa chọn lớp"
             flash(f'Chương trình học tuần {week_number} cho lớp {class_name} đã tồn tại!', 'danger')
-            classes = Class.query.order_by(Class.name).all()
+            classes = ordered_classes()
             days = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat']
             morning_slots = ['morning_0', 'morning_1', 'morning_2', 'morning_3', 'morning_4', 'morning_5', 'morning_6']
             afternoon_slots = ['afternoon_1', 'afternoon_2', 'afternoon_3', 'afternoon_4']
@@ -1401,15 +1213,10 @@ def curriculum():
     if 'csrf_token' not in session or not session['csrf_token']:
         session['csrf_token'] = secrets.token_hex(16)
     class_id = None
-    classes = Class.query.order_by(Class.name).all()
+    classes = ordered_classes()
     # Nếu là phụ huynh, chỉ cho xem curriculum của lớp con mình, không cho override qua URL
     if session.get('role') == 'parent':
-        user_id = session.get('user_id')
-        child = Child.query.filter_by(id=user_id).first()
-        if child and child.class_name:
-            class_obj = Class.query.filter_by(name=child.class_name).first()
-            if class_obj:
-                class_id = class_obj.id
+        class_id = current_scope().class_id
     else:
         # Chỉ admin/teacher mới được chọn class_id qua URL
         class_id = request.args.get('class_id', type=int)
@@ -1436,7 +1243,7 @@ def curriculum():
 def new_student():
     if session.get('role') != 'admin' and session.get('role') != 'teacher':
         return redirect_no_permission()
-    classes = Class.query.order_by(Class.name).all()
+    classes = ordered_classes()
     # Sinh mã số học sinh tự động: lấy max student_code dạng số, +1
     from sqlalchemy import func, cast, Integer
     last_code = db.session.query(func.max(cast(Child.student_code, Integer))).scalar()
@@ -1507,11 +1314,11 @@ def new_student():
                 father_phone=father_phone,
                 mother_name=mother_name,
                 mother_phone=mother_phone,
-                class_name=class_name, 
                 birth_date=birth_date, 
                 student_code=student_code, 
                 avatar=avatar_path
             )
+            new_child.assign_class(next(c for c in classes if c.name == class_name))
             db.session.add(new_child)
             db.session.commit()
             log_activity('create', 'student', new_child.id, f'Tạo học sinh: {name}')
@@ -1538,18 +1345,17 @@ def attendance():
     
     # Phân quyền: Parent chỉ xem con mình
     if session.get('role') == 'parent':
-        user_id = session.get('user_id')
-        child = Child.query.filter_by(id=user_id).first()
+        child = current_scope().child
         students = [child] if child else []
         selected_class = None
         class_names = []
     else:
         selected_class = request.args.get('class_name')
         # Lấy danh sách lớp từ bảng Class
-        class_names = [c.name for c in Class.query.order_by(Class.name).all()]
+        class_names = [c.name for c in ordered_classes()]
         # Lọc học sinh theo lớp
         if selected_class:
-            students = Child.query.filter_by(class_name=selected_class, is_active=True).order_by(Child.student_code).all()
+            students = class_students(selected_class).order_by(Child.student_code).all()
         else:
             students = Child.query.filter_by(is_active=True).order_by(Child.student_code).all()
     
@@ -1641,68 +1447,304 @@ def mark_attendance():
     mobile = is_mobile()
     return render_template('mark_attendance.html', students=students, title='Điểm danh học sinh', mobile=mobile)
 
-@main.route('/attendance/history')
-def attendance_history():
+def _attendance_history_scope():
+    """(học sinh được xem, tháng 'YYYY-MM') cho lịch sử điểm danh"""
     if session.get('role') == 'parent':
         # Chỉ cho phụ huynh xem lịch sử điểm danh của con mình
-        user_id = session.get('user_id')
-        child = Child.query.filter_by(id=user_id).first()
+        child = current_scope().child
         students = [child] if child else []
     else:
-        students = Child.query.filter_by(is_active=True).all()
-    month = request.args.get('month')
-    if month:
-        year, m = map(int, month.split('-'))
-    else:
-        today = datetime.today()
-        year, m = today.year, today.month
-        month = f"{year:04d}-{m:02d}"
-    num_days = monthrange(year, m)[1]
-    days_in_month = [f"{year:04d}-{m:02d}-{day:02d}" for day in range(1, num_days+1)]
-    records_raw = AttendanceRecord.query.filter(AttendanceRecord.date.like(f"{year:04d}-{m:02d}-%")).all()
-    records = {}
-    for r in records_raw:
-        records[(r.child_id, r.date)] = r
+        students = active_roster()
+    try:
+        month = datetime.strptime(request.args.get('month', ''), '%Y-%m').strftime('%Y-%m')
+    except ValueError:
+        month = datetime.today().strftime('%Y-%m')
+    return students, month
+
+
+@main.route('/attendance/history')
+def attendance_history():
+    students, month = _attendance_history_scope()
+    # Mỗi học sinh một chuỗi trạng thái (một ký tự mỗi ngày), ghép sẵn trong SQL - chỉ học sinh trên trang
+    matrix = month_matrix(month, [student.id for student in students])
     mobile = is_mobile()
-    return render_template('attendance_history.html', records=records, students=students, days_in_month=days_in_month, selected_month=month, title='Lịch sử điểm danh', mobile=mobile)
+    return render_template('attendance_history.html', matrix=matrix.rows, empty_row=empty_row(month), status_labels=matrix.labels, students=students, days_in_month=month_days(month), selected_month=month, title='Lịch sử điểm danh', mobile=mobile)
+
+
+@main.route('/api/attendance/history')
+def api_attendance_history():
+    """Lịch sử điểm danh dạng gọn (JSON) cho mobile / render phía client"""
+    if session.get('role') not in ['admin', 'teacher', 'parent']:
+        return jsonify({'success': False, 'error': 'Không có quyền truy cập'}), 403
+    students, month = _attendance_history_scope()
+    matrix = month_matrix(month, [student.id for student in students])
+    return jsonify({'success': True, 'history': matrix_payload(month, students, matrix)})
 
 @main.route('/api/save_monthly_service', methods=['POST'])
 def save_monthly_service():
-    """API để lưu thông tin dịch vụ hàng tháng khi checkbox thay đổi"""
+    """
+    API lưu dịch vụ hàng tháng khi checkbox thay đổi - nhận một lô thay đổi đã gom phía trình duyệt:
+    {"month": "2025-11", "changes": [{"child_id": 1, "has_english": true, "has_steamax": false}, ...]}
+    (vẫn nhận dạng cũ một học sinh: {"child_id", "month", "has_english", "has_steamax"})
+    """
+    if session.get('role') != 'admin':
+        return jsonify({'error': 'Forbidden'}), 403
+    data = request.get_json(silent=True) or {}
+    month = data.get('month')
+    changes = data.get('changes')
+    if changes is None and data.get('child_id'):
+        changes = [data]
+    if not month or not re.fullmatch(r'\d{4}-\d{2}', str(month)) or not isinstance(changes, list):
+        return jsonify({'error': 'Missing child_id or month'}), 400
     try:
-        data = request.get_json()
-        child_id = data.get('child_id')
-        month = data.get('month')
-        has_english = data.get('has_english', True)
-        has_steamax = data.get('has_steamax', True)
-        
-        print(f"[DEBUG] Nhận request save service: child_id={child_id}, month={month}, english={has_english}, steamax={has_steamax}")
-        
-        if not child_id or not month:
-            return jsonify({'error': 'Missing child_id or month'}), 400
-        
-        # Tìm hoặc tạo record
-        service = MonthlyService.query.filter_by(child_id=child_id, month=month).first()
-        if not service:
-            service = MonthlyService(child_id=child_id, month=month)
-            db.session.add(service)
-            print(f"[DEBUG] Tạo mới MonthlyService cho child_id={child_id}, month={month}")
-        else:
-            print(f"[DEBUG] Cập nhật MonthlyService existing cho child_id={child_id}, month={month}")
-        
-        # Cập nhật thông tin
-        service.has_english = has_english
-        service.has_steamax = has_steamax
-        
-        db.session.commit()
-        print(f"[DEBUG] Đã commit thành công!")
-        return jsonify({'success': True, 'message': 'Đã lưu thông tin dịch vụ'})
-        
+        choices = {int(change['child_id']): (bool(change.get('has_english', True)), bool(change.get('has_steamax', True)))
+                   for change in changes}
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'error': 'Invalid child_id'}), 400
+    known = {child_id for (child_id,) in db.session.query(Child.id).filter(Child.id.in_(list(choices))).all()} \
+        if choices else set()
+    unknown = sorted(set(choices) - known)
+    if unknown:
+        return jsonify({'error': 'Unknown child_id', 'child_ids': unknown}), 400
+
+    try:
+        saved = apply_service_changes(month, choices)
+        if saved:
+            db.session.commit()
+        return jsonify({'success': True, 'saved': saved, 'message': 'Đã lưu thông tin dịch vụ'})
     except Exception as e:
         db.session.rollback()
         print(f"[ERROR] Lỗi save service: {e}")
         return jsonify({'error': str(e)}), 500
 
+def invoice_docx(invoice):
+    """File Word (A5 ngang) của một hóa đơn trong sổ (Invoice + InvoiceLine) - bytes"""
+    doc = Document()
+    
+    # Cài đặt page size A5 nằm ngang
+    if DOCX_AVAILABLE:
+        try:
+            from docx.shared import Inches
+            from docx.enum.section import WD_SECTION_START
+            
+            section = doc.sections[0]
+            # A5 size: 148mm x 210mm, nhưng nằm ngang nên đảo ngược
+            section.page_width = Inches(8.27)  # 210mm = 8.27 inches
+            section.page_height = Inches(5.83)  # 148mm = 5.83 inches
+            section.left_margin = Inches(0.3)
+            section.right_margin = Inches(0.3)
+            section.top_margin = Inches(0.2)
+            section.bottom_margin = Inches(0.2)
+        except ImportError:
+            pass
+    
+    # Bảng header: logo bên trái, thông tin trường ở giữa
+    header_table = doc.add_table(rows=1, cols=3)  # Thay đổi từ 2 cột thành 3 cột
+    header_table.style = None  # Remove borders for a cleaner look
+    left_cell = header_table.cell(0,0)    # Logo
+    center_cell = header_table.cell(0,1)  # Thông tin trường
+    right_cell = header_table.cell(0,2)   # Trống
+    
+    left_cell.vertical_alignment = 1  # Top
+    center_cell.vertical_alignment = 1  # Top
+    right_cell.vertical_alignment = 1  # Top
+    # Logo on the left - to hơn
+    logo_path = os.path.join(os.path.dirname(__file__), 'static', 'images', 'logo.jpg')
+    if os.path.exists(logo_path):
+        run_logo = left_cell.paragraphs[0].add_run()
+        if DOCX_AVAILABLE:
+            try:
+                from docx.shared import Inches
+                run_logo.add_picture(logo_path, width=Inches(1.0))  # Tăng từ 0.6 lên 1.0
+            except ImportError:
+                pass
+        left_cell.paragraphs[0].alignment = 0  # Left
+    # School info ở giữa
+    center_paragraph = center_cell.paragraphs[0]
+    center_paragraph.alignment = 1  # Center
+    
+    school_run1 = center_paragraph.add_run('SMALL TREE\n')
+    school_run1.bold = True
+    school_run1.font.size = Pt(10)  # Tăng size vì ở giữa
+    
+    school_run2 = center_paragraph.add_run('MẦM NON CÂY NHỎ\n')
+    school_run2.bold = True
+    school_run2.font.size = Pt(10)
+
+    school_run3 = center_paragraph.add_run('Số 1, Rchai 2, Đức Trọng, Lâm Đồng\n')
+    school_run3.font.size = Pt(8)
+    
+    school_run4 = center_paragraph.add_run('SDT: 0917618868 / STK: Nguyễn Thị Vân 108875858567 NH VietinBank')
+    school_run4.font.size = Pt(7)
+    
+    # Đảm bảo mọi paragraph trong center cell đều căn giữa
+    for para in center_cell.paragraphs:
+        para.alignment = 1
+    # Loại bỏ paragraph trống để tiết kiệm không gian
+    # Format title with proper month and year display
+    # Tính tháng học phí (tháng tiếp theo)
+    current_year, current_month = map(int, invoice.month.split('-'))
+    fee_month = current_month + 1
+    fee_year = current_year
+    if fee_month > 12:
+        fee_month = 1
+        fee_year += 1
+    title = doc.add_heading(f'THÔNG BÁO HỌC PHÍ THÁNG {fee_month:02d} NĂM {fee_year}', 0)
+    title.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    run = title.runs[0]
+    run.font.size = Pt(12)  # Giảm từ 14 xuống 12 cho A5
+    run.font.color.rgb = RGBColor(76, 175, 80)
+    run.font.name = 'Comic Sans MS'
+    
+    # Thiết lập line spacing compact
+    from docx.shared import Pt as PtUnit
+    title.paragraph_format.space_before = PtUnit(0)
+    title.paragraph_format.space_after = PtUnit(6)
+    
+    # Bảng thông tin học sinh - Layout ngang cho A5
+    info_table = doc.add_table(rows=1, cols=4)  # Đổi từ 2x2 thành 1x4
+    info_table.style = 'Table Grid'
+    for row in info_table.rows:
+        for cell in row.cells:
+            tc = cell._tc
+            tcPr = tc.get_or_add_tcPr()
+            shd = OxmlElement('w:shd')
+            shd.set(qn('w:fill'), 'e8f5e9')
+            tcPr.append(shd)
+    info_table.cell(0,0).text = 'Họ và tên:'
+    info_table.cell(0,1).text = invoice.student_name
+    info_table.cell(0,2).text = 'Ngày sinh:'
+    info_table.cell(0,3).text = invoice.birth_date or "-"
+    # Loại bỏ paragraph trống để tiết kiệm không gian
+    # Bảng tóm tắt compact cho A5 - chia làm 2 cột
+    summary_table = doc.add_table(rows=4, cols=4)  # 4x4 grid cho compact
+    summary_table.style = 'Table Grid'
+    for row in summary_table.rows:
+        for cell in row.cells:
+            tc = cell._tc
+            tcPr = tc.get_or_add_tcPr()
+            shd = OxmlElement('w:shd')
+            shd.set(qn('w:fill'), 'e8f5e9')
+            tcPr.append(shd)
+            # Set font size cho tất cả text trong cell
+            for paragraph in cell.paragraphs:
+                for run in paragraph.runs:
+                    run.font.size = Pt(8)  # Giảm từ 9 xuống 8
+    
+    # Điền thông tin cơ bản - cột trái
+    cell = summary_table.cell(0,0)
+    cell.text = 'Số ngày đi học:'
+    cell.paragraphs[0].runs[0].font.size = Pt(8)
+    
+    cell = summary_table.cell(0,1)
+    cell.text = str(invoice.present_days)
+    cell.paragraphs[0].runs[0].font.size = Pt(8)
+    
+    cell = summary_table.cell(1,0)
+    cell.text = 'Số ngày vắng không phép:'
+    cell.paragraphs[0].runs[0].font.size = Pt(8)
+    
+    cell = summary_table.cell(1,1)
+    cell.text = str(invoice.absent_unexcused_days)
+    cell.paragraphs[0].runs[0].font.size = Pt(8)
+    
+    cell = summary_table.cell(2,0)
+    cell.text = 'Số ngày vắng có phép:'
+    cell.paragraphs[0].runs[0].font.size = Pt(8)
+    
+    cell = summary_table.cell(2,1)
+    cell.text = str(invoice.absent_excused_days)
+    cell.paragraphs[0].runs[0].font.size = Pt(8)
+    
+    cell = summary_table.cell(3,0)
+    cell.text = 'Tiền ăn:'
+    cell.paragraphs[0].runs[0].font.size = Pt(8)
+    
+    cell = summary_table.cell(3,1)
+    cell.text = f'{invoice.line("meal").amount:,} đ'
+    cell.paragraphs[0].runs[0].font.size = Pt(8)
+    
+    # Điền thông tin học phí và dịch vụ - cột phải
+    cell = summary_table.cell(0,2)
+    cell.text = 'Tiền học phí:'
+    cell.paragraphs[0].runs[0].font.size = Pt(8)
+    
+    cell = summary_table.cell(0,3)
+    cell.text = f'{invoice.line("tuition").amount:,} đ'
+    cell.paragraphs[0].runs[0].font.size = Pt(8)
+    
+    # Dịch vụ (anh văn, STEAMAX...) theo các dòng của hóa đơn
+    service_lines = [line for line in invoice.lines if line.kind not in ('tuition', 'meal')]
+    for row_index, line in enumerate(service_lines, start=1):
+        cell = summary_table.cell(row_index,2)
+        cell.text = f'{line.label}:'
+        cell.paragraphs[0].runs[0].font.size = Pt(8)
+        
+        cell = summary_table.cell(row_index,3)
+        cell.text = f'{line.amount:,} đ'
+        cell.paragraphs[0].runs[0].font.size = Pt(8)
+    
+    total_paragraph = doc.add_paragraph(f'Tổng tiền cần thanh toán: {invoice.total:,} đ')
+    total_paragraph.alignment = WD_ALIGN_PARAGRAPH.RIGHT
+    total_run = total_paragraph.runs[0]
+    total_run.font.color.rgb = RGBColor(76, 175, 80)
+    total_run.font.bold = True
+    total_run.font.name = 'Comic Sans MS'
+    total_run.font.size = Pt(10)  # Giảm font size cho A5
+    
+    # Thiết lập compact spacing cho total
+    total_paragraph.paragraph_format.space_before = PtUnit(3)
+    total_paragraph.paragraph_format.space_after = PtUnit(6)
+
+    # Add payment info table - Compact cho A5
+    # Loại bỏ khoảng cách để tiết kiệm không gian
+    payment_table = doc.add_table(rows=1, cols=2)
+    payment_table.style = None  # No border for clean look
+    left_payment_cell = payment_table.cell(0,0)
+    right_payment_cell = payment_table.cell(0,1)
+    left_payment_cell.vertical_alignment = 1  # Top
+    right_payment_cell.vertical_alignment = 1  # Top
+    
+    # Left cell với font size nhỏ - căn giữa
+    left_para = left_payment_cell.paragraphs[0]
+    left_para.alignment = 1  # Center
+    left_run1 = left_para.add_run('Người nộp tiền:')
+    left_run1.font.size = Pt(8)
+    left_run1.bold = True
+    left_para2 = left_payment_cell.add_paragraph('(Kí và ghi rõ họ tên)')
+    left_para2.alignment = 1  # Center
+    left_para2.runs[0].font.size = Pt(7)
+    
+    # Right cell với font size nhỏ                      
+    now = datetime.now()
+    # Sử dụng fee_month và fee_year để đồng bộ với tiêu đề học phí
+    right_para1 = right_payment_cell.paragraphs[0]
+    right_para1.alignment = 1
+    right_run1 = right_para1.add_run(f'Ngày 1 tháng {fee_month:02d} năm {fee_year}')
+    right_run1.font.size = Pt(7)
+
+    right_para2 = right_payment_cell.add_paragraph('Chủ Trường')
+    right_para2.alignment = 1
+    right_para2.runs[0].font.size = Pt(8)
+    right_para2.runs[0].bold = True
+    
+    right_para3 = right_payment_cell.add_paragraph('(Kí và ghi rõ họ tên)')
+    right_para3.alignment = 1
+    right_para3.runs[0].font.size = Pt(7)
+    
+    # paragraph trống để tiết kiệm không gian
+    right_payment_cell.add_paragraph().alignment = 1
+    
+    right_para_name = right_payment_cell.add_paragraph('Nguyễn Thị Vân')
+    right_para_name.alignment = 1
+    right_para_name.runs[0].font.size = Pt(8)
+    right_para_name.runs[0].bold = True
+    
+    file_stream = io.BytesIO()
+    doc.save(file_stream)
+    return file_stream.getvalue()
+
+
 @main.route('/invoice', methods=['GET', 'POST'])
 def invoice():
     # Chỉ admin mới được truy cập trang xuất hóa đơn
@@ -1727,67 +1769,27 @@ def invoice():
     next_month = f"{next_year:04d}-{next_m:02d}"
     next_month_num = f"{next_m:02d}"
     
-    num_days = monthrange(year, m)[1]
-    days_in_month = [f"{year:04d}-{m:02d}-{day:02d}" for day in range(1, num_days+1)]
-    students = Child.query.filter_by(is_active=True).all()
-    records_raw = AttendanceRecord.query.filter(AttendanceRecord.date.like(f"{year:04d}-{m:02d}-%")).all()
-    # Tính số ngày có mặt, số ngày vắng mặt không phép và có phép cho từng học sinh
-    attendance_days = {student.id: 0 for student in students}
-    absent_unexcused_days = {student.id: 0 for student in students}
-    absent_excused_days = {student.id: 0 for student in students}  # Thêm số ngày vắng có phép
-    valid_student_ids = set(attendance_days.keys())
-    for r in records_raw:
-        if r.child_id not in valid_student_ids:
-            continue
-        if r.status == 'Có mặt':
-            attendance_days[r.child_id] += 1
-        elif r.status == 'Vắng mặt không phép':
-            absent_unexcused_days[r.child_id] += 1
-        elif r.status == 'Vắng mặt có phép':  # Thêm logic này
-            absent_excused_days[r.child_id] += 1
-    
-    # Load thông tin dịch vụ từ database
-    monthly_services = MonthlyService.query.filter_by(month=month).all()
-    services_dict = {service.child_id: service for service in monthly_services}
-    
-    # Tạo default service cho học sinh chưa có record
-    for student in students:
-        if student.id not in services_dict:
-            # Tạo record mặc định (mặc định tick cả 2 dịch vụ)
-            new_service = MonthlyService(child_id=student.id, month=month, has_english=True, has_steamax=True)
-            db.session.add(new_service)
-            services_dict[student.id] = new_service
+    students = active_roster()
+    # Số ngày có mặt / vắng không phép / vắng có phép của từng học sinh (một query GROUP BY)
+    attendance = attendance_summaries(month)
+    # Biểu phí áp dụng cho tháng học phí (tháng tiếp theo)
+    rates = fee_rates(next_month)
     
-    try:
-        db.session.commit()
-    except Exception as e:
-        db.session.rollback()
-        print(f"[ERROR] Lỗi tạo default services: {e}")
+    # Dịch vụ đã lưu của tháng (học sinh chưa có dòng MonthlyService dùng mặc định, không ghi khi đọc)
+    services = service_choices(month)
     
     invoices = []
     if request.method == 'POST':
         selected_ids = request.form.getlist('student_ids')
         
-        # Xử lý checkbox data từ form khi submit và cập nhật database ngay
-        for student in students:
-            english_checked = request.form.get(f'english_{student.id}') == '1'
-            steamax_checked = request.form.get(f'steamax_{student.id}') == '1'
-            
-            # Cập nhật database ngay lập tức với giá trị từ form
-            service = services_dict.get(student.id)
-            if service:
-                service.has_english = english_checked
-                service.has_steamax = steamax_checked
-            else:
-                # Tạo mới nếu chưa có
-                new_service = MonthlyService(child_id=student.id, month=month, has_english=english_checked, has_steamax=steamax_checked)
-                db.session.add(new_service)
-                services_dict[student.id] = new_service
-        
-        # Commit changes to database
+        # Lựa chọn dịch vụ trên form - chỉ ghi những học sinh có thay đổi
+        choices = {student.id: (request.form.get(f'english_{student.id}') == '1',
+                                request.form.get(f'steamax_{student.id}') == '1')
+                   for student in students}
         try:
-            db.session.commit()
-            print(f"[DEBUG] Đã cập nhật tất cả dịch vụ từ form cho tháng {month}")
+            if apply_service_changes(month, choices):
+                db.session.commit()
+            services.update(choices)
         except Exception as e:
             db.session.rollback()
             print(f"[ERROR] Lỗi cập nhật dịch vụ từ form: {e}")
@@ -1796,378 +1798,68 @@ def invoice():
         if request.form.get('save_changes'):
             flash(f'Đã lưu thay đổi dịch vụ cho tháng {month}!', 'success')
             return redirect(url_for('main.invoice', month=month))
-        
-        if request.form.get('export_word'):
-            zip_buffer = io.BytesIO()
-            with zipfile.ZipFile(zip_buffer, 'w') as zipf:
-                for student in students:
-                    if str(student.id) in selected_ids:
-                        doc = Document()
-                        
-                        # Cài đặt page size A5 nằm ngang
-                        if DOCX_AVAILABLE:
-                            try:
-                                from docx.shared import Inches
-                                from docx.enum.section import WD_SECTION_START
-                                
-                                section = doc.sections[0]
-                                # A5 size: 148mm x 210mm, nhưng nằm ngang nên đảo ngược
-                                section.page_width = Inches(8.27)  # 210mm = 8.27 inches
-                                section.page_height = Inches(5.83)  # 148mm = 5.83 inches
-                                section.left_margin = Inches(0.3)
-                                section.right_margin = Inches(0.3)
-                                section.top_margin = Inches(0.2)
-                                section.bottom_margin = Inches(0.2)
-                            except ImportError:
-                                pass
-                        
-                        # Bảng header: logo bên trái, thông tin trường ở giữa
-                        header_table = doc.add_table(rows=1, cols=3)  # Thay đổi từ 2 cột thành 3 cột
-                        header_table.style = None  # Remove borders for a cleaner look
-                        left_cell = header_table.cell(0,0)    # Logo
-                        center_cell = header_table.cell(0,1)  # Thông tin trường
-                        right_cell = header_table.cell(0,2)   # Trống
-                        
-                        left_cell.vertical_alignment = 1  # Top
-                        center_cell.vertical_alignment = 1  # Top
-                        right_cell.vertical_alignment = 1  # Top
-                        # Logo on the left - to hơn
-                        logo_path = os.path.join(os.path.dirname(__file__), 'static', 'images', 'logo.jpg')
-                        if os.path.exists(logo_path):
-                            run_logo = left_cell.paragraphs[0].add_run()
-                            if DOCX_AVAILABLE:
-                                try:
-                                    from docx.shared import Inches
-                                    run_logo.add_picture(logo_path, width=Inches(1.0))  # Tăng từ 0.6 lên 1.0
-                                except ImportError:
-                                    pass
-                            left_cell.paragraphs[0].alignment = 0  # Left
-                        # School info ở giữa
-                        center_paragraph = center_cell.paragraphs[0]
-                        center_paragraph.alignment = 1  # Center
-                        
-                        school_run1 = center_paragraph.add_run('SMALL TREE\n')
-                        school_run1.bold = True
-                        school_run1.font.size = Pt(10)  # Tăng size vì ở giữa
-                        
-                        school_run2 = center_paragraph.add_run('MẦM NON CÂY NHỎ\n')
-                        school_run2.bold = True
-                        school_run2.font.size = Pt(10)
     
-                        school_run3 = center_paragraph.add_run('Số 1, Rchai 2, Đức Trọng, Lâm Đồng\n')
-                        school_run3.font.size = Pt(8)
-                        
-                        school_run4 = center_paragraph.add_run('SDT: 0917618868 / STK: Nguyễn Thị Vân 108875858567 NH VietinBank')
-                        school_run4.font.size = Pt(7)
-                        
-                        # Đảm bảo mọi paragraph trong center cell đều căn giữa
-                        for para in center_cell.paragraphs:
-                            para.alignment = 1
-                        # Loại bỏ paragraph trống để tiết kiệm không gian
-                        # Format title with proper month and year display
-                        # Tính tháng học phí (tháng tiếp theo)
-                        current_year, current_month = map(int, month.split('-'))
-                        fee_month = current_month + 1
-                        fee_year = current_year
-                        if fee_month > 12:
-                            fee_month = 1
-                            fee_year += 1
-                        title = doc.add_heading(f'THÔNG BÁO HỌC PHÍ THÁNG {fee_month:02d} NĂM {fee_year}', 0)
-                        title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                        run = title.runs[0]
-                        run.font.size = Pt(12)  # Giảm từ 14 xuống 12 cho A5
-                        run.font.color.rgb = RGBColor(76, 175, 80)
-                        run.font.name = 'Comic Sans MS'
-                        
-                        # Thiết lập line spacing compact
-                        from docx.shared import Pt as PtUnit
-                        title.paragraph_format.space_before = PtUnit(0)
-                        title.paragraph_format.space_after = PtUnit(6)
-                        
-                        # Bảng thông tin học sinh - Layout ngang cho A5
-                        info_table = doc.add_table(rows=1, cols=4)  # Đổi từ 2x2 thành 1x4
-                        info_table.style = 'Table Grid'
-                        for row in info_table.rows:
-                            for cell in row.cells:
-                                tc = cell._tc
-                                tcPr = tc.get_or_add_tcPr()
-                                shd = OxmlElement('w:shd')
-                                shd.set(qn('w:fill'), 'e8f5e9')
-                                tcPr.append(shd)
-                        info_table.cell(0,0).text = 'Họ và tên:'
-                        info_table.cell(0,1).text = student.name
-                        info_table.cell(0,2).text = 'Ngày sinh:'
-                        info_table.cell(0,3).text = student.birth_date or "-"
-                        # Loại bỏ paragraph trống để tiết kiệm không gian
-                        # Bảng tổng kết
-                        days = attendance_days.get(student.id, 0)
-                        absents = absent_unexcused_days.get(student.id, 0)
-                        age = calculate_age(student.birth_date) if student.birth_date else 0
-                        if age == 1:
-                            tuition = 1850000
-                        elif age == 2:
-                            tuition = 1750000
-                        elif age == 3:
-                            tuition = 1650000
-                        elif age == 4:
-                            tuition = 1550000
-                        else:
-                            tuition = 1500000
-                        excused_absents = sum(1 for r in records_raw if r.child_id == student.id and r.status == 'Vắng mặt có phép')
-                        
-                        # Tính meal_cost theo công thức mới: (26 - số ngày vắng có phép) * 38000
-                        meal_cost = (26 - excused_absents) * 38000
-                        
-                        # Lấy thông tin dịch vụ từ database sau khi đã cập nhật
-                        service = services_dict.get(student.id)
-                        has_english = service.has_english if service else True
-                        has_steamax = service.has_steamax if service else True
-                        
-                        # Bảng tóm tắt compact cho A5 - chia làm 2 cột
-                        summary_table = doc.add_table(rows=4, cols=4)  # 4x4 grid cho compact
-                        summary_table.style = 'Table Grid'
-                        for row in summary_table.rows:
-                            for cell in row.cells:
-                                tc = cell._tc
-                                tcPr = tc.get_or_add_tcPr()
-                                shd = OxmlElement('w:shd')
-                                shd.set(qn('w:fill'), 'e8f5e9')
-                                tcPr.append(shd)
-                                # Set font size cho tất cả text trong cell
-                                for paragraph in cell.paragraphs:
-                                    for run in paragraph.runs:
-                                        run.font.size = Pt(8)  # Giảm từ 9 xuống 8
-                        
-                        # Điền thông tin cơ bản - cột trái
-                        cell = summary_table.cell(0,0)
-                        cell.text = 'Số ngày đi học:'
-                        cell.paragraphs[0].runs[0].font.size = Pt(8)
-                        
-                        cell = summary_table.cell(0,1)
-                        cell.text = str(days)
-                        cell.paragraphs[0].runs[0].font.size = Pt(8)
-                        
-                        cell = summary_table.cell(1,0)
-                        cell.text = 'Số ngày vắng không phép:'
-                        cell.paragraphs[0].runs[0].font.size = Pt(8)
-                        
-                        cell = summary_table.cell(1,1)
-                        cell.text = str(absents)
-                        cell.paragraphs[0].runs[0].font.size = Pt(8)
-                        
-                        cell = summary_table.cell(2,0)
-                        cell.text = 'Số ngày vắng có phép:'
-                        cell.paragraphs[0].runs[0].font.size = Pt(8)
-                        
-                        cell = summary_table.cell(2,1)
-                        cell.text = str(excused_absents)
-                        cell.paragraphs[0].runs[0].font.size = Pt(8)
-                        
-                        cell = summary_table.cell(3,0)
-                        cell.text = 'Tiền ăn:'
-                        cell.paragraphs[0].runs[0].font.size = Pt(8)
-                        
-                        cell = summary_table.cell(3,1)
-                        cell.text = f'{meal_cost:,} đ'
-                        cell.paragraphs[0].runs[0].font.size = Pt(8)
-                        
-                        # Điền thông tin học phí và dịch vụ - cột phải
-                        cell = summary_table.cell(0,2)
-                        cell.text = 'Tiền học phí:'
-                        cell.paragraphs[0].runs[0].font.size = Pt(8)
-                        
-                        cell = summary_table.cell(0,3)
-                        cell.text = f'{tuition:,} đ'
-                        cell.paragraphs[0].runs[0].font.size = Pt(8)
-                        
-                        row_index = 1
-                        if has_english:
-                            cell = summary_table.cell(row_index,2)
-                            cell.text = 'Tiền học anh văn:'
-                            cell.paragraphs[0].runs[0].font.size = Pt(8)
-                            
-                            cell = summary_table.cell(row_index,3)
-                            cell.text = '250,000 đ'
-                            cell.paragraphs[0].runs[0].font.size = Pt(8)
-                            row_index += 1
-                            
-                        if has_steamax:
-                            cell = summary_table.cell(row_index,2)
-                            cell.text = 'Tiền học STEAMAX:'
-                            cell.paragraphs[0].runs[0].font.size = Pt(8)
-                            
-                            cell = summary_table.cell(row_index,3)
-                            cell.text = '200,000 đ'
-                            cell.paragraphs[0].runs[0].font.size = Pt(8)
-                            row_index += 1
-                        
-                        
-                        # Tính tổng
-                        english_cost = 250000 if has_english else 0
-                        steamax_cost = 200000 if has_steamax else 0
-                        total = tuition + meal_cost + english_cost + steamax_cost
-                        
-                        total_paragraph = doc.add_paragraph(f'Tổng tiền cần thanh toán: {total:,} đ')
-                        total_paragraph.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-                        total_run = total_paragraph.runs[0]
-                        total_run.font.color.rgb = RGBColor(76, 175, 80)
-                        total_run.font.bold = True
-                        total_run.font.name = 'Comic Sans MS'
-                        total_run.font.size = Pt(10)  # Giảm font size cho A5
-                        
-                        # Thiết lập compact spacing cho total
-                        total_paragraph.paragraph_format.space_before = PtUnit(3)
-                        total_paragraph.paragraph_format.space_after = PtUnit(6)
-
-                        # Add payment info table - Compact cho A5
-                        # Loại bỏ khoảng cách để tiết kiệm không gian
-                        payment_table = doc.add_table(rows=1, cols=2)
-                        payment_table.style = None  # No border for clean look
-                        left_payment_cell = payment_table.cell(0,0)
-                        right_payment_cell = payment_table.cell(0,1)
-                        left_payment_cell.vertical_alignment = 1  # Top
-                        right_payment_cell.vertical_alignment = 1  # Top
-                        
-                        # Left cell với font size nhỏ - căn giữa
-                        left_para = left_payment_cell.paragraphs[0]
-                        left_para.alignment = 1  # Center
-                        left_run1 = left_para.add_run('Người nộp tiền:')
-                        left_run1.font.size = Pt(8)
-                        left_run1.bold = True
-                        left_para2 = left_payment_cell.add_paragraph('(Kí và ghi rõ họ tên)')
-                        left_para2.alignment = 1  # Center
-                        left_para2.runs[0].font.size = Pt(7)
-                        
-                        # Right cell với font size nhỏ                      
-                        now = datetime.now()
-                        # Sử dụng fee_month và fee_year để đồng bộ với tiêu đề học phí
-                        right_para1 = right_payment_cell.paragraphs[0]
-                        right_para1.alignment = 1
-                        right_run1 = right_para1.add_run(f'Ngày 1 tháng {fee_month:02d} năm {fee_year}')
-                        right_run1.font.size = Pt(7)
-
-                        right_para2 = right_payment_cell.add_paragraph('Chủ Trường')
-                        right_para2.alignment = 1
-                        right_para2.runs[0].font.size = Pt(8)
-                        right_para2.runs[0].bold = True
-                        
-                        right_para3 = right_payment_cell.add_paragraph('(Kí và ghi rõ họ tên)')
-                        right_para3.alignment = 1
-                        right_para3.runs[0].font.size = Pt(7)
-                        
-                        # paragraph trống để tiết kiệm không gian
-                        right_payment_cell.add_paragraph().alignment = 1
-                        
-                        right_para_name = right_payment_cell.add_paragraph('Nguyễn Thị Vân')
-                        right_para_name.alignment = 1
-                        right_para_name.runs[0].font.size = Pt(8)
-                        right_para_name.runs[0].bold = True
-                        
-                        file_stream = io.BytesIO()
-                        doc.save(file_stream)
-                        file_stream.seek(0)
-                        filename = f"invoice_{student.name}_{month}.docx"
-                        zipf.writestr(filename, file_stream.read())
-            zip_buffer.seek(0)
-            return send_file(zip_buffer, download_name=f"invoices_{month}.zip", as_attachment=True)
+    # Tuổi, học phí, tiền ăn, dịch vụ, tổng tiền của cả danh sách (dùng chung cho HTML và Word)
+    invoice_rows = compute_invoices(students, attendance, services, rates)
+    
+    if request.method == 'POST':
+        if request.form.get('export_word'):
+            # Chỉ lập lại hóa đơn có đầu vào đổi, file Word cũ còn đúng thì dùng lại
+            selected_rows = [row for row in invoice_rows if str(row.student.id) in selected_ids]
+            ledger, regenerated = sync_invoices(month, selected_rows, rates)
+            built = cache_docx(ledger, invoice_docx)
+            try:
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"[ERROR] Lỗi lưu sổ hóa đơn: {e}")
+                flash('Không lưu được hóa đơn, vui lòng thử lại!', 'danger')
+                return redirect(url_for('main.invoice', month=month))
+            print(f"[INFO] Hóa đơn tháng {month}: {len(ledger)} học sinh, lập lại {regenerated}, tạo file Word {built}")
+            response = current_app.response_class(
+                stream_with_context(zip_stream(invoice_files([invoice.id for invoice in ledger]))),
+                mimetype='application/zip')
+            response.headers['Content-Disposition'] = f'attachment; filename=invoices_{month}.zip'
+            return response
         else:
-            for student in students:
-                if str(student.id) in selected_ids:
-                    days_present = attendance_days.get(student.id, 0)
-                    days_absent_unexcused = absent_unexcused_days.get(student.id, 0)
-                    days_absent_excused = absent_excused_days.get(student.id, 0)
-                    
-                    # Lấy thông tin dịch vụ từ database
-                    service = services_dict.get(student.id)
-                    has_english = service.has_english if service else True
-                    has_steamax = service.has_steamax if service else True
-                    
-                    # Học phí theo độ tuổi - sử dụng student_ages đã tính
-                    age = student_ages[student.id]
-                    if age == 1:
-                        tuition = 1850000
-                    elif age == 2:
-                        tuition = 1750000
-                    elif age == 3:
-                        tuition = 1650000
-                    elif age == 4:
-                        tuition = 1550000
-                    else:
-                        tuition = 1500000
-                    
-                    # Tính các khoản phí theo công thức mới
-                    meal_cost = (26 - days_absent_excused) * 38000  # 26 ngày mặc định trừ ngày vắng có phép
-                    english_cost = 250000 if has_english else 0
-                    steamax_cost = 200000 if has_steamax else 0
-                    total = meal_cost + tuition + english_cost + steamax_cost
-                    
-                    # Tạo chuỗi mô tả chi tiết
-                    extras = []
-                    if has_english: extras.append(f"Anh văn: {english_cost:,}đ")
-                    if has_steamax: extras.append(f"STEAMAX: {steamax_cost:,}đ")
-                    extra_text = " + " + " + ".join(extras) if extras else ""
-                    
-                    invoices.append(f"Học sinh {student.name}: Có mặt {days_present} ngày, vắng không phép {days_absent_unexcused} ngày, vắng có phép {days_absent_excused} ngày. Tiền ăn: {meal_cost:,}đ + Học phí: {tuition:,}đ{extra_text} = Tổng: {total:,}đ")
+            invoices = [invoice_summary(row) for row in invoice_rows if str(row.student.id) in selected_ids]
     mobile = is_mobile()
-    student_ages = {student.id: calculate_age(student.birth_date) if student.birth_date else 0 for student in students}
-    return render_template('invoice.html', students=students, attendance_days=attendance_days, absent_unexcused_days=absent_unexcused_days, absent_excused_days=absent_excused_days, services_dict=services_dict, selected_month=month, next_month=next_month, next_month_num=next_month_num, invoices=invoices, days_in_month=days_in_month, records={ (r.child_id, r.date): r for r in records_raw }, student_ages=student_ages, title='Xuất hóa đơn', mobile=mobile)
+    return render_template('invoice.html', invoice_rows=invoice_rows, rates=rates, selected_month=month, next_month=next_month, next_month_num=next_month_num, invoices=invoices, title='Xuất hóa đơn', mobile=mobile)
 
 
 @main.route('/login', methods=['GET', 'POST'])
 def login():
-    user_ip = request.remote_addr
-    now = datetime.now()
+    user_ip = client_ip()
     # Kiểm tra lockout do nhập sai
-    if user_ip in lockout_until and now < lockout_until[user_ip]:
+    if login_failures.locked_for(user_ip):
         flash(f'Tài khoản hoặc IP này bị khóa đăng nhập tạm thời. Vui lòng thử lại sau!', 'danger')
         return render_template('login.html', title='Đăng nhập')
     # Kiểm tra cooldown sau đăng nhập thành công
-    if user_ip in last_login_time and (now - last_login_time[user_ip]).total_seconds() < LOGIN_COOLDOWN_SECONDS:
-        wait_time = LOGIN_COOLDOWN_SECONDS - int((now - last_login_time[user_ip]).total_seconds())
+    wait_time = login_cooldown.locked_for(user_ip)
+    if wait_time:
         flash(f'Bạn vừa đăng nhập thành công. Vui lòng chờ {wait_time} giây trước khi đăng nhập lại!', 'warning')
         return render_template('login.html', title='Đăng nhập')
     if request.method == 'POST':
         email_or_phone = request.form.get('email')
         password = request.form.get('password')
-        # Kiểm tra admin
-        admin = Staff.query.filter_by(position='admin').first()
-        if admin and (email_or_phone == admin.email or email_or_phone == admin.phone) and check_password_hash(admin.password, password):
-            session['user_id'] = admin.id
-            session['role'] = 'admin'
-            session['name'] = admin.name
-            log_activity('login', description=f'Admin {admin.name} đăng nhập')
-            flash('Đăng nhập admin thành công!', 'success')
-            login_attempts[user_ip] = 0
-            last_login_time[user_ip] = now
-            return redirect(url_for('main.about'))
-        user = Child.query.filter(((Child.email==email_or_phone)|(Child.phone==email_or_phone))).first()
-        staff = Staff.query.filter(((Staff.email==email_or_phone)|(Staff.phone==email_or_phone))).first()
-        if user and check_password_hash(user.password, password):
-            session['user_id'] = user.id
-            session['role'] = 'parent'
-            session['name'] = user.name
-            log_activity('login', description=f'Phụ huynh {user.name} đăng nhập')
-            flash('Đăng nhập thành công!', 'success')
-            login_attempts[user_ip] = 0
-            last_login_time[user_ip] = now
-            return redirect(url_for('main.about'))
-        elif staff and check_password_hash(staff.password, password):
-            session['user_id'] = staff.id
-            session['role'] = 'teacher'
-            session['name'] = staff.name
-            log_activity('login', description=f'Giáo viên {staff.name} đăng nhập')
-            flash('Đăng nhập thành công!', 'success')
-            login_attempts[user_ip] = 0
-            last_login_time[user_ip] = now
+        # Một query có index xác định tài khoản (admin → phụ huynh → giáo viên), kiểm tra mật khẩu một lần
+        account = authenticate(email_or_phone, password)
+        if account:
+            regenerate_session(session)
+            forget_identity()
+            session['user_id'] = account.id
+            session['role'] = account.role
+            session['name'] = account.name
+            log_activity('login', description=f'{LOGIN_ROLE_LABELS[account.role]} {account.name} đăng nhập')
+            flash('Đăng nhập admin thành công!' if account.role == 'admin' else 'Đăng nhập thành công!', 'success')
+            login_failures.reset(user_ip)
+            login_cooldown.lock(user_ip, LOGIN_COOLDOWN_SECONDS)
             return redirect(url_for('main.about'))
+        if not login_failures.hit(user_ip).remaining:
+            flash(f'Bạn đã nhập sai quá số lần cho phép. Đăng nhập bị khóa {LOCKOUT_TIME_MINUTES} phút!', 'danger')
         else:
-            login_attempts[user_ip] = login_attempts.get(user_ip, 0) + 1
-            if login_attempts[user_ip] >= MAX_LOGIN_ATTEMPTS:
-                lockout_until[user_ip] = now + timedelta(minutes=LOCKOUT_TIME_MINUTES)
-                flash(f'Bạn đã nhập sai quá số lần cho phép. Đăng nhập bị khóa {LOCKOUT_TIME_MINUTES} phút!', 'danger')
-            else:
-                flash('Sai thông tin đăng nhập!', 'danger')
-            return render_template('login.html', title='Đăng nhập')
+            flash('Sai thông tin đăng nhập!', 'danger')
+        return render_template('login.html', title='Đăng nhập')
     return render_template('login.html', title='Đăng nhập')
 
 @main.route('/logout')
@@ -2520,7 +2212,7 @@ def edit_curriculum(week_number):
         
     # Filter by both week_number AND class_id to avoid editing wrong curriculum
     week = Curriculum.query.filter_by(week_number=week_number, class_id=class_id).first()
-    classes = Class.query.order_by(Class.name).all()
+    classes = ordered_classes()
     if not week:
         flash('Không tìm thấy chương trình học để chỉnh sửa!', 'danger')
         return redirect(url_for('main.curriculum'))
@@ -2560,12 +2252,10 @@ def edit_curriculum(week_number):
 
 @main.route('/profile')
 def profile():
-    user = None
     role = session.get('role')
-    user_id = session.get('user_id')
+    user = current_identity()
     info = {}
     if role == 'parent':
-        user = Child.query.get(user_id)
         if user:
             info = {
                 'full_name': user.parent_contact,
@@ -2578,7 +2268,6 @@ def profile():
                 'parent_contact': user.parent_contact,
             }
     elif role == 'teacher':
-        user = Staff.query.get(user_id)
         if user:
             info = {
                 'full_name': user.name,
@@ -2591,7 +2280,6 @@ def profile():
                 'parent_contact': '',
             }
     elif role == 'admin':
-        user = Staff.query.get(user_id)
         if user:
             info = {
                 'full_name': user.name,
@@ -2612,13 +2300,12 @@ def profile():
 @main.route('/profile/edit', methods=['GET', 'POST'])
 def edit_profile():
     role = session.get('role')
-    user_id = session.get('user_id')
     if role == 'parent':
         flash('Phụ huynh không có quyền chỉnh sửa thông tin!', 'danger')
         return redirect(url_for('main.profile'))
     elif role == 'teacher':
-        user = Staff.query.get(user_id)
-        full_name = user.name
+        user = current_identity()
+        full_name = user.name if user else None
     else:
         flash('Admin không thể chỉnh sửa thông tin!', 'danger')
         return redirect(url_for('main.profile'))
@@ -2695,7 +2382,7 @@ def edit_student(student_id):
     if session.get('role') != 'admin' and session.get('role') != 'teacher':
         return redirect_no_permission()
     student = Child.query.get_or_404(student_id)
-    classes = Class.query.order_by(Class.name).all()
+    classes = ordered_classes()
     
     if request.method == 'POST':
         class_name = request.form.get('class_name')
@@ -2707,7 +2394,7 @@ def edit_student(student_id):
         # Cập nhật thông tin học sinh trước
         student.name = request.form.get('name')
         student.student_code = request.form.get('student_code')
-        student.class_name = class_name
+        student.assign_class(next(c for c in classes if c.name == class_name))
         student.birth_date = request.form.get('birth_date')
         student.parent_contact = request.form.get('parent_contact')
         
@@ -2749,6 +2436,7 @@ def edit_student(student_id):
         # Commit tất cả thay đổi
         try:
             db.session.commit()
+            invalidate_class_scope(student_id)
             log_activity('edit', 'student', student_id, f'Sửa học sinh: {student.name}')
             if avatar_updated:
                 flash('Đã lưu thông tin và ảnh đại diện thành công!', 'success')
@@ -2842,118 +2530,64 @@ def export_students():
         return redirect(url_for('main.student_list'))
     
     try:
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-        from openpyxl.utils import get_column_letter
-        
-        # Tạo workbook và worksheet
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Danh sách học sinh"
-        
-        # Tạo header
-        headers = ['STT', 'Họ và tên', 'Mã học sinh', 'Ngày sinh', 'Cân nặng (kg)', 'Chiều cao (cm)', 'BMI', 'Đánh giá BMI', 'Đánh giá Cân nặng', 'Đánh giá Chiều cao']
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.font = Font(bold=True, color="FFFFFF")
-            cell.fill = PatternFill(start_color="4CAF50", end_color="4CAF50", fill_type="solid")
-            cell.alignment = Alignment(horizontal="center", vertical="center")
-            cell.border = Border(
-                left=Side(style='thin'),
-                right=Side(style='thin'),
-                top=Side(style='thin'),
-                bottom=Side(style='thin')
-            )
-        
+        from app.xlsx_writer import Column, write_xlsx, XLSX_MIMETYPE
+
+        columns = [
+            Column('STT', 'stt', 'center'),
+            Column('Họ và tên', 'name'),
+            Column('Mã học sinh', 'student_code'),
+            Column('Ngày sinh', 'birth_date'),
+            Column('Cân nặng (kg)', 'weight'),
+            Column('Chiều cao (cm)', 'height'),
+            Column('BMI', 'bmi'),
+            Column('Đánh giá BMI', 'bmi_assessment'),
+            Column('Đánh giá Cân nặng', 'weight_assessment'),
+            Column('Đánh giá Chiều cao', 'height_assessment'),
+        ]
+
         # Lấy danh sách học sinh và sắp xếp theo thứ tự lớp, sau đó theo tên
-        students = Child.query.filter_by(is_active=True).all()
-        students = sorted(students, key=lambda x: (get_class_order(x.class_name), x.name))
-        
-        # Thêm dữ liệu học sinh
-        for row, student in enumerate(students, 2):
-            # Lấy thông tin BMI mới nhất
-            latest_bmi = BmiRecord.query.filter_by(student_id=student.id).order_by(BmiRecord.date.desc()).first()
-            
-            weight = latest_bmi.weight if latest_bmi else ''
-            height = latest_bmi.height if latest_bmi else ''
-            bmi = round(latest_bmi.bmi, 2) if latest_bmi else ''
-            
-            # Tính đánh giá đầy đủ theo WHO standards (BMI, cân nặng, chiều cao)
-            bmi_assessment = ''
-            weight_assessment = ''
-            height_assessment = ''
-            
-            if latest_bmi and student.birth_date:
-                try:
-                    birth_date_obj = datetime.strptime(str(student.birth_date), '%Y-%m-%d') if isinstance(student.birth_date, str) else student.birth_date
-                    age_months = (datetime.now() - birth_date_obj).days // 30
-                    gender = getattr(student, 'gender', 'unknown')
-                    
-                    # Đánh giá đầy đủ
-                    growth_data = assess_child_growth_who(
-                        age_months, 
-                        gender, 
-                        bmi=latest_bmi.bmi if latest_bmi.bmi else None,
-                        weight_kg=latest_bmi.weight if latest_bmi.weight else None,
-                        height_cm=latest_bmi.height if latest_bmi.height else None
-                    )
-                    
-                    bmi_assessment = growth_data['bmi']['assessment'] or ''
-                    weight_assessment = growth_data['weight']['assessment'] or ''
-                    height_assessment = growth_data['height']['assessment'] or ''
-                except Exception as e:
-                    print(f"[ERROR] Lỗi đánh giá WHO cho {student.name}: {e}")
-            
-            data = [
-                row - 1,  # STT
-                student.name,
-                student.student_code or '',
-                student.birth_date or '',
-                weight,
-                height,
-                bmi,
-                bmi_assessment,
-                weight_assessment,
-                height_assessment
-            ]
-            
-            for col, value in enumerate(data, 1):
-                cell = ws.cell(row=row, column=col, value=value)
-                cell.alignment = Alignment(horizontal="center" if col == 1 else "left", vertical="center")
-                cell.border = Border(
-                    left=Side(style='thin'),
-                    right=Side(style='thin'),
-                    top=Side(style='thin'),
-                    bottom=Side(style='thin')
-                )
-        
-        # Tự động điều chỉnh độ rộng cột
-        for col in range(1, len(headers) + 1):
-            column_letter = get_column_letter(col)
-            max_length = 0
-            for row in ws[column_letter]:
-                try:
-                    if len(str(row.value)) > max_length:
-                        max_length = len(str(row.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
-        
-        # Tạo file tạm
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp:
-            wb.save(tmp.name)
-            tmp_path = tmp.name
-        
+        students = class_students().order_by(*roster_order()).all()
+        
+        # Chỉ số BMI mới nhất lấy từ bản chiếu trên Child (không query thêm),
+        # đánh giá WHO cho cả danh sách trong một lượt
+        measured = [s for s in students if s.current_bmi_date]
+        growth_by_student = dict(zip(
+            [s.id for s in measured],
+            assess_growth_batch([
+                (getattr(s, 'gender', 'unknown'), age_in_months(s.birth_date),
+                 s.current_bmi, s.current_weight, s.current_height)
+                for s in measured
+            ])
+        ))
+
+        def student_rows():
+            for stt, student in enumerate(students, 1):
+                has_bmi = student.current_bmi_date is not None
+                # Đánh giá đầy đủ theo WHO standards (BMI, cân nặng, chiều cao)
+                growth_data = growth_by_student.get(student.id) if student.birth_date else None
+                yield {
+                    'stt': stt,
+                    'name': student.name,
+                    'student_code': student.student_code or '',
+                    'birth_date': student.birth_date or '',
+                    'weight': student.current_weight if has_bmi else '',
+                    'height': student.current_height if has_bmi else '',
+                    'bmi': round(student.current_bmi, 2) if has_bmi else '',
+                    'bmi_assessment': (growth_data['bmi']['assessment'] or '') if growth_data else '',
+                    'weight_assessment': (growth_data['weight']['assessment'] or '') if growth_data else '',
+                    'height_assessment': (growth_data['height']['assessment'] or '') if growth_data else '',
+                }
+
+        output = write_xlsx(columns, student_rows(), sheet_title='Danh sách học sinh')
+
         # Tạo tên file với ngày giờ hiện tại
-        from datetime import datetime
         filename = f"danh_sach_hoc_sinh_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
         
         return send_file(
-            tmp_path,
+            output,
             as_attachment=True,
             download_name=filename,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            mimetype=XLSX_MIMETYPE
         )
         
     except Exception as e:
@@ -3026,8 +2660,7 @@ def export_subsidized_students():
         doc.add_paragraph('')
         
         # Lấy danh sách học sinh và sắp xếp theo thứ tự lớp, sau đó theo tên
-        students = Child.query.filter_by(is_active=True).all()
-        students = sorted(students, key=lambda x: (get_class_order(x.class_name), x.name))
+        students = class_students().order_by(*roster_order()).all()
         
         # Tạo table với 5 cột
         table = doc.add_table(rows=1, cols=5)
@@ -3161,13 +2794,9 @@ def change_admin_password():
 @main.route('/activities')
 def activities():
     user_role = session.get('role')
-    user_id = session.get('user_id')
     posts = None
     if user_role == 'parent':
-        child = Child.query.filter_by(id=user_id).first()
-        class_name = child.class_name if child else None
-        class_obj = Class.query.filter_by(name=class_name).first() if class_name else None
-        class_id = class_obj.id if class_obj else None
+        class_id = current_scope().class_id
         # Chỉ lấy bài viết của lớp con mình hoặc bài cho khách vãng lai
         posts = Activity.query.filter(
             (Activity.class_id == class_id) | (Activity.class_id == None)
@@ -3221,7 +2850,8 @@ def create_account():
             if not student_code or not class_name or not birth_date or not parent_contact:
                 flash('Vui lòng nhập đầy đủ thông tin học sinh/phụ huynh!', 'danger')
                 return render_template('create_account.html', title='Tạo tài khoản mới')
-            new_child = Child(name=name, age=0, parent_contact=parent_contact, class_name=class_name, birth_date=birth_date, email=email, phone=phone, password=generate_password_hash(password), student_code=student_code)
+            new_child = Child(name=name, age=0, parent_contact=parent_contact, birth_date=birth_date, email=email, phone=phone, password=generate_password_hash(password), student_code=student_code)
+            new_child.assign_class(Class.query.filter_by(name=class_name).first())
             db.session.add(new_child)
         elif role == 'teacher':
             position = request.form.get('position')
@@ -3236,7 +2866,7 @@ def create_account():
         flash('Tạo tài khoản thành công!', 'success')
         return redirect(url_for('main.accounts'))
     
-    classes = Class.query.order_by(Class.name).all()
+    classes = ordered_classes()
     return render_template('create_account.html', classes=classes, title='Tạo tài khoản mới')
 
 @main.route('/accounts/<int:user_id>/edit', methods=['GET', 'POST'])
@@ -3244,7 +2874,7 @@ def edit_account(user_id):
     if session.get('role') != 'admin':
         return redirect_no_permission()
     user_type = request.args.get('type', 'parent')
-    classes = Class.query.order_by(Class.name).all() if user_type == 'parent' else []
+    classes = ordered_classes() if user_type == 'parent' else []
     if user_type == 'teacher':
         user = Staff.query.get_or_404(user_id)
     else:
@@ -3256,7 +2886,7 @@ def edit_account(user_id):
         if user_type == 'parent':
             user.parent_contact = request.form.get('parent_contact')
             user.student_code = request.form.get('student_code')
-            user.class_name = request.form.get('class_name')
+            user.assign_class(Class.query.filter_by(name=request.form.get('class_name')).first())
             user.birth_date = request.form.get('birth_date')
             user.father_name = request.form.get('father_name')
             user.father_phone = request.form.get('father_phone')
@@ -3268,6 +2898,8 @@ def edit_account(user_id):
         if password:
             user.password = generate_password_hash(password)
         db.session.commit()
+        if user_type == 'parent':
+            invalidate_class_scope(user_id)
         log_activity('edit', 'account', user_id, f'Cập nhật tài khoản: {user.name}')
         flash('Đã cập nhật thông tin tài khoản!', 'success')
         return redirect(url_for('main.accounts'))
@@ -3324,7 +2956,7 @@ def edit_activity(id):
             flash('Không tìm thấy bài viết để chỉnh sửa!', 'danger')
             return redirect(url_for('main.activities'))
         from app.forms import ActivityEditForm
-        classes = Class.query.order_by(Class.name).all()
+        classes = ordered_classes()
         class_choices = [(0, 'Tất cả khách vãng lai')] + [(c.id, c.name) for c in classes]
         form = ActivityEditForm()
         form.class_id.choices = class_choices
@@ -3400,8 +3032,7 @@ def bmi_index():
     
     # Phân quyền: Parent chỉ xem con mình, Admin/Teacher xem tất cả
     if session.get('role') == 'parent':
-        user_id = session.get('user_id')
-        child = Child.query.filter_by(id=user_id).first()
+        child = current_scope().child
         students = [child] if child else []
     else:
         students = Child.query.filter_by(is_active=True).all()
@@ -3432,20 +3063,25 @@ def bmi_index():
             bmi=bmi
         )
         db.session.add(new_record)
+        refresh_current_bmi([student_id])
         db.session.commit()
         
         log_activity('create', 'bmi_record', new_record.id, f'Thêm BMI cho {Child.query.get(student_id).name}')
         flash('Đã lưu chỉ số BMI!', 'success')
 
-    bmi_history = {}
+    bmi_history = load_bmi_history([student.id for student in students])
+
+    # Đánh giá WHO cho mọi lần đo trong một lượt (tuổi tính tại ngày đo)
+    growth_rows, growth_record_ids = [], []
     for student in students:
-        records = BmiRecord.query.filter_by(student_id=student.id).order_by(BmiRecord.date.desc(), BmiRecord.id.desc()).all()
-        filtered = {}
-        for record in records:
-            date_str = record.date.strftime('%Y-%m-%d')
-            if date_str not in filtered:
-                filtered[date_str] = record
-        bmi_history[student.id] = list(filtered.values())
+        for record in bmi_history[student.id]:
+            growth_record_ids.append(record.id)
+            growth_rows.append((
+                getattr(student, 'gender', 'unknown'),
+                age_in_months(student.birth_date, record.date) if student.birth_date else None,
+                record.bmi, record.weight, record.height
+            ))
+    growth_by_record = dict(zip(growth_record_ids, assess_growth_batch(growth_rows)))
 
     current_date_iso = date.today().isoformat()
     return render_template(
@@ -3455,6 +3091,7 @@ def bmi_index():
         bmi=bmi,
         bmi_id=bmi_id,
         bmi_history=bmi_history,
+        growth_by_record=growth_by_record,
         current_date_iso=current_date_iso,
         mobile=False
     )
@@ -3470,6 +3107,7 @@ def edit_bmi_record(record_id):
         record.weight = float(weight)
         record.height = float(height)  # Sửa: phải convert sang float, không dùng request.form.get() trực tiếp
         record.bmi = round(float(weight) / ((float(height)/100) ** 2), 2)
+        refresh_current_bmi([record.student_id])
         db.session.commit()
         flash('Đã cập nhật chỉ số BMI!', 'success')
     else:
@@ -3485,76 +3123,36 @@ def delete_bmi_record(record_id):
     
     record = BmiRecord.query.get_or_404(record_id)
     db.session.delete(record)
+    refresh_current_bmi([record.student_id])
     db.session.commit()
     flash('Đã xoá chỉ số BMI!', 'success')
     return redirect(url_for('main.bmi_index', edit_id=None))
 
 @main.route('/menu')
 def menu():
-    # Chỉ sử dụng Menu model cho thực đơn
-    menus = Menu.query.order_by(Menu.week_number.desc()).all()
-    menu = []
-    
-    for menu_item in menus:
-        # Convert structured Menu fields to template format
-        data = {
-            'mon': {
-                'morning': menu_item.monday_morning or '',
-                'snack': menu_item.monday_snack or '',
-                'dessert': menu_item.monday_dessert or '',
-                'lunch': menu_item.monday_lunch or '',
-                'afternoon': menu_item.monday_afternoon or '',
-                'lateafternoon': menu_item.monday_lateafternoon or ''
-            },
-            'tue': {
-                'morning': menu_item.tuesday_morning or '',
-                'snack': menu_item.tuesday_snack or '',
-                'dessert': menu_item.tuesday_dessert or '',
-                'lunch': menu_item.tuesday_lunch or '',
-                'afternoon': menu_item.tuesday_afternoon or '',
-                'lateafternoon': menu_item.tuesday_lateafternoon or ''
-            },
-            'wed': {
-                'morning': menu_item.wednesday_morning or '',
-                'snack': menu_item.wednesday_snack or '',
-                'dessert': menu_item.wednesday_dessert or '',
-                'lunch': menu_item.wednesday_lunch or '',
-                'afternoon': menu_item.wednesday_afternoon or '',
-                'lateafternoon': menu_item.wednesday_lateafternoon or ''
-            },
-            'thu': {
-                'morning': menu_item.thursday_morning or '',
-                'snack': menu_item.thursday_snack or '',
-                'dessert': menu_item.thursday_dessert or '',
-                'lunch': menu_item.thursday_lunch or '',
-                'afternoon': menu_item.thursday_afternoon or '',
-                'lateafternoon': menu_item.thursday_lateafternoon or ''
-            },
-            'fri': {
-                'morning': menu_item.friday_morning or '',
-                'snack': menu_item.friday_snack or '',
-                'dessert': menu_item.friday_dessert or '',
-                'lunch': menu_item.friday_lunch or '',
-                'afternoon': menu_item.friday_afternoon or '',
-                'lateafternoon': menu_item.friday_lateafternoon or ''
-            },
-            'sat': {
-                'morning': menu_item.saturday_morning or '',
-                'snack': menu_item.saturday_snack or '',
-                'dessert': menu_item.saturday_dessert or '',
-                'lunch': menu_item.saturday_lunch or '',
-                'afternoon': menu_item.saturday_afternoon or '',
-                'lateafternoon': menu_item.saturday_lateafternoon or ''
-            }
-        }
-        
-        menu.append({
-            'week_number': menu_item.week_number,
-            'data': data
-        })
-    
+    years = menu_years()
+    year = request.args.get('year', type=int) or (years[0] if years else datetime.now().year)
+    page = request.args.get('page', 1, type=int)
+    role = session.get('role')
     mobile = is_mobile()
-    return render_template('menu.html', menu=menu, title='Thực đơn', mobile=mobile)
+    pagination = menu_page(year, page)
+    menus = pagination.items
+
+    # Trang của admin/giáo viên có form kèm CSRF token (hết hạn theo thời gian) nên luôn render lại;
+    # còn lại trả 304 khi các tuần trên trang không đổi (trừ khi đang có flash message chờ hiển thị)
+    conditional = role not in ['admin', 'teacher'] and not session.get('_flashes')
+    etag = listing_etag(menus, year, page, pagination.total, years, role, mobile)
+    last_modified = listing_last_modified(menus)
+    if conditional and not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response = make_response('', 304)
+    else:
+        response = make_response(render_template('menu.html', menu=menu_weeks(menus, mobile), pagination=pagination,
+                                                  years=years, year=year, title='Thực đơn', mobile=mobile))
+    if conditional:
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
 @main.route('/menu/new', methods=['GET', 'POST'])
 def new_menu():
@@ -3582,52 +3180,9 @@ def new_menu():
                                  error_week=week_number, current_week=current_week, current_year=current_year)
         
         # Create new Menu record
-        new_menu = Menu(
-            week_number=week_number,
-            year=2025,  # Current year
-            # Monday
-            monday_morning=request.form.get('content_mon_morning', ''),
-            monday_snack=request.form.get('content_mon_snack', ''),
-            monday_dessert=request.form.get('content_mon_dessert', ''),
-            monday_lunch=request.form.get('content_mon_lunch', ''),
-            monday_afternoon=request.form.get('content_mon_afternoon', ''),
-            monday_lateafternoon=request.form.get('content_mon_lateafternoon', ''),
-            # Tuesday
-            tuesday_morning=request.form.get('content_tue_morning', ''),
-            tuesday_snack=request.form.get('content_tue_snack', ''),
-            tuesday_dessert=request.form.get('content_tue_dessert', ''),
-            tuesday_lunch=request.form.get('content_tue_lunch', ''),
-            tuesday_afternoon=request.form.get('content_tue_afternoon', ''),
-            tuesday_lateafternoon=request.form.get('content_tue_lateafternoon', ''),
-            # Wednesday
-            wednesday_morning=request.form.get('content_wed_morning', ''),
-            wednesday_snack=request.form.get('content_wed_snack', ''),
-            wednesday_dessert=request.form.get('content_wed_dessert', ''),
-            wednesday_lunch=request.form.get('content_wed_lunch', ''),
-            wednesday_afternoon=request.form.get('content_wed_afternoon', ''),
-            wednesday_lateafternoon=request.form.get('content_wed_lateafternoon', ''),
-            # Thursday
-            thursday_morning=request.form.get('content_thu_morning', ''),
-            thursday_snack=request.form.get('content_thu_snack', ''),
-            thursday_dessert=request.form.get('content_thu_dessert', ''),
-            thursday_lunch=request.form.get('content_thu_lunch', ''),
-            thursday_afternoon=request.form.get('content_thu_afternoon', ''),
-            thursday_lateafternoon=request.form.get('content_thu_lateafternoon', ''),
-            # Friday
-            friday_morning=request.form.get('content_fri_morning', ''),
-            friday_snack=request.form.get('content_fri_snack', ''),
-            friday_dessert=request.form.get('content_fri_dessert', ''),
-            friday_lunch=request.form.get('content_fri_lunch', ''),
-            friday_afternoon=request.form.get('content_fri_afternoon', ''),
-            friday_lateafternoon=request.form.get('content_fri_lateafternoon', ''),
-            # Saturday
-            saturday_morning=request.form.get('content_sat_morning', ''),
-            saturday_snack=request.form.get('content_sat_snack', ''),
-            saturday_dessert=request.form.get('content_sat_dessert', ''),
-            saturday_lunch=request.form.get('content_sat_lunch', ''),
-            saturday_afternoon=request.form.get('content_sat_afternoon', ''),
-            saturday_lateafternoon=request.form.get('content_sat_lateafternoon', '')
-        )
+        new_menu = Menu(week_number=week_number, year=2025)
+        set_menu_data(new_menu, menu_data_from_form(request.form))
+        touch_menu(new_menu)
         
         db.session.add(new_menu)
         db.session.commit()
@@ -3675,47 +3230,8 @@ def edit_menu(week_number):
         new_week_number = request.form.get('week_number', type=int)
         
         # Update menu fields
-        menu_item.monday_morning = request.form.get('content_mon_morning', '')
-        menu_item.monday_snack = request.form.get('content_mon_snack', '')
-        menu_item.monday_dessert = request.form.get('content_mon_dessert', '')
-        menu_item.monday_lunch = request.form.get('content_mon_lunch', '')
-        menu_item.monday_afternoon = request.form.get('content_mon_afternoon', '')
-        menu_item.monday_lateafternoon = request.form.get('content_mon_lateafternoon', '')
-        
-        menu_item.tuesday_morning = request.form.get('content_tue_morning', '')
-        menu_item.tuesday_snack = request.form.get('content_tue_snack', '')
-        menu_item.tuesday_dessert = request.form.get('content_tue_dessert', '')
-        menu_item.tuesday_lunch = request.form.get('content_tue_lunch', '')
-        menu_item.tuesday_afternoon = request.form.get('content_tue_afternoon', '')
-        menu_item.tuesday_lateafternoon = request.form.get('content_tue_lateafternoon', '')
-        
-        menu_item.wednesday_morning = request.form.get('content_wed_morning', '')
-        menu_item.wednesday_snack = request.form.get('content_wed_snack', '')
-        menu_item.wednesday_dessert = request.form.get('content_wed_dessert', '')
-        menu_item.wednesday_lunch = request.form.get('content_wed_lunch', '')
-        menu_item.wednesday_afternoon = request.form.get('content_wed_afternoon', '')
-        menu_item.wednesday_lateafternoon = request.form.get('content_wed_lateafternoon', '')
-        
-        menu_item.thursday_morning = request.form.get('content_thu_morning', '')
-        menu_item.thursday_snack = request.form.get('content_thu_snack', '')
-        menu_item.thursday_dessert = request.form.get('content_thu_dessert', '')
-        menu_item.thursday_lunch = request.form.get('content_thu_lunch', '')
-        menu_item.thursday_afternoon = request.form.get('content_thu_afternoon', '')
-        menu_item.thursday_lateafternoon = request.form.get('content_thu_lateafternoon', '')
-        
-        menu_item.friday_morning = request.form.get('content_fri_morning', '')
-        menu_item.friday_snack = request.form.get('content_fri_snack', '')
-        menu_item.friday_dessert = request.form.get('content_fri_dessert', '')
-        menu_item.friday_lunch = request.form.get('content_fri_lunch', '')
-        menu_item.friday_afternoon = request.form.get('content_fri_afternoon', '')
-        menu_item.friday_lateafternoon = request.form.get('content_fri_lateafternoon', '')
-        
-        menu_item.saturday_morning = request.form.get('content_sat_morning', '')
-        menu_item.saturday_snack = request.form.get('content_sat_snack', '')
-        menu_item.saturday_dessert = request.form.get('content_sat_dessert', '')
-        menu_item.saturday_lunch = request.form.get('content_sat_lunch', '')
-        menu_item.saturday_afternoon = request.form.get('content_sat_afternoon', '')
-        menu_item.saturday_lateafternoon = request.form.get('content_sat_lateafternoon', '')
+        set_menu_data(menu_item, menu_data_from_form(request.form))
+        touch_menu(menu_item)
         
         # Check for duplicate week number if changed
         if new_week_number != menu_item.week_number:
@@ -3735,54 +3251,8 @@ def edit_menu(week_number):
     
     # Convert Menu fields to template format for editing
     data = {
-        'mon': {
-            'morning': menu_item.monday_morning or '',
-            'snack': menu_item.monday_snack or '',
-            'dessert': menu_item.monday_dessert or '',
-            'lunch': menu_item.monday_lunch or '',
-            'afternoon': menu_item.monday_afternoon or '',
-            'lateafternoon': menu_item.monday_lateafternoon or ''
-        },
-        'tue': {
-            'morning': menu_item.tuesday_morning or '',
-            'snack': menu_item.tuesday_snack or '',
-            'dessert': menu_item.tuesday_dessert or '',
-            'lunch': menu_item.tuesday_lunch or '',
-            'afternoon': menu_item.tuesday_afternoon or '',
-            'lateafternoon': menu_item.tuesday_lateafternoon or ''
-        },
-        'wed': {
-            'morning': menu_item.wednesday_morning or '',
-            'snack': menu_item.wednesday_snack or '',
-            'dessert': menu_item.wednesday_dessert or '',
-            'lunch': menu_item.wednesday_lunch or '',
-            'afternoon': menu_item.wednesday_afternoon or '',
-            'lateafternoon': menu_item.wednesday_lateafternoon or ''
-        },
-        'thu': {
-            'morning': menu_item.thursday_morning or '',
-            'snack': menu_item.thursday_snack or '',
-            'dessert': menu_item.thursday_dessert or '',
-            'lunch': menu_item.thursday_lunch or '',
-            'afternoon': menu_item.thursday_afternoon or '',
-            'lateafternoon': menu_item.thursday_lateafternoon or ''
-        },
-        'fri': {
-            'morning': menu_item.friday_morning or '',
-            'snack': menu_item.friday_snack or '',
-            'dessert': menu_item.friday_dessert or '',
-            'lunch': menu_item.friday_lunch or '',
-            'afternoon': menu_item.friday_afternoon or '',
-            'lateafternoon': menu_item.friday_lateafternoon or ''
-        },
-        'sat': {
-            'morning': menu_item.saturday_morning or '',
-            'snack': menu_item.saturday_snack or '',
-            'dessert': menu_item.saturday_dessert or '',
-            'lunch': menu_item.saturday_lunch or '',
-            'afternoon': menu_item.saturday_afternoon or '',
-            'lateafternoon': menu_item.saturday_lateafternoon or ''
-        }
+        day: {meal: getattr(menu_item, menu_field(day, meal)) or '' for meal in MEAL_KEYS}
+        for day in DAY_KEYS
     }
     
     # Get all active dishes
@@ -3796,6 +3266,7 @@ def delete_menu(week_number):
         return redirect_no_permission()
     menu_item = Menu.query.filter_by(week_number=week_number, year=2025).first()
     if menu_item:
+        touch_menu(menu_item)
         db.session.delete(menu_item)
         db.session.commit()
         log_activity('delete', 'menu', menu_item.id, f'Xóa thực đơn tuần {week_number}')
@@ -3822,110 +3293,23 @@ def import_menu():
     ws = wb.active
 
     # Đọc dữ liệu từ dòng 3 đến 8, cột B-G (theo mẫu: A1:A2 "Thứ", B1:G1 "Khung giờ", B2-G2 slot, A3-A8 thứ)
-    days = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat']
-    slots = ['morning', 'snack', 'dessert', 'lunch', 'afternoon', 'lateafternoon']
     menu_data = {}
-    for i, day in enumerate(days):
+    for i, day in enumerate(DAY_KEYS):
         row = i + 3  # Dòng 3-8
         menu_data[day] = {}
-        for j, slot in enumerate(slots):
+        for j, slot in enumerate(MEAL_KEYS):
             col = j + 2  # B=2, C=3, ... G=7
             value = ws.cell(row=row, column=col).value
             menu_data[day][slot] = value if value is not None else ""
     
     # Check if menu exists for this week
     menu_item = Menu.query.filter_by(week_number=week_number, year=2025).first()
-    if menu_item:
-        # Update existing menu
-        menu_item.monday_morning = menu_data['mon']['morning']
-        menu_item.monday_snack = menu_data['mon']['snack']
-        menu_item.monday_dessert = menu_data['mon']['dessert']
-        menu_item.monday_lunch = menu_data['mon']['lunch']
-        menu_item.monday_afternoon = menu_data['mon']['afternoon']
-        menu_item.monday_lateafternoon = menu_data['mon']['lateafternoon']
-        
-        menu_item.tuesday_morning = menu_data['tue']['morning']
-        menu_item.tuesday_snack = menu_data['tue']['snack']
-        menu_item.tuesday_dessert = menu_data['tue']['dessert']
-        menu_item.tuesday_lunch = menu_data['tue']['lunch']
-        menu_item.tuesday_afternoon = menu_data['tue']['afternoon']
-        menu_item.tuesday_lateafternoon = menu_data['tue']['lateafternoon']
-        
-        menu_item.wednesday_morning = menu_data['wed']['morning']
-        menu_item.wednesday_snack = menu_data['wed']['snack']
-        menu_item.wednesday_dessert = menu_data['wed']['dessert']
-        menu_item.wednesday_lunch = menu_data['wed']['lunch']
-        menu_item.wednesday_afternoon = menu_data['wed']['afternoon']
-        menu_item.wednesday_lateafternoon = menu_data['wed']['lateafternoon']
-        
-        menu_item.thursday_morning = menu_data['thu']['morning']
-        menu_item.thursday_snack = menu_data['thu']['snack']
-        menu_item.thursday_dessert = menu_data['thu']['dessert']
-        menu_item.thursday_lunch = menu_data['thu']['lunch']
-        menu_item.thursday_afternoon = menu_data['thu']['afternoon']
-        menu_item.thursday_lateafternoon = menu_data['thu']['lateafternoon']
-        
-        menu_item.friday_morning = menu_data['fri']['morning']
-        menu_item.friday_snack = menu_data['fri']['snack']
-        menu_item.friday_dessert = menu_data['fri']['dessert']
-        menu_item.friday_lunch = menu_data['fri']['lunch']
-        menu_item.friday_afternoon = menu_data['fri']['afternoon']
-        menu_item.friday_lateafternoon = menu_data['fri']['lateafternoon']
-        
-        menu_item.saturday_morning = menu_data['sat']['morning']
-        menu_item.saturday_snack = menu_data['sat']['snack']
-        menu_item.saturday_dessert = menu_data['sat']['dessert']
-        menu_item.saturday_lunch = menu_data['sat']['lunch']
-        menu_item.saturday_afternoon = menu_data['sat']['afternoon']
-        menu_item.saturday_lateafternoon = menu_data['sat']['lateafternoon']
-    else:
+    if not menu_item:
         # Create new menu
-        new_menu = Menu(
-            week_number=week_number,
-            year=2025,
-            monday_morning=menu_data['mon']['morning'],
-            monday_snack=menu_data['mon']['snack'],
-            monday_dessert=menu_data['mon']['dessert'],
-            monday_lunch=menu_data['mon']['lunch'],
-            monday_afternoon=menu_data['mon']['afternoon'],
-            monday_lateafternoon=menu_data['mon']['lateafternoon'],
-            
-            tuesday_morning=menu_data['tue']['morning'],
-            tuesday_snack=menu_data['tue']['snack'],
-            tuesday_dessert=menu_data['tue']['dessert'],
-            tuesday_lunch=menu_data['tue']['lunch'],
-            tuesday_afternoon=menu_data['tue']['afternoon'],
-            tuesday_lateafternoon=menu_data['tue']['lateafternoon'],
-            
-            wednesday_morning=menu_data['wed']['morning'],
-            wednesday_snack=menu_data['wed']['snack'],
-            wednesday_dessert=menu_data['wed']['dessert'],
-            wednesday_lunch=menu_data['wed']['lunch'],
-            wednesday_afternoon=menu_data['wed']['afternoon'],
-            wednesday_lateafternoon=menu_data['wed']['lateafternoon'],
-            
-            thursday_morning=menu_data['thu']['morning'],
-            thursday_snack=menu_data['thu']['snack'],
-            thursday_dessert=menu_data['thu']['dessert'],
-            thursday_lunch=menu_data['thu']['lunch'],
-            thursday_afternoon=menu_data['thu']['afternoon'],
-            thursday_lateafternoon=menu_data['thu']['lateafternoon'],
-            
-            friday_morning=menu_data['fri']['morning'],
-            friday_snack=menu_data['fri']['snack'],
-            friday_dessert=menu_data['fri']['dessert'],
-            friday_lunch=menu_data['fri']['lunch'],
-            friday_afternoon=menu_data['fri']['afternoon'],
-            friday_lateafternoon=menu_data['fri']['lateafternoon'],
-            
-            saturday_morning=menu_data['sat']['morning'],
-            saturday_snack=menu_data['sat']['snack'],
-            saturday_dessert=menu_data['sat']['dessert'],
-            saturday_lunch=menu_data['sat']['lunch'],
-            saturday_afternoon=menu_data['sat']['afternoon'],
-            saturday_lateafternoon=menu_data['sat']['lateafternoon']
-        )
-        db.session.add(new_menu)
+        menu_item = Menu(week_number=week_number, year=2025)
+        db.session.add(menu_item)
+    set_menu_data(menu_item, menu_data)
+    touch_menu(menu_item)
     
     db.session.commit()
     flash('Đã import thực đơn từ Excel!', 'success')
@@ -4290,1576 +3674,22 @@ def export_food_safety_process(week_number):
     if session.get('role') not in ['admin', 'teacher']:
         return redirect_no_permission()
     
-    # Lấy thực đơn của tuần (sử dụng Menu model)
-    menu_item = Menu.query.filter_by(week_number=week_number, year=2025).first()
+    # Lấy thực đơn của tuần (theo ?year=, mặc định năm gần nhất)
+    menu_item = _procurement_menu(week_number)
     if not menu_item:
         flash('Không tìm thấy thực đơn!', 'danger')
         return redirect(url_for('main.menu'))
     
-    import json
     if not OPENPYXL_AVAILABLE:
         flash('Chức năng này cần cài đặt openpyxl. Vui lòng liên hệ quản trị viên.', 'warning')
         return redirect(url_for('main.menu'))
     
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, Border, Side, Alignment, PatternFill
-    from io import BytesIO
-    import zipfile
-    from datetime import datetime, timedelta
-    
-    # Convert Menu model data to the same format as old Curriculum JSON
-    menu_data = {
-        'mon': {
-            'morning': menu_item.monday_morning or '',
-            'snack': menu_item.monday_snack or '',
-            'dessert': menu_item.monday_dessert or '',
-            'lunch': menu_item.monday_lunch or '',
-            'afternoon': menu_item.monday_afternoon or '',
-            'lateafternoon': menu_item.monday_lateafternoon or ''
-        },
-        'tue': {
-            'morning': menu_item.tuesday_morning or '',
-            'snack': menu_item.tuesday_snack or '',
-            'dessert': menu_item.tuesday_dessert or '',
-            'lunch': menu_item.tuesday_lunch or '',
-            'afternoon': menu_item.tuesday_afternoon or '',
-            'lateafternoon': menu_item.tuesday_lateafternoon or ''
-        },
-        'wed': {
-            'morning': menu_item.wednesday_morning or '',
-            'snack': menu_item.wednesday_snack or '',
-            'dessert': menu_item.wednesday_dessert or '',
-            'lunch': menu_item.wednesday_lunch or '',
-            'afternoon': menu_item.wednesday_afternoon or '',
-            'lateafternoon': menu_item.wednesday_lateafternoon or ''
-        },
-        'thu': {
-            'morning': menu_item.thursday_morning or '',
-            'snack': menu_item.thursday_snack or '',
-            'dessert': menu_item.thursday_dessert or '',
-            'lunch': menu_item.thursday_lunch or '',
-            'afternoon': menu_item.thursday_afternoon or '',
-            'lateafternoon': menu_item.thursday_lateafternoon or ''
-        },
-        'fri': {
-            'morning': menu_item.friday_morning or '',
-            'snack': menu_item.friday_snack or '',
-            'dessert': menu_item.friday_dessert or '',
-            'lunch': menu_item.friday_lunch or '',
-            'afternoon': menu_item.friday_afternoon or '',
-            'lateafternoon': menu_item.friday_lateafternoon or ''
-        },
-        'sat': {
-            'morning': menu_item.saturday_morning or '',
-            'snack': menu_item.saturday_snack or '',
-            'dessert': menu_item.saturday_dessert or '',
-            'lunch': menu_item.saturday_lunch or '',
-            'afternoon': menu_item.saturday_afternoon or '',
-            'lateafternoon': menu_item.saturday_lateafternoon or ''
-        }
-    }
-    
-    # Lấy thông tin suppliers chi tiết
-    from app.models import Supplier
-    suppliers = Supplier.query.all()
-    supplier_dict = {}
-    for supplier in suppliers:
-        supplier_dict[supplier.name] = {
-            'address': supplier.address or 'Chưa cập nhật địa chỉ',
-            'phone': supplier.phone or 'Chưa cập nhật SĐT',
-            'contact_person': supplier.contact_person or 'Chưa cập nhật người liên hệ',
-            'food_safety_cert': supplier.food_safety_cert or '',
-            'established_date': getattr(supplier, 'established_date', 'Chưa cập nhật')
-        }
-    
-    # Tính số học sinh có mặt theo từng ngày trong tuần
-    def get_daily_attendance_for_week(week_number):
-        """Trả về dict số học sinh có mặt mỗi ngày trong tuần"""
-        from datetime import date
-        year = datetime.now().year
-        week_start = date.fromisocalendar(year, int(week_number), 1)
-        week_dates = [week_start + timedelta(days=i) for i in range(6)]  # Thứ 2 đến Thứ 7
-        
-        daily_attendance = {}
-        days_vn = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat']
-        
-        for i, day in enumerate(week_dates):
-            day_str = day.strftime('%Y-%m-%d')
-            # Đếm số học sinh CÓ MẶT trong ngày này
-            count = AttendanceRecord.query.filter(
-                AttendanceRecord.date == day_str,
-                AttendanceRecord.status == 'Có mặt'
-            ).count()
-            # Nếu không có dữ liệu điểm danh, dùng tổng số học sinh active
-            if count == 0:
-                count = Child.query.filter_by(is_active=True).count()
-            daily_attendance[days_vn[i]] = count
-        
-        return daily_attendance
-    
-    daily_attendance = get_daily_attendance_for_week(week_number)
-    
-    
-
-    # Helper: Lấy nguyên liệu thực tế từ database
-    from app.models import Dish, DishIngredient, Product
-    def get_dish_ingredients(dish_name):
-        dish = Dish.query.filter_by(name=dish_name).first()
-        if not dish:
-            return []
-        return dish.ingredients
-
-    def get_ingredient_info(dish_ingredient, student_count):
-        product = dish_ingredient.product
-        total_qty = dish_ingredient.quantity * student_count
-        return {
-            'name': product.name,
-            'unit': dish_ingredient.unit,
-            'total_qty': total_qty,
-            'supplier': product.supplier.name if product.supplier else '',
-            'supplier_info': {
-                'address': product.supplier.address if product.supplier else '',
-                'phone': product.supplier.phone if product.supplier else '',
-                'contact_person': product.supplier.contact_person if product.supplier else '',
-                'food_safety_cert': product.supplier.food_safety_cert if product.supplier else ''
-            }
-        }
-   
-    
-    # Refactor: Aggregate all ingredients from the actual weekly menu using real dish/ingredient data
-    from collections import defaultdict
-    ingredient_totals = defaultdict(lambda: {'total_qty': 0, 'unit': '', 'category': '', 'supplier': None, 'product': None, 'usage_frequency': 0})
-    dish_by_day = defaultdict(list)  # Lưu món ăn theo từng ngày
-    dishes = set()
-
-    # 1. Lưu món ăn theo từng ngày để tính nguyên liệu theo số học sinh có mặt mỗi ngày
-    days_order = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat']
-    for day in days_order:
-        if day in menu_data:
-            day_data = menu_data[day]
-            for slot_dish in day_data.values():
-                if slot_dish:
-                    # Support both single dish and comma-separated dishes
-                    for dish_name in [d.strip() for d in slot_dish.split(',') if d.strip()]:
-                        dish_by_day[day].append(dish_name)
-                        dishes.add(dish_name)
-
-    # 2. Tính nguyên liệu cho từng ngày với số học sinh có mặt của ngày đó
-    for day, dish_list in dish_by_day.items():
-        students_today = daily_attendance.get(day, 0)
-        if students_today == 0:
-            continue
-            
-        # Đếm số lần mỗi món xuất hiện trong ngày này
-        dish_count_today = defaultdict(int)
-        for dish_name in dish_list:
-            dish_count_today[dish_name] += 1
-        
-        # Tính nguyên liệu cho ngày này
-        for dish_name, count_in_day in dish_count_today.items():
-            dish = Dish.query.filter_by(name=dish_name).first()
-            if not dish:
-                continue
-            for di in dish.ingredients:
-                product = di.product
-                if not product:
-                    continue
-                key = (di.product.name, di.unit, di.product.category, di.product.supplier)
-                # Tính: (lượng/học sinh) × (số học sinh có mặt hôm nay) × (số lần món xuất hiện trong ngày)
-                qty = di.quantity * students_today * count_in_day
-                
-                if key not in ingredient_totals:
-                    ingredient_totals[key] = {'total_qty': 0, 'unit': di.unit, 'category': di.product.category, 'supplier': di.product.supplier, 'product': di.product, 'usage_frequency': 0}
-                ingredient_totals[key]['total_qty'] += qty
-                ingredient_totals[key]['usage_frequency'] += 1
-    
-    # 3. Split into fresh, dry, fruit by category
-    fresh_ingredients_with_qty = []
-    dry_ingredients_with_qty = []
-    fruit_ingredients_with_qty = []
-    
-    def convert_to_kg(quantity, unit):
-        """
-        Convert quantity to kg/lít based on unit
-        - Món ăn thường lưu theo gram/ml cho 1 học sinh
-        - Phiếu tiếp nhận cần kg/lít
-        - Nếu đơn vị là gram/ml → chia 1000
-        - Nếu đơn vị đã là kg/lít → giữ nguyên
-        """
-        unit = unit.lower().strip()
-        
-        # Đơn vị nhỏ (gram, ml) → chuyển sang kg/lít
-        if 'gram' in unit or unit == 'g' or 'gr' in unit:
-            return quantity / 1000
-        elif 'ml' in unit or 'milliliter' in unit:
-            return quantity / 1000
-        # Đơn vị lớn (kg, lít) → giữ nguyên
-        elif 'kg' in unit or 'kilogram' in unit:
-            return quantity
-        elif 'lít' in unit or 'liter' in unit or unit == 'l':
-            return quantity
-        # Đơn vị khác (gói, hộp, quả, củ...) → giữ nguyên
-        else:
-            return quantity
-    
-    for name, info in ingredient_totals.items():
-        # Properly convert to kg based on unit
-        weight_kg = convert_to_kg(info['total_qty'], info['unit'])
-        
-        row = {
-            'name': name[0].title() if isinstance(name, tuple) else str(name).title(),
-            'weight_kg': round(weight_kg, 2),
-            'unit': info['unit'],
-            'category': info['category'],
-            'supplier': info['supplier'],
-            'supplier_info': supplier_dict.get(info['supplier'].name if info['supplier'] else '', {
-                'address': 'Địa chỉ chưa cập nhật',
-                'phone': 'SĐT chưa cập nhật', 
-                'contact_person': 'Người liên hệ chưa cập nhật',
-                'food_safety_cert': 'Chưa có giấy chứng nhận'
-            }),
-            'usage_frequency': info.get('usage_frequency', 0)
-        }
-        cat = (info['category'] or '').lower()
-        if 'tươi' in cat or 'rau' in cat or 'thịt' in cat or 'cá' in cat or 'trứng' in cat:
-            fresh_ingredients_with_qty.append(row)
-        elif 'khô' in cat or 'gia vị' in cat or 'bột' in cat or 'gạo' in cat or 'đường' in cat:
-            dry_ingredients_with_qty.append(row)
-        elif 'trái cây' in cat or 'hoa quả' in cat or 'fruit' in cat:
-            fruit_ingredients_with_qty.append(row)
-        else:
-            # Default: fresh if unknown
-            fresh_ingredients_with_qty.append(row)
-
-    # Sort by usage frequency
-    fresh_ingredients_with_qty.sort(key=lambda x: x['usage_frequency'], reverse=True)
-    dry_ingredients_with_qty.sort(key=lambda x: x['usage_frequency'], reverse=True)
-    fruit_ingredients_with_qty.sort(key=lambda x: x['usage_frequency'], reverse=True)
-    
-    zip_buffer = BytesIO()
-    
-    with zipfile.ZipFile(zip_buffer, 'w') as zipf:
-        
-        # BƯỚC 1.1: Tiếp nhận thực phẩm tươi - Xuất mỗi ngày 1 sheet, đúng menu/ngày
-        from datetime import date, timedelta, datetime
-        year = datetime.now().year
-        week_start = date.fromisocalendar(year, int(week_number), 1)
-        days_vn = ["Thứ 2", "Thứ 3", "Thứ 4", "Thứ 5", "Thứ 6", "Thứ 7"]
-        wb1 = Workbook()
-        # Style
-        from openpyxl.styles import Font, Border, Side, Alignment, PatternFill
-        thin_border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
-        thick_border = Border(left=Side(style='medium'), right=Side(style='medium'), top=Side(style='medium'), bottom=Side(style='medium'))
-        for day_offset in range(6):
-            day_date = week_start + timedelta(days=day_offset)
-            day_key = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat'][day_offset]
-            safe_date = day_date.strftime('%d-%m')  # Không dùng dấu '/'
-            sheet_title = f"{days_vn[day_offset]} ({safe_date})"
-            if day_offset == 0:
-                ws1 = wb1.active
-                ws1.title = sheet_title
-            else:
-                ws1 = wb1.create_sheet(title=sheet_title)
-            # Lấy menu ngày
-            menu_today = menu_data.get(day_key, {})
-            # Lấy số học sinh có mặt ngày này
-            students_today = daily_attendance.get(day_key, 0)
-            # Tính nguyên liệu thực tế cho ngày này
-            daily_ingredients = {}
-            for meal in menu_today.values():
-                if not meal: continue
-                for dish_name in [d.strip() for d in meal.split(',') if d.strip()]:
-                    dish = Dish.query.filter_by(name=dish_name).first()
-                    if dish:
-                        for di in dish.ingredients:
-                            key = (di.product.name, di.unit, di.product.category, di.product.supplier)
-                            qty = di.quantity * students_today
-                            if key not in daily_ingredients:
-                                daily_ingredients[key] = {'total_qty': 0, 'unit': di.unit, 'category': di.product.category, 'supplier': di.product.supplier, 'product': di.product}
-                            daily_ingredients[key]['total_qty'] += qty
-            # Phân loại tươi (sử dụng logic giống như tính toán tuần)
-            fresh_ingredients = []
-            for (name, unit, category, supplier), info in daily_ingredients.items():
-                cat = (category or '').lower()
-                if 'tươi' in cat or 'rau' in cat or 'thịt' in cat or 'cá' in cat or 'trứng' in cat or cat == 'fresh':
-                    # supplier có thể là object, cần lấy tên hoặc chuỗi
-                    if hasattr(supplier, 'name'):
-                        supplier_name = supplier.name
-                    elif isinstance(supplier, str):
-                        supplier_name = supplier
-                    else:
-                        supplier_name = ''
-                    
-                    # Use the same convert_to_kg function for consistency
-                    weight_kg = convert_to_kg(info['total_qty'], info['unit'])
-                    
-                    fresh_ingredients.append({
-                        'name': name,
-                        'weight_kg': round(weight_kg, 2),
-                        'unit': unit,
-                        'category': category,
-                        'supplier': supplier_name,
-                        'supplier_info': supplier_dict.get(supplier_name, {}),
-                    })
-            # --- Ghi dữ liệu và style sheet như cũ ---
-            ws1['A1'] = "TÊN CƠ SỞ: MNĐL Cây Nhỏ"
-            ws1['A1'].font = Font(bold=True, size=12)
-            ws1['A1'].fill = PatternFill(start_color="FFE6CC", end_color="FFE6CC", fill_type="solid")
-            ws1.merge_cells('A1:P1')
-            ws1['D2'] = "BIỂU MẪU KIỂM TRA TRƯỚC KHI CHẾ BIẾN THỨC ĂN"
-            ws1['D2'].font = Font(bold=True, size=14, color="FF0000")
-            ws1['D2'].alignment = Alignment(horizontal='center', vertical='center')
-            ws1.merge_cells('D2:M2')
-            ws1['O2'] = "Số: 1246/QĐ - Bộ Y Tế"
-            ws1['O2'].font = Font(bold=True, size=10)
-            ws1['O2'].fill = PatternFill(start_color="FFCCCC", end_color="FFCCCC", fill_type="solid")
-            info_data = [
-                (3, 'A', f"Người kiểm tra: Nguyễn Thị Vân", 'O', "Mẫu số 1.1"),
-                (4, 'A', f"Ngày kiểm tra: {day_date.strftime('%d/%m/%Y')} - {days_vn[day_offset]}", 'O', f"Số học sinh: {students_today}"),
-                (5, 'A', "Địa điểm: Bếp ăn Trường MNĐL Cây Nhỏ", 'O', "Phiên bản: v2.0")
-            ]
-            for row, col_a, text_a, col_o, text_o in info_data:
-                ws1[f'{col_a}{row}'] = text_a
-                ws1[f'{col_a}{row}'].font = Font(bold=True, size=10)
-                ws1[f'{col_o}{row}'] = text_o
-                ws1[f'{col_o}{row}'].font = Font(bold=True, size=10)
-                ws1[f'{col_o}{row}'].fill = PatternFill(start_color="E6F3FF", end_color="E6F3FF", fill_type="solid")
-            ws1['A7'] = "PHẦN I: THỰC PHẨM TƯƠI SỐNG, ĐÔNG LẠNH (Thịt, cá, rau, củ, quả...)"
-            ws1['A7'].font = Font(bold=True, size=12, color="0066CC")
-            ws1['A7'].fill = PatternFill(start_color="E6F3FF", end_color="E6F3FF", fill_type="solid")
-            ws1.merge_cells('A7:M7')
-            ws1['O7'] = "BƯỚC 1.1"
-            ws1['O7'].font = Font(bold=True, size=12, color="FF0000")
-            ws1['O7'].fill = PatternFill(start_color="FFEEEE", end_color="FFEEEE", fill_type="solid")
-            headers_main = [
-                'STT', 'TÊN THỰC PHẨM', 'THỜI GIAN NHẬP\n(Ngày/Giờ)', 
-                'KHỐI LƯỢNG\n(kg/lít)', 'NƠI CUNG CẤP', '', '', 'SỐ CHỨNG TỪ/SỐ HOÁ ĐƠN',
-                'GIẤY ĐĂNG KÝ VỚI THÚ Y', 'GIẤY KIỂM DỊCH',
-                'KIỂM TRA CẢM QUAN', '',
-                'XÉT NGHIỆM NHANH', '',
-                'BIỆN PHÁP XỬ LÝ/ GHI CHÚ'
-            ]
-            for i, header in enumerate(headers_main, 1):
-                cell = ws1.cell(row=8, column=i, value=header)
-                cell.font = Font(bold=True, size=9, color="FFFFFF")
-                cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-                cell.fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-                cell.border = thick_border
-            sub_headers = [
-                '', '', '', '', 'Tên cơ sở', 'SĐT/Địa chỉ', 'Người Giao Hàng', '','', '',
-                'Đạt', 'Không đạt', 'Đạt', 'Không đạt', ''
-            ]
-            for i, header in enumerate(sub_headers, 1):
-                cell = ws1.cell(row=9, column=i, value=header)
-                cell.font = Font(bold=True, size=8)
-                cell.alignment = Alignment(horizontal='center', vertical='center')
-                cell.fill = PatternFill(start_color="B4C6E7", end_color="B4C6E7", fill_type="solid")
-                cell.border = thin_border
-            ws1.merge_cells('E8:G8')
-            ws1.merge_cells('K8:L8')
-            ws1.merge_cells('M8:N8')
-
-            # Số thứ tự cột
-            for i in range(1, 16):
-                cell = ws1.cell(row=10, column=i, value=i)
-                cell.font = Font(bold=True, size=8)
-                cell.alignment = Alignment(horizontal='center', vertical='center')
-                cell.fill = PatternFill(start_color="B4C6E7", end_color="B4C6E7", fill_type="solid")
-                cell.border = thin_border
-            # Ghi dữ liệu thực phẩm tươi từng ngày
-            for i, ingredient_info in enumerate(fresh_ingredients[:25], 1):
-                row_num = 10 + i
-                supplier_info = ingredient_info.get('supplier_info', {})
-                supplier_name = ingredient_info.get('supplier', '') or 'CTY TNHH Thực phẩm An toàn'
-                phone = supplier_info.get('phone', '0902.xxx.xxx')
-                address = supplier_info.get('address', 'Đà Lạt')
-                contact_person = supplier_info.get('contact_person', 'Chưa cập nhật')
-                data_row = [
-                    i,
-                    ingredient_info['name'].upper(),
-                    f"{day_date.strftime('%d/%m/%Y')}\n6:00-7:00",
-                    f"{ingredient_info['weight_kg']} kg",
-                    supplier_name,
-                    f"{phone}\n{address[:30]}...",
-                    contact_person,
-                    '',  # Để trống SỐ CHỨNG TỪ/SỐ HOÁ ĐƠN
-                    supplier_info.get('food_safety_cert', ''),
-                    "",
-                    '✓',
-                    '',
-                    '✓',
-                    '',
-                    ""
-                ]
-                for j, value in enumerate(data_row, 1):
-                    cell = ws1.cell(row=row_num, column=j, value=value)
-                    cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-                    cell.border = thin_border
-                    if j == 1:
-                        cell.font = Font(bold=True, color="0066CC")
-                        cell.fill = PatternFill(start_color="F2F2F2", end_color="F2F2F2", fill_type="solid")
-                    elif j == 2:
-                        cell.font = Font(bold=True, size=10)
-                        cell.fill = PatternFill(start_color="FFF2CC", end_color="FFF2CC", fill_type="solid")
-                    elif j in [11, 13] and value == '✓':
-                        cell.font = Font(bold=True, size=12, color="00AA00")
-                        cell.fill = PatternFill(start_color="E2EFDA", end_color="E2EFDA", fill_type="solid")
-                    elif j == 5:
-                        cell.font = Font(bold=True, color="CC6600")
-            # Thống kê
-            stats_row = len(fresh_ingredients) + 12
-            ws1[f'A{stats_row}'] = "THỐNG KÊ TỔNG QUAN:"
-            ws1[f'A{stats_row}'].font = Font(bold=True, size=11, color="0066CC")
-            ws1[f'A{stats_row}'].fill = PatternFill(start_color="E6F3FF", end_color="E6F3FF", fill_type="solid")
-            total_weight = sum(item['weight_kg'] for item in fresh_ingredients)
-            total_items = len(fresh_ingredients)
-            stats_info = [
-                f"• Tổng số loại thực phẩm tươi: {total_items} loại",
-                f"• Tổng khối lượng ước tính: {total_weight:.1f} kg",
-                f"• Số học sinh phục vụ: {students_today} em",
-                f"• Khối lượng trung bình/học sinh: {(total_weight/students_today):.2f} kg/em/ngày" if students_today else "• Khối lượng trung bình/học sinh: N/A"
-            ]
-            for i, stat in enumerate(stats_info, 1):
-                ws1[f'A{stats_row + i}'] = stat
-                ws1[f'A{stats_row + i}'].font = Font(size=10)
-            note_row = stats_row + 6
-            ws1[f'A{note_row}'] = "GHI CHÚ QUAN TRỌNG:"
-            ws1[f'A{note_row}'].font = Font(bold=True, size=11, color="FF0000")
-            notes = [
-                "• Kiểm tra nhiệt độ bảo quản: Thực phẩm tươi <4°C, đông lạnh <-18°C",
-                "• Thời gian sử dụng: Thực phẩm tươi trong ngày, đông lạnh theo hạn sử dụng",  
-                "• Xét nghiệm nhanh: Ưu tiên thực phẩm có nguồn gốc không rõ ràng",
-                "• Báo cáo ngay nếu phát hiện bất thường về màu sắc, mùi vị, bao bì"
-            ]
-            for i, note in enumerate(notes, 1):
-                ws1[f'A{note_row + i}'] = note
-                ws1[f'A{note_row + i}'].font = Font(size=9, color="CC0000")
-            signature_row = note_row + 7
-            signature_data = [
-                (signature_row, 'D', "BẾP TRƯỞNG", 'K', "HIỆU TRƯỞNG"),
-                (signature_row + 1, 'D', "(Ký, ghi rõ họ tên)", 'K', "(Ký, ghi rõ họ tên)"),
-                (signature_row + 5, 'D', "Hoàng Thanh Tuấn", 'K', "Nguyễn Thị Vân"),
-                (signature_row + 6, 'D', f"Ngày {day_date.day}/{day_date.month}/{day_date.year}",
-                 'K',
-                 f"Ngày {day_date.day}/{day_date.month}/{day_date.year}")
-            ]
-            for row, col_d, text_d, col_k, text_k in signature_data:
-                ws1[f'{col_d}{row}'] = text_d
-                ws1[f'{col_k}{row}'] = text_k
-                for col, text in [(col_d, text_d), (col_k, text_k)]:
-                    cell = ws1[f'{col}{row}']
-                    cell.alignment = Alignment(horizontal='center', vertical='center')
-                    if row == signature_row:
-                        cell.font = Font(bold=True, size=12, color="0066CC")
-                        cell.fill = PatternFill(start_color="F2F2F2", end_color="F2F2F2", fill_type="solid")
-                    elif row == signature_row + 1:
-                        cell.font = Font(italic=True, size=9)
-                    elif row == signature_row + 5:
-                        cell.font = Font(bold=True, size=11)
-                    else:
-                        cell.font = Font(size=9)
-            
-            # Page setup cho in A4
-            ws1.page_setup.orientation = ws1.ORIENTATION_LANDSCAPE
-            ws1.page_setup.paperSize = ws1.PAPERSIZE_A4
-            ws1.page_setup.fitToPage = True
-            ws1.page_setup.fitToWidth = 1
-            ws1.page_setup.fitToHeight = 0
-            ws1.print_options.horizontalCentered = True
-            ws1.page_margins.left = 0.5
-            ws1.page_margins.right = 0.5
-            ws1.page_margins.top = 0.75
-            ws1.page_margins.bottom = 0.75
-        
-        if 'Sheet' in wb1.sheetnames:
-            wb1.remove(wb1['Sheet'])
-        file1_buffer = BytesIO()
-        wb1.save(file1_buffer)
-        file1_buffer.seek(0)
-        zipf.writestr(f"Bước 1.1 - Tiếp nhận thực phẩm tươi - Tuần {week_number}.xlsx", file1_buffer.read())
-        
-        # BƯỚC 1.2: Tiếp nhận thực phẩm khô - Format chuyên nghiệp 
-
-        # BƯỚC 1.2: Tiếp nhận thực phẩm khô - mỗi ngày 1 sheet, chỉ tạo wb2 1 lần
-        wb2 = Workbook()
-        days_vn = ["Thứ 2", "Thứ 3", "Thứ 4", "Thứ 5", "Thứ 6", "Thứ 7"]
-        for day_offset in range(6):
-            day_date = week_start + timedelta(days=day_offset)
-            day_key = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat'][day_offset]
-            safe_date = day_date.strftime('%d-%m')
-            sheet_title = f"{days_vn[day_offset]} ({safe_date})"
-            if day_offset == 0:
-                ws2 = wb2.active
-                ws2.title = sheet_title
-            else:
-                ws2 = wb2.create_sheet(title=sheet_title)
-            # Lấy menu ngày
-            menu_today = menu_data.get(day_key, {})
-            # Lấy số học sinh có mặt ngày này
-            students_today = daily_attendance.get(day_key, 0)
-            # Tính nguyên liệu thực tế cho ngày này
-            daily_ingredients = {}
-            for meal in menu_today.values():
-                if not meal: continue
-                for dish_name in [d.strip() for d in meal.split(',') if d.strip()]:
-                    dish = Dish.query.filter_by(name=dish_name).first()
-                    if dish:
-                        for di in dish.ingredients:
-                            key = (di.product.name, di.unit, di.product.category, di.product.supplier)
-                            qty = di.quantity * students_today
-                            if key not in daily_ingredients:
-                                daily_ingredients[key] = {'total_qty': 0, 'unit': di.unit, 'category': di.product.category, 'supplier': di.product.supplier, 'product': di.product}
-                            daily_ingredients[key]['total_qty'] += qty
-            # Phân loại khô
-            dry_ingredients = []
-            for (name, unit, category, supplier), info in daily_ingredients.items():
-                cat = (category or '').lower()
-                if cat == 'dry' or 'khô' in cat or 'gia vị' in cat or 'bột' in cat or 'gạo' in cat or 'đường' in cat:
-                    if hasattr(supplier, 'name'):
-                        supplier_name = supplier.name
-                    elif isinstance(supplier, str):
-                        supplier_name = supplier
-                    else:
-                        supplier_name = ''
-                    dry_ingredients.append({
-                        'name': name,
-                        'weight_kg': round(convert_to_kg(info['total_qty'], info['unit']), 2),
-                        'unit': unit,
-                        'category': category,
-                        'supplier': supplier_name,
-                        'supplier_info': supplier_dict.get(supplier_name, {}),
-                    })
-            # --- Ghi dữ liệu và style sheet như Bước 1.1 ---
-            ws2['A1'] = "TÊN CƠ SỞ: MNĐL Cây Nhỏ"
-            ws2['A1'].font = Font(bold=True, size=12)
-            ws2['A1'].fill = PatternFill(start_color="FFE6CC", end_color="FFE6CC", fill_type="solid")
-            ws2.merge_cells('A1:P1')
-            ws2['D2'] = "BIỂU MẪU KIỂM TRA THỰC PHẨM KHÔ VÀ BAO GÓI"
-            ws2['D2'].font = Font(bold=True, size=14, color="FF0000")
-            ws2['D2'].alignment = Alignment(horizontal='center', vertical='center')
-            ws2.merge_cells('D2:L2')
-            ws2['N2'] = "Số: 1246/QĐ - Bộ Y Tế"
-            ws2['N2'].font = Font(bold=True, size=10)
-            ws2['N2'].fill = PatternFill(start_color="FFCCCC", end_color="FFCCCC", fill_type="solid")
-            info_data2 = [
-                (3, 'A', f"Người kiểm tra: Nguyễn Thị Vân", 'N', "Mẫu số 1.2"),
-                (4, 'A', f"Ngày kiểm tra: {day_date.strftime('%d/%m/%Y')} - {days_vn[day_offset]}", 'N', f"Số học sinh: {students_today}"),
-                (5, 'A', "Địa điểm: Kho thực phẩm khô - MNĐL Cây Nhỏ", 'N', "")
-            ]
-            for row, col_a, text_a, col_n, text_n in info_data2:
-                ws2[f'{col_a}{row}'] = text_a
-                ws2[f'{col_a}{row}'].font = Font(bold=True, size=10)
-                ws2[f'{col_n}{row}'] = text_n
-                ws2[f'{col_n}{row}'].font = Font(bold=True, size=10)
-                ws2[f'{col_n}{row}'].fill = PatternFill(start_color="F0F8FF", end_color="F0F8FF", fill_type="solid")
-            ws2['A7'] = "PHẦN II: THỰC PHẨM KHÔ, BAO GÓI SẴN VÀ PHỤ GIA THỰC PHẨM"
-            ws2['A7'].font = Font(bold=True, size=12, color="FF6600")
-            ws2['A7'].fill = PatternFill(start_color="FFF2E6", end_color="FFF2E6", fill_type="solid")
-            ws2.merge_cells('A7:M7')
-            ws2['N7'] = "BƯỚC 1.2"
-            ws2['N7'].font = Font(bold=True, size=12, color="FF0000")
-            ws2['N7'].fill = PatternFill(start_color="FFEEEE", end_color="FFEEEE", fill_type="solid")
-            headers2_main = [
-                'STT', 'TÊN THỰC PHẨM', 'TÊN CƠ SỞ SẢN XUẤT', 
-                'ĐỊA CHỈ SẢN XUẤT', 'THỜI GIAN NHẬP\n(Ngày/Giờ)', 'KHỐI LƯỢNG (KG/LÍT)', 'NƠI CUNG CẤP', '', '',
-                'HẠN SỬ DỤNG', 'ĐIỀU KIỆN BẢO QUẢN', 'CHỨNG TỪ, HOÁ ĐƠN', 'KIỂM TRA CẢM QUAN', '', 'BIỆN PHÁP XỬ LÝ / GHI CHÚ'
-            ]
-            for i, header in enumerate(headers2_main, 1):
-                cell = ws2.cell(row=8, column=i, value=header)
-                cell.font = Font(bold=True, size=9, color="FFFFFF")
-                cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-                cell.fill = PatternFill(start_color="E67E22", end_color="E67E22", fill_type="solid")
-                cell.border = thick_border
-            sub_headers2 = [
-                '', '', '', '', '', '', '', 'Tên cơ sở', '', '', '', '', 
-                'Đạt', 'Không đạt', ''
-            ]
-            for i, header in enumerate(sub_headers2, 1):
-                cell = ws2.cell(row=9, column=i, value=header)
-                cell.font = Font(bold=True, size=8)
-                cell.alignment = Alignment(horizontal='center', vertical='center')
-                cell.fill = PatternFill(start_color="F8C471", end_color="F8C471", fill_type="solid")
-                cell.border = thin_border
-            ws2.merge_cells('G8:I8')  # Nơi cung cấp
-            ws2.merge_cells('M8:N8')  # Kiểm tra cảm quan
-            for i in range(1, 16):
-                cell = ws2.cell(row=10, column=i, value=i)
-                cell.font = Font(bold=True, size=8)
-                cell.alignment = Alignment(horizontal='center', vertical='center')
-                cell.fill = PatternFill(start_color="FADBD8", end_color="FADBD8", fill_type="solid")
-                cell.border = thin_border
-            # Ghi dữ liệu thực phẩm khô từng ngày
-            for i, ingredient_info in enumerate(dry_ingredients[:25], 1):
-                row_num = 10 + i
-                supplier_info = ingredient_info.get('supplier_info', {})
-                supplier_name = ingredient_info.get('supplier', '') or 'Siêu thị Co.opmart'
-                phone = supplier_info.get('phone', '0902.xxx.xxx')
-                address = supplier_info.get('address', 'Đà Lạt')
-                contact_person = supplier_info.get('contact_person', 'Chưa cập nhật')
-                expiry_date = (day_date + timedelta(days=180)).strftime('%d/%m/%Y')
-                # Đồng bộ với headers2_main mới
-                data_row2 = [
-                    i,  # STT
-                    ingredient_info['name'].upper(),  # TÊN THỰC PHẨM
-                    supplier_name,  # TÊN CƠ SỞ SẢN XUẤT (giả định là supplier)
-                    address,  # ĐỊA CHỈ SẢN XUẤT (giả định là address supplier)
-                    f"{day_date.strftime('%d/%m/%Y')}\n8:00-9:00",  # THỜI GIAN NHẬP
-                    f"{ingredient_info['weight_kg']} kg",  # KHỐI LƯỢNG
-                    supplier_name,  # NƠI CUNG CẤP
-                    '',  # cột phụ (merge)
-                    '',  # cột phụ (merge)
-                    "còn HDS",  # HẠN SỬ DỤNG
-                    "Khô ráo, thoáng mát\n<25°C",  # ĐIỀU KIỆN BẢO QUẢN
-                    '',  # CHỨNG TỪ, HOÁ ĐƠN (chưa có)
-                    '✓',  # KIỂM TRA CẢM QUAN (Đạt)
-                    '',  # Không đạt
-                    '',  # BIỆN PHÁP XỬ LÝ / GHI CHÚ
-                ]
-                for j, value in enumerate(data_row2, 1):
-                    cell = ws2.cell(row=row_num, column=j, value=value)
-                    cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-                    cell.border = thin_border
-                    if j == 1:
-                        cell.font = Font(bold=True, color="E67E22")
-                        cell.fill = PatternFill(start_color="F2F2F2", end_color="F2F2F2", fill_type="solid")
-                    elif j == 2:
-                        cell.font = Font(bold=True, size=10)
-                        cell.fill = PatternFill(start_color="FEF9E7", end_color="FEF9E7", fill_type="solid")
-                    elif j == 13 and value == '✓':
-                        cell.font = Font(bold=True, size=12, color="27AE60")
-                        cell.fill = PatternFill(start_color="E8F5E8", end_color="E8F5E8", fill_type="solid")
-                    elif j == 4:
-                        cell.font = Font(bold=True, color="D35400")
-                    elif j == 11:
-                        cell.font = Font(bold=True, color="8E44AD")
-            # Thống kê
-            stats_row2 = len(dry_ingredients) + 12
-            ws2[f'A{stats_row2}'] = "THỐNG KÊ THỰC PHẨM KHÔ:"
-            ws2[f'A{stats_row2}'].font = Font(bold=True, size=11, color="E67E22")
-            ws2[f'A{stats_row2}'].fill = PatternFill(start_color="FFF2E6", end_color="FFF2E6", fill_type="solid")
-            total_weight2 = sum(item['weight_kg'] for item in dry_ingredients)
-            total_items2 = len(dry_ingredients)
-            stats_info2 = [
-                f"• Tổng số loại thực phẩm khô: {total_items2} loại",
-                f"• Tổng khối lượng ước tính: {total_weight2:.1f} kg",
-                f"• Số học sinh phục vụ: {students_today} em",
-                f"• Khối lượng trung bình/học sinh: {(total_weight2/students_today):.2f} kg/em/ngày" if students_today else "• Khối lượng trung bình/học sinh: N/A"
-            ]
-            for i, stat in enumerate(stats_info2, 1):
-                ws2[f'A{stats_row2 + i}'] = stat
-                ws2[f'A{stats_row2 + i}'].font = Font(size=10)
-            note_row2 = stats_row2 + 6
-            ws2[f'A{note_row2}'] = "GHI CHÚ QUAN TRỌNG:"
-            ws2[f'A{note_row2}'].font = Font(bold=True, size=11, color="FF0000")
-            notes2 = [
-                "• Bảo quản nơi khô ráo, thoáng mát, tránh ánh nắng trực tiếp",
-                "• Kiểm tra hạn sử dụng, bao bì nguyên vẹn trước khi nhập kho",
-                "• Sử dụng theo nguyên tắc FIFO (nhập trước xuất trước)",
-                "• Báo cáo ngay nếu phát hiện bất thường về màu sắc, mùi vị, bao bì"
-            ]
-            for i, note in enumerate(notes2, 1):
-                ws2[f'A{note_row2 + i}'] = note
-                ws2[f'A{note_row2 + i}'].font = Font(size=9, color="CC0000")
-            signature_row2 = note_row2 + 7
-            signature_data2 = [
-                (signature_row2, 'D', "THỦ KHO", 'K', "HIỆU TRƯỞNG"),
-                (signature_row2 + 1, 'D', "(Ký, ghi rõ họ tên)", 'K', "(Ký, ghi rõ họ tên)"),
-                (signature_row2 + 5, 'D', "Hoàng Thanh Tuấn", 'K', "Nguyễn Thị Vân"),
-                (signature_row2 + 6, 'D', f"Ngày {day_date.day}/{day_date.month}/{day_date.year}", 'K', f"Ngày {day_date.day}/{day_date.month}/{day_date.year}")
-            ]
-            for row, col_d, text_d, col_k, text_k in signature_data2:
-                ws2[f'{col_d}{row}'] = text_d
-                ws2[f'{col_k}{row}'] = text_k
-                for col, text in [(col_d, text_d), (col_k, text_k)]:
-                    cell = ws2[f'{col}{row}']
-                    cell.alignment = Alignment(horizontal='center', vertical='center')
-                    if row == signature_row2:
-                        cell.font = Font(bold=True, size=12, color="E67E22")
-                        cell.fill = PatternFill(start_color="F2F2F2", end_color="F2F2F2", fill_type="solid")
-                    elif row == signature_row2 + 1:
-                        cell.font = Font(italic=True, size=9)
-                    elif row == signature_row2 + 5:
-                        cell.font = Font(bold=True, size=11)
-                    else:
-                        cell.font = Font(size=9)
-            
-            # Page setup cho in A4
-            ws2.page_setup.orientation = ws2.ORIENTATION_LANDSCAPE
-            ws2.page_setup.paperSize = ws2.PAPERSIZE_A4
-            ws2.page_setup.fitToPage = True
-            ws2.page_setup.fitToWidth = 1
-            ws2.page_setup.fitToHeight = 0
-            ws2.print_options.horizontalCentered = True
-            ws2.page_margins.left = 0.5
-            ws2.page_margins.right = 0.5
-            ws2.page_margins.top = 0.75
-            ws2.page_margins.bottom = 0.75
-        
-        if 'Sheet' in wb2.sheetnames:
-            wb2.remove(wb2['Sheet'])
-        file2_buffer = BytesIO()
-        wb2.save(file2_buffer)
-        file2_buffer.seek(0)
-        zipf.writestr(f"Bước 1.2 - Tiếp nhận thực phẩm khô - Tuần {week_number}.xlsx", file2_buffer.read())
-
-        # BƯỚC 2: Kiểm tra khi chế biến thức ăn - mỗi ngày 1 sheet
-        wb3 = Workbook()
-        days_vn = ["Thứ 2", "Thứ 3", "Thứ 4", "Thứ 5", "Thứ 6", "Thứ 7"]
-        for day_offset in range(6):
-            day_date = week_start + timedelta(days=day_offset)
-            day_key = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat'][day_offset]
-            safe_date = day_date.strftime('%d-%m')
-            sheet_title = f"{days_vn[day_offset]} ({safe_date})"
-            if day_offset == 0:
-                ws3 = wb3.active
-                ws3.title = sheet_title
-            else:
-                ws3 = wb3.create_sheet(title=sheet_title)
-            # Lấy số học sinh có mặt ngày này
-            students_today = daily_attendance.get(day_key, 0)
-            # Header chính tương tự các bước trước
-            ws3['A1'] = "TÊN CƠ SỞ: MNĐL Cây Nhỏ"
-            ws3['A1'].font = Font(bold=True, size=12)
-            ws3['A1'].fill = PatternFill(start_color="E6FFE6", end_color="E6FFE6", fill_type="solid")
-            ws3.merge_cells('A1:O1')
-            ws3['D2'] = "BIỂU MẪU KIỂM TRA KHI CHẾ BIẾN THỨC ĂN"
-            ws3['D2'].font = Font(bold=True, size=14, color="006600")
-            ws3['D2'].alignment = Alignment(horizontal='center', vertical='center')
-            ws3.merge_cells('D2:K2')
-            ws3['M2'] = "Số: 1246/QĐ - Bộ Y Tế"
-            ws3['M2'].font = Font(bold=True, size=10)
-            ws3['M2'].fill = PatternFill(start_color="CCFFCC", end_color="CCFFCC", fill_type="solid")
-            info_data3 = [
-                (3, 'A', f"Người kiểm tra: Nguyễn Thị Vân", 'M', "Mẫu số 2.0"),
-                (4, 'A', f"Ngày kiểm tra: {day_date.strftime('%d/%m/%Y')} - {days_vn[day_offset]}", 'M', f"Số học sinh: {students_today}"),
-                (5, 'A', "Địa điểm: Bếp chế biến - MNĐL Cây Nhỏ", 'M', "")
-            ]
-            for row, col_a, text_a, col_m, text_m in info_data3:
-                ws3[f'{col_a}{row}'] = text_a
-                ws3[f'{col_a}{row}'].font = Font(bold=True, size=10)
-                ws3[f'{col_m}{row}'] = text_m
-                ws3[f'{col_m}{row}'].font = Font(bold=True, size=10)
-                ws3[f'{col_m}{row}'].fill = PatternFill(start_color="F0F8FF", end_color="F0F8FF", fill_type="solid")
-            ws3['A7'] = "PHẦN II: KIỂM TRA QUY TRÌNH CHẾ BIẾN THỨC ĂN"
-            ws3['A7'].font = Font(bold=True, size=12, color="8B0000")
-            ws3['A7'].fill = PatternFill(start_color="FFE6E6", end_color="FFE6E6", fill_type="solid")
-            ws3.merge_cells('A7:L7')
-            ws3['M7'] = "BƯỚC 2"
-            ws3['M7'].font = Font(bold=True, size=12, color="FF0000")
-            ws3['M7'].fill = PatternFill(start_color="FFEEEE", end_color="FFEEEE", fill_type="solid")
-            headers3_main = [
-                'STT', 'CA/BỮA ĂN', 'TÊN MÓN ĂN', 'NGUYÊN LIỆU CHÍNH', 'SỐ SUẤT\n(phần)', 
-                'THỜI GIAN SƠ CHẾ XONG\n(ngày, giờ)', 'THỜI GIAN CHẾ BIẾN XONG\n(ngày, giờ)', 'KIỂM TRA VỆ SINH', '', '',
-                'KIỂM TRA CẢM QUAN THỨC ĂN', '', 'BIỆN PHÁP XỬ LÝ\nGHI CHÚ'
-            ]
-            for i, header in enumerate(headers3_main, 1):
-                cell = ws3.cell(row=8, column=i, value=header)
-                cell.font = Font(bold=True, size=9, color="FFFFFF")
-                cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-                cell.fill = PatternFill(start_color="8B0000", end_color="8B0000", fill_type="solid")
-                cell.border = thick_border
-            sub_headers3 = [
-                '', '', '', '', '', '', '', 'Người tham gia\n chế biến', 'Trang thiết bị\n dụng cụ', 'Khu vực chế biến\n và phụ trợ',
-                'Đạt', 'Không đạt', ''
-            ]
-            for i, header in enumerate(sub_headers3, 1):
-                cell = ws3.cell(row=9, column=i, value=header)
-                cell.font = Font(bold=True, size=8)
-                cell.alignment = Alignment(horizontal='center', vertical='center')
-                cell.fill = PatternFill(start_color="CD5C5C", end_color="CD5C5C", fill_type="solid")
-                cell.border = thin_border
-
-            # Đặt độ rộng và căn giữa cho H9, I9, J9
-            ws3.column_dimensions['H'].width = 18
-            ws3.column_dimensions['I'].width = 18
-            ws3.column_dimensions['J'].width = 18
-            for col in ['H', 'I', 'J']:
-                cell = ws3[f'{col}9']
-                cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-            ws3.merge_cells('H8:J8')  # Vệ sinh, Cảm quan
-            ws3.merge_cells('K8:L8')  # Đánh giá phục vụ
-            for i in range(1, 14):
-                cell = ws3.cell(row=10, column=i, value=i)
-                cell.font = Font(bold=True, size=8)
-                cell.alignment = Alignment(horizontal='center', vertical='center')
-                cell.fill = PatternFill(start_color="F0F8FF", end_color="F0F8FF", fill_type="solid")
-                cell.border = thin_border
-            # Ghi dữ liệu món ăn từng ngày (tương tự logic cũ, chỉ cho ngày này)
-            row_num = 11
-            stt = 1
-            meal_times = {
-                'morning': 'Bữa sáng',
-                'snack': 'Ăn phụ sáng',
-                'dessert': 'Tráng miệng',
-                'lunch': 'Bữa trưa',
-                'afternoon': 'Ăn phụ chiều',
-                'lateafternoon': 'Bữa xế',
-            }
-            # Giờ chuẩn cho từng ca (giờ_sơ_chế, giờ_chế_biến)
-            meal_time_hours = {
-                'morning':   ('07:00', '07:25'),
-                'snack':     ('09:00', '10:00'),
-                'dessert':   ('09:00', '10:00'),
-                'lunch':     ('09:00', '10:00'),
-                'afternoon': ('09:00', '10:00'),
-                'lateafternoon': ('14:00', '14:25')
-            }
-            # Lặp đủ 5 ca dựa trên meal_times
-            for meal_key, meal_name in meal_times.items():
-                dishes = []
-                if menu_data[day_key].get(meal_key):
-                    dishes = [d.strip() for d in menu_data[day_key][meal_key].split(',') if d.strip()]
-                # Không lọc, lấy toàn bộ món trong menu từng bữa
-                if dishes:
-                    dish_names = ', '.join([dish.title() for dish in dishes])
-                    all_ingredients = set()
-                    for dish in dishes:
-                        dish_obj = Dish.query.filter_by(name=dish).first()
-                        if dish_obj and dish_obj.ingredients:
-                            for di in dish_obj.ingredients:
-                                all_ingredients.add(di.product.name)
-                    main_ingredients = ', '.join(sorted(all_ingredients))
-                else:
-                    dish_names = ''
-                    main_ingredients = ''
-                # Tạo giá trị thời gian sơ chế xong, chế biến xong
-                date_str = day_date.strftime('%d/%m/%Y')
-                time_so_che = meal_time_hours[meal_key][0] if meal_key in meal_time_hours else ''
-                time_che_bien = meal_time_hours[meal_key][1] if meal_key in meal_time_hours else ''
-                so_che_str = f"{date_str} {time_so_che}" if time_so_che else ''
-                che_bien_str = f"{date_str} {time_che_bien}" if time_che_bien else ''
-                data_row3 = [
-                    stt,  # STT
-                    meal_name,  # CA/BỮA ĂN chỉ tên bữa
-                    dish_names,  # TÊN MÓN ĂN (danh sách món)
-                    main_ingredients,  # NGUYÊN LIỆU CHÍNH (toàn bộ nguyên liệu các món)
-                    students_today,  # SỐ SUẤT (phần)
-                    so_che_str,  # THỜI GIAN SƠ CHẾ XONG (ngày, giờ)
-                    che_bien_str,  # THỜI GIAN CHẾ BIẾN XONG (ngày, giờ)
-                    "Trang phục gọn gàng, vệ sinh cá nhân sạch sẽ",  # Người tham gia chế biến
-                    "Đảm bảo vệ sinh",  # Trang thiết bị dụng cụ
-                    "Đảm bảo vệ sinh",  # Khu vực chế biến và phụ trợ
-                    "",  # KIỂM TRA CẢM QUAN THỨC ĂN - Đạt
-                    "",  # KIỂM TRA CẢM QUAN THỨC ĂN - Không đạt
-                    ""   # BIỆN PHÁP XỬ LÝ GHI CHÚ
-                ]
-                for j, value in enumerate(data_row3, 1):
-                    cell = ws3.cell(row=row_num, column=j, value=value)
-                    cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-                    cell.border = thin_border
-                    if j == 1:
-                        cell.font = Font(bold=True, color="006600")
-                        cell.fill = PatternFill(start_color="F0FFF0", end_color="F0FFF0", fill_type="solid")
-                    elif j == 3:
-                        cell.font = Font(bold=True, size=10)
-                        cell.fill = PatternFill(start_color="F0FFF0", end_color="F0FFF0", fill_type="solid")
-                row_num += 1
-                stt += 1
-            # Thống kê phục vụ
-            stats_row3 = row_num + 2
-            ws3[f'A{stats_row3}'] = "THỐNG KÊ PHỤC VỤ THỨC ĂN:"
-            ws3[f'A{stats_row3}'].font = Font(bold=True, size=11, color="006600")
-            ws3[f'A{stats_row3}'].fill = PatternFill(start_color="E6FFE6", end_color="E6FFE6", fill_type="solid")
-            total_servings = stt - 1
-            total_portions = total_servings * students_today
-            stats_info3 = [
-                f"• Tổng số lần phục vụ: {total_servings} lần",
-                f"• Tổng số suất ăn phục vụ: {total_portions} suất",
-                f"• Trung bình suất/lần: {(total_portions/total_servings):.1f} suất/lần" if total_servings else "• Trung bình suất/lần: N/A",
-                f"• Thời gian trung bình từ chế biến xong đến phục vụ: <30 phút"
-            ]
-            for i, stat in enumerate(stats_info3, 1):
-                ws3[f'A{stats_row3 + i}'] = stat
-                ws3[f'A{stats_row3 + i}'].font = Font(size=10)
-            # Nguyên tắc bảo quản và phục vụ
-            principles_row = stats_row3 + 6
-            ws3[f'A{principles_row}'] = "NGUYÊN TẮC BẢO QUẢN VÀ PHỤC VỤ AN TOÀN:"
-            ws3[f'A{principles_row}'].font = Font(bold=True, size=11, color="004000")
-            principles_notes = [
-                "• Thời gian: Từ chế biến xong đến phục vụ không quá 2 giờ",
-                "• Nhiệt độ: Món nóng >60°C, món lạnh <10°C khi phục vụ",
-                "• Thiết bị: Sử dụng tủ giữ nhiệt, nồi cơm điện, bình giữ nhiệt",
-                "• Vệ sinh: Khử trùng dụng cụ trước mỗi bữa ăn",
-                "• Kiểm tra: Nhiệt độ thức ăn trước khi phục vụ cho trẻ"
-            ]
-            for i, note in enumerate(principles_notes, 1):
-                ws3[f'A{principles_row + i}'] = note
-                ws3[f'A{principles_row + i}'].font = Font(size=9, color="004000")
-            # Chữ ký
-            signature_row3 = principles_row + 8
-            signature_data3 = [
-                (signature_row3,     'D', "BẾP TRƯỞNG",  'H', "NV. Y TẾ",   'K', "HIỆU TRƯỞNG"),
-                (signature_row3 + 1, 'D', "(Ký, ghi rõ họ tên)",'H', "(Ký, ghi rõ họ tên)", 'K', "(Ký, ghi rõ họ tên)"),
-                (signature_row3 + 5, 'D', "Hoàng Thanh Tuấn",'H', "(Ký, ghi rõ họ tên)",  'K', "Nguyễn Thị Vân")
-            ]
-                # --- Ghi chữ ký ---
-            for item in signature_data3:
-                    
-                    row, col_d, text_d, col_h, text_h, col_k, text_k = item
-                    ws3[f'{col_d}{row}'] = text_d
-                    ws3[f'{col_h}{row}'] = text_h
-                    ws3[f'{col_k}{row}'] = text_k
-                    cols = [(col_d, text_d), (col_h, text_h), (col_k, text_k)]
-
-                    for col, text in cols:
-                        cell = ws3[f'{col}{row}']
-                        cell.alignment = Alignment(horizontal='center', vertical='center')
-                        if row == signature_row3:
-                            cell.font = Font(bold=True, size=12, color="006600")
-                            cell.fill = PatternFill(start_color="F0FFF0", end_color="F0FFF0", fill_type="solid")
-                        elif row == signature_row3 + 1:
-                            cell.font = Font(italic=True, size=9)
-                        elif row == signature_row3 + 5:
-                            cell.font = Font(bold=True, size=11)
-                        else:
-                            cell.font = Font(size=9)
-            
-            # Page setup cho in A4
-            ws3.page_setup.orientation = ws3.ORIENTATION_LANDSCAPE
-            ws3.page_setup.paperSize = ws3.PAPERSIZE_A4
-            ws3.page_setup.fitToPage = True
-            ws3.page_setup.fitToWidth = 1
-            ws3.page_setup.fitToHeight = 0
-            ws3.print_options.horizontalCentered = True
-            ws3.page_margins.left = 0.5
-            ws3.page_margins.right = 0.5
-            ws3.page_margins.top = 0.75
-            ws3.page_margins.bottom = 0.75
-        
-        if 'Sheet' in wb3.sheetnames:
-            wb3.remove(wb3['Sheet'])
-
-        file3_buffer = BytesIO()
-        wb3.save(file3_buffer)
-        file3_buffer.seek(0)
-        zipf.writestr(f"Bước 2 - Kiểm tra khi chế biến thức ăn - Tuần {week_number}.xlsx", file3_buffer.read())
-
-        # BƯỚC 3: Kiểm tra trước khi ăn - mỗi ngày 1 sheet,
-        wb4 = Workbook()
-        for day_offset in range(6):
-            day_date = week_start + timedelta(days=day_offset)
-            day_key = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat'][day_offset]
-            safe_date = day_date.strftime('%d-%m')
-            sheet_title = f"{days_vn[day_offset]} ({safe_date})"
-            if day_offset == 0:
-                ws4 = wb4.active
-                ws4.title = sheet_title
-            else:
-                ws4 = wb4.create_sheet(title=sheet_title)
-            # Lấy số học sinh có mặt ngày này
-            students_today = daily_attendance.get(day_key, 0)
-            # Header chính tương tự ws3
-            ws4['A1'] = "TÊN CƠ SỞ: MNĐL Cây Nhỏ"
-            ws4['A1'].font = Font(bold=True, size=12)
-            ws4['A1'].fill = PatternFill(start_color="E6FFE6", end_color="E6FFE6", fill_type="solid")
-            ws4.merge_cells('A1:O1')
-            ws4['D2'] = "BIỂU MẪU KIỂM TRA TRƯỚC KHI ĂN"
-            ws4['D2'].font = Font(bold=True, size=14, color="006600")
-            ws4['D2'].alignment = Alignment(horizontal='center', vertical='center')
-            ws4.merge_cells('D2:I2')
-            ws4['J2'] = "Số: 1246/QĐ - Bộ Y Tế"
-            ws4['J2'].font = Font(bold=True, size=10)
-            ws4['J2'].fill = PatternFill(start_color="CCFFCC", end_color="CCFFCC", fill_type="solid")
-            info_data4 = [
-                (3, 'A', f"Người kiểm tra: Nguyễn Thị Vân", 'J', "Mẫu số 3.0"),
-                (4, 'A', f"Ngày kiểm tra: {day_date.strftime('%d/%m/%Y')} - {days_vn[day_offset]}", 'J', f"Số học sinh: {students_today}"),
-                (5, 'A', "Địa điểm: Phòng ăn - MNĐL Cây Nhỏ", 'J', "")
-            ]
-            for row, col_a, text_a, col_m, text_m in info_data4:
-                ws4[f'{col_a}{row}'] = text_a
-                ws4[f'{col_a}{row}'].font = Font(bold=True, size=10)
-                ws4[f'{col_m}{row}'] = text_m
-                ws4[f'{col_m}{row}'].font = Font(bold=True, size=10)
-                ws4[f'{col_m}{row}'].fill = PatternFill(start_color="F0F8FF", end_color="F0F8FF", fill_type="solid")
-
-            ws4['J7'] = "BƯỚC 3"
-            ws4['J7'].font = Font(bold=True, size=12, color="FF0000")
-            ws4['J7'].fill = PatternFill(start_color="FFEEEE", end_color="FFEEEE", fill_type="solid")
-            headers4_main = [
-                'STT', 'CA/BỮA ĂN', 'TÊN MÓN ĂN', 'SỐ SUẤT\n(phần)',
-                'THỜI GIAN CHIA MÓN ĂN XONG\n(ngày, giờ)', 'THỜI GIAN BẮT ĐẦU ĂN\n(ngày, giờ)',
-                'DỤNG CỤ CHIA, CHỨA ĐỰNG\n, CHE ĐẬY, BẢO QUẢN THỨC ĂN',
-                'KIỂM TRA CẢM QUAN THỨC ĂN', '', 'BIỆN PHÁP XỬ LÝ\nGHI CHÚ'
-            ]
-            for i, header in enumerate(headers4_main, 1):
-                cell = ws4.cell(row=8, column=i, value=header)
-                cell.font = Font(bold=True, size=9, color="FFFFFF")
-                cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-                cell.fill = PatternFill(start_color="8B0000", end_color="8B0000", fill_type="solid")
-                cell.border = thick_border
-            sub_headers4 = [
-                '', '', '', '', 
-                '', '', 
-                '', 
-                'Đạt', 'Không đạt', ''
-            ]
-            for i, header in enumerate(sub_headers4, 1):
-                cell = ws4.cell(row=9, column=i, value=header)
-                cell.font = Font(bold=True, size=8)
-                cell.alignment = Alignment(horizontal='center', vertical='center')
-                cell.fill = PatternFill(start_color="CD5C5C", end_color="CD5C5C", fill_type="solid")
-                cell.border = thin_border
-            ws4.column_dimensions['G'].width = 25
-            ws4.column_dimensions['H'].width = 18
-            ws4.column_dimensions['I'].width = 18
-            for col in ['G','H', 'I']:
-                cell = ws4[f'{col}8']
-                cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-            ws4.merge_cells('H8:I8')
-            for i in range(1, 11):
-                cell = ws4.cell(row=10, column=i, value=i)
-                cell.font = Font(bold=True, size=8)
-                cell.alignment = Alignment(horizontal='center', vertical='center')
-                cell.fill = PatternFill(start_color="F0F8FF", end_color="F0F8FF", fill_type="solid")
-                cell.border = thin_border
-            # Ghi dữ liệu món ăn từng ngày (giống ws3)
-            row_num = 11
-            stt = 1
-            for meal_key, meal_name in meal_times.items():
-                dishes = []
-                if menu_data[day_key].get(meal_key):
-                    dishes = [d.strip() for d in menu_data[day_key][meal_key].split(',') if d.strip()]
-                if dishes:
-                    dish_names = ', '.join([dish.title() for dish in dishes])
-                else:
-                    dish_names = ''
-                date_str = day_date.strftime('%d/%m/%Y')
-                time_chia_xong = '10:15'  # Giả định giờ chia xong
-                time_bat_dau_an = '10:30'  # Giả định giờ bắt đầu ăn
-                chia_xong_str = f"{date_str} {time_chia_xong}"
-                bat_dau_an_str = f"{date_str} {time_bat_dau_an}"
-                data_row4 = [
-                    stt,  # STT
-                    meal_name,  # CA/BỮA ĂN
-                    dish_names,  # TÊN MÓN ĂN
-                    students_today,  # SỐ SUẤT
-                    chia_xong_str,  # THỜI GIAN CHIA MÓN ĂN XONG
-                    bat_dau_an_str,  # THỜI GIAN BẮT ĐẦU ĂN
-                    "Đảm bảo vệ sinh",  # DỤNG CỤ CHIA, CHỨA ĐỰNG
-                    "",  # KIỂM TRA CẢM QUAN THỨC ĂN
-                    '',  # Không đạt
-                    ''   # Ghi chú
-                ]
-                for j, value in enumerate(data_row4, 1):
-                    cell = ws4.cell(row=row_num, column=j, value=value)
-                    cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-                    cell.border = thin_border
-                    if j == 1:
-                        cell.font = Font(bold=True, color="006600")
-                        cell.fill = PatternFill(start_color="F0FFF0", end_color="F0FFF0", fill_type="solid")
-                    elif j == 3:
-                        cell.font = Font(bold=True, size=10)
-                        cell.fill = PatternFill(start_color="F0FFF0", end_color="F0FFF0", fill_type="solid")
-                row_num += 1
-                stt += 1
-            # Thống kê phục vụ
-            stats_row4 = row_num + 2
-            ws4[f'A{stats_row4}'] = "THỐNG KÊ PHỤC VỤ THỨC ĂN:"
-            ws4[f'A{stats_row4}'].font = Font(bold=True, size=11, color="006600")
-            ws4[f'A{stats_row4}'].fill = PatternFill(start_color="E6FFE6", end_color="E6FFE6", fill_type="solid")
-            total_servings = stt - 1
-            total_portions = total_servings * students_today
-            stats_info4 = [
-                f"• Tổng số lần phục vụ: {total_servings} lần",
-                f"• Tổng số suất ăn phục vụ: {total_portions} suất",
-                f"• Trung bình suất/lần: {(total_portions/total_servings):.1f} suất/lần" if total_servings else "• Trung bình suất/lần: N/A",
-                f"• Thời gian trung bình từ phục vụ đến ăn: <15 phút"
-            ]
-            for i, stat in enumerate(stats_info4, 1):
-                ws4[f'A{stats_row4 + i}'] = stat
-                ws4[f'A{stats_row4 + i}'].font = Font(size=10)
-            # Nguyên tắc phục vụ
-            principles_row4 = stats_row4 + 6
-            ws4[f'A{principles_row4}'] = "NGUYÊN TẮC PHỤC VỤ AN TOÀN:"
-            ws4[f'A{principles_row4}'].font = Font(bold=True, size=11, color="004000")
-            principles_notes4 = [
-                "• Đảm bảo vệ sinh dụng cụ, khu vực ăn trước khi phục vụ",
-                "• Kiểm tra nhiệt độ thức ăn trước khi cho trẻ ăn",
-                "• Đảm bảo trẻ rửa tay sạch sẽ trước khi ăn",
-                "• Báo cáo ngay nếu phát hiện bất thường về thức ăn hoặc sức khỏe trẻ"
-            ]
-            for i, note in enumerate(principles_notes4, 1):
-                ws4[f'A{principles_row4 + i}'] = note
-                ws4[f'A{principles_row4 + i}'].font = Font(size=9, color="004000")
-            # Chữ ký
-            signature_row4 = principles_row4 + 8
-            signature_data4 = [
-                (signature_row4,     'D', "BẾP TRƯỞNG",  'H', "NV. Y TẾ",   'K', "HIỆU TRƯỞNG"),
-                (signature_row4 + 1, 'D', "(Ký, ghi rõ họ tên)", 'H', "(Ký, ghi rõ họ tên)", 'K', "(Ký, ghi rõ họ tên)"),
-                (signature_row4 + 5, 'D', "Hoàng Thanh Tuấn",'H', "",  'K', "Nguyễn Thị Vân")
-            ]
-            for item in signature_data4:
-                row, col_d, text_d, col_h, text_h, col_k, text_k = item
-                ws4[f'{col_d}{row}'] = text_d
-                ws4[f'{col_h}{row}'] = text_h
-                ws4[f'{col_k}{row}'] = text_k
-                cols = [(col_d, text_d), (col_h, text_h), (col_k, text_k)]
-                for col, text in cols:
-                    cell = ws4[f'{col}{row}']
-                    cell.alignment = Alignment(horizontal='center', vertical='center')
-                    if row == signature_row4:
-                        cell.font = Font(bold=True, size=12, color="006600")
-                        cell.fill = PatternFill(start_color="F0FFF0", end_color="F0FFF0", fill_type="solid")
-                    elif row == signature_row4 + 1:
-                        cell.font = Font(italic=True, size=9)
-                    elif row == signature_row4 + 5:
-                        cell.font = Font(bold=True, size=11)
-                    else:
-                        cell.font = Font(size=9)
-            
-            # Page setup cho in A4
-            ws4.page_setup.orientation = ws4.ORIENTATION_LANDSCAPE
-            ws4.page_setup.paperSize = ws4.PAPERSIZE_A4
-            ws4.page_setup.fitToPage = True
-            ws4.page_setup.fitToWidth = 1
-            ws4.page_setup.fitToHeight = 0
-            ws4.print_options.horizontalCentered = True
-            ws4.page_margins.left = 0.5
-            ws4.page_margins.right = 0.5
-            ws4.page_margins.top = 0.75
-            ws4.page_margins.bottom = 0.75
-        
-        if 'Sheet' in wb4.sheetnames:
-            wb4.remove(wb4['Sheet'])
-        file4_buffer = BytesIO()
-        wb4.save(file4_buffer)
-        file4_buffer.seek(0)
-        zipf.writestr(f"Bước 3 - Kiểm tra trước khi ăn - Tuần {week_number}.xlsx", file4_buffer.read())
-        
-        # BƯỚC 5: Kiểm tra trước khi ăn - mỗi ngày 1 sheet,
-        wb5 = Workbook()
-        for day_offset in range(6):
-            day_date = week_start + timedelta(days=day_offset)
-            day_key = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat'][day_offset]
-            safe_date = day_date.strftime('%d-%m')
-            sheet_title = f"{days_vn[day_offset]} ({safe_date})"
-            if day_offset == 0:
-                ws5 = wb5.active
-                ws5.title = sheet_title
-            else:
-                ws5 = wb5.create_sheet(title=sheet_title)
-            # Lấy số học sinh có mặt ngày này
-            students_today = daily_attendance.get(day_key, 0)
-            # Header chính tương tự ws3
-            ws5['A1'] = "TÊN CƠ SỞ: MNĐL Cây Nhỏ"
-            ws5['A1'].font = Font(bold=True, size=12)
-            ws5['A1'].fill = PatternFill(start_color="E6FFE6", end_color="E6FFE6", fill_type="solid")
-            ws5.merge_cells('A1:O1')
-            ws5['D2'] = "BIỂU MẪU THEO DÕI LƯU VÀ HUỶ LƯU MẪU THỨC ĂN LƯU"
-            ws5['D2'].font = Font(bold=True, size=14, color="006600")
-            ws5['D2'].alignment = Alignment(horizontal='center', vertical='center')
-            ws5.merge_cells('D2:I2')
-            ws5['J2'] = "Số: 1246/QĐ - Bộ Y Tế"
-            ws5['J2'].font = Font(bold=True, size=10)
-            ws5['J2'].fill = PatternFill(start_color="CCFFCC", end_color="CCFFCC", fill_type="solid")
-            info_data4 = [
-                (3, 'A', f"Người kiểm tra: Nguyễn Thị Vân", 'J', "Mẫu số 5"),
-                (4, 'A', f"Ngày kiểm tra: {day_date.strftime('%d/%m/%Y')} - {days_vn[day_offset]}", 'J', f"Số học sinh: {students_today}"),
-                (5, 'A', "Địa điểm: Phòng ăn - MNĐL Cây Nhỏ", 'F', f"Ngày tiếp phẩm: {day_date.strftime('%d/%m/%Y')} - {days_vn[day_offset]}")
-            ]
-            for row, col_a, text_a, col_m, text_m in info_data4:
-                ws5[f'{col_a}{row}'] = text_a
-                ws5[f'{col_a}{row}'].font = Font(bold=True, size=10)
-                ws5[f'{col_m}{row}'] = text_m
-                ws5[f'{col_m}{row}'].font = Font(bold=True, size=10)
-                ws5[f'{col_m}{row}'].fill = PatternFill(start_color="F0F8FF", end_color="F0F8FF", fill_type="solid")
+    from app.food_safety_export import build_week_zip
 
-            
-            headers5_main = [
-                'STT', 'CA/BỮA ĂN', 'TÊN MẪU THỨC ĂN', 'SỐ SUẤT ĂN\n(phần)',
-                'KHỐI LƯỢNG\n/ THỂ TÍCH MẪU(GRAM/ML)', 'DỤNG CỤ CHỨA\n MẪU THỨC ĂN LƯU',
-                'NHIỆT ĐỘ BẢO QUẢN MẪU',
-                'THỜI GIAN LẤY MẪU\n (giờ, ngày, tháng, năm)', 'THỜI GIAN HUỶ MẪU\n (giờ, ngày, tháng, năm)', 
-                'GHI CHÚ', "NGƯỜI LƯU MẪU", "NGƯỜI HUỶ MẪU"
-            ]
-            for i, header in enumerate(headers5_main, 1):
-                cell = ws5.cell(row=8, column=i, value=header)
-                cell.font = Font(bold=True, size=9, color="FFFFFF")
-                cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-                cell.fill = PatternFill(start_color="8B0000", end_color="8B0000", fill_type="solid")
-                cell.border = thick_border
-            sub_headers5 = [
-                '', '', '', '', 
-                '', '', 
-                '', 
-                '', '', '',
-                '',''
-            ]
-            for i, header in enumerate(sub_headers5, 1):
-                cell = ws5.cell(row=9, column=i, value=header)
-                cell.font = Font(bold=True, size=8)
-                cell.alignment = Alignment(horizontal='center', vertical='center')
-                cell.fill = PatternFill(start_color="CD5C5C", end_color="CD5C5C", fill_type="solid")
-                cell.border = thin_border
-            ws5.column_dimensions['E'].width = 18
-            ws5.column_dimensions['F'].width = 18
-            ws5.column_dimensions['G'].width = 18
-            ws5.column_dimensions['H'].width = 18
-            ws5.column_dimensions['I'].width = 18
-            for col in ['E', 'F', 'G','H', 'I']:
-                cell = ws5[f'{col}8']
-                cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-            # ws5.merge_cells('H8:I8')
-            for i in range(1, 13):
-                cell = ws5.cell(row=10, column=i, value=i)
-                cell.font = Font(bold=True, size=8)
-                cell.alignment = Alignment(horizontal='center', vertical='center')
-                cell.fill = PatternFill(start_color="F0F8FF", end_color="F0F8FF", fill_type="solid")
-                cell.border = thin_border
-            # Ghi dữ liệu món ăn từng ngày (giống ws3)
-            row_num = 11
-            stt = 1
-            for meal_key, meal_name in meal_times.items():
-                dishes = []
-                if menu_data[day_key].get(meal_key):
-                    dishes = [d.strip() for d in menu_data[day_key][meal_key].split(',') if d.strip()]
-                if dishes:
-                    dish_names = ', '.join([dish.title() for dish in dishes])
-                else:
-                    dish_names = ''
-                date_str = day_date.strftime('%d/%m/%Y')
-                time_chia_xong = '10:15'  # Giả định giờ chia xong
-                time_bat_dau_an = '10:30'  # Giả định giờ bắt đầu ăn
-                chia_xong_str = f"{date_str} {time_chia_xong}"
-                bat_dau_an_str = f"{date_str} {time_bat_dau_an}"
-                # Tính thời gian huỷ mẫu: 15:00 ngày hôm sau của bat_dau_an_str
-                from datetime import datetime, timedelta
-                dt_batdau = datetime.strptime(bat_dau_an_str.split()[0], "%d/%m/%Y")
-                dt_huy = dt_batdau + timedelta(days=1)
-                huy_mau_str = f"15:00, {dt_huy.strftime('%d/%m/%Y')}"
-                
-                data_row5 = [
-                    stt,  # STT
-                    meal_name,  # CA/BỮA ĂN
-                    dish_names,  # TÊN MẪU THỨC ĂN
-                    students_today,  # SỐ SUẤT ĂN
-                    150,  # KHỐI LƯỢNG/THỂ TÍCH MẪU
-                    "Hộp Inox chuyên dụng",  # DỤNG CỤ CHỨA MẪU
-                    "2-4°C",  # NHIỆT ĐỘ BẢO QUẢN
-                    bat_dau_an_str,  # THỜI GIAN LẤY MẪU
-                    huy_mau_str,  # THỜI GIAN HUỶ MẪU
-                    'Ngon',  # GHI CHÚ
-                    "Hoàng Thanh Tuấn",  # NGƯỜI LƯU MẪU
-                    "Hoàng Thanh Tuấn"  # NGƯỜI HUỶ MẪU
-                ]
-                for j, value in enumerate(data_row5, 1):
-                    cell = ws5.cell(row=row_num, column=j, value=value)
-                    cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-                    cell.border = thin_border
-                    if j == 1:
-                        cell.font = Font(bold=True, color="006600")
-                        cell.fill = PatternFill(start_color="F0FFF0", end_color="F0FFF0", fill_type="solid")
-                    elif j == 3:
-                        cell.font = Font(bold=True, size=10)
-                        cell.fill = PatternFill(start_color="F0FFF0", end_color="F0FFF0", fill_type="solid")
-                row_num += 1
-                stt += 1
-            # Thống kê phục vụ
-            stats_row5 = row_num + 2
-            ws5[f'A{stats_row5}'] = "THỐNG KÊ PHỤC VỤ THỨC ĂN:"
-            ws5[f'A{stats_row5}'].font = Font(bold=True, size=11, color="006600")
-            ws5[f'A{stats_row5}'].fill = PatternFill(start_color="E6FFE6", end_color="E6FFE6", fill_type="solid")
-            total_servings = stt - 1
-            total_portions = total_servings * students_today
-            stats_info5 = [
-                f"• Tổng số lần phục vụ: {total_servings} lần",
-                f"• Tổng số suất ăn phục vụ: {total_portions} suất",
-                f"• Trung bình suất/lần: {(total_portions/total_servings):.1f} suất/lần" if total_servings else "• Trung bình suất/lần: N/A",
-                f"• Thời gian trung bình từ phục vụ đến ăn: <15 phút"
-            ]
-            for i, stat in enumerate(stats_info5, 1):
-                ws5[f'A{stats_row5 + i}'] = stat
-                ws5[f'A{stats_row5 + i}'].font = Font(size=10)
-            # Nguyên tắc phục vụ
-            principles_row5 = stats_row5 + 6
-            ws5[f'A{principles_row5}'] = "NGUYÊN TẮC PHỤC VỤ AN TOÀN:"
-            ws5[f'A{principles_row5}'].font = Font(bold=True, size=11, color="004000")
-            principles_notes5 = [
-                "• Đảm bảo vệ sinh dụng cụ, khu vực ăn trước khi phục vụ",
-                "• Kiểm tra nhiệt độ thức ăn trước khi cho trẻ ăn",
-                "• Đảm bảo trẻ rửa tay sạch sẽ trước khi ăn",
-                "• Báo cáo ngay nếu phát hiện bất thường về thức ăn hoặc sức khỏe trẻ"
-            ]
-            for i, note in enumerate(principles_notes5, 1):
-                ws5[f'A{principles_row5 + i}'] = note
-                ws5[f'A{principles_row5 + i}'].font = Font(size=9, color="004000")
-            # Chữ ký
-            signature_row5 = principles_row5 + 8
-            signature_data5 = [
-                (signature_row5,     'D', "NGƯỜI THỰC HIỆN LƯU MẪU",  'H', "NGƯỜI THỰC HIỆN HUỶ MẪU",   'K', "HIỆU TRƯỞNG"),
-                (signature_row5 + 1, 'D', "(Ký, ghi rõ họ tên)", 'H', "(Ký, ghi rõ họ tên)", 'K', "(Ký, ghi rõ họ tên)"),
-                (signature_row5 + 5, 'D', "Hoàng Thanh Tuấn",'H', "Hoàng Thanh Tuấn",  'K', "Nguyễn Thị Vân")
-            ]
-            for item in signature_data5:
-                row, col_d, text_d, col_h, text_h, col_k, text_k = item
-                ws5[f'{col_d}{row}'] = text_d
-                ws5[f'{col_h}{row}'] = text_h
-                ws5[f'{col_k}{row}'] = text_k
-                cols = [(col_d, text_d), (col_h, text_h), (col_k, text_k)]
-                for col, text in cols:
-                    cell = ws5[f'{col}{row}']
-                    cell.alignment = Alignment(horizontal='center', vertical='center')
-                    if row == signature_row5:
-                        cell.font = Font(bold=True, size=12, color="006600")
-                        cell.fill = PatternFill(start_color="F0FFF0", end_color="F0FFF0", fill_type="solid")
-                    elif row == signature_row5 + 1:
-                        cell.font = Font(italic=True, size=9)
-                    elif row == signature_row5 + 5:
-                        cell.font = Font(bold=True, size=11)
-                    else:
-                        cell.font = Font(size=9)
-            
-            # Page setup cho in A4
-            ws5.page_setup.orientation = ws5.ORIENTATION_LANDSCAPE
-            ws5.page_setup.paperSize = ws5.PAPERSIZE_A4
-            ws5.page_setup.fitToPage = True
-            ws5.page_setup.fitToWidth = 1
-            ws5.page_setup.fitToHeight = 0
-            ws5.print_options.horizontalCentered = True
-            ws5.page_margins.left = 0.5
-            ws5.page_margins.right = 0.5
-            ws5.page_margins.top = 0.75
-            ws5.page_margins.bottom = 0.75
-        
-        if 'Sheet' in wb5.sheetnames:
-            wb5.remove(wb5['Sheet'])
-        file5_buffer = BytesIO()
-        wb5.save(file5_buffer)
-        file5_buffer.seek(0)
-        zipf.writestr(f"Bước 4 - Theo dõi lưu và huỷ mẫu thức ăn lưu - Tuần {week_number}.xlsx", file5_buffer.read())
-        
-        # BƯỚC 6: PHIẾU TIẾP NHẬN VÀ KIỂM TRA CHẤT LƯỢNG THỰC PHẨM
-        wb6 = Workbook()
-        for day_offset in range(6):
-            day_date = week_start + timedelta(days=day_offset)
-            day_key = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat'][day_offset]
-            safe_date = day_date.strftime('%d-%m')
-            sheet_title = f"{days_vn[day_offset]} ({safe_date})"
-            if day_offset == 0:
-                ws6 = wb6.active
-                ws6.title = sheet_title
-            else:
-                ws6 = wb6.create_sheet(title=sheet_title)
-            # Lấy số học sinh có mặt ngày này
-            students_today = daily_attendance.get(day_key, 0)
-            # Header chính tương tự ws6
-            
-            ws6['D2'] = "PHIẾU TIẾP NHẬN VÀ KIỂM TRA CHẤT LƯỢNG THỰC PHẨM"
-            ws6['D2'].font = Font(bold=True, size=14, color="006600")
-            ws6['D2'].alignment = Alignment(horizontal='center', vertical='center')
-            ws6.merge_cells('D2:I2')
-            ws6['J2'] = ""
-            ws6['J2'].font = Font(bold=True, size=10)
-            ws6['J2'].fill = PatternFill(start_color="CCFFCC", end_color="CCFFCC", fill_type="solid")
-            info_data4 = [
-                (1, 'A', f"Phòng GD&ĐT: XÃ ĐỨC TRỌNG", 'J', f"Ngày: {day_date.strftime('%d/%m/%Y')}"),
-                (2, 'A', f"Đơn vị: MẦM NON CÂY NHỎ", 'J', f"Thứ: {days_vn[day_offset]}"),
-                (3, 'A', f"Số suất: {students_today}", 'F', "")
-            ]
-            for row, col_a, text_a, col_m, text_m in info_data4:
-                ws6[f'{col_a}{row}'] = text_a
-                ws6[f'{col_a}{row}'].font = Font(bold=True, size=10)
-                ws6[f'{col_m}{row}'] = text_m
-                ws6[f'{col_m}{row}'].font = Font(bold=True, size=10)
-                ws6[f'{col_m}{row}'].fill = PatternFill(start_color="F0F8FF", end_color="F0F8FF", fill_type="solid")
-            # Thêm dòng tiêu đề lớn phía trên bảng
-            ws6['A5'] = "I. Tiếp nhận, kiểm tra chất lượng thực phẩm và chế biến"
-            ws6['A5'].font = Font(bold=True, size=12, color="8B0000")
-            ws6['A5'].fill = PatternFill(start_color="FFF2E6", end_color="FFF2E6", fill_type="solid")
-            ws6.merge_cells('A5:G5')
-
-            headers6_main = [
-                'STT', 'TÊN THỰC PHẨM',
-                'ĐƠN VỊ TÍNH', 'SỐ LƯỢNG DỰ KIẾN MUA',
-                'THỰC TẾ TIẾP NHẬN', 'GIÁ TIỀN (VNĐ)',
-                'NHẬN XÉT'
-            ]
-            for i, header in enumerate(headers6_main, 1):
-                cell = ws6.cell(row=6, column=i, value=header)
-                cell.font = Font(bold=True, size=9, color="FFFFFF")
-                cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-                cell.fill = PatternFill(start_color="8B0000", end_color="8B0000", fill_type="solid")
-                cell.border = thick_border
-            sub_headers6 = [
-                '', '', '',
-                '', '', '', ''
-            ]
-            for i, header in enumerate(sub_headers6, 1):
-                cell = ws6.cell(row=7, column=i, value=header)
-                cell.font = Font(bold=True, size=8)
-                cell.alignment = Alignment(horizontal='center', vertical='center')
-                cell.fill = PatternFill(start_color="CD5C5C", end_color="CD5C5C", fill_type="solid")
-                cell.border = thin_border
-            ws6.column_dimensions['B'].width = 18
-            ws6.column_dimensions['C'].width = 18
-            ws6.column_dimensions['D'].width = 18
-            ws6.column_dimensions['E'].width = 18
-            ws6.column_dimensions['F'].width = 15
-            ws6.column_dimensions['G'].width = 20
-            for col in ['B', 'C', 'D', 'E', 'F', 'G']:
-                cell = ws6[f'{col}6']
-                cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-            # ws6.merge_cells('H6:I6')
-            for i in range(1, 8):   
-                cell = ws6.cell(row=8, column=i, value=i)
-                cell.font = Font(bold=True, size=8)
-                cell.alignment = Alignment(horizontal='center', vertical='center')
-                cell.fill = PatternFill(start_color="F0F8FF", end_color="F0F8FF", fill_type="solid")
-                cell.border = thin_border
-            # Ghi dữ liệu món ăn từng ngày
-            row_num = 9
-            stt = 1
-            daily_total_cost = 0  # Tổng chi phí trong ngày
-            # Tổng hợp nguyên liệu trong ngày (chỉ 1 lần cho ngày hiện tại)
-            daily_ingredients = {}
-            for meal in menu_data[day_key].values():
-                if not meal: continue
-                for dish_name in [d.strip() for d in meal.split(',') if d.strip()]:
-                    dish = Dish.query.filter_by(name=dish_name).first()
-                    if dish:
-                        for di in dish.ingredients:
-                            key = (di.product.name, di.unit, di.product.category, di.product.supplier)
-                            qty = di.quantity * students_today
-                            if key not in daily_ingredients:
-                                daily_ingredients[key] = {'total_qty': 0, 'unit': di.unit, 'category': di.product.category, 'supplier': di.product.supplier, 'product': di.product}
-                            daily_ingredients[key]['total_qty'] += qty
-
-            for (name, unit, category, supplier), info in daily_ingredients.items():
-                # Quy đổi đơn vị nếu cần để hiển thị
-                qty = info['total_qty']  # Số lượng tính bằng đơn vị gốc (gram/ml từ món ăn)
-                display_unit = unit
-                if unit and unit.lower() in ['g', 'gram', 'gr']:
-                    display_unit = 'kg'
-                    display_qty = round(qty / 1000, 2)
-                elif unit and unit.lower() in ['ml', 'mililít', 'milliliter']:
-                    display_unit = 'lít' 
-                    display_qty = round(qty / 1000, 2)
-                else:
-                    display_qty = round(qty, 2)
-
-                # Tính giá tiền: product.price tương ứng với product.unit
-                # Nếu product.unit là kg/lít → dùng display_qty (đã quy đổi)
-                # Nếu product.unit là gram/ml → dùng qty (chưa quy đổi)
-                product = info['product']  # Product object
-                total_price = 0
-                if product and product.price:
-                    product_unit_lower = (product.unit or '').lower()
-                    # Kiểm tra xem product.unit là đơn vị lớn (kg/lít) hay nhỏ (gram/ml)
-                    if product_unit_lower in ['kg', 'kilogram', 'lít', 'lit', 'liter', 'l']:
-                        # product.price là giá/kg hoặc giá/lít → dùng display_qty
-                        total_price = round(product.price * display_qty, 0)
-                    else:
-                        # product.price là giá/gram hoặc giá/ml → dùng qty
-                        total_price = round(product.price * qty, 0)
-                    price_display = f"{total_price:,.0f} đ"
-                    daily_total_cost += total_price  # Cộng vào tổng chi phí
-                else:
-                    price_display = "Chưa có giá"
-
-                # name ở đây là TÊN THỰC PHẨM chỉ lấy theo ngày hiện tại, không phải cả tuần
-                data_row6 = [
-                    stt,  # STT
-                    name,  # TÊN THỰC PHẨM
-                    display_unit,  # ĐƠN VỊ
-                    display_qty,  # SỐ LƯỢNG DỰ KIẾN MUA
-                    '',  # THỰC TẾ TIẾP NHẬN (để trống)
-                    price_display,  # GIÁ TIỀN (VNĐ)
-                    "",  # Nhận xét
-                ]
-                for j, value in enumerate(data_row6, 1):
-                    cell = ws6.cell(row=row_num, column=j, value=value)
-                    cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-                    cell.border = thin_border
-                    if j == 1:
-                        cell.font = Font(bold=True, color="006600")
-                        cell.fill = PatternFill(start_color="F0FFF0", end_color="F0FFF0", fill_type="solid")
-                    elif j == 2:
-                        cell.font = Font(bold=True, size=10)
-                        cell.fill = PatternFill(start_color="F0FFF0", end_color="F0FFF0", fill_type="solid")
-                    elif j == 6:  # Cột giá tiền
-                        if total_price > 0:
-                            cell.font = Font(bold=True, color="FF6600")
-                            cell.fill = PatternFill(start_color="FFF8E1", end_color="FFF8E1", fill_type="solid")
-                        else:
-                            cell.font = Font(italic=True, color="999999")
-                row_num += 1
-                stt += 1
-            
-            # Thêm dòng tổng cộng
-            if daily_total_cost > 0:
-                ws6.merge_cells(f'A{row_num}:E{row_num}')
-                ws6[f'A{row_num}'] = "TỔNG CHI PHÍ DỰ KIẾN"
-                ws6[f'A{row_num}'].font = Font(bold=True, size=11, color="8B0000")
-                ws6[f'A{row_num}'].alignment = Alignment(horizontal='right', vertical='center')
-                ws6[f'A{row_num}'].fill = PatternFill(start_color="FFE6E6", end_color="FFE6E6", fill_type="solid")
-                
-                ws6[f'F{row_num}'] = f"{daily_total_cost:,.0f} đ"
-                ws6[f'F{row_num}'].font = Font(bold=True, size=12, color="8B0000")
-                ws6[f'F{row_num}'].alignment = Alignment(horizontal='center', vertical='center')
-                ws6[f'F{row_num}'].fill = PatternFill(start_color="FFE6E6", end_color="FFE6E6", fill_type="solid")
-                
-                ws6[f'G{row_num}'] = ""
-                ws6[f'G{row_num}'].fill = PatternFill(start_color="FFE6E6", end_color="FFE6E6", fill_type="solid")
-                
-                # Add borders
-                for col in range(1, 8):
-                    ws6.cell(row=row_num, column=col).border = thick_border
-                
-                row_num += 1
-            # Nội Dung khác
-            stats_row6 = row_num + 2
-            ws6[f'A{stats_row6}'] = "II. Nội Dung Khác"
-            ws6[f'A{stats_row6}'].font = Font(bold=True, size=12, color="8B0000")
-            ws6[f'A{stats_row6}'].fill = PatternFill(start_color="FFF2E6", end_color="FFF2E6", fill_type="solid")
-            # Chữ ký
-            signature_row6 = stats_row6 + 8
-            signature_data6 = [
-                (signature_row6,     'A', "NGƯỜI GIAO HÀNG", "C",'NGƯỜI TIẾP NHẬN', "E", "NV. Y TẾ",   'H', "HIỆU TRƯỞNG"),
-                (signature_row6 + 1, 'A', "(Ký, ghi rõ họ tên)", "C",'(Ký, ghi rõ họ tên)', 'E', "(Ký, ghi rõ họ tên)", 'H', "(Ký, ghi rõ họ tên)"),
-                (signature_row6 + 5, 'A', "","C","","E", "",  'H', "Nguyễn Thị Vân")
-            ]
-            for item in signature_data6:
-                # unpack 9 values: row, col_d, text_d, col_f, text_f, col_h, text_h, col_k, text_k
-                row, col_d, text_d, col_f, text_f, col_h, text_h, col_k, text_k = item
-                ws6[f'{col_d}{row}'] = text_d
-                ws6[f'{col_f}{row}'] = text_f
-                ws6[f'{col_h}{row}'] = text_h
-                ws6[f'{col_k}{row}'] = text_k
-                cols = [(col_d, text_d), (col_f, text_f), (col_h, text_h), (col_k, text_k)]
-                for col, text in cols:
-                    cell = ws6[f'{col}{row}']
-                    cell.alignment = Alignment(horizontal='center', vertical='center')
-                    if row == signature_row6:
-                        cell.font = Font(bold=True, size=12, color="006600")
-                        cell.fill = PatternFill(start_color="F0FFF0", end_color="F0FFF0", fill_type="solid")
-                    elif row == signature_row6 + 1:
-                        cell.font = Font(italic=True, size=9)
-                    elif row == signature_row6 + 5:
-                        cell.font = Font(bold=True, size=11)
-                    else:
-                        cell.font = Font(size=9)
-            
-            # Page setup cho in A4
-            ws6.page_setup.orientation = ws6.ORIENTATION_PORTRAIT
-            ws6.page_setup.paperSize = ws6.PAPERSIZE_A4
-            ws6.page_setup.fitToPage = True
-            ws6.page_setup.fitToWidth = 1
-            ws6.page_setup.fitToHeight = 0
-            ws6.print_options.horizontalCentered = True
-            ws6.page_margins.left = 0.5
-            ws6.page_margins.right = 0.5
-            ws6.page_margins.top = 0.75
-            ws6.page_margins.bottom = 0.75
-        
-        if 'Sheet' in wb6.sheetnames:
-            wb6.remove(wb6['Sheet'])
-        file6_buffer = BytesIO()
-        wb6.save(file6_buffer)
-        file6_buffer.seek(0)
-        zipf.writestr(f"Bước 6 - PHIẾU TIẾP NHẬN VÀ KIỂM TRA CHẤT LƯỢNG THỰC PHẨM - Tuần {week_number}.xlsx", file6_buffer.read())
-        
-    # Đóng zipfile và trả về
-    zip_buffer.seek(0)
+    # Dữ liệu cả tuần (món ăn, nguyên liệu, sĩ số từng ngày) lấy từ kế hoạch mua hàng
+    # đã cache, sau đó dựng các biểu mẫu theo layout spec
+    plan = get_procurement_plan(menu_item)
+    zip_buffer = build_week_zip(plan.days, week_number)
     
     # Tạo response để download
     response = send_file(
@@ -5872,6 +3702,64 @@ def export_food_safety_process(week_number):
     flash(f'Đã xuất thành công quy trình an toàn thực phẩm 3 bước cho tuần {week_number}!', 'success')
     return response
 
+# ================== KẾ HOẠCH MUA HÀNG ==================
+
+def _procurement_menu(week_number):
+    """Thực đơn của tuần theo ?year=, mặc định năm gần nhất có thực đơn tuần đó"""
+    query = Menu.query.filter_by(week_number=week_number)
+    year = request.args.get('year', type=int)
+    if year:
+        query = query.filter_by(year=year)
+    return query.order_by(Menu.year.desc()).first()
+
+
+@main.route('/procurement/<int:week_number>')
+def procurement_plan(week_number):
+    """Trang danh sách mua hàng theo nhà cung cấp/ngày của thực đơn tuần"""
+    if session.get('role') not in ['admin', 'teacher']:
+        return redirect_no_permission()
+    menu_item = _procurement_menu(week_number)
+    if not menu_item:
+        flash('Không tìm thấy thực đơn!', 'danger')
+        return redirect(url_for('main.menu'))
+    headcount = request.args.get('headcount', type=int)
+    plan = get_procurement_plan(menu_item, headcount)
+    return render_template('procurement.html', plan=plan, headcount=headcount, supplier_name=supplier_name,
+                           title=f'Kế hoạch mua hàng tuần {week_number}', mobile=is_mobile())
+
+
+@main.route('/api/procurement/<int:week_number>')
+def api_procurement_plan(week_number):
+    if session.get('role') not in ['admin', 'teacher']:
+        return jsonify({'success': False, 'error': 'Không có quyền truy cập'}), 403
+    menu_item = _procurement_menu(week_number)
+    if not menu_item:
+        return jsonify({'success': False, 'error': 'Không tìm thấy thực đơn'}), 404
+    plan = get_procurement_plan(menu_item, request.args.get('headcount', type=int))
+    return jsonify({'success': True, 'plan': plan_to_dict(plan)})
+
+
+@main.route('/procurement/month/<int:year>/<int:month>')
+def procurement_month_report(year, month):
+    """Báo cáo chi phí nguyên liệu cuối tháng"""
+    if session.get('role') not in ['admin', 'teacher']:
+        return redirect_no_permission()
+    if not 1 <= month <= 12:
+        flash('Tháng không hợp lệ!', 'danger')
+        return redirect(url_for('main.menu'))
+    report = month_cost_report(year, month)
+    return render_template('procurement_month.html', report=report, supplier_name=supplier_name,
+                           title=f'Chi phí nguyên liệu tháng {month}/{year}', mobile=is_mobile())
+
+
+@main.route('/api/procurement/month/<int:year>/<int:month>')
+def api_procurement_month_report(year, month):
+    if session.get('role') not in ['admin', 'teacher']:
+        return jsonify({'success': False, 'error': 'Không có quyền truy cập'}), 403
+    if not 1 <= month <= 12:
+        return jsonify({'success': False, 'error': 'Tháng không hợp lệ'}), 400
+    return jsonify({'success': True, 'report': report_to_dict(month_cost_report(year, month))})
+
 # ================== QUẢN LÝ NHÀ CUNG CẤP VÀ SẢN PHẨM ==================
 
 @main.route('/suppliers')
@@ -5921,6 +3809,7 @@ def edit_supplier(supplier_id):
     if form.validate_on_submit():
         form.populate_obj(supplier)
         db.session.commit()
+        food_catalog_changed()
         log_activity('edit', 'supplier', supplier_id, f'Cập nhật nhà cung cấp: {supplier.name}')
         flash('Cập nhật nhà cung cấp thành công!', 'success')
         return redirect(url_for('main.suppliers'))
@@ -5937,6 +3826,7 @@ def delete_supplier(supplier_id):
     supplier_name = supplier.name
     supplier.is_active = False
     db.session.commit()
+    food_catalog_changed()
     log_activity('delete', 'supplier', supplier_id, f'Xóa nhà cung cấp: {supplier_name}')
     flash('Xóa nhà cung cấp thành công!', 'success')
     return redirect(url_for('main.suppliers'))
@@ -6015,6 +3905,7 @@ def edit_product(product_id):
     if form.validate_on_submit():
         form.populate_obj(product)
         db.session.commit()
+        food_catalog_changed()
         log_activity('edit', 'product', product_id, f'Cập nhật sản phẩm: {product.name}')
         flash('Cập nhật sản phẩm thành công!', 'success')
         return redirect(url_for('main.products'))
@@ -6031,6 +3922,7 @@ def delete_product(product_id):
     product_name = product.name
     product.is_active = False
     db.session.commit()
+    food_catalog_changed()
     log_activity('delete', 'product', product_id, f'Xóa sản phẩm: {product_name}')
     flash('Xóa sản phẩm thành công!', 'success')
     return redirect(url_for('main.products'))
@@ -6046,63 +3938,26 @@ def ai_menu_suggestions():
         return jsonify({'success': False, 'error': 'Không có quyền truy cập. Vui lòng đăng nhập với tài khoản admin hoặc giáo viên.'}), 403
 
     try:
-        from app.models import Dish
-        import random
-        meal_types = ["morning", "snack", "dessert", "lunch", "afternoon", "lateafternoon"]
-        days = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat']
-        dishes = Dish.query.filter_by(is_active=True).all()
-        dishes_by_meal = {meal: [] for meal in meal_types}
-        for d in dishes:
-            if d.meal_times:
-                for meal in d.meal_times:
-                    if meal in meal_types:
-                        dishes_by_meal[meal].append(d.name)
-
-        menu = {}
-        used_dishes = {meal: set() for meal in meal_types}  # Theo dõi món đã dùng trong tuần cho từng bữa
-        for day in days:
-            menu[day] = {}
-            for meal in meal_types:
-                meal_dishes = dishes_by_meal[meal][:]
-                if not meal_dishes:
-                    menu[day][meal] = "[Không có]"
-                    continue
-                # Loại các món đã dùng hết lượt trong tuần (ưu tiên không lặp)
-                available = [d for d in meal_dishes if d not in used_dishes[meal]]
-                if meal == "lunch":
-                    # Trưa: 2 món khác nhau, tránh trùng trong tuần
-                    if len(available) >= 2:
-                        selected = random.sample(available, 2)
-                    elif len(meal_dishes) >= 2:
-                        # Nếu đã dùng hết, cho phép lặp lại nhưng vẫn chọn 2 món khác nhau
-                        selected = random.sample(meal_dishes, 2)
-                    elif len(meal_dishes) == 1:
-                        selected = [meal_dishes[0], meal_dishes[0]]
-                    else:
-                        selected = ["[Không có]", "[Không có]"]
-                    menu[day][meal] = ", ".join(selected)
-                    for s in selected:
-                        used_dishes[meal].add(s)
-                else:
-                    # Các bữa khác: 1 món, tránh trùng trong tuần
-                    if available:
-                        selected = random.choice(available)
-                    else:
-                        selected = random.choice(meal_dishes)
-                    menu[day][meal] = selected
-                    used_dishes[meal].add(selected)
+        data = request.get_json(silent=True) or {}
+        plan = optimize_week_menu(available_ingredients=data.get('available_ingredients', ''))
+        menu = plan.menu
         return jsonify({
             'success': True,
             'menu': menu,
             'suggestions': {
                 'nutrition_tips': [
-                    f"Thực đơn được tối ưu cho trẻ {request.json.get('age_group', '1-3 tuổi')}",
+                    f"Thực đơn được tối ưu cho trẻ {data.get('age_group', '1-3 tuổi')}",
+                    f"Chi phí nguyên liệu ước tính: {plan.cost_per_child:,.0f} đ/trẻ/tuần",
                     "Đảm bảo cân bằng dinh dưỡng với đầy đủ nhóm thực phẩm",
-                    "Tránh lặp lại món ăn trong cùng bữa trong tuần",
+                    "Tránh lặp lại món ăn trong tuần và hạn chế trùng nguyên liệu giữa các ngày",
                     "Bữa trưa có 2 món để tăng đa dạng dinh dưỡng",
                     "Khuyến khích trẻ thử nhiều loại thực phẩm khác nhau"
                 ],
-                'generated_from': 'SmallTree AI - Nutrition optimized menu system'
+                'generated_from': 'SmallTree AI - Nutrition optimized menu system',
+                'cost_per_child': plan.cost_per_child,
+                'daily_cost': plan.daily_cost,
+                'unpriced_dishes': plan.unpriced_dishes,
+                'excluded_dishes': plan.excluded_dishes
             },
             'security_info': f"Optimized menu for {user_role} with nutrition balance",
         })
@@ -6113,15 +3968,8 @@ def ai_menu_suggestions():
 
 def extract_weekly_menu_from_suggestions(suggestions):
     """Trích xuất và chuyển đổi suggestions thành format menu database"""
-    menu_data = {}
-    days = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat']
-    slots = ['morning', 'snack', 'dessert', 'lunch', 'afternoon', 'lateafternoon']
-    
     # Initialize empty menu
-    for day in days:
-        menu_data[day] = {}
-        for slot in slots:
-            menu_data[day][slot] = "Món ăn dinh dưỡng"
+    menu_data = {day: {meal: "Món ăn dinh dưỡng" for meal in MEAL_KEYS} for day in DAY_KEYS}
     
     current_day = None
     current_day_index = -1
@@ -6225,52 +4073,8 @@ def create_menu_from_suggestions():
 
         
         # Cập nhật dữ liệu thực đơn
-        for day in ['mon', 'tue', 'wed', 'thu', 'fri', 'sat']:
-            day_data = menu_data.get(day, {})
-  
-            
-            if day == 'mon':
-                menu_obj.monday_morning = day_data.get('morning', '')
-                menu_obj.monday_snack = day_data.get('snack', '')
-                menu_obj.monday_dessert = day_data.get('dessert', '')
-                menu_obj.monday_lunch = day_data.get('lunch', '')
-                menu_obj.monday_afternoon = day_data.get('afternoon', '')
-                menu_obj.monday_lateafternoon = day_data.get('lateafternoon', '')
-            elif day == 'tue':
-                menu_obj.tuesday_morning = day_data.get('morning', '')
-                menu_obj.tuesday_snack = day_data.get('snack', '')
-                menu_obj.tuesday_dessert = day_data.get('dessert', '')
-                menu_obj.tuesday_lunch = day_data.get('lunch', '')
-                menu_obj.tuesday_afternoon = day_data.get('afternoon', '')
-                menu_obj.tuesday_lateafternoon = day_data.get('lateafternoon', '')
-            elif day == 'wed':
-                menu_obj.wednesday_morning = day_data.get('morning', '')
-                menu_obj.wednesday_snack = day_data.get('snack', '')
-                menu_obj.wednesday_dessert = day_data.get('dessert', '')
-                menu_obj.wednesday_lunch = day_data.get('lunch', '')
-                menu_obj.wednesday_afternoon = day_data.get('afternoon', '')
-                menu_obj.wednesday_lateafternoon = day_data.get('lateafternoon', '')
-            elif day == 'thu':
-                menu_obj.thursday_morning = day_data.get('morning', '')
-                menu_obj.thursday_snack = day_data.get('snack', '')
-                menu_obj.thursday_dessert = day_data.get('dessert', '')
-                menu_obj.thursday_lunch = day_data.get('lunch', '')
-                menu_obj.thursday_afternoon = day_data.get('afternoon', '')
-                menu_obj.thursday_lateafternoon = day_data.get('lateafternoon', '')
-            elif day == 'fri':
-                menu_obj.friday_morning = day_data.get('morning', '')
-                menu_obj.friday_snack = day_data.get('snack', '')
-                menu_obj.friday_dessert = day_data.get('dessert', '')
-                menu_obj.friday_lunch = day_data.get('lunch', '')
-                menu_obj.friday_afternoon = day_data.get('afternoon', '')
-                menu_obj.friday_lateafternoon = day_data.get('lateafternoon', '')
-            elif day == 'sat':
-                menu_obj.saturday_morning = day_data.get('morning', '')
-                menu_obj.saturday_snack = day_data.get('snack', '')
-                menu_obj.saturday_dessert = day_data.get('dessert', '')
-                menu_obj.saturday_lunch = day_data.get('lunch', '')
-                menu_obj.saturday_afternoon = day_data.get('afternoon', '')
-                menu_obj.saturday_lateafternoon = day_data.get('lateafternoon', '')
+        set_menu_data(menu_obj, menu_data)
+        touch_menu(menu_obj)
         
         db.session.commit()
  
@@ -6306,12 +4110,11 @@ def ai_dashboard():
 def student_albums():
     """Danh sách album của tất cả học sinh"""
     user_role = session.get('role')
-    user_id = session.get('user_id')
     students = []
     albums = []
     if user_role == 'parent':
         # Chỉ xem album của con mình
-        child = Child.query.filter_by(id=user_id).first()
+        child = current_scope().child
         if child:
             students = [child]
             albums = StudentAlbum.query.filter_by(student_id=child.id).order_by(StudentAlbum.date_created.desc()).all()
@@ -6966,7 +4769,8 @@ def course_learn(course_id):
     user_role = session.get('role')
     
     # Get course from database
-    from app.models_courses import Course, CourseSection, Lesson, Enrollment, LessonProgress
+    from app.models_courses import Course, Enrollment
+    from app.course_outline import load_course_player
     
     # Admin and teacher can access all courses without enrollment
     if user_role in ['admin', 'teacher']:
@@ -6983,69 +4787,19 @@ def course_learn(course_id):
             return redirect(url_for('main.course_detail', course_id=course_id))
     
     course = Course.query.get_or_404(course_id)
-    sections = CourseSection.query.filter_by(course_id=course_id).order_by(CourseSection.order).all()
     
-    # Build lesson progress map for template
-    lesson_progress_map = {}
-    total_lessons = 0
-    completed_lessons = 0
-    
-    if enrollment:
-        for section in sections:
-            for lesson in section.lessons:
-                total_lessons += 1
-                progress = LessonProgress.query.filter_by(
-                    lesson_id=lesson.id,
-                    enrollment_id=enrollment.id
-                ).first()
-                
-                if progress:
-                    lesson_progress_map[lesson.id] = {
-                        'is_completed': progress.is_completed,
-                        'completion_percentage': progress.completion_percentage,
-                        'current_position': progress.current_position,
-                        'watched_duration': progress.watched_duration
-                    }
-                    if progress.is_completed:
-                        completed_lessons += 1
-                else:
-                    lesson_progress_map[lesson.id] = {
-                        'is_completed': False,
-                        'completion_percentage': 0,
-                        'current_position': 0,
-                        'watched_duration': 0
-                    }
-    
-    # Calculate overall progress
-    overall_progress = 0
-    if total_lessons > 0:
-        overall_progress = round((completed_lessons / total_lessons) * 100, 1)
-    
-    # Get current lesson (first incomplete or first lesson)
-    current_lesson = None
-    if enrollment:
-        for section in sections:
-            for lesson in section.lessons:
-                progress = lesson_progress_map.get(lesson.id, {})
-                if not progress.get('is_completed', False):
-                    current_lesson = lesson
-                    break
-            if current_lesson:
-                break
-    
-    # If all completed or no enrollment, show first lesson
-    if not current_lesson and sections and sections[0].lessons:
-        current_lesson = sections[0].lessons[0]
+    # Outline (cache theo phiên bản khóa học) + tiến độ - số query cố định
+    player = load_course_player(course, enrollment)
     
     return render_template('courses/learn.html', 
                          course=course,
-                         sections=sections,
-                         current_lesson=current_lesson,
+                         sections=player['sections'],
+                         current_lesson=player['current_lesson'],
                          enrollment=enrollment,
-                         lesson_progress_map=lesson_progress_map,
-                         overall_progress=overall_progress,
-                         total_lessons=total_lessons,
-                         completed_lessons=completed_lessons,
+                         lesson_progress_map=player['lesson_progress_map'],
+                         overall_progress=player['overall_progress'],
+                         total_lessons=player['total_lessons'],
+                         completed_lessons=player['completed_lessons'],
                          title=f'Learn: {course.title}',
                          mobile=mobile)
 
@@ -7610,6 +5364,7 @@ def api_create_section(course_id):
         return jsonify({'success': False, 'message': 'Unauthorized'}), 401
     
     from app.models_courses import Course, CourseSection
+    from app.course_outline import touch_course_outline
     
     course = Course.query.get_or_404(course_id)
     
@@ -7634,6 +5389,7 @@ def api_create_section(course_id):
     )
     
     db.session.add(section)
+    touch_course_outline(course_id)
     db.session.commit()
     
     return jsonify({
@@ -7672,6 +5428,7 @@ def api_update_section(course_id, section_id):
         return jsonify({'success': False, 'message': 'Unauthorized'}), 401
     
     from app.models_courses import Course, CourseSection
+    from app.course_outline import touch_course_outline
     
     course = Course.query.get_or_404(course_id)
     section = CourseSection.query.get_or_404(section_id)
@@ -7691,6 +5448,7 @@ def api_update_section(course_id, section_id):
     if description is not None:
         section.description = description
     
+    touch_course_outline(course_id)
     db.session.commit()
     
     return jsonify({
@@ -7707,6 +5465,7 @@ def api_delete_section(course_id, section_id):
         return jsonify({'success': False, 'message': 'Unauthorized'}), 401
     
     from app.models_courses import Course, CourseSection, Lesson
+    from app.course_outline import touch_course_outline
     
     course = Course.query.get_or_404(course_id)
     section = CourseSection.query.get_or_404(section_id)
@@ -7723,6 +5482,7 @@ def api_delete_section(course_id, section_id):
     
     # Delete section
     db.session.delete(section)
+    touch_course_outline(course_id)
     db.session.commit()
     
     return jsonify({
@@ -7743,6 +5503,7 @@ def api_create_lecture(section_id):
         return jsonify({'success': False, 'message': 'Unauthorized'}), 401
     
     from app.models_courses import CourseSection, Lesson, Course
+    from app.course_outline import touch_course_outline
     
     section = CourseSection.query.get_or_404(section_id)
     course = Course.query.get_or_404(section.course_id)
@@ -7784,6 +5545,7 @@ def api_create_lecture(section_id):
     )
     
     db.session.add(lecture)
+    touch_course_outline(course.id)
     db.session.commit()
     
     return jsonify({
@@ -7801,6 +5563,7 @@ def api_update_lecture(section_id, lecture_id):
         return jsonify({'success': False, 'message': 'Unauthorized'}), 401
     
     from app.models_courses import CourseSection, Lesson, Course
+    from app.course_outline import touch_course_outline
     
     section = CourseSection.query.get_or_404(section_id)
     lecture = Lesson.query.get_or_404(lecture_id)
@@ -7836,6 +5599,7 @@ def api_update_lecture(section_id, lecture_id):
     
     lecture.is_preview = request.form.get('is_preview') == 'on'
     
+    touch_course_outline(course.id)
     db.session.commit()
     
     return jsonify({
@@ -7882,6 +5646,7 @@ def api_delete_lecture(lecture_id):
         return jsonify({'success': False, 'message': 'Unauthorized'}), 401
     
     from app.models_courses import Lesson, CourseSection, Course
+    from app.course_outline import touch_course_outline
     
     lecture = Lesson.query.get_or_404(lecture_id)
     section = CourseSection.query.get_or_404(lecture.section_id)
@@ -7892,6 +5657,7 @@ def api_delete_lecture(lecture_id):
         return jsonify({'success': False, 'message': 'Forbidden'}), 403
     
     db.session.delete(lecture)
+    touch_course_outline(course.id)
     db.session.commit()
     
     return jsonify({
@@ -7996,6 +5762,7 @@ def api_reorder_sections():
         return jsonify({'success': False, 'message': 'Unauthorized'}), 401
     
     from app.models_courses import CourseSection, Course
+    from app.course_outline import touch_course_outline
     
     try:
         data = request.get_json()
@@ -8021,6 +5788,7 @@ def api_reorder_sections():
             if section and section.course_id == course.id:
                 section.order = index
         
+        touch_course_outline(course.id)
         db.session.commit()
         
         return jsonify({
@@ -8043,6 +5811,7 @@ def api_reorder_lectures():
         return jsonify({'success': False, 'message': 'Unauthorized'}), 401
     
     from app.models_courses import Lesson, CourseSection, Course
+    from app.course_outline import touch_course_outline
     
     try:
         data = request.get_json()
@@ -8066,6 +5835,7 @@ def api_reorder_lectures():
             if lecture and lecture.section_id == section_id:
                 lecture.order = index
         
+        touch_course_outline(course.id)
         db.session.commit()
         
         return jsonify({
@@ -8082,6 +5852,9 @@ def api_reorder_lectures():
 
 @main.route('/api/courses/enrollment-request', methods=['POST'])
 @csrf.exempt
+@rate_limit('enrollment_request', limit=5, window=3600,
+            key=lambda: f"{session.get('role')}:{session['user_id']}" if session.get('user_id') else None,
+            message='Bạn đã gửi quá nhiều yêu cầu đăng ký. Vui lòng thử lại sau!')
 def api_enrollment_request():
     """Handle enrollment request and send email notification"""
     if not session.get('user_id'):
@@ -8158,7 +5931,6 @@ def admin_enrollments():
         return redirect(url_for('main.index'))
     
     from app.models_courses import Course, Enrollment
-    from app.models import Child
     
     mobile = is_mobile()
     
@@ -8172,7 +5944,7 @@ def admin_enrollments():
     enrollments = enrollments_query.order_by(Enrollment.enrolled_at.desc()).all()
     
     # Get all students and courses for the form
-    students = Child.query.filter_by(is_active=True).order_by(Child.name).all()
+    students = sorted(active_roster(), key=lambda student: student.name)
     courses = Course.query.filter(Course.status.in_(['published', 'draft'])).order_by(Course.title).all()
     
     # Get filtered course info if filter is applied
@@ -8552,7 +6324,7 @@ def update_enrollment_progress(enrollment_id):
 # ==================== YOUTUBE API ====================
 @main.route('/api/youtube/info', methods=['GET'])
 def api_youtube_info():
-    """Fetch YouTube video metadata using YouTube Data API v3"""
+    """Fetch YouTube video metadata using YouTube Data API v3 (cached by video ID)"""
     video_id = request.args.get('video_id')
     
     if not video_id:
@@ -8562,8 +6334,7 @@ def api_youtube_info():
         }), 400
     
     import requests
-    import re
-    from datetime import timedelta
+    from app.youtube_cache import get_youtube_cache
     
     api_key = current_app.config.get('YOUTUBE_API_KEY')
     
@@ -8575,43 +6346,16 @@ def api_youtube_info():
         }), 500
     
     try:
-        # Call YouTube Data API v3
-        url = f'https://www.googleapis.com/youtube/v3/videos'
-        params = {
-            'part': 'snippet,contentDetails,statistics',
-            'id': video_id,
-            'key': api_key
-        }
-        
-        response = requests.get(url, params=params, timeout=10)
-        data = response.json()
+        # Cache SQLite + gộp request đồng thời cho cùng video ID
+        video = get_youtube_cache(current_app.config).get(video_id)
         
-        if 'items' not in data or len(data['items']) == 0:
+        if not video:
             return jsonify({
                 'success': False,
                 'message': 'Video not found or private'
             }), 404
         
-        video = data['items'][0]
-        snippet = video['snippet']
-        content_details = video['contentDetails']
-        statistics = video.get('statistics', {})
-        
-        # Parse ISO 8601 duration (PT1H23M45S -> seconds)
-        duration_str = content_details['duration']
-        duration_seconds = parse_iso8601_duration(duration_str)
-        
-        return jsonify({
-            'success': True,
-            'video_id': video_id,
-            'title': snippet['title'],
-            'description': snippet['description'][:500],  # Truncate
-            'duration': duration_seconds,
-            'channel': snippet['channelTitle'],
-            'thumbnail': snippet['thumbnails']['high']['url'] if 'high' in snippet['thumbnails'] else snippet['thumbnails']['default']['url'],
-            'published_at': snippet['publishedAt'],
-            'view_count': statistics.get('viewCount', 0)
-        })
+        return jsonify(dict(video, success=True))
         
     except requests.exceptions.Timeout:
         return jsonify({
@@ -8631,22 +6375,47 @@ def api_youtube_info():
         }), 500
 
 
-def parse_iso8601_duration(duration_str):
-    """
-    Parse ISO 8601 duration format to seconds
-    Examples: PT1H23M45S, PT15M30S, PT45S
-    """
-    import re
+@main.route('/api/youtube/info/batch', methods=['GET'])
+def api_youtube_info_batch():
+    """Fetch metadata for many videos at once (?video_ids=id1,id2,...) - one videos.list call per 50 IDs"""
+    video_ids = [v.strip() for v in request.args.get('video_ids', '').split(',') if v.strip()]
+    
+    if not video_ids:
+        return jsonify({
+            'success': False,
+            'message': 'Missing video_ids parameter'
+        }), 400
     
-    pattern = r'PT(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?'
-    match = re.match(pattern, duration_str)
+    import requests
+    from app.youtube_cache import get_youtube_cache
     
-    if not match:
-        return 0
+    api_key = current_app.config.get('YOUTUBE_API_KEY')
     
-    hours = int(match.group(1) or 0)
-    minutes = int(match.group(2) or 0)
-    seconds = int(match.group(3) or 0)
+    if not api_key or api_key == 'YOUR_YOUTUBE_API_KEY_HERE':
+        return jsonify({
+            'success': False,
+            'message': 'YouTube API key not configured. Please set YOUTUBE_API_KEY in config.py'
+        }), 500
     
-    total_seconds = hours * 3600 + minutes * 60 + seconds
-    return total_seconds
+    try:
+        videos = get_youtube_cache(current_app.config).get_many(video_ids)
+        return jsonify({
+            'success': True,
+            'videos': videos  # video_id -> metadata (null nếu không tìm thấy/private)
+        })
+    except requests.exceptions.Timeout:
+        return jsonify({
+            'success': False,
+            'message': 'YouTube API timeout. Please try again.'
+        }), 408
+    except requests.exceptions.RequestException as e:
+        return jsonify({
+            'success': False,
+            'message': f'Error connecting to YouTube API: {str(e)}'
+        }), 500
+    except (ValueError, KeyError) as e:
+        print(f'Invalid YouTube API response: {str(e)}')
+        return jsonify({
+            'success': False,
+            'message': f'Invalid response from YouTube API: {str(e)}'
+        }), 502
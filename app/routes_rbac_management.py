@@ -4,13 +4,21 @@ Admin có thể xem và chỉnh sửa quyền của từng user
 """
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify
 from app.models import db
-from app.models_users import User, ROLE_PERMISSIONS, TeacherProfile, StudentProfile, ParentProfile
+from app.models_users import User, TeacherProfile, StudentProfile, ParentProfile
+from app.models_rbac import (Permission, cached_role_permissions, bump_permissions_version, save_role_permissions,
+                             add_permission)
+from app.user_directory import user_page, user_entries, role_counts
 from datetime import datetime
 
 rbac_mgmt = Blueprint('rbac_mgmt', __name__, url_prefix='/rbac')
 
 
 # ==================== MIDDLEWARE ====================
+def role_permission_lists():
+    """{role: [permission đã sắp xếp]} từ cache quyền (database hoặc ROLE_PERMISSIONS mặc định)"""
+    return {role: sorted(perms) for role, perms in cached_role_permissions().items()}
+
+
 def admin_required():
     """Check if current user is admin"""
     if session.get('role') != 'admin':
@@ -26,33 +34,22 @@ def list_users():
     if not admin_required():
         return redirect(url_for('main.login'))
     
-    # Get all users with their profiles
-    users = User.query.order_by(User.created_at.desc()).all()
+    page = request.args.get('page', 1, type=int)
+    role = request.args.get('role') or None
+    search = request.args.get('search', '')
+    status = request.args.get('status') or None
     
-    # Prepare user data with permission counts
-    users_data = []
-    for user in users:
-        permissions = ROLE_PERMISSIONS.get(user.role, [])
-        
-        # Get profile info
-        profile_info = None
-        if user.role == 'teacher' and user.teacher_profile:
-            profile_info = f"{user.teacher_profile.position or 'Teacher'}"
-        elif user.role in ['student', 'public_student'] and user.student_profile:
-            profile_info = f"{user.student_profile.student_type} - {user.student_profile.student_code or 'N/A'}"
-        elif user.role == 'parent' and user.parent_profile:
-            children_count = len(user.parent_profile.children)
-            profile_info = f"{children_count} children"
-        
-        users_data.append({
-            'user': user,
-            'permissions': permissions,
-            'permission_count': len(permissions),
-            'profile_info': profile_info
-        })
+    pagination = user_page(page, role=role, search=search, status=status)
+    filters = {key: value for key, value in (('role', role), ('search', search), ('status', status)) if value}
+    users_data = user_entries(pagination.items, role_permission_lists())
+    role_stats = role_counts()
     
     return render_template('rbac/user_list.html', 
                           users_data=users_data,
+                          pagination=pagination,
+                          role_stats=role_stats,
+                          total_users=sum(role_stats.values()),
+                          filters=filters,
                           title='Quản lý User & Permissions')
 
 
@@ -88,6 +85,7 @@ def edit_permissions(user_id):
                     profile = ParentProfile(user_id=user.id)
                     db.session.add(profile)
                 
+                bump_permissions_version()
                 db.session.commit()
                 flash(f'✅ Đã đổi role từ "{old_role}" → "{new_role}" cho {user.full_name}', 'success')
             else:
@@ -102,11 +100,12 @@ def edit_permissions(user_id):
         return redirect(url_for('rbac_mgmt.edit_permissions', user_id=user_id))
     
     # GET request - show permission editor
-    current_permissions = ROLE_PERMISSIONS.get(user.role, [])
+    role_perms = role_permission_lists()
+    current_permissions = role_perms.get(user.role, [])
     
     # All possible permissions (union of all roles)
     all_permissions = set()
-    for perms in ROLE_PERMISSIONS.values():
+    for perms in role_perms.values():
         all_permissions.update(perms)
     all_permissions = sorted(all_permissions)
     
@@ -133,7 +132,7 @@ def edit_permissions(user_id):
                           current_permissions=current_permissions,
                           all_permissions=all_permissions,
                           permission_groups=permission_groups,
-                          role_permissions=ROLE_PERMISSIONS,
+                          role_permissions=role_perms,
                           title=f'Edit Permissions - {user.full_name}')
 
 
@@ -143,14 +142,16 @@ def list_roles():
     if not admin_required():
         return redirect(url_for('main.login'))
     
+    role_perms = role_permission_lists()
+    
     # Count users by role
     role_counts = {}
-    for role in ROLE_PERMISSIONS.keys():
+    for role in role_perms.keys():
         count = User.query.filter_by(role=role).count()
         role_counts[role] = count
     
     return render_template('rbac/role_list.html',
-                          role_permissions=ROLE_PERMISSIONS,
+                          role_permissions=role_perms,
                           role_counts=role_counts,
                           title='Roles & Permissions')
 
@@ -161,7 +162,8 @@ def edit_role(role_name):
     if not admin_required():
         return redirect(url_for('main.login'))
     
-    if role_name not in ROLE_PERMISSIONS:
+    role_perms = role_permission_lists()
+    if role_name not in role_perms:
         flash('Role không tồn tại!', 'danger')
         return redirect(url_for('rbac_mgmt.list_roles'))
     
@@ -169,19 +171,18 @@ def edit_role(role_name):
         # Get selected permissions from form
         selected_perms = request.form.getlist('permissions')
         
-        # Update ROLE_PERMISSIONS (in-memory, cần save vào file hoặc database)
-        ROLE_PERMISSIONS[role_name] = selected_perms
-        
-        # TODO: Lưu vào database hoặc config file
+        # Lưu vào database và tăng phiên bản cache quyền (mọi worker nạp lại)
+        save_role_permissions(role_name, selected_perms)
+        db.session.commit()
         flash(f'✅ Đã cập nhật permissions cho role "{role_name}"', 'success')
         return redirect(url_for('rbac_mgmt.list_roles'))
     
     # GET - show editor
-    current_perms = ROLE_PERMISSIONS.get(role_name, [])
+    current_perms = role_perms.get(role_name, [])
     
     # All possible permissions
     all_perms = set()
-    for perms in ROLE_PERMISSIONS.values():
+    for perms in role_perms.values():
         all_perms.update(perms)
     all_perms = sorted(all_perms)
     
@@ -226,13 +227,14 @@ def manage_permissions():
             if new_perm:
                 # Check if exists
                 all_perms = set()
-                for perms in ROLE_PERMISSIONS.values():
+                for perms in cached_role_permissions().values():
                     all_perms.update(perms)
                 
-                if new_perm in all_perms:
+                if new_perm in all_perms or Permission.query.filter_by(name=new_perm).first():
                     flash(f'Permission "{new_perm}" đã tồn tại!', 'warning')
                 else:
-                    # TODO: Lưu vào database
+                    add_permission(new_perm, category)
+                    db.session.commit()
                     flash(f'✅ Đã thêm permission "{new_perm}"', 'success')
             else:
                 flash('Tên permission không được để trống!', 'danger')
@@ -240,8 +242,9 @@ def manage_permissions():
         return redirect(url_for('rbac_mgmt.manage_permissions'))
     
     # GET - show all permissions
+    role_perms = role_permission_lists()
     all_perms = set()
-    for perms in ROLE_PERMISSIONS.values():
+    for perms in role_perms.values():
         all_perms.update(perms)
     
     # Group by category
@@ -260,7 +263,7 @@ def manage_permissions():
     # Count usage per permission
     perm_usage = {}
     for perm in all_perms:
-        count = sum(1 for role, perms in ROLE_PERMISSIONS.items() if perm in perms)
+        count = sum(1 for role, perms in role_perms.items() if perm in perms)
         perm_usage[perm] = count
     
     return render_template('rbac/manage_permissions.html',
@@ -279,7 +282,8 @@ def quick_change_role(user_id):
     user = User.query.get_or_404(user_id)
     new_role = request.json.get('role')
     
-    if new_role not in ROLE_PERMISSIONS:
+    role_perms = cached_role_permissions()
+    if new_role not in role_perms:
         return jsonify({'error': 'Invalid role'}), 400
     
     old_role = user.role
@@ -300,9 +304,10 @@ def quick_change_role(user_id):
         profile = ParentProfile(user_id=user.id)
         db.session.add(profile)
     
+    bump_permissions_version()
     db.session.commit()
     
-    new_permissions = ROLE_PERMISSIONS.get(new_role, [])
+    new_permissions = role_perms.get(new_role, ())
     
     return jsonify({
         'success': True,
@@ -0,0 +1,55 @@
+"""
+Service Enrollment - Dịch vụ (anh văn, STEAMAX) học sinh đăng ký theo tháng (MonthlyService)
+
+Mặc định mọi học sinh dùng cả hai dịch vụ (DEFAULT_SERVICES). Không tạo dòng mặc định khi
+đọc: học sinh chưa có dòng MonthlyService của tháng được coi là đăng ký mặc định, nên mở
+trang hóa đơn không ghi gì vào database.
+
+apply_service_changes() chỉ ghi những học sinh có lựa chọn khác giá trị hiện tại: một lệnh
+UPDATE (executemany theo khoá chính) cho dòng đã có, một lệnh INSERT cho dòng mới.
+Dùng chung cho form hóa đơn và API nhận lô thay đổi checkbox (đã gom phía trình duyệt).
+"""
+from sqlalchemy import insert, update
+
+from app.models import db, MonthlyService
+
+DEFAULT_SERVICES = (True, True)  # (has_english, has_steamax)
+
+
+def service_choices(month):
+    """{child_id: (has_english, has_steamax)} đã lưu của tháng 'YYYY-MM' - một query theo cột"""
+    rows = db.session.query(MonthlyService.child_id, MonthlyService.has_english, MonthlyService.has_steamax)\
+        .filter(MonthlyService.month == month).all()
+    return {child_id: (bool(has_english), bool(has_steamax)) for child_id, has_english, has_steamax in rows}
+
+
+def apply_service_changes(month, choices):
+    """
+    Lưu {child_id: (has_english, has_steamax)} của tháng, chỉ các dòng thực sự đổi (chưa commit).
+    Trả về số học sinh được ghi.
+    """
+    if not choices:
+        return 0
+    current = {child_id: (service_id, bool(has_english), bool(has_steamax))
+               for service_id, child_id, has_english, has_steamax in
+               db.session.query(MonthlyService.id, MonthlyService.child_id,
+                                MonthlyService.has_english, MonthlyService.has_steamax)
+               .filter(MonthlyService.month == month, MonthlyService.child_id.in_(list(choices))).all()}
+
+    updates = []
+    inserts = []
+    for child_id, (has_english, has_steamax) in choices.items():
+        wanted = (bool(has_english), bool(has_steamax))
+        saved = current.get(child_id)
+        if saved is None:
+            if wanted != DEFAULT_SERVICES:
+                inserts.append({'child_id': child_id, 'month': month,
+                                'has_english': wanted[0], 'has_steamax': wanted[1]})
+        elif saved[1:] != wanted:
+            updates.append({'id': saved[0], 'has_english': wanted[0], 'has_steamax': wanted[1]})
+
+    if updates:
+        db.session.execute(update(MonthlyService), updates)
+    if inserts:
+        db.session.execute(insert(MonthlyService), inserts)
+    return len(updates) + len(inserts)
@@ -0,0 +1,300 @@
+"""
+Session Store - Session phía server, cookie chỉ chứa session id đã ký
+
+Trước đây toàn bộ session (user_id, role, name, csrf_token, temp_activity_id...) nằm
+trong cookie ký bằng SECRET_KEY: mỗi request phải gửi lại và giải mã/kiểm chữ ký cả khối.
+Giờ cookie chỉ là session id ngắn (22 ký tự) + chữ ký; dữ liệu nằm ở store:
+
+- 'sqlite': bảng session trong file SQLite cục bộ (SESSION_DB), dùng chung giữa các worker
+  trên cùng máy; bản ghi hết hạn được dọn (sweep) tối đa mỗi SESSION_SWEEP_SECONDS giây
+- 'redis':  Redis hoặc server tương thích (Valkey, KeyDB...) - TTL do Redis tự xoá
+- 'cookie': giữ session cookie mặc định của Flask (không dùng store)
+
+Dữ liệu chỉ được đọc từ store khi view thực sự truy cập session (request ảnh tĩnh,
+trang công khai không tốn lần đọc nào), qua cache đọc trong process (SESSION_CACHE_TTL
+giây, 0 = tắt). Đăng xuất/đổi session id xoá bản cache của worker đang xử lý request, nhưng
+worker khác vẫn có thể chấp nhận session cũ tối đa SESSION_CACHE_TTL giây.
+Session mang theo TTL từ open_session nên đọc được cả khi không còn app context
+(client.session_transaction(), response stream, teardown).
+Chỉ ghi lại khi session bị sửa, hoặc khi TTL còn dưới một nửa (gia hạn).
+"""
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+SESSION_ID_BYTES = 16  # secrets.token_urlsafe(16) → 22 ký tự
+DEFAULT_SWEEP_SECONDS = 600
+DEFAULT_CACHE_TTL = 2
+DEFAULT_CACHE_SIZE = 1000
+
+
+# ================== STORE ==================
+
+class SQLiteSessionStore:
+    """Bảng session (sid, data, expires_at) trong file SQLite cục bộ"""
+    def __init__(self, db_path, sweep_seconds=DEFAULT_SWEEP_SECONDS):
+        self.db_path = db_path
+        self.sweep_seconds = sweep_seconds
+        self._last_sweep = 0
+        self._init_db()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+
+    def _init_db(self):
+        with closing(self._connect()) as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS session ('
+                ' sid TEXT PRIMARY KEY,'
+                ' data TEXT NOT NULL,'
+                ' expires_at REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_session_expires_at ON session (expires_at)')
+
+    def load(self, sid):
+        """(data, expires_at) hoặc None nếu không có / đã hết hạn"""
+        with closing(self._connect()) as conn:
+            return conn.execute('SELECT data, expires_at FROM session WHERE sid = ? AND expires_at > ?',
+                                (sid, time.time())).fetchone()
+
+    def save(self, sid, data, ttl):
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute('INSERT OR REPLACE INTO session (sid, data, expires_at) VALUES (?, ?, ?)',
+                         (sid, data, now + ttl))
+            if now - self._last_sweep >= self.sweep_seconds:
+                self._last_sweep = now
+                self.sweep(conn, now)
+
+    def sweep(self, conn, now):
+        conn.execute('DELETE FROM session WHERE expires_at <= ?', (now,))
+
+    def delete(self, sid):
+        with closing(self._connect()) as conn:
+            conn.execute('DELETE FROM session WHERE sid = ?', (sid,))
+
+
+class RedisSessionStore:
+    """Khoá session:<sid> với TTL - client là redis.Redis hoặc object có cùng các lệnh GET/SET/TTL/DEL"""
+    def __init__(self, client):
+        self.client = client
+
+    def _key(self, sid):
+        return f'session:{sid}'
+
+    def load(self, sid):
+        data = self.client.get(self._key(sid))
+        if data is None:
+            return None
+        ttl = self.client.ttl(self._key(sid))
+        data = data.decode('utf-8') if isinstance(data, bytes) else data
+        return data, time.time() + max(ttl, 0)
+
+    def save(self, sid, data, ttl):
+        self.client.set(self._key(sid), data, ex=int(ttl))
+
+    def delete(self, sid):
+        self.client.delete(self._key(sid))
+
+
+# ================== SESSION ==================
+
+class ServerSession(SessionMixin):
+    """Session chỉ đọc dữ liệu từ store ở lần truy cập đầu tiên"""
+    def __init__(self, interface, sid, new, ttl):
+        self.sid = sid
+        self.ttl = ttl
+        self.new = new
+        self.modified = False
+        self.accessed = False
+        self.refresh = False
+        self.old_sid = None
+        self._interface = interface
+        self._data = {} if new else None
+
+    def _load(self):
+        self.accessed = True
+        if self._data is None:
+            loaded = self._interface.load_data(self.sid, self.ttl)
+            if loaded is None:
+                # id hết hạn/không tồn tại: cấp id mới, không dùng lại id do client gửi lên
+                self.sid = self._interface.new_sid()
+                self.new = True
+                self._data = {}
+            else:
+                self._data, self.refresh = loaded
+        return self._data
+
+    def __getitem__(self, key):
+        return self._load()[key]
+
+    def __setitem__(self, key, value):
+        self._load()[key] = value
+        self.modified = True
+
+    def __delitem__(self, key):
+        del self._load()[key]
+        self.modified = True
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self):
+        return len(self._load())
+
+    def clear(self):
+        self._load()
+        self._data = {}
+        self.modified = True
+
+    def regenerate(self):
+        """Đổi session id, giữ dữ liệu (gọi khi đăng nhập - chống session fixation)"""
+        self._load()
+        if not self.new:
+            self.old_sid = self.sid
+        self.sid = self._interface.new_sid()
+        self.new = True
+        self.modified = True
+
+
+class ServerSessionInterface(SessionInterface):
+    serializer = TaggedJSONSerializer()
+    salt = 'smalltree-session'
+
+    def __init__(self, store, cache_ttl=DEFAULT_CACHE_TTL, cache_size=DEFAULT_CACHE_SIZE):
+        self.store = store
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # sid -> (data, expires_at, cached_at)
+        self._cache_lock = threading.Lock()
+
+    def new_sid(self):
+        return secrets.token_urlsafe(SESSION_ID_BYTES)
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt=self.salt, key_derivation='hmac')
+
+    def _ttl(self, app):
+        return app.permanent_session_lifetime.total_seconds()
+
+    # ---------- cache đọc ----------
+
+    def _cached(self, sid, now):
+        if not self.cache_ttl:
+            return None
+        with self._cache_lock:
+            item = self._cache.get(sid)
+            if item is None:
+                return None
+            if now - item[2] >= self.cache_ttl or item[1] <= now:
+                del self._cache[sid]
+                return None
+            self._cache.move_to_end(sid)
+            return item
+
+    def _remember(self, sid, data, expires_at, now):
+        if not self.cache_ttl:
+            return
+        with self._cache_lock:
+            self._cache[sid] = (data, expires_at, now)
+            self._cache.move_to_end(sid)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _forget(self, sid):
+        with self._cache_lock:
+            self._cache.pop(sid, None)
+
+    def load_data(self, sid, ttl):
+        """(dict dữ liệu, cần gia hạn hay không - còn dưới nửa ttl giây) hoặc None"""
+        now = time.time()
+        item = self._cached(sid, now)
+        if item is None:
+            row = self.store.load(sid)
+            if row is None:
+                return None
+            item = (row[0], row[1], now)
+            self._remember(sid, row[0], row[1], now)
+        data, expires_at = item[0], item[1]
+        return self.serializer.loads(data), expires_at - now < ttl / 2
+
+    # ---------- SessionInterface ----------
+
+    def open_session(self, app, request):
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                return ServerSession(self, self._signer(app).unsign(cookie).decode('ascii'), new=False,
+                                     ttl=self._ttl(app))
+            except (BadSignature, UnicodeDecodeError):
+                pass
+        return ServerSession(self, self.new_sid(), new=True, ttl=self._ttl(app))
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.old_sid:
+            self.store.delete(session.old_sid)
+            self._forget(session.old_sid)
+
+        if session.accessed:
+            response.vary.add('Cookie')
+        if not session.modified and not session.refresh:
+            return
+
+        if not session:
+            if not session.new:
+                self.store.delete(session.sid)
+                self._forget(session.sid)
+            response.delete_cookie(name, domain=domain, path=path,
+                                   secure=self.get_cookie_secure(app),
+                                   samesite=self.get_cookie_samesite(app),
+                                   httponly=self.get_cookie_httponly(app))
+            return
+
+        now = time.time()
+        ttl = self._ttl(app)
+        data = self.serializer.dumps(dict(session))
+        self.store.save(session.sid, data, ttl)
+        self._remember(session.sid, data, now + ttl, now)
+        response.set_cookie(name, self._signer(app).sign(session.sid).decode('ascii'),
+                            expires=self.get_expiration_time(app, session),
+                            httponly=self.get_cookie_httponly(app), domain=domain, path=path,
+                            secure=self.get_cookie_secure(app), samesite=self.get_cookie_samesite(app))
+
+
+def init_session_store(app):
+    """Gắn session phía server theo app.config (SESSION_BACKEND); 'cookie' giữ session mặc định của Flask"""
+    kind = app.config.get('SESSION_BACKEND', 'sqlite')
+    if kind == 'cookie':
+        return
+    if kind == 'redis':
+        if not REDIS_AVAILABLE:
+            raise RuntimeError('SESSION_BACKEND=redis cần cài đặt redis (pip install redis)')
+        store = RedisSessionStore(redis.Redis.from_url(app.config['SESSION_REDIS_URL']))
+    else:
+        store = SQLiteSessionStore(app.config['SESSION_DB'],
+                                   app.config.get('SESSION_SWEEP_SECONDS', DEFAULT_SWEEP_SECONDS))
+    app.session_interface = ServerSessionInterface(store, app.config.get('SESSION_CACHE_TTL', DEFAULT_CACHE_TTL),
+                                                   app.config.get('SESSION_CACHE_SIZE', DEFAULT_CACHE_SIZE))
+
+
+def regenerate_session(session):
+    """Đổi session id nếu backend hỗ trợ (session cookie của Flask không có id)"""
+    if hasattr(session, 'regenerate'):
+        session.regenerate()
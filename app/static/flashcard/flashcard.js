@@ -44,6 +44,15 @@ function playAudio(audioPath) {
     sound.play();
 }
 
+// Header cho request JSON (kèm CSRF token từ thẻ meta trong flashcard/base.html)
+function jsonHeaders() {
+    const meta = document.querySelector('meta[name=csrf-token]');
+    return {
+        'Content-Type': 'application/json',
+        'X-CSRFToken': meta ? meta.getAttribute('content') : ''
+    };
+}
+
 // ================== FLASH MODE ==================
 class FlashMode {
     constructor(cards, childId) {
@@ -213,14 +222,17 @@ class FlashMode {
     }
     
     saveProgress(stars) {
-        fetch('/flashcards/api/update-deck-progress', {
+        // Gửi cả phiên học trong 1 request (keepalive để không bị huỷ khi chuyển trang)
+        fetch('/flashcards/api/submit-session', {
             method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
+            headers: jsonHeaders(),
+            keepalive: true,
             body: JSON.stringify({
                 child_id: this.childId,
                 deck_id: this.cards[0].deck_id,
                 learned_cards: this.learnedCards.size,
-                stars: stars
+                stars: stars,
+                events: [...this.learnedCards].map(cardId => ({ card_id: cardId, ease_level: 2 }))
             })
         });
     }
@@ -235,6 +247,7 @@ class QuizMode {
         this.currentIndex = 0;
         this.score = 0;
         this.totalStars = 0;
+        this.reviewEvents = [];
         
         this.init();
     }
@@ -313,6 +326,9 @@ class QuizMode {
     checkAnswer(selectedId, correctId, element) {
         const isCorrect = selectedId === correctId;
         
+        // Ghi lại kết quả để gửi theo lô khi kết thúc (2 = Good, 1 = Hard)
+        this.reviewEvents.push({ card_id: correctId, ease_level: isCorrect ? 2 : 1 });
+        
         if (isCorrect) {
             element.classList.add('correct');
             this.score += 10;
@@ -391,15 +407,18 @@ class QuizMode {
     }
     
     saveProgress() {
-        fetch('/flashcards/api/update-deck-progress', {
+        // Gửi cả phiên học trong 1 request (keepalive để không bị huỷ khi chuyển trang)
+        fetch('/flashcards/api/submit-session', {
             method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
+            headers: jsonHeaders(),
+            keepalive: true,
             body: JSON.stringify({
                 child_id: this.childId,
                 deck_id: this.cards[0].deck_id,
                 learned_cards: this.cards.length,
                 score: this.score,
-                stars: this.totalStars
+                stars: this.totalStars,
+                events: this.reviewEvents
             })
         });
     }
@@ -414,6 +433,7 @@ class AudioMode {
         this.currentIndex = 0;
         this.score = 0;
         this.totalStars = 0;
+        this.reviewEvents = [];
         this.currentSound = null;
         
         this.init();
@@ -524,6 +544,9 @@ class AudioMode {
     checkAnswer(selectedId, correctId, element) {
         const isCorrect = selectedId === correctId;
         
+        // Ghi lại kết quả để gửi theo lô khi kết thúc (2 = Good, 1 = Hard)
+        this.reviewEvents.push({ card_id: correctId, ease_level: isCorrect ? 2 : 1 });
+        
         if (isCorrect) {
             element.classList.add('correct');
             this.score += 10;
@@ -609,15 +632,18 @@ class AudioMode {
     }
     
     saveProgress() {
-        fetch('/flashcards/api/update-deck-progress', {
+        // Gửi cả phiên học trong 1 request (keepalive để không bị huỷ khi chuyển trang)
+        fetch('/flashcards/api/submit-session', {
             method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
+            headers: jsonHeaders(),
+            keepalive: true,
             body: JSON.stringify({
                 child_id: this.childId,
                 deck_id: this.cards[0].deck_id,
                 learned_cards: this.cards.length,
                 score: this.score,
-                stars: this.totalStars
+                stars: this.totalStars,
+                events: this.reviewEvents
             })
         });
     }
@@ -0,0 +1,104 @@
+"""
+Units - Chuẩn hoá đơn vị tính của nguyên liệu và sản phẩm
+
+DishIngredient.unit và Product.unit là chuỗi tự nhập ('g', 'Gram', 'kg', 'Lít', 'gói'...).
+Bảng quy đổi được dựng một lần khi import module; đơn vị được phân tích MỘT lần khi ghi
+(models gọi canonical_quantity()/unit_price() trong @validates) và lưu kèm giá trị gốc:
+
+- DishIngredient.base_quantity/base_unit: lượng theo đơn vị chuẩn ('g', 'ml' hoặc đơn vị đếm)
+- Product.base_unit/unit_price: giá trên 1 đơn vị chuẩn
+
+Xuất biểu mẫu, kế hoạch mua hàng và gợi ý thực đơn chỉ làm phép tính trên các cột chuẩn,
+không đọc lại chuỗi đơn vị. display_amounts() quy đổi cả cột số lượng sang đơn vị hiển thị
+(kg/lít) trong một lần (dùng numpy nếu có).
+"""
+import unicodedata
+from collections import namedtuple
+from functools import lru_cache
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+MASS = 'mass'
+VOLUME = 'volume'
+COUNT = 'count'
+
+# base: đơn vị chuẩn; factor: số đơn vị chuẩn trong 1 đơn vị gốc
+Unit = namedtuple('Unit', ['base', 'factor', 'dimension'])
+
+_ALIASES = {
+    MASS: ('g', {
+        ('mg', 'miligam', 'milligram'): 0.001,
+        ('g', 'gr', 'gam', 'gram', 'grams'): 1,
+        ('lạng',): 100,
+        ('kg', 'kgs', 'kilo', 'kilogam', 'kilogram', 'ký', 'kí'): 1000,
+    }),
+    VOLUME: ('ml', {
+        ('ml', 'cc', 'mililít', 'mililit', 'milliliter', 'millilitre'): 1,
+        ('l', 'lít', 'lit', 'liter', 'litre'): 1000,
+    }),
+}
+
+UNIT_TABLE = {
+    alias: Unit(base, factor, dimension)
+    for dimension, (base, groups) in _ALIASES.items()
+    for aliases, factor in groups.items()
+    for alias in aliases
+}
+
+# Đơn vị hiển thị trên biểu mẫu/danh sách mua hàng: (đơn vị, số đơn vị chuẩn trong 1 đơn vị hiển thị)
+DISPLAY_UNITS = {'g': ('kg', 1000), 'ml': ('lít', 1000)}
+
+# Khối lượng và thể tích tính giá qua lại theo tỉ trọng ≈ 1 (1 lít ≈ 1 kg) như trước đây
+_WEIGHABLE = ('g', 'ml')
+
+
+def normalize_unit(raw):
+    """Chuỗi đơn vị đã chuẩn hoá: NFC, chữ thường, bỏ khoảng trắng thừa và dấu chấm cuối"""
+    text = unicodedata.normalize('NFC', str(raw or ''))
+    return ' '.join(text.lower().split()).rstrip('.')
+
+
+@lru_cache(maxsize=512)
+def parse_unit(raw):
+    """Unit của chuỗi đơn vị; đơn vị không có trong bảng là đơn vị đếm (gói, hộp, quả...)"""
+    name = normalize_unit(raw)
+    return UNIT_TABLE.get(name) or Unit(name, 1, COUNT)
+
+
+def canonical_quantity(quantity, unit):
+    """(base_quantity, base_unit) của một lượng theo đơn vị gốc"""
+    parsed = parse_unit(unit)
+    return float(quantity) * parsed.factor, parsed.base
+
+
+def unit_price(price, unit):
+    """(base_unit, giá trên 1 đơn vị chuẩn) từ giá theo đơn vị gốc; giá None nếu chưa có giá"""
+    parsed = parse_unit(unit)
+    return parsed.base, (float(price) / parsed.factor if price else None)
+
+
+def compatible(base_unit, price_unit):
+    return base_unit == price_unit or (base_unit in _WEIGHABLE and price_unit in _WEIGHABLE)
+
+
+def purchase_cost(base_quantity, base_unit, price_unit, price):
+    """Thành tiền của base_quantity theo giá/đơn vị chuẩn; None nếu chưa có giá hoặc đơn vị không quy đổi được"""
+    if not price or not compatible(base_unit, price_unit):
+        return None
+    return base_quantity * price
+
+
+def display_unit(base_unit):
+    return DISPLAY_UNITS.get(base_unit, (base_unit, 1))[0]
+
+
+def display_amounts(quantities, base_units):
+    """Quy đổi cả cột số lượng chuẩn sang đơn vị hiển thị (kg/lít/đơn vị đếm)"""
+    divisors = [DISPLAY_UNITS.get(unit, (unit, 1))[1] for unit in base_units]
+    if not NUMPY_AVAILABLE:
+        return [q / d for q, d in zip(quantities, divisors)]
+    return (np.asarray(quantities, dtype=float) / np.asarray(divisors, dtype=float)).tolist()
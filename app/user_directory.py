@@ -0,0 +1,82 @@
+"""
+User Directory - Danh sách tài khoản RBAC phân trang, có lọc/tìm kiếm (/rbac/users)
+
+Số query của một trang không phụ thuộc số user:
+- 1 query đếm + 1 query user của trang (kèm số con của phụ huynh từ subquery
+  GROUP BY student_profile.parent_id, không gọi ParentProfile.children từng người)
+- 3 query selectinload cho teacher_profile / student_profile / parent_profile
+- 1 query GROUP BY role cho ô thống kê
+Lọc role/trạng thái và tìm tên/email/username chạy trong SQL thay vì trong template.
+"""
+from collections import namedtuple
+
+from sqlalchemy import func, or_
+from sqlalchemy.orm import selectinload
+
+from app.models import db
+from app.models_users import User, StudentProfile
+
+USERS_PER_PAGE = 30
+
+# profile_info: chuỗi mô tả ngắn theo role (chức vụ, mã học sinh, số con...) hoặc None
+UserEntry = namedtuple('UserEntry', ['user', 'permissions', 'permission_count', 'profile_info'])
+
+
+def _like_pattern(text):
+    escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+def _children_counts():
+    return db.session.query(
+        StudentProfile.parent_id.label('parent_id'),
+        func.count(StudentProfile.id).label('children_count'),
+    ).filter(StudentProfile.parent_id.isnot(None)).group_by(StudentProfile.parent_id).subquery()
+
+
+def user_page(page, role=None, search=None, status=None, per_page=USERS_PER_PAGE):
+    """Pagination với items là các dòng (User, children_count), user mới tạo trước"""
+    counts = _children_counts()
+    query = db.session.query(User, func.coalesce(counts.c.children_count, 0))\
+        .outerjoin(counts, counts.c.parent_id == User.id)\
+        .options(selectinload(User.teacher_profile),
+                 selectinload(User.student_profile),
+                 selectinload(User.parent_profile))
+    if role:
+        query = query.filter(User.role == role)
+    if status == 'active':
+        query = query.filter(User.is_active.is_(True))
+    elif status == 'inactive':
+        query = query.filter(User.is_active.is_(False))
+    search = (search or '').strip()
+    if search:
+        pattern = _like_pattern(search)
+        query = query.filter(or_(User.full_name.ilike(pattern, escape='\\'),
+                                 User.email.ilike(pattern, escape='\\'),
+                                 User.username.ilike(pattern, escape='\\')))
+    return query.order_by(User.created_at.desc(), User.id.desc())\
+        .paginate(page=page, per_page=per_page, error_out=False)
+
+
+def role_counts():
+    """{role: số user} trên toàn bộ bảng users (không theo bộ lọc)"""
+    return dict(db.session.query(User.role, func.count(User.id)).group_by(User.role).all())
+
+
+def profile_info(user, children_count):
+    if user.role == 'teacher' and user.teacher_profile:
+        return f"{user.teacher_profile.position or 'Teacher'}"
+    if user.role in ['student', 'public_student'] and user.student_profile:
+        return f"{user.student_profile.student_type} - {user.student_profile.student_code or 'N/A'}"
+    if user.role == 'parent' and user.parent_profile:
+        return f"{children_count} children"
+    return None
+
+
+def user_entries(rows, role_permissions):
+    """list UserEntry cho template từ items của user_page() và {role: [permission]}"""
+    entries = []
+    for user, children_count in rows:
+        permissions = role_permissions.get(user.role, [])
+        entries.append(UserEntry(user, permissions, len(permissions), profile_info(user, children_count)))
+    return entries
@@ -0,0 +1,116 @@
+"""
+XLSX Writer - Xuất bảng Excel dạng streaming (openpyxl write_only)
+
+- Cột khai báo bằng Column(header, value, style): value là tên key/thuộc tính
+  hoặc hàm nhận record trả về giá trị.
+- Style dùng NamedStyle đăng ký một lần cho mỗi workbook, không tạo
+  Font/Border/PatternFill mới cho từng ô.
+- Độ rộng cột tính từ WIDTH_SAMPLE_ROWS dòng đầu của luồng dữ liệu (write_only
+  bắt buộc đặt độ rộng trước khi ghi dòng), phần còn lại ghi thẳng ra file.
+- Kết quả ghi vào SpooledTemporaryFile: nhỏ thì nằm trong RAM, lớn thì tràn ra đĩa.
+
+Bộ nhớ không tăng theo số dòng (chỉ giữ tối đa WIDTH_SAMPLE_ROWS dòng).
+"""
+import tempfile
+from collections import namedtuple
+from collections.abc import Mapping
+from itertools import chain, islice
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+from openpyxl.utils import get_column_letter
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+WIDTH_SAMPLE_ROWS = 500
+MAX_COLUMN_WIDTH = 50
+SPOOL_MAX_SIZE = 5 * 1024 * 1024  # > 5MB thì ghi ra file tạm trên đĩa
+
+Column = namedtuple('Column', ['header', 'value', 'style'])
+Column.__new__.__defaults__ = ('cell',)
+
+
+def _thin_border():
+    side = Side(style='thin')
+    return Border(left=side, right=side, top=side, bottom=side)
+
+
+def _named_styles():
+    """Bộ style dùng chung - tạo mới cho mỗi workbook (NamedStyle gắn với workbook khi đăng ký)"""
+    header = NamedStyle(name='header')
+    header.font = Font(bold=True, color='FFFFFF')
+    header.fill = PatternFill(start_color='4CAF50', end_color='4CAF50', fill_type='solid')
+    header.alignment = Alignment(horizontal='center', vertical='center')
+    header.border = _thin_border()
+
+    cell = NamedStyle(name='cell')
+    cell.alignment = Alignment(horizontal='left', vertical='center')
+    cell.border = _thin_border()
+
+    center = NamedStyle(name='center')
+    center.alignment = Alignment(horizontal='center', vertical='center')
+    center.border = _thin_border()
+
+    return [header, cell, center]
+
+
+def _cell_value(column, record):
+    if callable(column.value):
+        return column.value(record)
+    if isinstance(record, Mapping):
+        return record.get(column.value)
+    return getattr(record, column.value, None)
+
+
+def _display_width(value):
+    return len(str(value)) if value is not None else 0
+
+
+def write_xlsx(columns, records, sheet_title='Sheet1', styles=None):
+    """
+    Ghi records (iterable bất kỳ, có thể là generator) ra file xlsx.
+    styles: list NamedStyle bổ sung ngoài 'header', 'cell', 'center'.
+
+    Returns: SpooledTemporaryFile đã seek(0), caller đóng sau khi gửi.
+    """
+    wb = Workbook(write_only=True)
+    for style in chain(_named_styles(), styles or []):
+        wb.add_named_style(style)
+    ws = wb.create_sheet(title=sheet_title)
+
+    records = iter(records)
+    sample = [[_cell_value(c, r) for c in columns] for r in islice(records, WIDTH_SAMPLE_ROWS)]
+
+    widths = [_display_width(c.header) for c in columns]
+    for values in sample:
+        for i, value in enumerate(values):
+            widths[i] = max(widths[i], _display_width(value))
+    for i, width in enumerate(widths, 1):
+        ws.column_dimensions[get_column_letter(i)].width = min(width + 2, MAX_COLUMN_WIDTH)
+
+    def styled_cells(style_names):
+        cells = []
+        for style in style_names:
+            cell = WriteOnlyCell(ws)
+            cell.style = style
+            cells.append(cell)
+        return cells
+
+    def append(cells, values):
+        for cell, value in zip(cells, values):
+            cell.value = value
+        ws.append(cells)
+
+    # Mỗi cột dùng lại một ô đã gán style: append() ghi dòng ra file ngay nên an toàn
+    append(styled_cells(['header'] * len(columns)), [c.header for c in columns])
+    cells = styled_cells([c.style for c in columns])
+    for values in sample:
+        append(cells, values)
+    del sample
+    for record in records:
+        append(cells, [_cell_value(c, record) for c in columns])
+
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE, suffix='.xlsx')
+    wb.save(output)
+    output.seek(0)
+    return output
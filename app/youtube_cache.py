@@ -0,0 +1,240 @@
+"""
+YouTube Metadata Cache
+Cache metadata video YouTube (tiêu đề, thời lượng, thumbnail...) trong bảng SQLite
+cục bộ, có TTL + LRU eviction, gộp các request đồng thời cho cùng video ID
+và tra cứu hàng loạt bằng videos.list nhiều ID.
+Video không tồn tại/private cũng được cache (data = null) với TTL ngắn hơn (negative_ttl).
+"""
+import json
+import re
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+import requests
+
+YOUTUBE_VIDEOS_URL = 'https://www.googleapis.com/youtube/v3/videos'
+MAX_IDS_PER_REQUEST = 50  # Giới hạn của YouTube Data API cho videos.list
+
+
+def parse_iso8601_duration(duration_str):
+    """
+    Parse ISO 8601 duration format to seconds
+    Examples: PT1H23M45S, PT15M30S, PT45S
+    """
+    pattern = r'PT(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?'
+    match = re.match(pattern, duration_str or '')
+
+    if not match:
+        return 0
+
+    hours = int(match.group(1) or 0)
+    minutes = int(match.group(2) or 0)
+    seconds = int(match.group(3) or 0)
+
+    total_seconds = hours * 3600 + minutes * 60 + seconds
+    return total_seconds
+
+
+def _normalize_item(item):
+    """Chuyển 1 item của videos.list thành dict metadata gọn (giống response của /api/youtube/info)"""
+    snippet = item['snippet']
+    thumbnails = snippet.get('thumbnails', {})
+    thumbnail = thumbnails.get('high') or thumbnails.get('default') or {}
+    return {
+        'video_id': item['id'],
+        'title': snippet['title'],
+        'description': snippet.get('description', '')[:500],  # Truncate
+        'duration': parse_iso8601_duration(item['contentDetails']['duration']),
+        'channel': snippet.get('channelTitle', ''),
+        'thumbnail': thumbnail.get('url', ''),
+        'published_at': snippet.get('publishedAt'),
+        'view_count': item.get('statistics', {}).get('viewCount', 0)
+    }
+
+
+class _Pending:
+    """Một lượt gọi upstream đang chạy - các request khác cùng video ID sẽ chờ kết quả này"""
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class YouTubeMetadataCache:
+    """
+    Cache metadata YouTube theo video ID.
+    - TTL: bản ghi cũ hơn ttl giây được coi như chưa có
+    - Negative cache: video không tìm thấy được nhớ trong negative_ttl giây
+    - LRU: giữ tối đa max_entries bản ghi, xoá bản ghi ít được truy cập nhất
+    - Coalescing: mỗi video ID chỉ có 1 request upstream tại một thời điểm
+    """
+    def __init__(self, db_path, api_key, ttl=7 * 24 * 3600, max_entries=5000,
+                 api_url=YOUTUBE_VIDEOS_URL, timeout=10, negative_ttl=3600):
+        self.db_path = db_path
+        self.api_key = api_key
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.api_url = api_url
+        self.timeout = timeout
+        self._inflight = {}  # video_id -> _Pending
+        self._lock = threading.Lock()
+        self._init_db()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    def _init_db(self):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS youtube_metadata ('
+                ' video_id TEXT PRIMARY KEY,'
+                ' data TEXT NOT NULL,'
+                ' fetched_at REAL NOT NULL,'
+                ' last_access REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_youtube_metadata_last_access '
+                         'ON youtube_metadata (last_access)')
+
+    # ---------- SQLite ----------
+    def _read(self, video_ids):
+        """Lấy các bản ghi còn hạn (kể cả bản ghi không tìm thấy → None) và cập nhật last_access (LRU)"""
+        now = time.time()
+        placeholders = ','.join('?' * len(video_ids))
+        with closing(self._connect()) as conn, conn:
+            rows = conn.execute(
+                f'SELECT video_id, data FROM youtube_metadata '
+                f'WHERE video_id IN ({placeholders}) '
+                f"AND fetched_at >= CASE WHEN data = 'null' THEN ? ELSE ? END",
+                (*video_ids, now - self.negative_ttl, now - self.ttl)
+            ).fetchall()
+            if rows:
+                conn.executemany('UPDATE youtube_metadata SET last_access = ? WHERE video_id = ?',
+                                 [(now, row[0]) for row in rows])
+        return {row[0]: json.loads(row[1]) for row in rows}
+
+    def _write(self, metadata_by_id):
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO youtube_metadata (video_id, data, fetched_at, last_access) '
+                'VALUES (?, ?, ?, ?)',
+                [(vid, json.dumps(data), now, now) for vid, data in metadata_by_id.items()]
+            )
+            # Xoá bản ghi hết hạn, rồi cắt bớt theo LRU nếu vượt max_entries
+            conn.execute(
+                "DELETE FROM youtube_metadata WHERE fetched_at < CASE WHEN data = 'null' THEN ? ELSE ? END",
+                (now - self.negative_ttl, now - self.ttl)
+            )
+            conn.execute(
+                'DELETE FROM youtube_metadata WHERE video_id IN ('
+                ' SELECT video_id FROM youtube_metadata ORDER BY last_access DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,)
+            )
+
+    def invalidate(self, video_id):
+        with closing(self._connect()) as conn, conn:
+            conn.execute('DELETE FROM youtube_metadata WHERE video_id = ?', (video_id,))
+
+    # ---------- Upstream ----------
+    def _fetch_upstream(self, video_ids):
+        """
+        Gọi videos.list với tối đa 50 ID mỗi request. Video không tồn tại/private không có trong kết quả.
+        Upstream trả lỗi HTTP (quota, key sai...) → requests.exceptions.HTTPError, không cache gì.
+        """
+        found = {}
+        for start in range(0, len(video_ids), MAX_IDS_PER_REQUEST):
+            chunk = video_ids[start:start + MAX_IDS_PER_REQUEST]
+            response = requests.get(self.api_url, params={
+                'part': 'snippet,contentDetails,statistics',
+                'id': ','.join(chunk),
+                'key': self.api_key
+            }, timeout=self.timeout)
+            response.raise_for_status()
+            data = response.json()
+            for item in data.get('items', []):
+                metadata = _normalize_item(item)
+                found[metadata['video_id']] = metadata
+        return found
+
+    # ---------- Public API ----------
+    def get_many(self, video_ids):
+        """
+        Metadata cho nhiều video: {video_id: dict hoặc None nếu không tìm thấy}.
+        Lỗi mạng (requests.exceptions.*) và response không đúng định dạng (ValueError/KeyError)
+        được raise lại cho mọi request đang chờ; chờ request khác quá timeout × 2 giây thì
+        raise requests.exceptions.Timeout.
+        """
+        video_ids = list(dict.fromkeys(v for v in video_ids if v))
+        if not video_ids:
+            return {}
+
+        results = self._read(video_ids)
+        missing = [v for v in video_ids if v not in results]
+        if not missing:
+            return results
+
+        # Chia thành: ID mình sẽ fetch (leader) và ID đang có request khác fetch (chờ)
+        mine, waiting = {}, {}
+        with self._lock:
+            for vid in missing:
+                pending = self._inflight.get(vid)
+                if pending is None:
+                    pending = self._inflight[vid] = _Pending()
+                    mine[vid] = pending
+                else:
+                    waiting[vid] = pending
+
+        if mine:
+            try:
+                fetched = self._fetch_upstream(list(mine))
+                self._write({vid: fetched.get(vid) for vid in mine})
+                for vid, pending in mine.items():
+                    pending.result = fetched.get(vid)
+            except Exception as e:
+                for pending in mine.values():
+                    pending.error = e
+                raise
+            finally:
+                with self._lock:
+                    for vid, pending in mine.items():
+                        self._inflight.pop(vid, None)
+                        pending.event.set()
+            for vid, pending in mine.items():
+                results[vid] = pending.result
+
+        for vid, pending in waiting.items():
+            if not pending.event.wait(self.timeout * 2):
+                # Leader chưa xong: không trả None (sẽ bị hiểu là video không tồn tại)
+                raise requests.exceptions.Timeout(f'Hết thời gian chờ metadata YouTube cho {vid}')
+            if pending.error is not None:
+                raise pending.error
+            results[vid] = pending.result
+
+        return results
+
+    def get(self, video_id):
+        """Metadata cho 1 video, None nếu không tìm thấy"""
+        return self.get_many([video_id]).get(video_id)
+
+
+_cache_instance = None
+_cache_instance_lock = threading.Lock()
+
+
+def get_youtube_cache(config):
+    """Cache dùng chung trong process, tạo từ app.config (YOUTUBE_API_KEY, YOUTUBE_CACHE_*)"""
+    global _cache_instance
+    with _cache_instance_lock:
+        if _cache_instance is None or _cache_instance.api_key != config.get('YOUTUBE_API_KEY'):
+            _cache_instance = YouTubeMetadataCache(
+                db_path=config['YOUTUBE_CACHE_DB'],
+                api_key=config.get('YOUTUBE_API_KEY'),
+                ttl=config.get('YOUTUBE_CACHE_TTL', 7 * 24 * 3600),
+                max_entries=config.get('YOUTUBE_CACHE_MAX_ENTRIES', 5000),
+                negative_ttl=config.get('YOUTUBE_CACHE_NEGATIVE_TTL', 3600),
+                api_url=config.get('YOUTUBE_API_URL', YOUTUBE_VIDEOS_URL)
+            )
+        return _cache_instance
@@ -0,0 +1,70 @@
+"""
+Benchmark: đánh giá tăng trưởng WHO cho 1.000 học sinh
+So sánh cách cũ (gọi assess_child_growth_who từng dòng, như filter assess_growth trong template)
+với assess_growth_batch (cả lớp trong một lượt, dùng numpy nếu có), kèm số học sinh có kết quả
+khác nhau giữa hai cách (z-score so với sai số 1e-6).
+
+Chạy: python bench_growth_standards.py
+"""
+import random
+import time
+from datetime import date, timedelta
+
+from app.growth_standards import (
+    NUMPY_AVAILABLE, age_in_months, assess_child_growth_who, assess_growth_batch
+)
+
+STUDENTS = 1000
+RUNS = 20
+
+
+def _same(a, b):
+    """Hai kết quả đánh giá giống nhau (số thực so với sai số 1e-6)"""
+    if a.keys() != b.keys():
+        return False
+    for key, value in a.items():
+        other = b[key]
+        if isinstance(value, float) and isinstance(other, float):
+            if abs(value - other) > 1e-6:
+                return False
+        elif value != other:
+            return False
+    return True
+
+
+def main():
+    random.seed(42)
+    today = date.today()
+    rows = []
+    for _ in range(STUDENTS):
+        birth_date = (today - timedelta(days=random.randint(365, 6 * 365))).isoformat()
+        height = random.uniform(75, 125)
+        weight = random.uniform(9, 28)
+        rows.append((
+            random.choice(['male', 'female']),
+            age_in_months(birth_date),
+            round(weight / (height / 100) ** 2, 2),
+            weight,
+            height
+        ))
+
+    start = time.perf_counter()
+    for _ in range(RUNS):
+        per_row = [assess_child_growth_who(age, gender, bmi=bmi, weight_kg=weight, height_cm=height)
+                   for gender, age, bmi, weight, height in rows]
+    per_row_ms = (time.perf_counter() - start) / RUNS * 1000
+
+    start = time.perf_counter()
+    for _ in range(RUNS):
+        batch = assess_growth_batch(rows)
+    batch_ms = (time.perf_counter() - start) / RUNS * 1000
+
+    print(f"numpy: {'có' if NUMPY_AVAILABLE else 'không'}")
+    print(f"{'per-row (filter)':<20} {per_row_ms:8.2f} ms / {STUDENTS} học sinh")
+    print(f"{'batch':<20} {batch_ms:8.2f} ms / {STUDENTS} học sinh")
+    mismatches = sum(not _same(a, b) for a, b in zip(per_row, batch))
+    print(f"{'khác nhau':<20} {mismatches:8d} / {STUDENTS} học sinh")
+
+
+if __name__ == '__main__':
+    main()
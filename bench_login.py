@@ -0,0 +1,93 @@
+"""
+Benchmark: đăng nhập với 5.000 học sinh (phụ huynh) và 20 giáo viên
+- Tra cứu tài khoản: 3 query cũ (admin, child OR, staff OR) so với resolve_login()
+  (1 query UNION ALL), có / không có index email/phone
+- Cả request POST /login (gồm 1 lần check_password_hash)
+
+Chạy: python bench_login.py
+Dùng database SQLite tạm, không đụng tới app/site.db.
+"""
+import os
+import statistics
+import tempfile
+import time
+
+import config
+
+CHILDREN = 5000
+TEACHERS = 20
+RUNS = 300
+LOGIN_RUNS = 15
+
+
+def main():
+    db_file = os.path.join(tempfile.mkdtemp(), 'bench_login.db')
+    config.Config.SQLALCHEMY_DATABASE_URI = f'sqlite:///{db_file}'
+    config.Config.RATE_LIMIT_BACKEND = 'memory'
+
+    from werkzeug.security import generate_password_hash
+    from app import create_app
+    from app.models import db, Child, Staff
+    from app.login_identity import resolve_login
+    import app.routes as routes
+
+    app = create_app()
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.app_context():
+        db.create_all()
+        password_hash = generate_password_hash('123456')
+        print(f"Seeding {CHILDREN} children, {TEACHERS} teachers...")
+        db.session.add(Staff(name='admin', position='admin', contact_info='admin', email='admin@smalltree.vn',
+                             phone='0900000000', password=password_hash))
+        db.session.bulk_insert_mappings(Staff, [
+            {'name': f'GV {i}', 'position': 'teacher', 'contact_info': '', 'email': f'gv{i}@smalltree.vn',
+             'phone': f'08{i:08d}', 'password': password_hash}
+            for i in range(TEACHERS)
+        ])
+        db.session.bulk_insert_mappings(Child, [
+            {'name': f'Bé {i}', 'age': 4, 'email': f'ph{i}@smalltree.vn', 'phone': f'09{i:08d}',
+             'password': password_hash, 'is_active': True}
+            for i in range(CHILDREN)
+        ])
+        db.session.commit()
+
+        def old_lookup(identifier):
+            admin = Staff.query.filter_by(position='admin').first()
+            if admin and identifier in (admin.email, admin.phone):
+                return admin
+            return (Child.query.filter((Child.email == identifier) | (Child.phone == identifier)).first()
+                    or Staff.query.filter((Staff.email == identifier) | (Staff.phone == identifier)).first())
+
+        def timed(label, lookup):
+            start = time.perf_counter()
+            for i in range(RUNS):
+                lookup(f'ph{(i * 37) % CHILDREN}@smalltree.vn')
+                db.session.remove()
+            elapsed = (time.perf_counter() - start) / RUNS * 1000
+            print(f"{label:<40} {elapsed:8.2f} ms / lookup")
+
+        timed('3 queries (indexed)', old_lookup)
+        timed('resolve_login (indexed)', resolve_login)
+
+        client = app.test_client()
+        for label, identifier, password in [('POST /login parent OK', 'ph4999@smalltree.vn', '123456'),
+                                            ('POST /login wrong password', 'gv5@smalltree.vn', 'sai'),
+                                            ('POST /login unknown account', 'khong-co@smalltree.vn', 'sai')]:
+            times = []
+            for _ in range(LOGIN_RUNS):
+                routes.login_failures.reset('127.0.0.1')
+                routes.login_cooldown.reset('127.0.0.1')
+                start = time.perf_counter()
+                client.post('/login', data={'email': identifier, 'password': password})
+                times.append((time.perf_counter() - start) * 1000)
+            print(f"{label:<40} {statistics.median(times):8.2f} ms (median)")
+
+        for name in ('ix_child_email', 'ix_child_phone', 'ix_staff_email', 'ix_staff_phone'):
+            db.session.execute(db.text(f'DROP INDEX {name}'))
+        db.session.commit()
+        timed('3 queries (no index)', old_lookup)
+        timed('resolve_login (no index)', resolve_login)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark: chọn thẻ đến hạn ôn (review queue) trên 100.000 dòng CardProgress
+So sánh có / không có index (child_id, next_review).
+
+Chạy: python bench_review_queue.py
+Dùng database SQLite tạm, không đụng tới app/site.db.
+"""
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import config
+
+PROGRESS_ROWS = 100_000
+CHILDREN = 200
+DECKS = 50
+CARDS_PER_DECK = 20
+RUNS = 50
+
+
+def main():
+    db_file = os.path.join(tempfile.mkdtemp(), 'bench_review_queue.db')
+    config.Config.SQLALCHEMY_DATABASE_URI = f'sqlite:///{db_file}'
+
+    from app import create_app
+    from app.models import db, Deck, Card, CardProgress, Child
+    from app.flashcard.review_queue import get_review_queue
+
+    app = create_app()
+    with app.app_context(), app.test_request_context():
+        db.create_all()
+        random.seed(42)
+        now = datetime.now()
+
+        print(f"Seeding {CHILDREN} children, {DECKS * CARDS_PER_DECK} cards, {PROGRESS_ROWS} progress rows...")
+        db.session.bulk_insert_mappings(Child, [{'id': i, 'name': f'Bé {i}', 'age': 4} for i in range(1, CHILDREN + 1)])
+        db.session.bulk_insert_mappings(Deck, [{'id': d, 'title': f'Deck {d}', 'age_group': '3-5', 'order': d}
+                                               for d in range(1, DECKS + 1)])
+        db.session.bulk_insert_mappings(Card, [
+            {'id': (d - 1) * CARDS_PER_DECK + c, 'deck_id': d, 'front_text': f'Card {d}-{c}',
+             'image_url': f'flashcard/images/{d}_{c}.jpg', 'order': c}
+            for d in range(1, DECKS + 1) for c in range(1, CARDS_PER_DECK + 1)
+        ])
+        total_cards = DECKS * CARDS_PER_DECK
+        rows = []
+        for child_id in range(1, CHILDREN + 1):
+            for card_id in random.sample(range(1, total_cards + 1), PROGRESS_ROWS // CHILDREN):
+                rows.append({
+                    'child_id': child_id,
+                    'card_id': card_id,
+                    'ease_level': 2,
+                    'repetitions': 3,
+                    'interval_days': 4,
+                    'next_review': now + timedelta(days=random.uniform(-30, 30)),
+                    'last_reviewed': now - timedelta(days=random.randint(1, 30))
+                })
+        db.session.bulk_insert_mappings(CardProgress, rows)
+        db.session.commit()
+
+        def timed(label):
+            start = time.perf_counter()
+            for _ in range(RUNS):
+                get_review_queue(random.randint(1, CHILDREN), limit=20, now=now)
+            elapsed = (time.perf_counter() - start) / RUNS * 1000
+            print(f"{label:<32} {elapsed:8.2f} ms / queue")
+
+        timed('with (child_id, next_review)')
+        db.session.execute(db.text('DROP INDEX ix_card_progress_child_next_review'))
+        db.session.commit()
+        timed('without index')
+
+
+if __name__ == '__main__':
+    main()
@@ -32,6 +32,30 @@ class Config:
     # Get your API key from: https://console.cloud.google.com/apis/credentials
     # Enable YouTube Data API v3 in your Google Cloud project
     YOUTUBE_API_KEY = os.environ.get('YOUTUBE_API_KEY') or 'YOUR_YOUTUBE_API_KEY_HERE'
+    # Cache metadata video (SQLite cục bộ) - tránh gọi lại API khi sửa bài giảng
+    YOUTUBE_CACHE_DB = os.environ.get('YOUTUBE_CACHE_DB') or os.path.join(os.path.abspath(os.path.dirname(__file__)), "app", "youtube_cache.db")
+    YOUTUBE_CACHE_TTL = int(os.environ.get('YOUTUBE_CACHE_TTL') or 7 * 24 * 3600)  # 7 ngày
+    YOUTUBE_CACHE_MAX_ENTRIES = int(os.environ.get('YOUTUBE_CACHE_MAX_ENTRIES') or 5000)
+    YOUTUBE_CACHE_NEGATIVE_TTL = int(os.environ.get('YOUTUBE_CACHE_NEGATIVE_TTL') or 3600)  # video không tìm thấy: 1 giờ
+
+    # Giới hạn tần suất đăng nhập/API (app/rate_limit.py): 'sqlite' (mặc định, dùng chung giữa
+    # các worker trên cùng máy), 'redis' (RATE_LIMIT_REDIS_URL), 'memory' (chỉ 1 worker) hoặc
+    # 'redis-local' (stand-in Redis trong process, chỉ 1 worker - chạy thử đường Redis không cần server)
+    RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND') or 'sqlite'
+    RATE_LIMIT_DB = os.environ.get('RATE_LIMIT_DB') or os.path.join(os.path.abspath(os.path.dirname(__file__)), "app", "rate_limit.db")
+    RATE_LIMIT_REDIS_URL = os.environ.get('RATE_LIMIT_REDIS_URL') or 'redis://localhost:6379/0'
+    RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS') or 10000)
+
+    # Session phía server (app/session_store.py): 'sqlite' (mặc định), 'redis' (SESSION_REDIS_URL)
+    # hoặc 'cookie' (session cookie của Flask). Thời hạn session = PERMANENT_SESSION_LIFETIME.
+    SESSION_BACKEND = os.environ.get('SESSION_BACKEND') or 'sqlite'
+    SESSION_DB = os.environ.get('SESSION_DB') or os.path.join(os.path.abspath(os.path.dirname(__file__)), "app", "session.db")
+    SESSION_REDIS_URL = os.environ.get('SESSION_REDIS_URL') or 'redis://localhost:6379/1'
+    # Cache đọc session trong process (giây, 0 = tắt). Sau khi đăng xuất/đổi session id, worker KHÁC
+    # vẫn có thể chấp nhận session cũ tối đa chừng đó giây - đặt 0 nếu không chấp nhận được.
+    SESSION_CACHE_TTL = float(os.environ.get('SESSION_CACHE_TTL') or 2)
+    SESSION_CACHE_SIZE = int(os.environ.get('SESSION_CACHE_SIZE') or 1000)
+    SESSION_SWEEP_SECONDS = int(os.environ.get('SESSION_SWEEP_SECONDS') or 600)
     
     # Email Configuration for Gmail
     MAIL_SERVER = 'smtp.gmail.com'
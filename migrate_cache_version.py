@@ -0,0 +1,38 @@
+"""
+Migration script: Tạo bảng cache_version (bộ đếm phiên bản cache trong process, app/roster.py)
+và dòng 'roster' cho bản chụp danh sách học sinh.
+
+Chạy được nhiều lần (idempotent).
+"""
+from app import create_app
+from app.models import db, CacheVersion
+from app.roster import ROSTER_CACHE
+from sqlalchemy import inspect
+
+
+def migrate_cache_version():
+    app = create_app()
+
+    with app.app_context():
+        print("=" * 60)
+        print("MIGRATION: cache_version table")
+        print("=" * 60)
+
+        print("\n[1/2] Creating table...")
+        if 'cache_version' not in inspect(db.engine).get_table_names():
+            CacheVersion.__table__.create(db.engine)
+            print("✓ cache_version created")
+        else:
+            print("⊗ cache_version already exists")
+
+        print(f"\n[2/2] Initializing '{ROSTER_CACHE}' version...")
+        if not db.session.get(CacheVersion, ROSTER_CACHE):
+            db.session.add(CacheVersion(name=ROSTER_CACHE, version=1))
+            db.session.commit()
+            print(f"✓ {ROSTER_CACHE} = 1")
+        else:
+            print(f"⊗ {ROSTER_CACHE} already exists")
+
+
+if __name__ == '__main__':
+    migrate_cache_version()
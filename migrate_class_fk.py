@@ -0,0 +1,87 @@
+"""
+Migration script: Khoá ngoại lớp cho học sinh và thứ tự lớp
+- class.sort_order (thứ tự hiển thị, trước đây hard-code trong get_class_order)
+- child.class_id (FK → class.id, có index ix_child_class_id)
+rồi backfill class_id theo tên lớp hiện có (child.class_name = class.name).
+
+Chạy được nhiều lần (idempotent) - class_id được tính lại từ class_name; sort_order
+chỉ được điền cho lớp còn giá trị mặc định.
+"""
+from app import create_app
+from app.models import db, Child, Class, DEFAULT_CLASS_SORT_ORDER
+from sqlalchemy import inspect, text
+
+# Thứ tự lớp cũ (routes.get_class_order)
+LEGACY_CLASS_ORDER = {
+    'Lớp Mầm': 1,
+    'Lớp Chồi': 2,
+    'Lớp Lá': 3,
+    'Kay 01': 4,
+    'Kay01': 4,
+    'Kay 02': 5,
+    'Kay02': 5,
+    'Kay 03': 6,
+    'Kay03': 6,
+}
+
+
+def migrate_class_fk():
+    app = create_app()
+
+    with app.app_context():
+        print("=" * 60)
+        print("MIGRATION: child.class_id + class.sort_order")
+        print("=" * 60)
+
+        inspector = inspect(db.engine)
+
+        print("\n[1/4] Adding columns...")
+        class_columns = [c['name'] for c in inspector.get_columns('class')]
+        if 'sort_order' not in class_columns:
+            db.session.execute(text(f'ALTER TABLE class ADD COLUMN sort_order INTEGER NOT NULL '
+                                    f'DEFAULT {DEFAULT_CLASS_SORT_ORDER}'))
+            print("✓ class.sort_order added")
+        else:
+            print("⊗ class.sort_order already exists")
+        child_columns = [c['name'] for c in inspector.get_columns('child')]
+        if 'class_id' not in child_columns:
+            db.session.execute(text('ALTER TABLE child ADD COLUMN class_id INTEGER REFERENCES class (id)'))
+            print("✓ child.class_id added")
+        else:
+            print("⊗ child.class_id already exists")
+        db.session.commit()
+
+        print("\n[2/4] Creating index ix_child_class_id...")
+        indexes = [i['name'] for i in inspect(db.engine).get_indexes('child')]
+        if 'ix_child_class_id' not in indexes:
+            db.session.execute(text('CREATE INDEX ix_child_class_id ON child (class_id)'))
+            db.session.commit()
+            print("✓ Index created")
+        else:
+            print("⊗ Index already exists")
+
+        print("\n[3/4] Backfilling child.class_id from class_name...")
+        db.session.execute(text(
+            'UPDATE child SET class_id = (SELECT class.id FROM class WHERE class.name = child.class_name)'
+        ))
+        db.session.commit()
+        linked = Child.query.filter(Child.class_id.isnot(None)).count()
+        unmatched = db.session.query(Child.class_name).filter(
+            Child.class_id.is_(None), Child.class_name.isnot(None), Child.class_name != ''
+        ).distinct().all()
+        print(f"✓ {linked} children linked to a class")
+        if unmatched:
+            print(f"⚠️ Class names without a matching class: {', '.join(row[0] for row in unmatched)}")
+
+        print("\n[4/4] Filling class.sort_order...")
+        updated = 0
+        for class_obj in Class.query.filter_by(sort_order=DEFAULT_CLASS_SORT_ORDER).all():
+            if class_obj.name in LEGACY_CLASS_ORDER:
+                class_obj.sort_order = LEGACY_CLASS_ORDER[class_obj.name]
+                updated += 1
+        db.session.commit()
+        print(f"✓ Done ({updated} classes ordered)")
+
+
+if __name__ == '__main__':
+    migrate_class_fk()
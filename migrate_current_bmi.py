@@ -0,0 +1,53 @@
+"""
+Migration script: Thêm bản chiếu BMI hiện tại trên child
+(current_bmi, current_weight, current_height, current_bmi_date)
+và index (student_id, date) cho bmi_record, rồi backfill từ bmi_record.
+
+Chạy được nhiều lần (idempotent).
+"""
+from app import create_app
+from app.models import db, Child
+from app.bmi_history import refresh_current_bmi
+from sqlalchemy import inspect, text
+
+
+def migrate_current_bmi():
+    app = create_app()
+
+    with app.app_context():
+        print("=" * 60)
+        print("MIGRATION: child.current_bmi projection + bmi_record index")
+        print("=" * 60)
+
+        inspector = inspect(db.engine)
+
+        print("\n[1/3] Adding child.current_* columns...")
+        columns = [c['name'] for c in inspector.get_columns('child')]
+        for name, sql_type in (('current_bmi', 'FLOAT'), ('current_weight', 'FLOAT'),
+                               ('current_height', 'FLOAT'), ('current_bmi_date', 'DATE')):
+            if name not in columns:
+                db.session.execute(text(f'ALTER TABLE child ADD COLUMN {name} {sql_type}'))
+                print(f"✓ Column {name} added")
+            else:
+                print(f"⊗ Column {name} already exists")
+
+        print("\n[2/3] Creating index ix_bmi_record_student_date...")
+        indexes = [i['name'] for i in inspector.get_indexes('bmi_record')]
+        if 'ix_bmi_record_student_date' not in indexes:
+            db.session.execute(text(
+                'CREATE INDEX ix_bmi_record_student_date ON bmi_record (student_id, date)'
+            ))
+            print("✓ Index created")
+        else:
+            print("⊗ Index already exists")
+        db.session.commit()
+
+        print("\n[3/3] Backfilling current BMI...")
+        student_ids = [row.id for row in db.session.query(Child.id)]
+        refresh_current_bmi(student_ids)
+        db.session.commit()
+        print(f"✓ Done ({len(student_ids)} students)")
+
+
+if __name__ == '__main__':
+    migrate_current_bmi()
@@ -0,0 +1,39 @@
+"""
+Migration script: Thêm cột deck.card_count (số thẻ trong bộ, denormalized)
+rồi backfill từ bảng card. (Index của card_progress: migrate_review_queue.py)
+
+Chạy được nhiều lần (idempotent).
+"""
+from app import create_app
+from app.models import db
+from sqlalchemy import inspect, text
+
+
+def migrate_deck_card_count():
+    app = create_app()
+
+    with app.app_context():
+        print("=" * 60)
+        print("MIGRATION: deck.card_count")
+        print("=" * 60)
+
+        inspector = inspect(db.engine)
+
+        print("\n[1/2] Adding deck.card_count column...")
+        columns = [c['name'] for c in inspector.get_columns('deck')]
+        if 'card_count' not in columns:
+            db.session.execute(text('ALTER TABLE deck ADD COLUMN card_count INTEGER NOT NULL DEFAULT 0'))
+            print("✓ Column added")
+        else:
+            print("⊗ Column already exists")
+
+        print("\n[2/2] Backfilling card counts...")
+        db.session.execute(text(
+            'UPDATE deck SET card_count = (SELECT COUNT(*) FROM card WHERE card.deck_id = deck.id)'
+        ))
+        db.session.commit()
+        print("✓ Done")
+
+
+if __name__ == '__main__':
+    migrate_deck_card_count()
@@ -0,0 +1,44 @@
+"""
+Migration script: Tạo bảng fee_schedule (biểu phí có version, app/billing.py) và ghi giá
+đang dùng (DEFAULT_FEES: tiền ăn 38.000đ/ngày x 26 ngày, anh văn 250.000đ, STEAMAX 200.000đ,
+học phí theo tuổi) thành version 1.
+
+Đổi giá về sau: thêm version mới bằng app.billing.add_fee_schedule(), không sửa dòng cũ.
+
+Chạy được nhiều lần (idempotent).
+"""
+from app import create_app
+from app.models import db, FeeSchedule
+from app.billing import add_fee_schedule
+from sqlalchemy import inspect
+
+INITIAL_EFFECTIVE_FROM = '2000-01'  # áp dụng cho mọi tháng cũ
+
+
+def migrate_fee_schedule():
+    app = create_app()
+
+    with app.app_context():
+        print("=" * 60)
+        print("MIGRATION: fee_schedule table")
+        print("=" * 60)
+
+        print("\n[1/2] Creating table...")
+        if 'fee_schedule' not in inspect(db.engine).get_table_names():
+            FeeSchedule.__table__.create(db.engine)
+            print("✓ fee_schedule created")
+        else:
+            print("⊗ fee_schedule already exists")
+
+        print("\n[2/2] Seeding current fees...")
+        if not FeeSchedule.query.first():
+            schedule = add_fee_schedule(INITIAL_EFFECTIVE_FROM, note='Biểu phí ban đầu')
+            db.session.commit()
+            print(f"✓ fee_schedule v{schedule.version} (from {schedule.effective_from})")
+        else:
+            latest = FeeSchedule.query.order_by(FeeSchedule.version.desc()).first()
+            print(f"⊗ Fee schedule already exists (latest v{latest.version} from {latest.effective_from})")
+
+
+if __name__ == '__main__':
+    migrate_fee_schedule()
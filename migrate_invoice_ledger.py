@@ -0,0 +1,34 @@
+"""
+Migration script: Tạo bảng sổ hóa đơn invoice, invoice_line (app/invoice_ledger.py).
+
+Hóa đơn được lập vào sổ ở lần xuất Word đầu tiên của mỗi tháng; không cần backfill.
+
+Chạy được nhiều lần (idempotent).
+"""
+from app import create_app
+from app.models import db, Invoice, InvoiceLine
+from sqlalchemy import inspect
+
+LEDGER_TABLES = [Invoice.__table__, InvoiceLine.__table__]
+
+
+def migrate_invoice_ledger():
+    app = create_app()
+
+    with app.app_context():
+        print("=" * 60)
+        print("MIGRATION: invoice ledger tables")
+        print("=" * 60)
+
+        print("\n[1/1] Creating tables...")
+        existing = set(inspect(db.engine).get_table_names())
+        for table in LEDGER_TABLES:
+            if table.name not in existing:
+                table.create(db.engine)
+                print(f"✓ {table.name} created")
+            else:
+                print(f"⊗ {table.name} already exists")
+
+
+if __name__ == '__main__':
+    migrate_invoice_ledger()
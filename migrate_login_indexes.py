@@ -0,0 +1,42 @@
+"""
+Migration script: Thêm index email/phone cho bảng child và staff
+(trang đăng nhập xác định tài khoản bằng một query có index - app/login_identity.py).
+
+Chạy được nhiều lần (idempotent).
+"""
+from app import create_app
+from app.models import db
+from sqlalchemy import inspect, text
+
+LOGIN_INDEXES = [
+    ('child', 'email'),
+    ('child', 'phone'),
+    ('staff', 'email'),
+    ('staff', 'phone'),
+]
+
+
+def migrate_login_indexes():
+    app = create_app()
+
+    with app.app_context():
+        print("=" * 60)
+        print("MIGRATION: login email/phone indexes")
+        print("=" * 60)
+
+        inspector = inspect(db.engine)
+
+        for step, (table, column) in enumerate(LOGIN_INDEXES, 1):
+            name = f'ix_{table}_{column}'
+            print(f"\n[{step}/{len(LOGIN_INDEXES)}] Creating index {name}...")
+            indexes = [i['name'] for i in inspector.get_indexes(table)]
+            if name not in indexes:
+                db.session.execute(text(f'CREATE INDEX {name} ON {table} ({column})'))
+                db.session.commit()
+                print("✓ Index created")
+            else:
+                print("⊗ Index already exists")
+
+
+if __name__ == '__main__':
+    migrate_login_indexes()
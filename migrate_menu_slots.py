@@ -0,0 +1,41 @@
+"""
+Migration script: Tạo bảng menu_slot (thực đơn dạng chuẩn hoá: menu_id, day, meal,
+position, dish_id) kèm index, rồi backfill từ các cột <thứ>_<bữa> của bảng menu.
+
+Chạy được nhiều lần (idempotent) - slot của mỗi thực đơn được tạo lại từ các cột text.
+"""
+from app import create_app
+from app.models import db, Menu, MenuSlot
+from app.menu_slots import sync_menu_slots
+from sqlalchemy import inspect
+
+
+def migrate_menu_slots():
+    app = create_app()
+
+    with app.app_context():
+        print("=" * 60)
+        print("MIGRATION: menu_slot table")
+        print("=" * 60)
+
+        inspector = inspect(db.engine)
+
+        print("\n[1/2] Creating table menu_slot...")
+        if 'menu_slot' not in inspector.get_table_names():
+            MenuSlot.__table__.create(db.engine)
+            print("✓ Table created (with indexes)")
+        else:
+            print("⊗ Table already exists")
+
+        print("\n[2/2] Backfilling menu slots...")
+        menus = Menu.query.all()
+        for menu in menus:
+            sync_menu_slots(menu)
+        db.session.commit()
+        slot_count = MenuSlot.query.count()
+        unmatched = MenuSlot.query.filter(MenuSlot.dish_id.is_(None)).count()
+        print(f"✓ Done ({len(menus)} menus, {slot_count} slots, {unmatched} without matching dish)")
+
+
+if __name__ == '__main__':
+    migrate_menu_slots()
@@ -0,0 +1,33 @@
+"""
+Migration script: Thêm index (year, week_number) cho bảng menu
+(trang danh sách thực đơn phân trang theo năm, tuần mới nhất trước).
+
+Chạy được nhiều lần (idempotent).
+"""
+from app import create_app
+from app.models import db
+from sqlalchemy import inspect, text
+
+
+def migrate_menu_year_week_index():
+    app = create_app()
+
+    with app.app_context():
+        print("=" * 60)
+        print("MIGRATION: menu (year, week_number) index")
+        print("=" * 60)
+
+        inspector = inspect(db.engine)
+
+        print("\n[1/1] Creating index ix_menu_year_week...")
+        indexes = [i['name'] for i in inspector.get_indexes('menu')]
+        if 'ix_menu_year_week' not in indexes:
+            db.session.execute(text('CREATE INDEX ix_menu_year_week ON menu (year, week_number)'))
+            db.session.commit()
+            print("✓ Index created")
+        else:
+            print("⊗ Index already exists")
+
+
+if __name__ == '__main__':
+    migrate_menu_year_week_index()
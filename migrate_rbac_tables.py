@@ -0,0 +1,51 @@
+"""
+Migration script: Tạo bảng RBAC động (roles, permissions, role_permissions, rbac_version)
+và khởi tạo roles hệ thống từ ROLE_PERMISSIONS (app/models_rbac.py).
+
+Sau khi chạy, quyền của role đọc từ database; sửa ở /rbac/roles có hiệu lực cho mọi worker
+(bộ đếm rbac_version được kiểm tra lại tối đa mỗi PERMISSION_VERSION_CHECK_SECONDS giây).
+
+Chạy được nhiều lần (idempotent).
+"""
+from app import create_app
+from app.models import db
+from app.models_rbac import Role, Permission, RbacVersion, role_permissions, init_system_roles
+from sqlalchemy import inspect
+
+RBAC_TABLES = [Role.__table__, Permission.__table__, role_permissions, RbacVersion.__table__]
+
+
+def migrate_rbac_tables():
+    app = create_app()
+
+    with app.app_context():
+        print("=" * 60)
+        print("MIGRATION: RBAC tables + permission cache version")
+        print("=" * 60)
+
+        print("\n[1/3] Creating tables...")
+        existing = set(inspect(db.engine).get_table_names())
+        for table in RBAC_TABLES:
+            if table.name not in existing:
+                table.create(db.engine)
+                print(f"✓ {table.name} created")
+            else:
+                print(f"⊗ {table.name} already exists")
+
+        print("\n[2/3] Initializing system roles...")
+        if not Role.query.first():
+            init_system_roles()
+        else:
+            print(f"⊗ Roles already exist ({Role.query.count()} roles, {Permission.query.count()} permissions)")
+
+        print("\n[3/3] Initializing permission version...")
+        if not db.session.get(RbacVersion, 1):
+            db.session.add(RbacVersion(id=1, version=1))
+            db.session.commit()
+            print("✓ rbac_version = 1")
+        else:
+            print("⊗ rbac_version already exists")
+
+
+if __name__ == '__main__':
+    migrate_rbac_tables()
@@ -0,0 +1,51 @@
+"""
+Migration script: Chuẩn bị card_progress cho hàng đợi ôn tập (app/flashcard/review_queue.py)
+- Cột first_reviewed: lần học đầu tiên, dùng đếm số thẻ mới trong ngày
+- Index (child_id, next_review): lấy thẻ đến hạn bằng range scan
+
+Dòng cũ: first_reviewed lấy theo last_reviewed nếu thẻ mới học một lần (repetitions <= 1),
+còn lại để NULL (được tính là thẻ ôn).
+
+Chạy được nhiều lần (idempotent).
+"""
+from app import create_app
+from app.models import db
+from sqlalchemy import inspect, text
+
+INDEX_NAME = 'ix_card_progress_child_next_review'
+
+
+def migrate_review_queue():
+    app = create_app()
+
+    with app.app_context():
+        print("=" * 60)
+        print("MIGRATION: card_progress review queue (first_reviewed + index)")
+        print("=" * 60)
+
+        inspector = inspect(db.engine)
+
+        print("\n[1/2] Adding card_progress.first_reviewed column...")
+        columns = [c['name'] for c in inspector.get_columns('card_progress')]
+        if 'first_reviewed' not in columns:
+            db.session.execute(text('ALTER TABLE card_progress ADD COLUMN first_reviewed DATETIME'))
+            db.session.execute(text(
+                'UPDATE card_progress SET first_reviewed = last_reviewed WHERE repetitions <= 1'
+            ))
+            db.session.commit()
+            print("✓ Column added and backfilled")
+        else:
+            print("⊗ Column already exists")
+
+        print(f"\n[2/2] Creating index {INDEX_NAME}...")
+        indexes = [i['name'] for i in inspector.get_indexes('card_progress')]
+        if INDEX_NAME not in indexes:
+            db.session.execute(text(f'CREATE INDEX {INDEX_NAME} ON card_progress (child_id, next_review)'))
+            db.session.commit()
+            print("✓ Index created")
+        else:
+            print("⊗ Index already exists")
+
+
+if __name__ == '__main__':
+    migrate_review_queue()
@@ -0,0 +1,59 @@
+"""
+Migration script: Thêm cột đơn vị chuẩn cho nguyên liệu và sản phẩm
+- dish_ingredient.base_quantity, dish_ingredient.base_unit
+- product.base_unit, product.unit_price
+rồi backfill từ quantity/unit/price hiện có (app.units).
+
+Chạy được nhiều lần (idempotent) - các cột chuẩn được tính lại từ giá trị gốc.
+"""
+from app import create_app
+from app.models import db, DishIngredient, Product
+from app.units import canonical_quantity, unit_price
+from sqlalchemy import inspect, text
+
+NEW_COLUMNS = [
+    ('dish_ingredient', 'base_quantity', 'FLOAT'),
+    ('dish_ingredient', 'base_unit', 'VARCHAR(20)'),
+    ('product', 'base_unit', 'VARCHAR(20)'),
+    ('product', 'unit_price', 'FLOAT'),
+]
+
+
+def migrate_unit_columns():
+    app = create_app()
+
+    with app.app_context():
+        print("=" * 60)
+        print("MIGRATION: canonical unit columns")
+        print("=" * 60)
+
+        inspector = inspect(db.engine)
+
+        print("\n[1/3] Adding columns...")
+        for table, column, column_type in NEW_COLUMNS:
+            columns = [c['name'] for c in inspector.get_columns(table)]
+            if column not in columns:
+                db.session.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {column_type}'))
+                print(f"✓ {table}.{column} added")
+            else:
+                print(f"⊗ {table}.{column} already exists")
+        db.session.commit()
+
+        print("\n[2/3] Backfilling dish ingredients...")
+        ingredients = DishIngredient.query.all()
+        for di in ingredients:
+            di.base_quantity, di.base_unit = canonical_quantity(di.quantity, di.unit)
+        db.session.commit()
+        print(f"✓ Done ({len(ingredients)} ingredients)")
+
+        print("\n[3/3] Backfilling products...")
+        products = Product.query.all()
+        for product in products:
+            product.base_unit, product.unit_price = unit_price(product.price, product.unit)
+        db.session.commit()
+        units = sorted({p.base_unit for p in products} | {di.base_unit for di in ingredients})
+        print(f"✓ Done ({len(products)} products, units: {', '.join(units)})")
+
+
+if __name__ == '__main__':
+    migrate_unit_columns()
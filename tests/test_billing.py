@@ -0,0 +1,101 @@
+"""
+Test tính hóa đơn (app/billing.py): so với công thức cũ trong routes.py (calculate_age + bậc học phí)
+"""
+from datetime import date, datetime
+
+import pytest
+from flask import Flask
+
+from app import billing
+from app.billing import (DEFAULT_RATES, AttendanceSummary, add_fee_schedule, compute_invoices,
+                         fee_rates)
+from app.models import db, FeeSchedule
+from app.roster import RosterEntry
+
+TODAY = date(2026, 10, 19)
+
+
+def _baseline(birth_date, excused, has_english, has_steamax, meal_fee=38000):
+    """Công thức trước khi có fee_schedule (calculate_age + if/elif học phí, 26 ngày ăn)"""
+    try:
+        birthday = datetime.strptime(birth_date, '%Y-%m-%d')
+        age = TODAY.year - birthday.year - ((TODAY.month, TODAY.day) < (birthday.month, birthday.day))
+    except Exception:
+        age = 0
+    tuition = {1: 1850000, 2: 1750000, 3: 1650000, 4: 1550000}.get(age, 1500000)
+    meal_cost = (26 - excused) * meal_fee
+    english_cost = 250000 if has_english else 0
+    steamax_cost = 200000 if has_steamax else 0
+    return age, tuition, meal_cost, english_cost, steamax_cost, tuition + meal_cost + english_cost + steamax_cost
+
+
+# (ngày sinh, vắng có phép, anh văn, steamax)
+SAMPLES = [
+    ('2025-10-19', 0, True, True),    # tròn 1 tuổi hôm nay
+    ('2025-10-20', 2, True, False),   # mai mới 1 tuổi → 0 tuổi
+    ('2024-03-01', 5, False, True),
+    ('2023-10-18', 26, False, False),
+    ('2022-02-28', 1, True, True),
+    ('2020-02-29', 0, True, True),    # 6 tuổi, ngày nhuận
+    ('2027-01-01', 0, True, True),    # ngày sinh sau hôm nay: tuổi âm
+    ('19/10/2023', 3, True, True),    # sai định dạng → 0 tuổi
+    ('', 0, False, True),
+    (None, 4, True, False),
+]
+
+
+@pytest.fixture(params=[True, False], ids=['numpy', 'python'])
+def numpy_path(request, monkeypatch):
+    monkeypatch.setattr(billing, 'NUMPY_AVAILABLE', request.param)
+
+
+def _invoices(rates, samples=SAMPLES):
+    students = [RosterEntry(i, f'HS{i}', f'Bé {i}', 1, 'Lá', birth) for i, (birth, *_) in enumerate(samples)]
+    attendance = {i: AttendanceSummary(20, 1, excused) for i, (_, excused, *_) in enumerate(samples)}
+    services = {i: (english, steamax) for i, (_, _, english, steamax) in enumerate(samples)}
+    return compute_invoices(students, attendance, services, rates, on_date=TODAY)
+
+
+def test_default_rates_match_baseline(numpy_path):
+    rows = _invoices(DEFAULT_RATES)
+    for row, sample in zip(rows, SAMPLES):
+        assert (row.age, row.tuition, row.meal_cost, row.english_cost, row.steamax_cost, row.total) \
+            == _baseline(*sample), sample
+        assert (row.present, row.absent_unexcused, row.absent_excused) == (20, 1, sample[1])
+
+
+def test_missing_attendance_and_services_use_defaults(numpy_path):
+    students = [RosterEntry(1, 'HS1', 'Bé 1', 1, 'Lá', '2024-01-01')]
+    [row] = compute_invoices(students, {}, {}, DEFAULT_RATES, on_date=TODAY)
+    assert row.total == _baseline('2024-01-01', 0, True, True)[-1]
+    assert compute_invoices([], {}, {}, DEFAULT_RATES, on_date=TODAY) == []
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'billing.db'}"
+    db.init_app(app)
+    with app.app_context():
+        yield app
+
+
+def test_fee_rates_without_table_fall_back_to_defaults(app):
+    assert fee_rates('2026-10') == DEFAULT_RATES
+
+
+def test_fee_rates_pick_latest_version_effective_for_month(app, numpy_path):
+    FeeSchedule.__table__.create(db.engine)
+    add_fee_schedule('2025-01', note='Giá cũ')
+    db.session.commit()
+    add_fee_schedule('2026-09', meal_fee=40000)
+    db.session.commit()
+
+    assert fee_rates('2024-12') == DEFAULT_RATES
+    assert fee_rates('2025-06')._replace(version=0, effective_from=None) == DEFAULT_RATES
+    rates = fee_rates('2026-10')
+    assert (rates.version, rates.effective_from, rates.meal_fee) == (2, '2026-09', 40000)
+    assert rates.tuition_by_age == DEFAULT_RATES.tuition_by_age  # JSON key str → int
+
+    for row, sample in zip(_invoices(rates), SAMPLES):
+        assert row.total == _baseline(*sample, meal_fee=40000)[-1], sample
@@ -0,0 +1,56 @@
+"""
+Test dựng biểu mẫu an toàn thực phẩm (app/food_safety_export.py) từ DaySheet tự tạo, không cần database
+"""
+import zipfile
+from datetime import date, timedelta
+from io import BytesIO
+
+from openpyxl import load_workbook
+
+from app.food_safety_export import (MEAL_TIMES, STEP_1_1, WEEKLY_TEMPLATES, build_week_zip,
+                                    build_workbook)
+from app.procurement import DaySheet, Ingredient, SupplierInfo
+
+SUPPLIER = SupplierInfo(1, 'HTX Rau Đà Lạt', '12 Trần Phú', '0901', 'Chị Mai', 'ATTP-01')
+WEEKDAYS = ['Thứ 2', 'Thứ 3', 'Thứ 4', 'Thứ 5', 'Thứ 6', 'Thứ 7']
+
+
+def _day(i):
+    meals = {key: [] for key in MEAL_TIMES}
+    meals['lunch'] = ['canh bí', 'cá kho']
+    return DaySheet(
+        key=f'day{i}', name=WEEKDAYS[i], date=date(2026, 10, 12) + timedelta(days=i), students=20,
+        meals=meals, dish_products={'canh bí': ['Bí xanh'], 'cá kho': ['Cá basa']},
+        ingredients=[
+            Ingredient('Bí xanh', 'kg', 'rau củ', SUPPLIER, None, 2.0, 2.0, 30000),
+            Ingredient('Cá basa', 'kg', 'thịt cá', None, None, 1.5, 1.5, None),
+            Ingredient('Gạo', 'kg', 'gạo', None, None, 3.0, 3.0, 54000),
+        ])
+
+
+def test_week_zip_contains_every_form_and_day():
+    days = [_day(i) for i in range(2)]
+    with zipfile.ZipFile(build_week_zip(days, 42)) as zf:
+        names = zf.namelist()
+        assert names == [t['filename'].format(week=42) for t in WEEKLY_TEMPLATES]
+        for name in names:
+            wb = load_workbook(BytesIO(zf.read(name)))
+            assert wb.sheetnames == ['Thứ 2 (12-10)', 'Thứ 3 (13-10)']
+
+
+def test_fresh_ingredients_table():
+    ws = build_workbook(STEP_1_1, [_day(0)]).active
+    values = [v for row in ws.iter_rows(values_only=True) for v in row if v is not None]
+    assert 'BÍ XANH' in values and 'CÁ BASA' in values
+    assert 'GẠO' not in values  # hàng khô nằm ở Bước 1.2
+    assert 'HTX Rau Đà Lạt' in values
+
+
+def test_styles_registered_once_per_workbook():
+    for template in WEEKLY_TEMPLATES:
+        one = build_workbook(template, [_day(0)])
+        six = build_workbook(template, [_day(i) for i in range(6)])
+        names = list(six.named_styles)
+        assert len(names) == len(set(names))
+        # Thêm sheet không tạo thêm định dạng ô mới
+        assert len(six._cell_styles) == len(one._cell_styles)
@@ -0,0 +1,99 @@
+"""
+Test sổ hóa đơn (app/invoice_ledger.py) trên database SQLite tạm
+"""
+import io
+import zipfile
+
+import pytest
+from flask import Flask
+
+from app.billing import DEFAULT_RATES, AttendanceSummary, compute_invoices
+from app.invoice_ledger import cache_docx, invoice_files, sync_invoices, zip_stream
+from app.models import db, Invoice
+from app.roster import RosterEntry
+
+MONTH = '2026-09'
+STUDENTS = [RosterEntry(i, f'HS{i}', f'Bé {i}', 1, 'Lá', f'202{i}-05-01') for i in (1, 2, 3)]
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'ledger.db'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+
+def _rows(excused=None, rates=DEFAULT_RATES):
+    excused = excused or {}
+    attendance = {s.id: AttendanceSummary(20, 0, excused.get(s.id, 0)) for s in STUDENTS}
+    return compute_invoices(STUDENTS, attendance, {2: (False, True)}, rates)
+
+
+def _sync(rows, rates=DEFAULT_RATES):
+    invoices, regenerated = sync_invoices(MONTH, rows, rates)
+    db.session.commit()
+    return invoices, regenerated
+
+
+def test_only_changed_invoices_are_regenerated(app):
+    invoices, regenerated = _sync(_rows())
+    assert regenerated == 3
+    assert [i.child_id for i in invoices] == [1, 2, 3]
+    assert [line.kind for line in invoices[1].lines] == ['tuition', 'meal', 'steamax']
+    hashes = {i.child_id: (i.id, i.input_hash) for i in invoices}
+
+    invoices, regenerated = _sync(_rows())
+    assert regenerated == 0
+    assert {i.child_id: (i.id, i.input_hash) for i in invoices} == hashes
+
+    invoices, regenerated = _sync(_rows(excused={3: 2}))
+    assert regenerated == 1
+    changed = {i.child_id for i in invoices if i.input_hash != hashes[i.child_id][1]}
+    assert changed == {3}
+    meal = next(line for line in invoices[2].lines if line.kind == 'meal')
+    days = DEFAULT_RATES.meal_days - 2
+    assert (meal.quantity, meal.amount) == (days, days * DEFAULT_RATES.meal_fee)
+    assert Invoice.query.count() == 3
+
+    # Biểu phí version mới: mọi hóa đơn lập lại
+    rates = DEFAULT_RATES._replace(version=1, meal_fee=40000)
+    assert _sync(_rows(excused={3: 2}, rates=rates), rates)[1] == 3
+
+
+def test_docx_is_rebuilt_only_for_regenerated_invoices(app):
+    built = []
+
+    def build(invoice):
+        built.append(invoice.child_id)
+        return f'docx {invoice.student_name} {invoice.total}'.encode('utf-8')
+
+    invoices, _ = _sync(_rows())
+    assert cache_docx(invoices, build) == 3
+    db.session.commit()
+
+    invoices, _ = _sync(_rows(excused={1: 1}))
+    assert cache_docx(invoices, build) == 1
+    db.session.commit()
+    assert built == [1, 2, 3, 1]
+
+
+def test_zip_stream_opens_with_zipfile(app):
+    invoices, _ = _sync(_rows())
+    cache_docx(invoices[:2], lambda invoice: f'Hóa đơn {invoice.student_name}'.encode('utf-8'))
+    db.session.commit()
+
+    chunks = list(zip_stream(invoice_files([i.id for i in invoices])))
+    assert len(chunks) == 3  # mỗi file một phần + phần cuối (central directory)
+    with zipfile.ZipFile(io.BytesIO(b''.join(chunks))) as zf:
+        assert zf.testzip() is None
+        assert zf.namelist() == [f'invoice_Bé 1_{MONTH}.docx', f'invoice_Bé 2_{MONTH}.docx']
+        assert zf.read(f'invoice_Bé 2_{MONTH}.docx').decode('utf-8') == 'Hóa đơn Bé 2'
+
+
+def test_empty_zip_stream_is_valid():
+    with zipfile.ZipFile(io.BytesIO(b''.join(zip_stream([])))) as zf:
+        assert zf.namelist() == []
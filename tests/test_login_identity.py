@@ -0,0 +1,48 @@
+"""
+Test authenticate (app/login_identity.py): số lần hash mật khẩu không phụ thuộc tài khoản khớp
+"""
+import pytest
+from werkzeug.security import generate_password_hash
+
+from app import login_identity
+from app.login_identity import MAX_LOGIN_CANDIDATES, LoginAccount, authenticate
+
+TEACHER = LoginAccount('teacher', 2, 'Cô Lan')
+PARENT = LoginAccount('parent', 5, 'Bé Na')
+
+
+@pytest.fixture
+def hashes(monkeypatch):
+    """Ghi lại các hash đã được kiểm tra"""
+    checked = []
+    check = login_identity.check_password_hash
+
+    def counting_check(password_hash, password):
+        checked.append(password_hash)
+        return check(password_hash, password)
+
+    monkeypatch.setattr(login_identity, 'check_password_hash', counting_check)
+    return checked
+
+
+def _use_candidates(monkeypatch, candidates):
+    monkeypatch.setattr(login_identity, 'resolve_login', lambda identifier: candidates)
+
+
+@pytest.mark.parametrize('password, expected', [('sai', None), ('phu-huynh', PARENT), ('giao-vien', TEACHER)])
+def test_hash_count_is_fixed(monkeypatch, hashes, password, expected):
+    for candidates in ([], [(TEACHER, generate_password_hash('giao-vien'))],
+                       [(PARENT, generate_password_hash('phu-huynh')),
+                        (TEACHER, generate_password_hash('giao-vien'))]):
+        hashes.clear()
+        _use_candidates(monkeypatch, candidates)
+        account = authenticate('a@smalltree.vn', password)
+        assert len(hashes) == MAX_LOGIN_CANDIDATES
+        assert account == (expected if expected in [c[0] for c in candidates] else None)
+
+
+def test_first_matching_account_wins(monkeypatch, hashes):
+    _use_candidates(monkeypatch, [(PARENT, generate_password_hash('chung')),
+                                  (TEACHER, generate_password_hash('chung'))])
+    assert authenticate('a@smalltree.vn', 'chung') == PARENT
+    assert len(hashes) == MAX_LOGIN_CANDIDATES
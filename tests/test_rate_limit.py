@@ -0,0 +1,92 @@
+"""
+Test RateLimit (app/rate_limit.py) trên các backend, gồm stand-in LocalRedis
+"""
+import pytest
+from flask import Flask, jsonify, session
+
+from app import rate_limit as rl
+from app.rate_limit import (LocalRedis, MemoryBackend, RateLimit, RedisBackend, SQLiteBackend,
+                            rate_limit)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rl.time, 'time', clock)
+    return clock
+
+
+@pytest.fixture(params=['memory', 'sqlite', 'redis-local'])
+def backend(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryBackend()
+    if request.param == 'sqlite':
+        return SQLiteBackend(str(tmp_path / 'rate_limit.db'))
+    return RedisBackend(LocalRedis())
+
+
+def test_limit_then_window_slides(backend, clock):
+    limiter = RateLimit('t', limit=3, window=60, backend=backend)
+    assert [limiter.hit('ip').allowed for _ in range(4)] == [True, True, True, False]
+
+    clock.now += 120  # hai window sau: bộ đếm cũ đã hết hạn
+    assert limiter.hit('ip').allowed
+    assert limiter.count('ip') == 1
+
+
+def test_lockout_and_reset(backend, clock):
+    limiter = RateLimit('t', limit=2, window=60, lockout=300, backend=backend)
+    limiter.hit('u')
+    limiter.hit('u')
+    decision = limiter.hit('u')
+    assert not decision.allowed and decision.retry_after > 0
+    assert limiter.locked_for('u') > 0
+
+    limiter.reset('u')
+    assert limiter.locked_for('u') == 0
+    assert limiter.hit('u').allowed
+
+
+def test_local_redis_commands(clock):
+    client = LocalRedis()
+    assert client.incr('k') == 1 and client.incr('k') == 2
+    assert client.ttl('k') == -1
+    assert client.expire('k', 10) and client.ttl('k') == 10
+    assert client.incr('k') == 3 and client.ttl('k') == 10  # INCR giữ TTL như Redis
+    assert client.get('k') == b'3'
+
+    client.set('s', 1.5, ex=5)
+    assert client.get('s') == b'1.5'
+    clock.now += 6
+    assert client.get('s') is None and client.ttl('s') == -2
+    assert client.delete('k', 's', 'missing') == 1
+    assert not client.expire('k', 10)
+
+
+def test_anonymous_requests_are_not_counted(monkeypatch):
+    monkeypatch.setattr(rl, '_backend', MemoryBackend())
+    app = Flask(__name__)
+    app.secret_key = 'test-secret'
+
+    @app.route('/enroll')
+    @rate_limit('enroll', limit=1, window=60,
+                key=lambda: f"user:{session['user_id']}" if session.get('user_id') else None)
+    def enroll():
+        if not session.get('user_id'):
+            return jsonify(error='Unauthorized'), 401
+        return jsonify(ok=True)
+
+    client = app.test_client()
+    assert [client.get('/enroll').status_code for _ in range(3)] == [401, 401, 401]
+    with client.session_transaction() as sess:
+        sess['user_id'] = 5
+    assert client.get('/enroll').status_code == 200
+    assert client.get('/enroll').status_code == 429
@@ -0,0 +1,71 @@
+"""
+Test session phía server (app/session_store.py) trên app Flask tối thiểu, store SQLite tạm
+"""
+import pytest
+from flask import Flask, jsonify, session
+
+from app.session_store import SQLiteSessionStore, ServerSessionInterface, regenerate_session
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.secret_key = 'test-secret'
+    app.session_interface = ServerSessionInterface(SQLiteSessionStore(str(tmp_path / 'session.db')))
+
+    @app.route('/whoami')
+    def whoami():
+        return jsonify(user_id=session.get('user_id'))
+
+    @app.route('/login/<int:user_id>')
+    def login(user_id):
+        session['user_id'] = user_id
+        regenerate_session(session)
+        return 'ok'
+
+    @app.route('/logout')
+    def logout():
+        session.clear()
+        return 'ok'
+
+    return app
+
+
+def test_session_transaction_without_app_context(app):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = 7
+    # Lần thứ hai đọc lại từ store (lazy load) - vẫn không có app context
+    with client.session_transaction() as sess:
+        assert sess['user_id'] == 7
+        sess['role'] = 'admin'
+    assert client.get('/whoami').json == {'user_id': 7}
+
+
+def _session_cookie(client):
+    return next(c for c in client.cookie_jar if c.name == 'session').value
+
+
+def test_session_readable_after_request_context(app):
+    client = app.test_client()
+    client.get('/login/3')
+    with app.test_request_context(headers={'Cookie': f'session={_session_cookie(client)}'}) as ctx:
+        sess = ctx.session
+    # Context đã đóng, dữ liệu chưa đọc lần nào (như response stream / teardown)
+    assert sess.get('user_id') == 3
+
+
+def test_regenerate_and_logout_drop_old_session(app):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+    old_sid = sess.sid
+    client.get('/login/2')
+    assert app.session_interface.store.load(old_sid) is None
+    assert client.get('/whoami').json == {'user_id': 2}
+
+    new_sid = _session_cookie(client).split('.')[0]
+    client.get('/logout')
+    assert client.get('/whoami').json == {'user_id': None}
+    assert app.session_interface.store.load(new_sid) is None
+    assert app.session_interface.load_data(new_sid, 3600) is None
@@ -0,0 +1,72 @@
+"""
+Test quy đổi đơn vị (app/units.py)
+"""
+import unicodedata
+
+import pytest
+
+from app import units
+from app.units import (COUNT, MASS, VOLUME, canonical_quantity, display_amounts, display_unit,
+                       parse_unit, purchase_cost, unit_price)
+
+
+@pytest.mark.parametrize('raw, base, factor, dimension', [
+    ('g', 'g', 1, MASS),
+    (' Gram ', 'g', 1, MASS),
+    ('KG.', 'g', 1000, MASS),
+    ('Ký', 'g', 1000, MASS),
+    ('lạng', 'g', 100, MASS),
+    ('mg', 'g', 0.001, MASS),
+    ('Lít', 'ml', 1000, VOLUME),
+    ('l', 'ml', 1000, VOLUME),
+    ('cc', 'ml', 1, VOLUME),
+    ('Gói', 'gói', 1, COUNT),
+    ('', '', 1, COUNT),
+    (None, '', 1, COUNT),
+])
+def test_parse_unit(raw, base, factor, dimension):
+    assert tuple(parse_unit(raw)) == (base, factor, dimension)
+
+
+def test_parse_unit_normalizes_decomposed_unicode():
+    # 'Lít' gõ bằng bộ gõ tổ hợp (NFD) vẫn là lít
+    assert parse_unit(unicodedata.normalize('NFD', 'Lít')) == parse_unit('l')
+
+
+@pytest.mark.parametrize('quantity, unit', [
+    (1.5, 'kg'), (250, 'g'), (3, 'lạng'), (0.75, 'lít'), (500, 'ml'), (4, 'hộp'),
+])
+def test_canonical_quantity_round_trips_to_display_unit(quantity, unit):
+    base_quantity, base_unit = canonical_quantity(quantity, unit)
+    [amount] = display_amounts([base_quantity], [base_unit])
+    factor = parse_unit(unit).factor
+    _, display_factor = units.DISPLAY_UNITS.get(base_unit, (base_unit, 1))
+    assert amount == pytest.approx(quantity * factor / display_factor)
+    # Ngược lại từ đơn vị hiển thị về đơn vị gốc
+    assert amount * display_factor / factor == pytest.approx(quantity)
+
+
+def test_display_amounts_without_numpy(monkeypatch):
+    quantities, base_units = [1500.0, 250.0, 3.0], ['g', 'ml', 'hộp']
+    expected = display_amounts(quantities, base_units)
+    monkeypatch.setattr(units, 'NUMPY_AVAILABLE', False)
+    assert display_amounts(quantities, base_units) == pytest.approx(expected)
+    assert expected == pytest.approx([1.5, 0.25, 3.0])
+    assert [display_unit(u) for u in base_units] == ['kg', 'lít', 'hộp']
+
+
+def test_price_per_base_unit_round_trips():
+    # 120.000đ/kg → 120đ/g; mua 1,5kg (1500g) = 180.000đ
+    base_unit, price = unit_price(120000, 'kg')
+    assert (base_unit, price) == ('g', 120)
+    assert purchase_cost(*canonical_quantity(1.5, 'kg'), base_unit, price) == pytest.approx(180000)
+    assert unit_price(None, 'kg') == ('g', None)
+
+
+def test_purchase_cost_across_units():
+    # Khối lượng ↔ thể tích tính theo tỉ trọng ≈ 1; đơn vị đếm không quy đổi được sang khối lượng
+    base_unit, price = unit_price(30000, 'lít')
+    assert purchase_cost(*canonical_quantity(500, 'g'), base_unit, price) == pytest.approx(15000)
+    assert purchase_cost(*canonical_quantity(2, 'gói'), base_unit, price) is None
+    assert purchase_cost(*canonical_quantity(2, 'gói'), *unit_price(5000, 'Gói')) == pytest.approx(10000)
+    assert purchase_cost(100, 'g', 'g', None) is None
@@ -0,0 +1,76 @@
+"""
+Test write_xlsx (app/xlsx_writer.py): đọc lại file bằng openpyxl
+"""
+from collections import namedtuple
+
+import pytest
+from openpyxl import load_workbook
+
+from app import xlsx_writer
+from app.xlsx_writer import MAX_COLUMN_WIDTH, Column, write_xlsx
+
+Student = namedtuple('Student', ['name', 'code'])
+
+COLUMNS = [
+    Column('STT', lambda s: s.code[1:], 'center'),
+    Column('Họ và tên', 'name'),
+    Column('Mã', 'code'),
+]
+
+
+@pytest.fixture
+def sample_rows(monkeypatch):
+    monkeypatch.setattr(xlsx_writer, 'WIDTH_SAMPLE_ROWS', 3)
+    return 3
+
+
+def _load(output):
+    try:
+        return load_workbook(output)
+    finally:
+        output.close()
+
+
+def _students(n, long_name_at=None):
+    for i in range(n):
+        name = 'N' * 80 if i == long_name_at else f'Bé {i}'
+        yield Student(name, f'S{i}')
+
+
+def test_generator_is_written_in_order(sample_rows):
+    records = _students(10)
+    wb = _load(write_xlsx(COLUMNS, records, sheet_title='Học sinh'))
+    ws = wb['Học sinh']
+    rows = list(ws.iter_rows(values_only=True))
+    assert rows[0] == ('STT', 'Họ và tên', 'Mã')
+    assert rows[1:] == [(str(i), f'Bé {i}', f'S{i}') for i in range(10)]
+    assert next(records, None) is None  # generator chỉ được duyệt một lần
+
+
+def test_mapping_records_and_missing_keys():
+    wb = _load(write_xlsx([Column('Tên', 'name'), Column('Lớp', 'class_name')], [{'name': 'An'}]))
+    assert list(wb.active.iter_rows(values_only=True)) == [('Tên', 'Lớp'), ('An', None)]
+
+
+def test_widths_come_from_sample_rows(sample_rows):
+    ws = _load(write_xlsx(COLUMNS, _students(10, long_name_at=5))).active
+    # Tên dài nằm sau WIDTH_SAMPLE_ROWS dòng đầu: không làm rộng cột
+    assert ws.column_dimensions['B'].width == len('Họ và tên') + 2
+    assert ws.column_dimensions['A'].width == len('STT') + 2
+
+    ws = _load(write_xlsx(COLUMNS, _students(10, long_name_at=1))).active
+    assert ws.column_dimensions['B'].width == MAX_COLUMN_WIDTH
+
+
+def test_named_styles_are_reused():
+    def cell_styles(n):
+        wb = _load(write_xlsx(COLUMNS, _students(n)))
+        ws = wb.active
+        assert wb.named_styles.count('header') == 1
+        assert all(c.font.b and c.fill.fgColor.rgb == '004CAF50' for c in ws[1])
+        assert [c.alignment.horizontal for c in ws[n + 1]] == ['center', 'left', 'left']
+        assert all(c.border.left.style == 'thin' for c in ws[n + 1])
+        return len(wb._cell_styles)
+
+    # Số định dạng ô (cellXfs) của workbook không tăng theo số dòng
+    assert cell_styles(5) == cell_styles(200) == 4  # mặc định + header, center, cell
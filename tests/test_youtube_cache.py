@@ -0,0 +1,196 @@
+"""
+Test YouTubeMetadataCache (app/youtube_cache.py) với endpoint videos.list giả chạy cục bộ
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+import requests
+
+from app import youtube_cache
+from app.youtube_cache import MAX_IDS_PER_REQUEST, YouTubeMetadataCache
+
+
+def _item(video_id):
+    return {
+        'id': video_id,
+        'snippet': {'title': f'Video {video_id}', 'channelTitle': 'SmallTree',
+                    'thumbnails': {'high': {'url': f'https://img/{video_id}.jpg'}}},
+        'contentDetails': {'duration': 'PT1M30S'},
+        'statistics': {'viewCount': '7'}
+    }
+
+
+class FakeYouTube:
+    """videos.list giả: trả các video trong self.videos, ghi lại danh sách ID của từng request"""
+    def __init__(self):
+        self.videos = set()
+        self.calls = []
+        self.status = 200
+        self.body = None  # ghi đè nội dung response (JSON hỏng...)
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                ids = parse_qs(urlparse(self.path).query)['id'][0].split(',')
+                fake.calls.append(ids)
+                if fake.body is not None:
+                    body = fake.body
+                elif fake.status != 200:
+                    body = json.dumps({'error': {'code': fake.status, 'message': 'quotaExceeded'}})
+                else:
+                    body = json.dumps({'items': [_item(v) for v in ids if v in fake.videos]})
+                self.send_response(fake.status)
+                self.send_header('Content-Type', 'application/json')
+                self.end_headers()
+                self.wfile.write(body.encode('utf-8'))
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/youtube/v3/videos'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def fake_youtube():
+    fake = FakeYouTube()
+    yield fake
+    fake.close()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(youtube_cache.time, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def cache(tmp_path, fake_youtube, clock):
+    return YouTubeMetadataCache(str(tmp_path / 'youtube_cache.db'), 'test-key', ttl=100,
+                                negative_ttl=10, api_url=fake_youtube.url, timeout=5)
+
+
+def test_miss_then_hit(cache, fake_youtube):
+    fake_youtube.videos = {'abc'}
+
+    video = cache.get('abc')
+    assert video['title'] == 'Video abc'
+    assert video['duration'] == 90
+    assert video['thumbnail'] == 'https://img/abc.jpg'
+    assert fake_youtube.calls == [['abc']]
+
+    assert cache.get('abc') == video
+    assert len(fake_youtube.calls) == 1
+
+
+def test_entry_expires_after_ttl(cache, fake_youtube, clock):
+    fake_youtube.videos = {'abc'}
+    cache.get('abc')
+
+    clock.now += 99
+    cache.get('abc')
+    assert len(fake_youtube.calls) == 1
+
+    clock.now += 2
+    assert cache.get('abc')['video_id'] == 'abc'
+    assert len(fake_youtube.calls) == 2
+
+
+def test_not_found_is_cached_for_negative_ttl(cache, fake_youtube, clock):
+    assert cache.get('gone') is None
+    assert cache.get('gone') is None
+    assert fake_youtube.calls == [['gone']]
+
+    fake_youtube.videos = {'gone'}
+    clock.now += 11
+    assert cache.get('gone')['video_id'] == 'gone'
+    assert len(fake_youtube.calls) == 2
+
+
+def test_batch_only_fetches_missing_ids(cache, fake_youtube):
+    fake_youtube.videos = {'a', 'b', 'c'}
+    cache.get('a')
+
+    videos = cache.get_many(['a', 'b', 'b', 'c', 'x', ''])
+    assert list(videos) == ['a', 'b', 'c', 'x']
+    assert videos['x'] is None
+    assert fake_youtube.calls[1] == ['b', 'c', 'x']
+
+
+def test_batch_splits_at_api_limit(cache, fake_youtube):
+    ids = [f'v{i}' for i in range(MAX_IDS_PER_REQUEST * 2 + 1)]
+    fake_youtube.videos = set(ids)
+
+    videos = cache.get_many(ids)
+    assert all(videos[v]['video_id'] == v for v in ids)
+    assert [len(call) for call in fake_youtube.calls] == [MAX_IDS_PER_REQUEST, MAX_IDS_PER_REQUEST, 1]
+
+
+def test_upstream_http_error_is_raised_and_not_cached(cache, fake_youtube):
+    fake_youtube.videos = {'abc'}
+    fake_youtube.status = 403
+    with pytest.raises(requests.exceptions.HTTPError):
+        cache.get('abc')
+
+    fake_youtube.status = 200
+    assert cache.get('abc')['video_id'] == 'abc'
+    assert len(fake_youtube.calls) == 2
+
+
+def test_malformed_upstream_response_raises_value_error(cache, fake_youtube):
+    fake_youtube.body = 'not json'
+    with pytest.raises(ValueError):
+        cache.get('abc')
+
+    fake_youtube.body = json.dumps({'items': [{'id': 'abc'}]})
+    with pytest.raises(KeyError):
+        cache.get('abc')
+
+
+def test_lru_keeps_max_entries(tmp_path, fake_youtube, clock):
+    cache = YouTubeMetadataCache(str(tmp_path / 'lru.db'), 'test-key', max_entries=2,
+                                 api_url=fake_youtube.url, timeout=5)
+    fake_youtube.videos = {'a', 'b', 'c'}
+    cache.get('a')
+    clock.now += 1
+    cache.get('b')
+    clock.now += 1
+    cache.get('a')  # a mới được dùng, b là bản ghi cũ nhất
+    clock.now += 1
+    cache.get('c')
+
+    calls = len(fake_youtube.calls)
+    cache.get_many(['a', 'c'])
+    assert len(fake_youtube.calls) == calls
+    cache.get('b')
+    assert fake_youtube.calls[-1] == ['b']
+
+
+def test_waiter_timeout_raises_instead_of_not_found(tmp_path, fake_youtube):
+    cache = YouTubeMetadataCache(str(tmp_path / 'wait.db'), 'test-key',
+                                 api_url=fake_youtube.url, timeout=0.05)
+    fake_youtube.videos = {'abc'}
+    cache._inflight['abc'] = youtube_cache._Pending()  # request khác đang fetch và bị treo
+    with pytest.raises(requests.exceptions.Timeout):
+        cache.get('abc')
+    assert fake_youtube.calls == []
+
+    del cache._inflight['abc']
+    assert cache.get('abc')['video_id'] == 'abc'